@@ -5,7 +5,10 @@ A lightweight enum-based registry that replaces the configuration-based
 agent system with a simple, in-memory registry of available agents.
 
 Programs are created lazily at build time to avoid expensive DSPy
-initialization at module import time.
+initialization at module import time. Compiled programs keep no per-request
+state, so each one is loaded once per process and shared by every agent and
+mode that uses it: memory per worker and startup time do not grow with the
+number of agents.
 """
 
 from collections.abc import Callable
@@ -14,7 +17,12 @@ from enum import Enum
 from typing import Any
 
 from cairo_coder.core.config import VectorStoreConfig
-from cairo_coder.core.constants import MAX_SOURCE_COUNT, SIMILARITY_THRESHOLD
+from cairo_coder.core.constants import (
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+    DEFAULT_LATENCY_BUDGET_S,
+    MAX_SOURCE_COUNT,
+    SIMILARITY_THRESHOLD,
+)
 from cairo_coder.core.rag_pipeline import RagPipeline, RagPipelineFactory
 from cairo_coder.core.types import DocumentSource
 from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
@@ -50,6 +58,10 @@ class AgentSpec:
     mcp_generation_program_factory: ProgramFactory
     max_source_count: int = MAX_SOURCE_COUNT
     similarity_threshold: float = SIMILARITY_THRESHOLD
+    # Default end-to-end latency budget in seconds (None for unbounded)
+    latency_budget_s: float | None = DEFAULT_LATENCY_BUDGET_S
+    # Token budget for the documentation context passed to generation (None for unbounded)
+    context_token_budget: int | None = DEFAULT_CONTEXT_TOKEN_BUDGET
 
     def build(
         self, vector_db: SourceFilteredPgVectorRM, vector_store_config: VectorStoreConfig
@@ -74,38 +86,86 @@ class AgentSpec:
             sources=self.sources,
             max_source_count=self.max_source_count,
             similarity_threshold=self.similarity_threshold,
+            latency_budget_s=self.latency_budget_s,
+            context_token_budget=self.context_token_budget,
             query_processor=self.query_processor_factory(),
             generation_program=self.generation_program_factory(),
             mcp_generation_program=self.mcp_generation_program_factory(),
+            retrieval_judge=_create_retrieval_judge(),
+            grok_search=_create_grok_search(),
         )
 
 
+# Program instances shared by all agents, by program key
+_shared_programs: dict[str, Any] = {}
+
+
+def shared_program(key: str, factory: ProgramFactory) -> Any:
+    """
+    Get the process-wide instance of a program, creating it on first use.
+
+    Args:
+        key: Program identifier (one per distinct compiled program)
+        factory: Function creating the program
+
+    Returns:
+        Shared program instance
+    """
+    program = _shared_programs.get(key)
+    if program is None:
+        program = _shared_programs[key] = factory()
+    return program
+
+
+def clear_shared_programs() -> None:
+    """Forget the shared programs, so the next build loads them again."""
+    _shared_programs.clear()
+
+
 def _create_cairo_coder_generation_program() -> Any:
     """Factory for Cairo Coder generation program."""
     from cairo_coder.dspy.generation_program import create_generation_program
 
-    return create_generation_program(AgentId.CAIRO_CODER)
+    return shared_program(
+        "generation_cairo_coder", lambda: create_generation_program(AgentId.CAIRO_CODER)
+    )
 
 
 def _create_starknet_generation_program() -> Any:
     """Factory for Starknet generation program."""
     from cairo_coder.dspy.generation_program import create_generation_program
 
-    return create_generation_program(AgentId.STARKNET)
+    return shared_program(
+        "generation_starknet", lambda: create_generation_program(AgentId.STARKNET)
+    )
 
 
 def _create_query_processor() -> Any:
     """Factory for query processor."""
     from cairo_coder.dspy.query_processor import create_query_processor
 
-    return create_query_processor()
+    return shared_program("query_processor", create_query_processor)
 
 
 def _create_mcp_generation_program() -> Any:
     """Factory for MCP generation program."""
     from cairo_coder.dspy.generation_program import create_mcp_generation_program
 
-    return create_mcp_generation_program()
+    return shared_program("mcp_generation", create_mcp_generation_program)
+
+
+def _create_retrieval_judge() -> Any:
+    """Factory for the retrieval judge."""
+    from cairo_coder.dspy.retrieval_judge import RetrievalJudge
+
+    return shared_program("retrieval_judge", RetrievalJudge)
+
+
+def _create_grok_search() -> Any:
+    """Factory for the Grok search program."""
+    from cairo_coder.dspy.grok_search import GrokSearchProgram
+
+    return shared_program("grok_search", GrokSearchProgram)
 
 
 # The global registry of available agents
@@ -3,16 +3,22 @@ Agent Factory for Cairo Coder.
 
 This module implements the AgentFactory class that creates and configures
 RAG Pipeline agents using the lightweight agent registry.
+
+The registry, and with it DSPy and the pipeline modules, is imported on first
+use, so importing this module (as the server does at startup) stays cheap.
 """
 
-from typing import Any
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
 
 import structlog
 
-from cairo_coder.agents.registry import get_agent_by_string_id
 from cairo_coder.core.config import VectorStoreConfig
-from cairo_coder.core.rag_pipeline import RagPipeline
-from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
+
+if TYPE_CHECKING:
+    from cairo_coder.core.rag_pipeline import RagPipeline
+    from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
 
 logger = structlog.get_logger(__name__)
 
@@ -59,6 +65,8 @@ class AgentFactory:
         if cache_key in self._agent_cache:
             return self._agent_cache[cache_key]
 
+        from cairo_coder.agents.registry import get_agent_by_string_id
+
         # Get agent spec from registry
         _, spec = get_agent_by_string_id(agent_id)
 
@@ -70,6 +78,18 @@ class AgentFactory:
 
         return agent
 
+    def preload_agents(self) -> int:
+        """
+        Build every registry agent, in both modes, ahead of the first requests.
+
+        Returns:
+            Number of agents in the cache
+        """
+        for agent_id in self.get_available_agents():
+            for mcp_mode in (False, True):
+                self.get_or_create_agent(agent_id, mcp_mode=mcp_mode)
+        return len(self._agent_cache)
+
     def clear_cache(self) -> None:
         """Clear the agent cache."""
         self._agent_cache.clear()
@@ -98,6 +118,8 @@ class AgentFactory:
         Raises:
             ValueError: If agent_id is not found
         """
+        from cairo_coder.agents.registry import get_agent_by_string_id
+
         enum_id, spec = get_agent_by_string_id(agent_id)
 
         return {
@@ -0,0 +1,92 @@
+"""
+Accounting of pipeline runs cancelled when their client disconnects.
+
+The server cancels the task running a pipeline as soon as its client goes away
+(see `server/disconnect.py`). Every stage awaits its LM or provider call in that
+task, so the cancellation reaches the call in flight: litellm aborts the HTTP
+request (streamed generation included, whose stream is closed explicitly), the
+judge's gathered calls are cancelled together and the Grok gRPC call is cancelled.
+Only embedding calls, which run in a thread, complete in the background and have
+their result discarded.
+
+The tokens a cancelled run did not spend cannot be measured; they are estimated
+as the moving average of the tokens used by the pipeline's completed runs, minus
+what the cancelled run had already used.
+
+The tokens a cancelled run did use are still passed to the callback the request
+registered with `on_cancelled_run`, so they count against the client's rate limit.
+"""
+
+from __future__ import annotations
+
+import contextvars
+from collections.abc import Callable
+
+import structlog
+
+from cairo_coder.core import metrics
+from cairo_coder.core.constants import CANCELLED_RUN_TOKENS_AVERAGE_WEIGHT
+from cairo_coder.core.types import LMUsage, usage_total_tokens
+
+logger = structlog.get_logger(__name__)
+
+_cancelled_run_callback: contextvars.ContextVar[Callable[[LMUsage], None] | None] = (
+    contextvars.ContextVar("cancelled_run_callback", default=None)
+)
+
+
+def on_cancelled_run(callback: Callable[[LMUsage], None]) -> None:
+    """
+    Pass the LM usage of the current request's cancelled runs to `callback`.
+
+    Must be called before the runs start: they see it through the context they
+    inherit. The callback is synchronous, as it runs while the run is cancelled.
+    """
+    _cancelled_run_callback.set(callback)
+
+
+class RunTokenEstimator:
+    """Moving average of the LM tokens used by a pipeline's completed runs."""
+
+    def __init__(self, weight: float = CANCELLED_RUN_TOKENS_AVERAGE_WEIGHT):
+        """
+        Initialize the estimator.
+
+        Args:
+            weight: Weight of each new run in the average (0 < weight <= 1)
+        """
+        if not 0 < weight <= 1:
+            raise ValueError("Moving average weight must be in (0, 1]")
+        self.weight = weight
+        self.mean_tokens: float | None = None
+
+    def observe(self, usage: LMUsage | None) -> None:
+        """Fold the usage of a completed run into the average."""
+        tokens = usage_total_tokens(usage or {})
+        if tokens <= 0:
+            return
+        if self.mean_tokens is None:
+            self.mean_tokens = float(tokens)
+        else:
+            self.mean_tokens += self.weight * (tokens - self.mean_tokens)
+
+    def tokens_saved(self, used: int) -> int:
+        """Estimated tokens a run cancelled after using `used` tokens did not spend."""
+        if self.mean_tokens is None:
+            return 0
+        return max(0, round(self.mean_tokens - used))
+
+    def record_cancellation(self, usage: LMUsage | None, elapsed_s: float) -> None:
+        """Log and count a run cancelled after `elapsed_s`, having used `usage`."""
+        used = usage_total_tokens(usage or {})
+        saved = self.tokens_saved(used)
+        metrics.record_cancelled_run(saved)
+        callback = _cancelled_run_callback.get()
+        if callback is not None and usage and used > 0:
+            callback(usage)
+        logger.info(
+            "Pipeline run cancelled, client disconnected",
+            elapsed_s=round(elapsed_s, 3),
+            tokens_used=used,
+            estimated_tokens_saved=saved,
+        )
@@ -0,0 +1,282 @@
+"""
+Circuit breakers for the pipeline's dependencies.
+
+When a dependency degrades, every request would otherwise wait for it to fail or
+time out before falling back. Each dependency (Grok, the judge and query
+processor LMs, the embedder and the vector database) has a breaker tracking the
+outcome of its recent calls, where a call fails when it raises or takes longer
+than the dependency's slow-call threshold:
+
+- CLOSED: calls go through; the breaker opens once too many recent calls failed.
+- OPEN: calls are rejected at once with CircuitOpenError, and the pipeline takes
+  its fallback (no Grok, no judge, heuristic query processing, cached retrieval
+  results) without waiting.
+- HALF_OPEN: after a cool-down, a few probe calls go through; the breaker closes
+  once they all succeeded and opens again on the first failure.
+
+Cancelled and timed-out calls are not counted: their limits come from the
+client (disconnects, latency budgets) or from hedges that lost, and a client must
+not open a breaker shared by every request. A call still running past its
+slow-call threshold is counted as failed at that point, so a hanging dependency
+opens its breaker even though its calls end cancelled. Breakers are per worker
+process, like the stage limits.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import os
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from enum import IntEnum
+
+import structlog
+
+from cairo_coder.core import metrics
+from cairo_coder.core.constants import (
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+    CIRCUIT_BREAKER_MIN_CALLS,
+    CIRCUIT_BREAKER_OPEN_S,
+    CIRCUIT_BREAKER_SLOW_CALL_S,
+    CIRCUIT_BREAKER_WINDOW,
+)
+
+logger = structlog.get_logger(__name__)
+
+BREAKER_GROK = "grok"
+BREAKER_JUDGE_LM = "judge_lm"
+BREAKER_QUERY_LM = "query_processor_lm"
+BREAKER_EMBEDDER = "embedder"
+BREAKER_DB = "db"
+
+
+class CircuitState(IntEnum):
+    """Breaker state; the value is exported as the state gauge."""
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+    @property
+    def label(self) -> str:
+        """Metric label of the state."""
+        return self.name.lower()
+
+
+class CircuitOpenError(Exception):
+    """A call was rejected because the breaker of its dependency is open."""
+
+    def __init__(self, dependency: str):
+        super().__init__(f"Circuit breaker of {dependency} is open")
+        self.dependency = dependency
+
+
+@dataclass
+class _Call:
+    """A call under way through a breaker."""
+
+    probe: bool
+    recorded: bool = False
+
+
+class CircuitBreaker:
+    """Tracks the recent calls to a dependency and rejects calls while it is failing."""
+
+    def __init__(
+        self,
+        dependency: str,
+        slow_call_s: float,
+        window: int = CIRCUIT_BREAKER_WINDOW,
+        min_calls: int = CIRCUIT_BREAKER_MIN_CALLS,
+        failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+        open_s: float = CIRCUIT_BREAKER_OPEN_S,
+        half_open_probes: int = CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+        enabled: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            dependency: Dependency name used in metrics, logs and errors
+            slow_call_s: Duration beyond which a call counts as failed
+            window: Outcomes of recent calls kept
+            min_calls: Calls seen before the breaker may open
+            failure_rate: Share of failed calls in the window that opens the breaker
+            open_s: Time spent open before probing the dependency again
+            half_open_probes: Successful probes needed to close the breaker
+            enabled: Whether the breaker may open (a disabled breaker only lets calls through)
+            clock: Monotonic clock, replaceable in tests
+        """
+        if slow_call_s <= 0 or open_s <= 0:
+            raise ValueError(f"Slow-call and open durations of {dependency} must be positive")
+        if not 0 < failure_rate <= 1:
+            raise ValueError(f"Failure rate of {dependency} must be in (0, 1]")
+        if not 0 < min_calls <= window or half_open_probes <= 0:
+            raise ValueError(f"Call counts of the {dependency} breaker must be positive")
+        self.dependency = dependency
+        self.slow_call_s = slow_call_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_s = open_s
+        self.half_open_probes = half_open_probes
+        self.enabled = enabled
+        self._clock = clock
+        self._outcomes: collections.deque[bool] = collections.deque(maxlen=window)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        metrics.record_circuit_state(dependency, self._state.label, int(self._state), changed=False)
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state; an open breaker becomes half-open after its cool-down."""
+        if self._state is CircuitState.OPEN and self._clock() - self._opened_at >= self.open_s:
+            self._set_state(CircuitState.HALF_OPEN)
+        return self._state
+
+    def available(self) -> bool:
+        """Whether a call would be let through now."""
+        state = self.state
+        if state is CircuitState.HALF_OPEN:
+            return self._probes_in_flight + self._probe_successes < self.half_open_probes
+        return state is CircuitState.CLOSED
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Run a call to the dependency in the block, recording its outcome.
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call (the block does not run)
+        """
+        if not self.available():
+            metrics.record_circuit_rejection(self.dependency)
+            raise CircuitOpenError(self.dependency)
+        probe = self._state is CircuitState.HALF_OPEN
+        if probe:
+            self._probes_in_flight += 1
+        call = _Call(probe)
+        start = self._clock()
+        slow_timer = self._start_slow_timer(call)
+        try:
+            yield
+        except (asyncio.CancelledError, TimeoutError):
+            self._end_call(call)
+            raise
+        except Exception:
+            self._end_call(call)
+            self._record_call(call, ok=False)
+            raise
+        finally:
+            if slow_timer is not None:
+                slow_timer.cancel()
+        self._end_call(call)
+        self._record_call(call, ok=self._clock() - start <= self.slow_call_s)
+
+    def _start_slow_timer(self, call: _Call) -> asyncio.TimerHandle | None:
+        """Fail the call once it exceeds the slow-call threshold, if run on an event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        return loop.call_later(self.slow_call_s, self._record_call, call, False)
+
+    def _end_call(self, call: _Call) -> None:
+        if call.probe:
+            # State changes reset the count while probes may still be running
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _record_call(self, call: _Call, ok: bool) -> None:
+        # Slow calls are recorded when they become slow, not again when they end
+        if not call.recorded:
+            call.recorded = True
+            self._record(ok=ok, probe=call.probe)
+
+    def _record(self, ok: bool, probe: bool) -> None:
+        if not self.enabled:
+            return
+        if probe:
+            # Probes count only while the breaker is still half-open
+            if self._state is not CircuitState.HALF_OPEN:
+                return
+            if not ok:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self._outcomes.clear()
+                self._set_state(CircuitState.CLOSED)
+                logger.info("Circuit breaker closed", dependency=self.dependency)
+            return
+        # Calls started before the breaker opened do not count
+        if self._state is not CircuitState.CLOSED:
+            return
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(
+            self._outcomes
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._set_state(CircuitState.OPEN)
+        logger.warning(
+            "Circuit breaker opened, skipping dependency",
+            dependency=self.dependency,
+            recent_calls=len(self._outcomes),
+            recent_failures=self._outcomes.count(False),
+            open_s=self.open_s,
+        )
+
+    def _set_state(self, state: CircuitState) -> None:
+        self._state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        metrics.record_circuit_state(self.dependency, state.label, int(state))
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def configure_circuit_breakers(
+    enabled: bool = True,
+    failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+    open_s: float = CIRCUIT_BREAKER_OPEN_S,
+) -> None:
+    """Replace the breakers of every dependency (all closed)."""
+    _breakers.clear()
+    for dependency, slow_call_s in CIRCUIT_BREAKER_SLOW_CALL_S.items():
+        _breakers[dependency] = CircuitBreaker(
+            dependency,
+            slow_call_s,
+            failure_rate=failure_rate,
+            open_s=open_s,
+            enabled=enabled,
+        )
+
+
+def configure_circuit_breakers_from_env() -> None:
+    """Configure the breakers from the CIRCUIT_BREAKER* environment variables."""
+    configure_circuit_breakers(
+        enabled=os.getenv("CIRCUIT_BREAKERS_ENABLED", "true").strip().lower()
+        in {"1", "true", "yes", "on"},
+        failure_rate=float(
+            os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", str(CIRCUIT_BREAKER_FAILURE_RATE))
+        ),
+        open_s=float(os.getenv("CIRCUIT_BREAKER_OPEN_S", str(CIRCUIT_BREAKER_OPEN_S))),
+    )
+
+
+def circuit_breaker(dependency: str) -> CircuitBreaker:
+    """The breaker of a dependency (one of the BREAKER_* names)."""
+    return _breakers[dependency]
+
+
+configure_circuit_breakers()
@@ -0,0 +1,237 @@
+"""
+Priority-ordered concurrency limits for requests and pipeline stages.
+
+A burst of requests would otherwise fan out into unbounded LM calls (the retrieval
+judge rates every document concurrently), embeddings and database queries until
+provider rate limits are hit and every request slows down. Each PriorityLimiter
+bounds the calls in flight; callers beyond the limit wait in a priority queue, and
+a released slot goes to the most urgent waiter (then the oldest):
+
+- INTERACTIVE: streaming chat, where a user watches the answer being written;
+- STANDARD: non-streaming chat and retrieval;
+- BACKGROUND: MCP, batch and evaluation traffic.
+
+The server admits requests through its own limiter (see `server/admission.py`)
+and sets the request priority in a context variable, so the stage limits (LLM,
+embedding, database) deep in the pipeline order their waiters the same way
+without threading the priority through. Limits are per worker process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import time
+from collections.abc import AsyncIterator
+from enum import IntEnum
+
+from cairo_coder.core import metrics
+from cairo_coder.core.constants import (
+    MAX_CONCURRENT_DB_QUERIES,
+    MAX_CONCURRENT_EMBEDDING_CALLS,
+    MAX_CONCURRENT_LLM_CALLS,
+    MAX_RETRY_AFTER_S,
+    MIN_RETRY_AFTER_S,
+)
+
+STAGE_LLM = "llm"
+STAGE_EMBEDDING = "embedding"
+STAGE_DB = "db"
+
+# Weight of the latest hold time in the moving average used for Retry-After
+_HOLD_TIME_SMOOTHING = 0.2
+
+
+class Priority(IntEnum):
+    """Request priority; lower values are served first."""
+
+    INTERACTIVE = 0
+    STANDARD = 1
+    BACKGROUND = 2
+
+    @property
+    def label(self) -> str:
+        """Metric label of the priority."""
+        return self.name.lower()
+
+
+_request_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "request_priority", default=Priority.STANDARD
+)
+
+
+def set_request_priority(priority: Priority) -> None:
+    """Set the priority of the current request (and the tasks it starts)."""
+    _request_priority.set(priority)
+
+
+def current_priority() -> Priority:
+    """Priority of the request being served (STANDARD outside requests)."""
+    return _request_priority.get()
+
+
+class LimitExceededError(Exception):
+    """A caller could not get a slot: the queue is full or the wait was too long."""
+
+    def __init__(self, limiter: str, reason: str, retry_after_s: int):
+        super().__init__(f"Too many requests waiting for {limiter} ({reason})")
+        self.limiter = limiter
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class PriorityLimiter:
+    """Bounds the concurrent holders of a slot; waiters are served by priority."""
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        max_waiting: int | None = None,
+        max_wait_s: float | None = None,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Queue name used in metrics and errors
+            limit: Slots held at once
+            max_waiting: Waiters beyond which bounded acquisitions are rejected
+                (None waits without bound)
+            max_wait_s: Time after which a bounded acquisition gives up (None waits
+                without bound)
+        """
+        if limit <= 0:
+            raise ValueError(f"Concurrency limit of {name} must be positive")
+        if max_waiting is not None and max_waiting < 0:
+            raise ValueError(f"Queue size of {name} must not be negative")
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.max_wait_s = max_wait_s
+        self.in_use = 0
+        self.waiting = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self.mean_hold_s = 1.0
+
+    def retry_after_s(self) -> int:
+        """Estimated seconds until a new caller would get a slot."""
+        estimate = self.mean_hold_s * (self.waiting + 1) / self.limit
+        return int(min(MAX_RETRY_AFTER_S, max(MIN_RETRY_AFTER_S, math.ceil(estimate))))
+
+    async def acquire(self, priority: Priority | None = None, bounded: bool = True) -> None:
+        """
+        Take a slot, waiting behind more urgent and older waiters.
+
+        Args:
+            priority: Waiter priority (defaults to the current request's priority)
+            bounded: Whether the queue size and wait limits apply
+
+        Raises:
+            LimitExceededError: If a bounded acquisition finds the queue full or
+                times out
+        """
+        if priority is None:
+            priority = current_priority()
+        if self.in_use < self.limit and not self.waiting:
+            self.in_use += 1
+            metrics.record_queue_wait(self.name, priority.label, 0.0)
+            return
+        if bounded and self.max_waiting is not None and self.waiting >= self.max_waiting:
+            raise LimitExceededError(self.name, "queue_full", self.retry_after_s())
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.waiting += 1
+        metrics.record_queue_depth(self.name, priority.label, 1)
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.max_wait_s if bounded else None):
+                await future
+        except BaseException as exc:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the wait ended
+                self.release()
+            else:
+                future.cancel()
+            if isinstance(exc, TimeoutError):
+                raise LimitExceededError(self.name, "queue_timeout", self.retry_after_s()) from None
+            raise
+        finally:
+            self.waiting -= 1
+            metrics.record_queue_depth(self.name, priority.label, -1)
+            metrics.record_queue_wait(self.name, priority.label, time.perf_counter() - start)
+
+    def release(self, held_s: float | None = None) -> None:
+        """
+        Give a slot back, handing it to the most urgent waiter if any.
+
+        Args:
+            held_s: How long the slot was held, to refine Retry-After estimates
+        """
+        if held_s is not None:
+            self.mean_hold_s += _HOLD_TIME_SMOOTHING * (held_s - self.mean_hold_s)
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self, priority: Priority | None = None, bounded: bool = True
+    ) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire(priority, bounded)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+
+_stage_limiters: dict[str, PriorityLimiter] = {}
+
+
+def configure_stage_limits(
+    llm: int = MAX_CONCURRENT_LLM_CALLS,
+    embedding: int = MAX_CONCURRENT_EMBEDDING_CALLS,
+    db: int = MAX_CONCURRENT_DB_QUERIES,
+) -> None:
+    """Replace the per-stage limits (calls in flight per worker)."""
+    _stage_limiters.clear()
+    _stage_limiters[STAGE_LLM] = PriorityLimiter(STAGE_LLM, llm)
+    _stage_limiters[STAGE_EMBEDDING] = PriorityLimiter(STAGE_EMBEDDING, embedding)
+    _stage_limiters[STAGE_DB] = PriorityLimiter(STAGE_DB, db)
+
+
+def configure_stage_limits_from_env() -> None:
+    """Configure the per-stage limits from MAX_CONCURRENT_* environment variables."""
+    configure_stage_limits(
+        llm=int(os.getenv("MAX_CONCURRENT_LLM_CALLS", str(MAX_CONCURRENT_LLM_CALLS))),
+        embedding=int(
+            os.getenv("MAX_CONCURRENT_EMBEDDING_CALLS", str(MAX_CONCURRENT_EMBEDDING_CALLS))
+        ),
+        db=int(os.getenv("MAX_CONCURRENT_DB_QUERIES", str(MAX_CONCURRENT_DB_QUERIES))),
+    )
+
+
+def stage_limiter(stage: str) -> PriorityLimiter:
+    """The limiter of a pipeline stage (STAGE_LLM, STAGE_EMBEDDING or STAGE_DB)."""
+    return _stage_limiters[stage]
+
+
+def stage_slot(stage: str) -> contextlib.AbstractAsyncContextManager[None]:
+    """Hold a slot of a pipeline stage limit; stage calls wait rather than fail."""
+    return _stage_limiters[stage].slot(bounded=False)
+
+
+configure_stage_limits()
@@ -27,6 +27,190 @@ SIMILARITY_THRESHOLD = 0.4
 MAX_SOURCE_COUNT = 5
 DEFAULT_RETRIEVAL_K = 5
 DEFAULT_JUDGE_LM = "gemini/gemini-flash-lite-latest"
+# Adjacent chunks of a page share up to this many characters (ingester chunkOverlap);
+# shorter shared prefixes are ignored when stitching merged chunks
+MAX_CHUNK_OVERLAP_CHARS = 1024
+MIN_CHUNK_OVERLAP_CHARS = 32
+
+# =============================================================================
+# Context Packing Configuration
+# =============================================================================
+# Default token budget for the documentation context passed to generation
+DEFAULT_CONTEXT_TOKEN_BUDGET = 24_000
+# Rough character-per-token ratio used to estimate context size without a tokenizer
+CONTEXT_CHARS_PER_TOKEN = 4
+# Below this many tokens of remaining budget, documents are dropped instead of truncated
+MIN_TRUNCATED_DOCUMENT_TOKENS = 200
+# Document metadata key holding the retrieval judge's relevance score
+LLM_JUDGE_SCORE_KEY = "llm_judge_score"
+# Ranking score for documents that carry neither a judge score nor a similarity
+UNSCORED_DOCUMENT_SCORE = 0.5
+
+# =============================================================================
+# Chat History Compression
+# =============================================================================
+# Recent messages are kept verbatim within this token budget (at least
+# HISTORY_MIN_VERBATIM_MESSAGES, at most HISTORY_MAX_VERBATIM_MESSAGES); older
+# messages are folded into a rolling summary cached per conversation
+HISTORY_VERBATIM_TOKEN_BUDGET = 3_000
+HISTORY_MIN_VERBATIM_MESSAGES = 2
+HISTORY_MAX_VERBATIM_MESSAGES = 10
+HISTORY_SUMMARY_CACHE_SIZE = 2_048
+HISTORY_SUMMARY_LM = "gemini/gemini-flash-lite-latest"
+
+# =============================================================================
+# Conversation State
+# =============================================================================
+# Follow-up turns reuse the previous turn's documents and judge scores; state
+# expires after CONVERSATION_STATE_TTL_S of inactivity
+CONVERSATION_STATE_TTL_S = 30 * 60
+CONVERSATION_STATE_MAX_CONVERSATIONS = 2_048
+# Documents carried over to the next turn (highest judge scores first)
+CONVERSATION_STATE_MAX_DOCUMENTS = 20
+
+# =============================================================================
+# Answer Cache Configuration
+# =============================================================================
+# Cached answers older than this are ignored and pruned at startup
+ANSWER_CACHE_TTL_S = 6 * 60 * 60
+# Most recent entries compared by embedding when near-duplicate matching is enabled
+ANSWER_CACHE_CANDIDATE_LIMIT = 200
+
+# =============================================================================
+# Grok Search Cache (per worker)
+# =============================================================================
+# Grok answers are reused for GROK_CACHE_TTL_S; for GROK_CACHE_STALE_S more, the
+# stale answer is served while a refreshed one is fetched in the background
+GROK_CACHE_TTL_S = 10 * 60
+GROK_CACHE_STALE_S = 50 * 60
+GROK_CACHE_MAX_ENTRIES = 1_024
+
+# =============================================================================
+# Streaming Configuration
+# =============================================================================
+# Events buffered between a streaming pipeline run and its consumer; beyond it,
+# the pipeline waits for the consumer (backpressure from slow clients)
+STREAM_QUEUE_MAX_EVENTS = 256
+# Adjacent answer or reasoning chunks are merged into a single event for up to
+# this long, or until this many characters are buffered (0 disables merging)
+STREAM_COALESCE_WINDOW_S = 0.03
+STREAM_COALESCE_MAX_CHARS = 1024
+
+# =============================================================================
+# Cancellation on Client Disconnect
+# =============================================================================
+# Weight of each completed run in the moving average of LM tokens per run, from
+# which the tokens saved by cancelled runs are estimated
+CANCELLED_RUN_TOKENS_AVERAGE_WEIGHT = 0.05
+# Status logged for requests whose client disconnected (nginx's "client closed request")
+CLIENT_CLOSED_REQUEST_STATUS = 499
+
+# =============================================================================
+# Admission Control and Concurrency Limits (per worker)
+# =============================================================================
+# Requests served at once; beyond it, requests wait in a priority queue of at most
+# MAX_QUEUED_REQUESTS and are rejected with 429 when it is full or after
+# ADMISSION_MAX_WAIT_S of waiting
+MAX_CONCURRENT_REQUESTS = 32
+MAX_QUEUED_REQUESTS = 64
+ADMISSION_MAX_WAIT_S = 30.0
+# Bounds of the Retry-After header sent with 429 responses
+MIN_RETRY_AFTER_S = 1
+MAX_RETRY_AFTER_S = 60
+# Calls in flight per stage, across the requests of a worker
+MAX_CONCURRENT_LLM_CALLS = 64
+MAX_CONCURRENT_EMBEDDING_CALLS = 8
+MAX_CONCURRENT_DB_QUERIES = 10
+
+# =============================================================================
+# Hedged LLM Requests (per worker)
+# =============================================================================
+# Duplicate requests a stage may send, as a share of its calls; 0 disables hedging
+LLM_HEDGE_BUDGET = 0.0
+# Hedges a stage can save up for a burst of slow calls
+LLM_HEDGE_MAX_BURST = 10.0
+# Latency quantile of the stage's recent calls after which a duplicate is sent
+LLM_HEDGE_LATENCY_QUANTILE = 0.9
+# Calls kept per stage to estimate the quantile, and calls observed before hedging
+LLM_HEDGE_LATENCY_WINDOW = 200
+LLM_HEDGE_MIN_SAMPLES = 20
+# Bounds of the hedge delay
+LLM_HEDGE_MIN_DELAY_S = 0.1
+LLM_HEDGE_MAX_DELAY_S = 20.0
+
+# =============================================================================
+# Circuit Breakers (per worker)
+# =============================================================================
+# A breaker opens when at least CIRCUIT_BREAKER_FAILURE_RATE of the last
+# CIRCUIT_BREAKER_WINDOW calls to its dependency failed or were slow (once it has
+# seen CIRCUIT_BREAKER_MIN_CALLS calls). After CIRCUIT_BREAKER_OPEN_S it lets
+# CIRCUIT_BREAKER_HALF_OPEN_PROBES calls through, and closes once they all succeed
+CIRCUIT_BREAKER_WINDOW = 20
+CIRCUIT_BREAKER_MIN_CALLS = 10
+CIRCUIT_BREAKER_FAILURE_RATE = 0.5
+CIRCUIT_BREAKER_OPEN_S = 30.0
+CIRCUIT_BREAKER_HALF_OPEN_PROBES = 3
+# Duration beyond which a call counts as slow, per dependency
+CIRCUIT_BREAKER_SLOW_CALL_S = {
+    "grok": 20.0,
+    "judge_lm": 10.0,
+    "query_processor_lm": 10.0,
+    "embedder": 5.0,
+    "db": 5.0,
+}
+
+# =============================================================================
+# Rate Limiting (per user and API key)
+# =============================================================================
+# Requests and LLM tokens per minute; 0 disables a limit. Bucket capacity is one
+# minute of allowance, so a client can burst up to its per-minute limit
+RATE_LIMIT_API_KEY_RPM = 0
+RATE_LIMIT_API_KEY_TPM = 0
+RATE_LIMIT_USER_RPM = 0
+RATE_LIMIT_USER_TPM = 0
+# Buckets kept by a worker when limits are not shared through Postgres (least
+# recently used ones are dropped, which refills them)
+RATE_LIMIT_MAX_LOCAL_BUCKETS = 100_000
+# Shared buckets untouched for this long are deleted at startup
+RATE_LIMIT_BUCKET_IDLE_TTL_S = 3600.0
+
+# =============================================================================
+# Batch API Configuration
+# =============================================================================
+# Chat completion requests accepted in one batch, and how many run at once
+BATCH_MAX_REQUESTS = 500
+BATCH_DEFAULT_CONCURRENCY = 8
+BATCH_MAX_CONCURRENCY = 32
+# Search queries of a batch are embedded together: texts are collected for up to
+# this long, or until this many are pending (the embedder's own batch size)
+BATCH_EMBEDDING_WINDOW_S = 0.05
+BATCH_EMBEDDING_MAX_TEXTS = 512
+
+# =============================================================================
+# Request Profiling
+# =============================================================================
+# Profiles kept on disk (oldest deleted first)
+PROFILING_MAX_SESSIONS = 50
+# pyinstrument sampling interval
+PROFILING_INTERVAL_S = 0.001
+
+# =============================================================================
+# Latency Budget Configuration (seconds)
+# =============================================================================
+DEFAULT_LATENCY_BUDGET_S = 90.0
+MAX_LATENCY_BUDGET_S = 300.0
+# Time kept aside for generation when bounding the stages that run before it
+GENERATION_RESERVE_S = 20.0
+# Minimum remaining budget required to start each stage; below it the stage
+# is skipped (query processing falls back to the raw query)
+QUERY_PROCESSING_MIN_BUDGET_S = 2.0
+GROK_MIN_BUDGET_S = 15.0
+JUDGE_MIN_BUDGET_S = 5.0
+SKILL_EXPANSION_MIN_BUDGET_S = 1.0
+HISTORY_SUMMARY_MIN_BUDGET_S = 5.0
+RETRIEVAL_STATEMENT_TIMEOUT_S = 10.0
+# Upper bound of a Grok search, whatever the remaining budget
+GROK_TIMEOUT_S = 30.0
 
 # =============================================================================
 # Connection Pool Configuration
@@ -0,0 +1,173 @@
+"""
+Token-budgeted context packing for generation prompts.
+
+The packer ranks the documents that survived retrieval and judging, then renders
+as many of them as fit in a per-agent token budget: documents are kept whole in
+rank order, the best one that does not fit is truncated if enough budget is left,
+and the others that do not fit are dropped. Ranking and tie-breaking only depend on document content
+and metadata, so identical inputs always produce an identical context string
+(which keeps upstream prompt caching effective).
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from cairo_coder.core.constants import (
+    CONTEXT_CHARS_PER_TOKEN,
+    LLM_JUDGE_SCORE_KEY,
+    MIN_TRUNCATED_DOCUMENT_TOKENS,
+    UNSCORED_DOCUMENT_SCORE,
+)
+from cairo_coder.core.types import Document
+
+NO_DOCUMENTATION_CONTEXT = "No relevant documentation found."
+CONTEXT_PREAMBLE = "Relevant Documentation:\n\n"
+DOCUMENT_SEPARATOR = "\n\n---\n\n"
+TRUNCATION_MARKER = "\n[... truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text (character-count heuristic)."""
+    return math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN)
+
+
+def document_score(doc: Document) -> float:
+    """Score used to rank a document: judge score, then similarity, then a neutral default."""
+    for key in (LLM_JUDGE_SCORE_KEY, "similarity"):
+        value = doc.metadata.get(key)
+        if isinstance(value, int | float):
+            return float(value)
+    return UNSCORED_DOCUMENT_SCORE
+
+
+def _sort_key(doc: Document) -> tuple:
+    """Deterministic ranking key: virtual documents first, then by descending score."""
+    url = doc.metadata.get("url") or doc.metadata.get("sourceLink", "")
+    return (
+        not doc.metadata.get("is_virtual", False),
+        -document_score(doc),
+        str(url),
+        str(doc.metadata.get("chunkNumber", "")),
+        str(doc.metadata.get("title", "")),
+        doc.page_content,
+    )
+
+
+def rank_documents(documents: list[Document]) -> list[Document]:
+    """Documents in context order: virtual documents first, then by descending score."""
+    return sorted(documents, key=_sort_key)
+
+
+def _render_header(doc: Document) -> str:
+    """Render the markdown header of a document block (empty for virtual documents)."""
+    # Virtual documents (like Grok summaries) are included without a header so the
+    # LLM cites the actual sources instead of the container
+    if doc.metadata.get("is_virtual", False):
+        return ""
+    source_name = doc.metadata.get("source_display", "Unknown Source")
+    title = doc.metadata.get("title", "Untitled Document")
+    url = doc.metadata.get("url") or doc.metadata.get("sourceLink", "")
+    heading = f"## [{title}]({url})" if url else f"## {title}"
+    return f"{heading}\n*Source: {source_name}*\n\n"
+
+
+@dataclass
+class PackedContext:
+    """Result of packing documents into a generation context."""
+
+    text: str
+    tokens_used: int
+    included: list[Document]
+    truncated: int = 0
+    dropped: int = 0
+
+
+class ContextPacker:
+    """Packs ranked documents into a context string bounded by a token budget."""
+
+    def __init__(
+        self,
+        token_budget: int | None,
+        min_truncated_tokens: int = MIN_TRUNCATED_DOCUMENT_TOKENS,
+    ):
+        """
+        Initialize the packer.
+
+        Args:
+            token_budget: Maximum context size in tokens, or None for no limit
+            min_truncated_tokens: Smallest useful truncated document; below this
+                remaining budget, documents are dropped instead of truncated
+        """
+        if token_budget is not None and token_budget <= 0:
+            raise ValueError("Context token budget must be positive")
+        self.token_budget = token_budget
+        self.min_truncated_tokens = min_truncated_tokens
+
+    def pack(self, documents: list[Document]) -> PackedContext:
+        """
+        Rank documents and render as many as fit in the token budget.
+
+        Args:
+            documents: Documents to include in the context
+
+        Returns:
+            PackedContext with the rendered text and packing statistics
+        """
+        if not documents:
+            return PackedContext(
+                text=NO_DOCUMENTATION_CONTEXT,
+                tokens_used=estimate_tokens(NO_DOCUMENTATION_CONTEXT),
+                included=[],
+            )
+
+        blocks = [CONTEXT_PREAMBLE]
+        used = estimate_tokens(CONTEXT_PREAMBLE)
+        included: list[Document] = []
+        truncated = 0
+        dropped = 0
+
+        for doc in rank_documents(documents):
+            header = _render_header(doc)
+            block = f"{header}{doc.page_content}{DOCUMENT_SEPARATOR}"
+            cost = estimate_tokens(block)
+            if self.token_budget is None or used + cost <= self.token_budget:
+                blocks.append(block)
+                used += cost
+                included.append(doc)
+                continue
+
+            # At most one document (the best one that does not fit whole) is truncated;
+            # smaller lower-ranked documents may still fill the remaining budget.
+            remaining = self.token_budget - used
+            overhead = estimate_tokens(f"{header}{TRUNCATION_MARKER}{DOCUMENT_SEPARATOR}")
+            content_tokens = remaining - overhead
+            if truncated == 0 and content_tokens >= self.min_truncated_tokens:
+                content = doc.page_content[: content_tokens * CONTEXT_CHARS_PER_TOKEN]
+                # Cut on a line boundary when possible to avoid splitting code mid-line
+                if "\n" in content:
+                    content = content[: content.rindex("\n")]
+                block = f"{header}{content}{TRUNCATION_MARKER}{DOCUMENT_SEPARATOR}"
+                cost = estimate_tokens(block)
+                # Rounding the overhead and content separately may leave the block a
+                # token over the remaining budget: trim what exceeds it
+                if cost > remaining:
+                    content = content[: len(content) - (cost - remaining) * CONTEXT_CHARS_PER_TOKEN]
+                    block = f"{header}{content}{TRUNCATION_MARKER}{DOCUMENT_SEPARATOR}"
+                    cost = estimate_tokens(block)
+                if cost <= remaining:
+                    blocks.append(block)
+                    used += cost
+                    included.append(doc)
+                    truncated += 1
+                    continue
+            dropped += 1
+
+        return PackedContext(
+            text="".join(blocks),
+            tokens_used=used,
+            included=included,
+            truncated=truncated,
+            dropped=dropped,
+        )
@@ -0,0 +1,143 @@
+"""
+Server-side conversation state for follow-up turns.
+
+For each conversation (keyed by the `x-conversation-id` header), the store keeps the
+last ProcessedQuery, the documents kept for generation and the judge scores of every
+document judged so far. Follow-up turns ("now add a test for it") extend the
+previous document set with newly retrieved documents and only send documents
+without a known score to the retrieval judge.
+
+State is kept in-process per pipeline (LRU-bounded, expiring after inactivity), so a
+follow-up routed to another worker simply runs the full pipeline.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from cairo_coder.core.constants import (
+    CONVERSATION_STATE_MAX_CONVERSATIONS,
+    CONVERSATION_STATE_MAX_DOCUMENTS,
+    CONVERSATION_STATE_TTL_S,
+)
+from cairo_coder.core.types import Document, ProcessedQuery
+from cairo_coder.dspy.retrieval_judge import LLM_JUDGE_SCORE_KEY
+
+
+def document_key(doc: Document) -> str:
+    """Stable identifier of a document, covering its content (merged chunks differ)."""
+    payload = json.dumps(
+        [
+            str(doc.metadata.get("source", "")),
+            doc.metadata.get("uniqueId") or doc.metadata.get("title", ""),
+            doc.page_content,
+        ]
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class ConversationState:
+    """Retrieval state left by the last turn of a conversation."""
+
+    processed_query: ProcessedQuery
+    document_ids: list[str]
+    judge_scores: dict[str, float]
+    documents: list[Document]
+    turn: int = 1
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def reusable_documents(self) -> list[Document]:
+        """Copies of the previous turn's documents (metadata is mutated downstream)."""
+        return [
+            Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+            for doc in self.documents
+        ]
+
+
+class ConversationStateStore:
+    """In-process, LRU-bounded store of conversation states."""
+
+    def __init__(
+        self,
+        ttl_s: float = CONVERSATION_STATE_TTL_S,
+        max_conversations: int = CONVERSATION_STATE_MAX_CONVERSATIONS,
+        max_documents: int = CONVERSATION_STATE_MAX_DOCUMENTS,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            ttl_s: Inactivity after which a conversation state is discarded
+            max_conversations: Number of conversations kept (least recently used evicted)
+            max_documents: Number of documents carried over to the next turn
+        """
+        if ttl_s <= 0:
+            raise ValueError("Conversation state TTL must be positive")
+        self.ttl_s = ttl_s
+        self.max_conversations = max_conversations
+        self.max_documents = max_documents
+        self._states: OrderedDict[str, ConversationState] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def get(self, conversation_id: str | None) -> ConversationState | None:
+        """Return the state of a conversation, or None if unknown or expired."""
+        if conversation_id is None:
+            return None
+        state = self._states.get(conversation_id)
+        if state is None:
+            return None
+        if time.monotonic() - state.updated_at > self.ttl_s:
+            del self._states[conversation_id]
+            return None
+        self._states.move_to_end(conversation_id)
+        return state
+
+    def update(
+        self,
+        conversation_id: str,
+        processed_query: ProcessedQuery,
+        judged: list[Document],
+        kept: list[Document],
+    ) -> ConversationState:
+        """
+        Record the outcome of a turn.
+
+        Args:
+            conversation_id: Conversation the turn belongs to
+            processed_query: Processed query of the turn
+            judged: Documents considered by the judge (scores are read from their metadata)
+            kept: Documents kept for generation, carried over to the next turn
+
+        Returns:
+            The new conversation state
+        """
+        previous = self.get(conversation_id)
+        scores = dict(previous.judge_scores) if previous else {}
+        for doc in judged:
+            score = doc.metadata.get(LLM_JUDGE_SCORE_KEY)
+            if isinstance(score, int | float):
+                scores[document_key(doc)] = float(score)
+
+        carried = [doc for doc in kept if not doc.metadata.get("is_virtual", False)]
+        carried.sort(key=lambda doc: -scores.get(document_key(doc), 0.0))
+        carried = carried[: self.max_documents]
+
+        state = ConversationState(
+            processed_query=processed_query,
+            document_ids=[document_key(doc) for doc in carried],
+            judge_scores=scores,
+            documents=carried,
+            turn=previous.turn + 1 if previous else 1,
+        )
+        self._states[conversation_id] = state
+        self._states.move_to_end(conversation_id)
+        while len(self._states) > self.max_conversations:
+            self._states.popitem(last=False)
+        return state
@@ -0,0 +1,106 @@
+"""
+Per-request latency budget for the RAG pipeline.
+
+A Deadline is created once per request and shared by every pipeline stage.
+Optional stages (Grok augmentation, retrieval judge, skill expansion) consult it
+to decide whether to run at all and how long they may take, and record the
+degradations they applied so they can be surfaced on the PipelineResult.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+
+from cairo_coder.core.constants import MAX_LATENCY_BUDGET_S
+
+
+class Deadline:
+    """
+    Monotonic deadline shared by the stages of a single pipeline run.
+
+    A budget of None means "unbounded": every stage is allowed to run and no
+    timeouts are applied.
+    """
+
+    def __init__(self, budget_s: float | None = None):
+        """
+        Initialize the deadline.
+
+        Args:
+            budget_s: Total latency budget in seconds, or None for no limit
+        """
+        if budget_s is not None and budget_s <= 0:
+            raise ValueError("Latency budget must be positive")
+        self.budget_s = budget_s
+        self.started_at = time.monotonic()
+        self.degradations: list[str] = []
+
+    @classmethod
+    def from_header(cls, value: str) -> Deadline:
+        """
+        Build a deadline from an `x-latency-budget-ms` header value.
+
+        Args:
+            value: Raw header value in milliseconds
+
+        Returns:
+            Deadline capped at MAX_LATENCY_BUDGET_S
+
+        Raises:
+            ValueError: If the header is not a positive integer
+        """
+        try:
+            budget_ms = int(value)
+        except ValueError as exc:
+            raise ValueError("x-latency-budget-ms must be an integer number of milliseconds") from exc
+        if budget_ms <= 0:
+            raise ValueError("x-latency-budget-ms must be positive")
+        return cls(min(budget_ms / 1000, MAX_LATENCY_BUDGET_S))
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds elapsed since the deadline was created."""
+        return time.monotonic() - self.started_at
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (infinite when unbounded)."""
+        if self.budget_s is None:
+            return math.inf
+        return max(0.0, self.budget_s - self.elapsed)
+
+    def expired(self) -> bool:
+        """Whether the budget has been fully consumed."""
+        return self.remaining() <= 0
+
+    def allows(self, min_s: float, reserve_s: float = 0.0) -> bool:
+        """
+        Check whether a stage needing at least `min_s` seconds may start.
+
+        Args:
+            min_s: Minimum time the stage needs to be useful
+            reserve_s: Time to keep aside for later stages
+        """
+        return self.remaining() - reserve_s >= min_s
+
+    def timeout(self, reserve_s: float = 0.0, cap_s: float | None = None) -> float | None:
+        """
+        Compute the timeout to apply to a stage.
+
+        Args:
+            reserve_s: Time to keep aside for later stages
+            cap_s: Optional upper bound for this stage
+
+        Returns:
+            Timeout in seconds, or None when neither budget nor cap applies
+        """
+        remaining = self.remaining()
+        if math.isinf(remaining):
+            return cap_s
+        available = max(0.0, remaining - reserve_s)
+        return available if cap_s is None else min(available, cap_s)
+
+    def degrade(self, degradation: str) -> None:
+        """Record a degradation applied to this request."""
+        if degradation not in self.degradations:
+            self.degradations.append(degradation)
@@ -0,0 +1,192 @@
+"""
+Hedged LLM requests for the non-streaming stages.
+
+Provider latency has a long tail: most query processing and judge calls return
+quickly, but a few take several times longer and set the request's p99. A hedged
+stage sends a duplicate of a call that is still running after the stage's usual
+latency (the LLM_HEDGE_LATENCY_QUANTILE of its recent calls); whichever answers
+first wins, and the other is cancelled, which aborts its HTTP request.
+
+Duplicates cost tokens, so each stage earns LLM_HEDGE_BUDGET hedges per call (up
+to a burst of LLM_HEDGE_MAX_BURST) and skips hedging once they are spent; with the
+default budget of 0, hedging is disabled. A stage hedges only once it has seen
+LLM_HEDGE_MIN_SAMPLES calls. Budgets and latencies are per worker process.
+
+Hedges are not retries: a call that fails is not duplicated, and a hedged call
+only fails when every request sent failed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from cairo_coder.core import metrics
+from cairo_coder.core.constants import (
+    LLM_HEDGE_BUDGET,
+    LLM_HEDGE_LATENCY_QUANTILE,
+    LLM_HEDGE_LATENCY_WINDOW,
+    LLM_HEDGE_MAX_BURST,
+    LLM_HEDGE_MAX_DELAY_S,
+    LLM_HEDGE_MIN_DELAY_S,
+    LLM_HEDGE_MIN_SAMPLES,
+)
+
+T = TypeVar("T")
+
+HEDGE_SENT = "sent"
+HEDGE_WON = "won"
+HEDGE_SKIPPED = "skipped"
+
+
+@dataclass
+class HedgeConfig:
+    """Hedging settings shared by the hedged stages."""
+
+    budget: float = LLM_HEDGE_BUDGET
+    max_burst: float = LLM_HEDGE_MAX_BURST
+    latency_quantile: float = LLM_HEDGE_LATENCY_QUANTILE
+    latency_window: int = LLM_HEDGE_LATENCY_WINDOW
+    min_samples: int = LLM_HEDGE_MIN_SAMPLES
+    min_delay_s: float = LLM_HEDGE_MIN_DELAY_S
+    max_delay_s: float = LLM_HEDGE_MAX_DELAY_S
+
+    def __post_init__(self) -> None:
+        if self.budget < 0:
+            raise ValueError("Hedge budget must not be negative")
+        if self.max_burst < 1 and self.budget > 0:
+            raise ValueError("Hedge burst must allow at least one hedge")
+        if not 0 < self.latency_quantile < 1:
+            raise ValueError("Hedge latency quantile must be in (0, 1)")
+        if self.latency_window < 1 or self.min_samples < 1:
+            raise ValueError("Hedge latency window and minimum samples must be positive")
+        if not 0 <= self.min_delay_s <= self.max_delay_s:
+            raise ValueError("Hedge delay bounds must satisfy 0 <= min <= max")
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+
+class Hedger:
+    """Hedges the calls of one stage, within the stage's budget."""
+
+    def __init__(self, stage: str, config: HedgeConfig):
+        """
+        Initialize the hedger.
+
+        Args:
+            stage: Stage name used in metrics
+            config: Hedging settings
+        """
+        self.stage = stage
+        self.config = config
+        self.latencies: collections.deque[float] = collections.deque(maxlen=config.latency_window)
+        # Hedges earned and not spent yet
+        self.credit = 0.0
+
+    def delay_s(self) -> float | None:
+        """Time after which a call is hedged, or None while too few calls were seen."""
+        if len(self.latencies) < self.config.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        quantile = ordered[min(len(ordered) - 1, int(self.config.latency_quantile * len(ordered)))]
+        return min(self.config.max_delay_s, max(self.config.min_delay_s, quantile))
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await `call()`, sending a second `call()` if the first one is slow.
+
+        Args:
+            call: Starts the stage's LLM request; called once per request sent
+
+        Returns:
+            Result of the first request to succeed
+        """
+        if not self.config.enabled:
+            return await call()
+
+        self.credit = min(self.config.max_burst, self.credit + self.config.budget)
+        delay = self.delay_s()
+        started: dict[asyncio.Future[T], float] = {}
+
+        def send() -> asyncio.Future[T]:
+            task = asyncio.ensure_future(call())
+            started[task] = time.perf_counter()
+            return task
+
+        primary = send()
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    if self.credit >= 1:
+                        self.credit -= 1
+                        send()
+                        metrics.record_hedge(self.stage, HEDGE_SENT)
+                    else:
+                        metrics.record_hedge(self.stage, HEDGE_SKIPPED)
+            winner = await self._first_success(list(started))
+        finally:
+            losers = [task for task in started if not task.done()]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+
+        result = winner.result()
+        self.latencies.append(time.perf_counter() - started[winner])
+        if winner is not primary:
+            metrics.record_hedge(self.stage, HEDGE_WON)
+        return result
+
+    @staticmethod
+    async def _first_success(tasks: list[asyncio.Future[T]]) -> asyncio.Future[T]:
+        """First task to succeed, or the first one sent when all of them fail."""
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return task
+        return tasks[0]
+
+
+_config = HedgeConfig()
+_hedgers: dict[str, Hedger] = {}
+
+
+def configure_hedging(config: HedgeConfig) -> None:
+    """Replace the hedging settings, resetting every stage's latencies and budget."""
+    global _config
+    _config = config
+    _hedgers.clear()
+
+
+def configure_hedging_from_env() -> None:
+    """Configure hedging from the LLM_HEDGE_* environment variables."""
+    configure_hedging(
+        HedgeConfig(
+            budget=float(os.getenv("LLM_HEDGE_BUDGET", str(LLM_HEDGE_BUDGET))),
+            max_burst=float(os.getenv("LLM_HEDGE_MAX_BURST", str(LLM_HEDGE_MAX_BURST))),
+            latency_quantile=float(
+                os.getenv("LLM_HEDGE_LATENCY_QUANTILE", str(LLM_HEDGE_LATENCY_QUANTILE))
+            ),
+        )
+    )
+
+
+def hedger(stage: str) -> Hedger:
+    """The hedger of a stage, created on first use."""
+    if stage not in _hedgers:
+        _hedgers[stage] = Hedger(stage, _config)
+    return _hedgers[stage]
+
+
+async def hedged(stage: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Await `call()` with hedging for `stage` (a plain call while hedging is disabled)."""
+    return await hedger(stage).run(call)
@@ -0,0 +1,365 @@
+"""
+Prometheus metrics for the Cairo Coder server.
+
+Pipeline stages, retrieval judge outcomes, LM token usage, cache lookups, database
+pool checkouts, streamed text chunks, client disconnects and the pipeline runs they
+cancelled, hedged LLM requests, circuit breakers, concurrency queues and 429
+rejections are exported on `/metrics`, labelled by agent and mode (`chat`, `mcp`,
+`retrieve` or `batch`). The labels of the current request are held in a context
+variable set by the server, so instrumented code deep in the pipeline (retriever,
+judge, repository) does not need to thread them through.
+
+Under multi-worker uvicorn, `main()` points PROMETHEUS_MULTIPROC_DIR at a shared
+directory before the workers start; each worker then writes its samples there and
+`/metrics` aggregates every worker's samples, whichever worker serves the scrape.
+Counters and histograms are summed across workers. Gauges declare how they are
+aggregated (see the note above the registry); a worker's gauge samples are dropped
+when it shuts down.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import glob
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# prometheus_client picks its value storage when first imported, so multiprocess
+# mode must be decided the same way
+MULTIPROCESS_MODE = bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+# Pipeline stages with a latency histogram
+STAGE_QUERY_PROCESSING = "query_processing"
+STAGE_EMBEDDING = "embedding"
+STAGE_VECTOR_SEARCH = "vector_search"
+STAGE_GROK = "grok"
+STAGE_JUDGE = "judge"
+STAGE_SKILL_EXPANSION = "skill_expansion"
+STAGE_SUGGESTIONS = "suggestions"
+STAGE_FIRST_TOKEN = "first_token"
+STAGE_TOTAL = "total"
+
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LABELS = ("agent", "mode")
+
+# Gauges and their multiprocess aggregation across live workers:
+# - QUEUE_DEPTH (`livesum`): requests waiting on the whole server
+# - CIRCUIT_BREAKER_STATE (`livemax`): the worst state of any worker's breaker,
+#   as each worker has its own breakers
+# Every other metric is a counter or a histogram.
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "cairo_coder_pipeline_stage_seconds",
+    "Latency of RAG pipeline stages",
+    [*REQUEST_LABELS, "stage"],
+    buckets=STAGE_BUCKETS,
+)
+JUDGE_CALLS = Counter(
+    "cairo_coder_judge_calls_total",
+    "Documents sent to the retrieval judge LM",
+    REQUEST_LABELS,
+)
+JUDGE_DOCUMENTS = Counter(
+    "cairo_coder_judge_documents_total",
+    "Documents kept or dropped by the retrieval judge",
+    [*REQUEST_LABELS, "outcome"],
+)
+LM_TOKENS = Counter(
+    "cairo_coder_lm_tokens_total",
+    "LM tokens used, by model and token kind",
+    [*REQUEST_LABELS, "model", "kind"],
+)
+CACHE_LOOKUPS = Counter(
+    "cairo_coder_cache_lookups_total",
+    "Cache lookups by cache and result",
+    [*REQUEST_LABELS, "cache", "result"],
+)
+DB_POOL_CHECKOUTS = Counter(
+    "cairo_coder_db_pool_checkouts_total",
+    "asyncpg pool connection checkouts",
+    [*REQUEST_LABELS, "pool"],
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "cairo_coder_db_pool_wait_seconds",
+    "Time spent waiting for an asyncpg pool connection",
+    [*REQUEST_LABELS, "pool"],
+    buckets=POOL_WAIT_BUCKETS,
+)
+STREAM_TEXT_CHUNKS = Counter(
+    "cairo_coder_stream_text_chunks_total",
+    "Answer and reasoning chunks produced by streaming pipeline runs",
+    [*REQUEST_LABELS, "kind"],
+)
+STREAM_TEXT_FRAMES = Counter(
+    "cairo_coder_stream_text_frames_total",
+    "Events emitted for those chunks once adjacent chunks are coalesced",
+    [*REQUEST_LABELS, "kind"],
+)
+SSE_DISCONNECTS = Counter(
+    "cairo_coder_sse_client_disconnects_total",
+    "Streaming clients that disconnected before the end of the response",
+    REQUEST_LABELS,
+)
+CLIENT_DISCONNECTS = Counter(
+    "cairo_coder_client_disconnects_total",
+    "Clients that disconnected before their response was ready",
+    REQUEST_LABELS,
+)
+CANCELLED_RUNS = Counter(
+    "cairo_coder_cancelled_runs_total",
+    "Pipeline runs cancelled before completion because their clients disconnected",
+    REQUEST_LABELS,
+)
+LM_TOKENS_SAVED = Counter(
+    "cairo_coder_lm_tokens_saved_total",
+    "Estimated LM tokens not spent thanks to cancelled pipeline runs",
+    REQUEST_LABELS,
+)
+LLM_HEDGES = Counter(
+    "cairo_coder_llm_hedges_total",
+    "Duplicate LLM requests of hedged stages: sent, won (answered first) or skipped (over budget)",
+    [*REQUEST_LABELS, "stage", "outcome"],
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "cairo_coder_queue_wait_seconds",
+    "Time spent waiting for a request admission or stage concurrency slot",
+    [*REQUEST_LABELS, "queue", "priority"],
+    buckets=QUEUE_WAIT_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "cairo_coder_queue_depth",
+    "Requests or stage calls currently waiting for a slot",
+    ["queue", "priority"],
+    multiprocess_mode="livesum",
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "cairo_coder_circuit_breaker_state",
+    "Circuit breaker state by dependency: 0 closed, 1 half-open, 2 open",
+    ["dependency"],
+    multiprocess_mode="livemax",
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "cairo_coder_circuit_breaker_transitions_total",
+    "Circuit breaker state changes by dependency and new state",
+    ["dependency", "state"],
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "cairo_coder_circuit_breaker_rejections_total",
+    "Calls skipped because the circuit breaker of their dependency was open",
+    [*REQUEST_LABELS, "dependency"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "cairo_coder_admission_rejections_total",
+    "Requests rejected with 429 Too Many Requests",
+    [*REQUEST_LABELS, "reason"],
+)
+
+
+# (agent, mode) of the request being served; "none" outside requests
+_request_labels: contextvars.ContextVar[tuple[str, str]] = contextvars.ContextVar(
+    "metrics_request_labels", default=("none", "none")
+)
+
+# Raw stage samples collected by `record_stages()` (offline benchmarks)
+_stage_samples: contextvars.ContextVar[list[tuple[str, float]] | None] = contextvars.ContextVar(
+    "metrics_stage_samples", default=None
+)
+
+
+def set_request_labels(agent_id: str, mcp_mode: bool, mode: str | None = None) -> None:
+    """
+    Label the metrics recorded by the current request (and the tasks it starts).
+
+    The mode label is "mcp" or "chat" unless `mode` overrides it (e.g. "retrieve").
+    """
+    _request_labels.set((agent_id, mode or ("mcp" if mcp_mode else "chat")))
+
+
+def _labels() -> tuple[str, str]:
+    return _request_labels.get()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record the duration of a pipeline stage."""
+    PIPELINE_STAGE_SECONDS.labels(*_labels(), stage).observe(seconds)
+    samples = _stage_samples.get()
+    if samples is not None:
+        samples.append((stage, seconds))
+
+
+@contextlib.contextmanager
+def record_stages() -> Iterator[list[tuple[str, float]]]:
+    """
+    Collect the raw `(stage, seconds)` samples observed in the current context.
+
+    Histograms only give bucketed latencies; benchmarks use the raw samples to
+    compute exact percentiles. Tasks started inside the block are included.
+    """
+    samples: list[tuple[str, float]] = []
+    token = _stage_samples.set(samples)
+    try:
+        yield samples
+    finally:
+        _stage_samples.reset(token)
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time a pipeline stage, including stages that fail or are cancelled."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_judge(judged: int, kept: int) -> None:
+    """Record a retrieval judge run over `judged` documents."""
+    agent, mode = _labels()
+    JUDGE_CALLS.labels(agent, mode).inc(judged)
+    JUDGE_DOCUMENTS.labels(agent, mode, "kept").inc(kept)
+    JUDGE_DOCUMENTS.labels(agent, mode, "dropped").inc(max(0, judged - kept))
+
+
+def record_lm_usage(usage: dict[str, dict[str, Any]] | None) -> None:
+    """Record the token usage of a pipeline run (`{model: {prompt_tokens, ...}}`)."""
+    agent, mode = _labels()
+    for model, entry in (usage or {}).items():
+        for kind in ("prompt_tokens", "completion_tokens"):
+            tokens = entry.get(kind) if isinstance(entry, dict) else None
+            if isinstance(tokens, int | float) and tokens > 0:
+                LM_TOKENS.labels(agent, mode, model, kind.removesuffix("_tokens")).inc(tokens)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Record a cache lookup."""
+    CACHE_LOOKUPS.labels(*_labels(), cache, "hit" if hit else "miss").inc()
+
+
+def record_stream_frame(kind: str, chunks: int) -> None:
+    """Record a streamed text event made of `chunks` coalesced chunks."""
+    agent, mode = _labels()
+    STREAM_TEXT_CHUNKS.labels(agent, mode, kind).inc(chunks)
+    STREAM_TEXT_FRAMES.labels(agent, mode, kind).inc()
+
+
+def record_sse_disconnect() -> None:
+    """Record a streaming client that went away mid-response."""
+    SSE_DISCONNECTS.labels(*_labels()).inc()
+
+
+def record_client_disconnect() -> None:
+    """Record a client that went away before its (non-streamed) response was ready."""
+    CLIENT_DISCONNECTS.labels(*_labels()).inc()
+
+
+def record_cancelled_run(estimated_tokens_saved: int) -> None:
+    """Record a pipeline run cancelled before completion."""
+    agent, mode = _labels()
+    CANCELLED_RUNS.labels(agent, mode).inc()
+    LM_TOKENS_SAVED.labels(agent, mode).inc(estimated_tokens_saved)
+
+
+def record_hedge(stage: str, outcome: str) -> None:
+    """Record a duplicate LLM request of a hedged stage."""
+    LLM_HEDGES.labels(*_labels(), stage, outcome).inc()
+
+
+def record_circuit_state(dependency: str, state: str, value: int, changed: bool = True) -> None:
+    """Record the state of a circuit breaker, counting a transition when it `changed`."""
+    CIRCUIT_BREAKER_STATE.labels(dependency).set(value)
+    if changed:
+        CIRCUIT_BREAKER_TRANSITIONS.labels(dependency, state).inc()
+
+
+def record_circuit_rejection(dependency: str) -> None:
+    """Record a call skipped by an open circuit breaker."""
+    CIRCUIT_BREAKER_REJECTIONS.labels(*_labels(), dependency).inc()
+
+
+def record_queue_wait(queue: str, priority: str, seconds: float) -> None:
+    """Record the time spent waiting for a slot of a concurrency limit."""
+    QUEUE_WAIT_SECONDS.labels(*_labels(), queue, priority).observe(seconds)
+
+
+def record_queue_depth(queue: str, priority: str, delta: int) -> None:
+    """Track the waiters of a concurrency limit (`delta` is +1 or -1)."""
+    QUEUE_DEPTH.labels(queue, priority).inc(delta)
+
+
+def record_admission_rejection(reason: str) -> None:
+    """Record a request rejected with 429."""
+    ADMISSION_REJECTIONS.labels(*_labels(), reason).inc()
+
+
+@contextlib.asynccontextmanager
+async def acquire(pool: Any, pool_name: str) -> AsyncIterator[Any]:
+    """`pool.acquire()` that records the checkout and the time spent waiting for it."""
+    agent, mode = _labels()
+    start = time.perf_counter()
+    async with pool.acquire() as connection:
+        DB_POOL_WAIT_SECONDS.labels(agent, mode, pool_name).observe(time.perf_counter() - start)
+        DB_POOL_CHECKOUTS.labels(agent, mode, pool_name).inc()
+        yield connection
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Render the metrics exposition.
+
+    Returns:
+        Tuple of (payload, content type); in multiprocess mode the samples of every
+        worker are aggregated
+    """
+    if MULTIPROCESS_MODE:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exited() -> None:
+    """Drop the live gauge samples of the current worker (multiprocess mode only)."""
+    if MULTIPROCESS_MODE:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def prepare_multiprocess_dir() -> str:
+    """
+    Set up the directory shared by the workers' metric files.
+
+    Must be called before the workers are started. Uses PROMETHEUS_MULTIPROC_DIR
+    when set (clearing files left by a previous run), or a fresh temporary directory.
+
+    Returns:
+        The metrics directory
+    """
+    path = os.environ.get(MULTIPROC_DIR_ENV)
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for stale in glob.glob(os.path.join(path, "*.db")):
+            os.remove(stale)
+    else:
+        path = tempfile.mkdtemp(prefix="cairo-coder-metrics-")
+        os.environ[MULTIPROC_DIR_ENV] = path
+    return path
@@ -9,6 +9,7 @@ import asyncio
 import contextlib
 import json
 import os
+import time
 from collections.abc import AsyncGenerator
 from dataclasses import dataclass
 from typing import Any
@@ -19,12 +20,46 @@ import structlog
 from dspy.adapters import XMLAdapter
 from langsmith import traceable
 
+from cairo_coder.core import metrics
+from cairo_coder.core.cancellation import RunTokenEstimator
+from cairo_coder.core.circuit_breaker import (
+    BREAKER_JUDGE_LM,
+    BREAKER_QUERY_LM,
+    CircuitOpenError,
+    circuit_breaker,
+)
 from cairo_coder.core.config import VectorStoreConfig
-from cairo_coder.core.constants import DEFAULT_JUDGE_LM, MAX_SOURCE_COUNT, SIMILARITY_THRESHOLD
+from cairo_coder.core.constants import (
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+    DEFAULT_JUDGE_LM,
+    DEFAULT_LATENCY_BUDGET_S,
+    GENERATION_RESERVE_S,
+    GROK_MIN_BUDGET_S,
+    GROK_TIMEOUT_S,
+    HISTORY_SUMMARY_LM,
+    HISTORY_SUMMARY_MIN_BUDGET_S,
+    JUDGE_MIN_BUDGET_S,
+    MAX_SOURCE_COUNT,
+    QUERY_PROCESSING_MIN_BUDGET_S,
+    RETRIEVAL_STATEMENT_TIMEOUT_S,
+    SIMILARITY_THRESHOLD,
+    SKILL_EXPANSION_MIN_BUDGET_S,
+    STREAM_COALESCE_MAX_CHARS,
+    STREAM_COALESCE_WINDOW_S,
+)
+from cairo_coder.core.context_packer import ContextPacker, PackedContext, rank_documents
+from cairo_coder.core.conversation_state import (
+    ConversationState,
+    ConversationStateStore,
+    document_key,
+)
+from cairo_coder.core.deadline import Deadline
+from cairo_coder.core.stream_queue import StreamEventQueue
 from cairo_coder.core.types import (
     Document,
     DocumentSource,
     FormattedSource,
+    LMUsage,
     Message,
     PipelineResult,
     ProcessedQuery,
@@ -32,11 +67,16 @@ from cairo_coder.core.types import (
     StreamEventType,
     title_from_url,
 )
+from cairo_coder.dspy.context_summarizer import ChatHistoryCompressor
 from cairo_coder.dspy.document_retriever import DocumentRetrieverProgram
 from cairo_coder.dspy.generation_program import GenerationProgram, SkillGenerationProgram
 from cairo_coder.dspy.grok_search import GrokSearchProgram
 from cairo_coder.dspy.query_processor import QueryProcessorProgram
-from cairo_coder.dspy.retrieval_judge import RetrievalJudge
+from cairo_coder.dspy.retrieval_judge import (
+    LLM_JUDGE_REASON_KEY,
+    LLM_JUDGE_SCORE_KEY,
+    RetrievalJudge,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -56,6 +96,16 @@ class RagPipelineConfig:
     sources: list[DocumentSource]
     max_source_count: int = MAX_SOURCE_COUNT
     similarity_threshold: float = SIMILARITY_THRESHOLD
+    latency_budget_s: float | None = DEFAULT_LATENCY_BUDGET_S
+    context_token_budget: int | None = DEFAULT_CONTEXT_TOKEN_BUDGET
+    judge_lm: str = DEFAULT_JUDGE_LM
+    history_summary_lm: str = HISTORY_SUMMARY_LM
+    stream_coalesce_window_s: float = STREAM_COALESCE_WINDOW_S
+    stream_coalesce_max_chars: int = STREAM_COALESCE_MAX_CHARS
+    # Shared judge instance (a new judge is created when None)
+    retrieval_judge: RetrievalJudge | None = None
+    # Shared Grok search program (a new one is created when None)
+    grok_search: GrokSearchProgram | None = None
 
 
 class RagPipeline(dspy.Module):
@@ -81,66 +131,177 @@ class RagPipeline(dspy.Module):
         self.document_retriever = config.document_retriever
         self.generation_program = config.generation_program
         self.mcp_generation_program = config.mcp_generation_program
-        self.retrieval_judge = RetrievalJudge()
-        self.grok_search = GrokSearchProgram()
+        self.retrieval_judge = config.retrieval_judge or RetrievalJudge()
+        self.grok_search = config.grok_search or GrokSearchProgram()
+        self.context_packer = ContextPacker(config.context_token_budget)
+        self.history_compressor = ChatHistoryCompressor()
+        self.conversation_states = ConversationStateStore()
+        # Tokens used by completed runs, to estimate what cancelled runs saved
+        self.run_tokens = RunTokenEstimator()
+
+    def _new_deadline(self) -> Deadline:
+        """Create a deadline from this pipeline's default latency budget."""
+        return Deadline(self.config.latency_budget_s)
 
     async def _aprocess_query_and_retrieve_docs(
         self,
         query: str,
         chat_history_str: str,
         sources: list[DocumentSource] | None = None,
+        deadline: Deadline | None = None,
+        conversation_id: str | None = None,
+        fast_path: bool = False,
+        judge: bool = True,
+        grok: bool = True,
     ) -> tuple[ProcessedQuery, list[Document], list[str]]:
         """
         Process query and retrieve documents - shared async logic.
 
+        Optional stages (Grok, judge, skill expansion) are skipped or cut short
+        when the remaining budget of `deadline` is too small, and LM stages are
+        skipped while the circuit breaker of their dependency is open; the applied
+        degradations are recorded on the deadline. `fast_path` processes the query
+        without the LM, and `judge` / `grok` turn those stages off entirely.
+
+        On follow-up turns of a conversation, the previous turn's documents are
+        added to the retrieved ones and documents with a known judge score are
+        not judged again.
+
         Returns:
             Tuple of (processed_query, documents, grok_citations)
         """
-        qp_prediction = await self.query_processor.acall(
-            query=query, chat_history=chat_history_str
-        )
-        processed_query = qp_prediction.processed_query
+        if deadline is None:
+            deadline = self._new_deadline()
+        state = self.conversation_states.get(conversation_id)
+
+        if fast_path:
+            processed_query = self._heuristic_process(query, state)
+        elif not deadline.allows(QUERY_PROCESSING_MIN_BUDGET_S, reserve_s=GENERATION_RESERVE_S):
+            deadline.degrade("query_processing_skipped")
+            processed_query = self._heuristic_process(query, state)
+        elif not circuit_breaker(BREAKER_QUERY_LM).available():
+            deadline.degrade("query_processing_circuit_open")
+            processed_query = self._heuristic_process(query, state)
+        else:
+            try:
+                with metrics.stage_timer(metrics.STAGE_QUERY_PROCESSING):
+                    qp_prediction = await asyncio.wait_for(
+                        self.query_processor.acall(query=query, chat_history=chat_history_str),
+                        timeout=deadline.timeout(reserve_s=GENERATION_RESERVE_S),
+                    )
+                processed_query = qp_prediction.processed_query
+            except CircuitOpenError:
+                deadline.degrade("query_processing_circuit_open")
+                processed_query = self._heuristic_process(query, state)
+            except TimeoutError:
+                logger.warning("Query processing exceeded latency budget, using raw query")
+                deadline.degrade("query_processing_timeout")
+                processed_query = self._heuristic_process(query, state)
 
         # Use provided sources or fall back to processed query sources
         retrieval_sources = (
             processed_query.resources if sources is None else sources
         )
         dr_prediction = await self.document_retriever.acall(
-            processed_query=processed_query, sources=retrieval_sources
+            processed_query=processed_query,
+            sources=retrieval_sources,
+            statement_timeout=deadline.timeout(
+                reserve_s=GENERATION_RESERVE_S, cap_s=RETRIEVAL_STATEMENT_TIMEOUT_S
+            ),
         )
         documents = dr_prediction.documents
+        for degradation in dr_prediction.get("degradations", None) or []:
+            deadline.degrade(degradation)
+        if state is not None:
+            documents = self._extend_with_previous_documents(documents, state, retrieval_sources)
 
         # Optional Grok web/X augmentation: activate when STARKNET_BLOG is among sources.
         grok_citations: list[str] = []
         grok_summary_doc = None
         try:
-            if DocumentSource.STARKNET_BLOG in retrieval_sources and not os.getenv("OPTIMIZER_RUN"):
-                grok_pred = await self.grok_search.acall(processed_query, chat_history_str)
-                grok_docs = grok_pred.documents
-
-                grok_citations = list(self.grok_search.last_citations)
-                if grok_docs:
-                    documents.extend(grok_docs)
-                grok_summary_doc = next((d for d in grok_docs if d.metadata.get("name") == "grok-answer"), None)
+            if (
+                grok
+                and DocumentSource.STARKNET_BLOG in retrieval_sources
+                and not os.getenv("OPTIMIZER_RUN")
+            ):
+                if not deadline.allows(GROK_MIN_BUDGET_S, reserve_s=GENERATION_RESERVE_S):
+                    deadline.degrade("grok_skipped")
+                else:
+                    # Grok calls go through its circuit breaker; cached answers do not
+                    with metrics.stage_timer(metrics.STAGE_GROK):
+                        grok_pred = await asyncio.wait_for(
+                            self.grok_search.acall(processed_query, chat_history_str),
+                            timeout=deadline.timeout(
+                                reserve_s=GENERATION_RESERVE_S, cap_s=GROK_TIMEOUT_S
+                            ),
+                        )
+                    grok_docs = grok_pred.documents
+
+                    grok_citations = list(grok_pred.get("citations", None) or [])
+                    if grok_docs:
+                        documents.extend(grok_docs)
+                    grok_summary_doc = next((d for d in grok_docs if d.metadata.get("name") == "grok-answer"), None)
+        except CircuitOpenError:
+            deadline.degrade("grok_circuit_open")
+        except TimeoutError:
+            logger.warning("Grok augmentation exceeded latency budget; continuing without it")
+            deadline.degrade("grok_timeout")
         except Exception as e:
             logger.warning("Grok augmentation failed; continuing without it", error=str(e), exc_info=True)
 
-        try:
-            with dspy.context(
-                lm=dspy.LM(DEFAULT_JUDGE_LM, max_tokens=10000, temperature=0.5),
-                adapter=XMLAdapter(),
-            ):
-                judge_pred = await self.retrieval_judge.acall(query=query, documents=documents)
-                documents = judge_pred.documents
-        except Exception as e:
-            logger.warning(
-                "Retrieval judge failed (async), using all documents",
-                error=str(e),
-                exc_info=True,
+        judged_documents = documents
+        prejudged: list[Document] = []
+        if judge and state is not None:
+            prejudged, documents = self._apply_known_scores(documents, state)
+
+        # Nothing to judge when every document was scored earlier in the conversation
+        to_judge = judge and bool(documents)
+        if to_judge and not deadline.allows(JUDGE_MIN_BUDGET_S, reserve_s=GENERATION_RESERVE_S):
+            logger.warning("Skipping retrieval judge, latency budget too small")
+            deadline.degrade("judge_skipped")
+        elif to_judge and not circuit_breaker(BREAKER_JUDGE_LM).available():
+            # Calls made once the judge is under way are rejected one by one instead
+            deadline.degrade("judge_circuit_open")
+        elif to_judge:
+            try:
+                with dspy.context(
+                    lm=dspy.LM(self.config.judge_lm, max_tokens=10000, temperature=0.5),
+                    adapter=XMLAdapter(),
+                ), metrics.stage_timer(metrics.STAGE_JUDGE):
+                    judge_pred = await asyncio.wait_for(
+                        self.retrieval_judge.acall(query=query, documents=documents),
+                        timeout=deadline.timeout(reserve_s=GENERATION_RESERVE_S),
+                    )
+                    documents = judge_pred.documents
+            except TimeoutError:
+                logger.warning("Retrieval judge exceeded latency budget, using all documents")
+                deadline.degrade("judge_timeout")
+            except Exception as e:
+                logger.warning(
+                    "Retrieval judge failed (async), using all documents",
+                    error=str(e),
+                    exc_info=True,
+                )
+                # documents already contains all retrieved docs, no action needed
+        documents = prejudged + documents
+
+        if conversation_id is not None:
+            self.conversation_states.update(
+                conversation_id, processed_query, judged=judged_documents, kept=documents
             )
-            # documents already contains all retrieved docs, no action needed
 
-        documents = await self._expand_skill_documents(documents)
+        if not deadline.allows(SKILL_EXPANSION_MIN_BUDGET_S, reserve_s=GENERATION_RESERVE_S):
+            deadline.degrade("skill_expansion_skipped")
+        else:
+            try:
+                with metrics.stage_timer(metrics.STAGE_SKILL_EXPANSION):
+                    documents = await asyncio.wait_for(
+                        self._expand_skill_documents(documents),
+                        timeout=deadline.timeout(reserve_s=GENERATION_RESERVE_S),
+                    )
+            except TimeoutError:
+                logger.warning("Skill expansion exceeded latency budget, keeping chunks")
+                deadline.degrade("skill_expansion_timeout")
 
         # Ensure Grok summary is present and first in order (for generation context)
         if grok_summary_doc is not None:
@@ -153,6 +314,73 @@ class RagPipeline(dspy.Module):
 
         return processed_query, documents, grok_citations
 
+    def _heuristic_process(self, query: str, state: ConversationState | None) -> ProcessedQuery:
+        """
+        Build a ProcessedQuery without the LM, reusing the previous turn's analysis.
+
+        The raw text of a follow-up ("now add a test for it") rarely retrieves the
+        right documents on its own, so the previous search queries are kept.
+        """
+        processed_query = self.query_processor.heuristic_process(query)
+        if state is not None:
+            previous = state.processed_query
+            processed_query.search_queries = list(
+                dict.fromkeys([*processed_query.search_queries, *previous.search_queries])
+            )
+            processed_query.is_contract_related |= previous.is_contract_related
+            processed_query.is_test_related |= previous.is_test_related
+        return processed_query
+
+    @staticmethod
+    def _extend_with_previous_documents(
+        documents: list[Document],
+        state: ConversationState,
+        sources: list[DocumentSource],
+    ) -> list[Document]:
+        """Add the previous turn's documents (from the searched sources) not retrieved again."""
+        seen = {document_key(doc) for doc in documents}
+        carried = [
+            doc
+            for doc in state.reusable_documents()
+            if doc.metadata.get("source") in sources and document_key(doc) not in seen
+        ]
+        if carried:
+            logger.info(
+                "Reusing documents from previous turn",
+                reused=len(carried),
+                retrieved=len(documents),
+                turn=state.turn + 1,
+            )
+        return documents + carried
+
+    def _apply_known_scores(
+        self, documents: list[Document], state: ConversationState
+    ) -> tuple[list[Document], list[Document]]:
+        """
+        Filter documents already scored earlier in the conversation by their known score.
+
+        Returns:
+            Tuple of (kept pre-scored documents, documents still to judge)
+        """
+        kept: list[Document] = []
+        to_judge: list[Document] = []
+        for doc in documents:
+            score = state.judge_scores.get(document_key(doc))
+            if score is None:
+                to_judge.append(doc)
+                continue
+            doc.metadata[LLM_JUDGE_SCORE_KEY] = score
+            doc.metadata.setdefault(LLM_JUDGE_REASON_KEY, "Scored earlier in the conversation")
+            if score >= self.retrieval_judge.threshold:
+                kept.append(doc)
+        if len(to_judge) < len(documents):
+            logger.info(
+                "Reusing judge scores from previous turns",
+                reused=len(documents) - len(to_judge),
+                to_judge=len(to_judge),
+            )
+        return kept, to_judge
+
     async def _expand_skill_documents(self, documents: list[Document]) -> list[Document]:
         """
         Replace skill chunks with full skill documents when available.
@@ -231,6 +459,69 @@ class RagPipeline(dspy.Module):
 
         return result_documents
 
+    @traceable(name="RagPipelineRetrieve", run_type="retriever")
+    async def aretrieve(
+        self,
+        query: str,
+        chat_history: list[Message] | None = None,
+        sources: list[DocumentSource] | None = None,
+        deadline: Deadline | None = None,
+        conversation_id: str | None = None,
+        fast_path: bool = False,
+        judge: bool = True,
+        limit: int | None = None,
+    ) -> PipelineResult:
+        """
+        Retrieve ranked documents for a query, without any generation.
+
+        Runs query processing, vector search, the optional retrieval judge and skill
+        expansion. Grok web search and the chat history summary are skipped since
+        both generate text.
+
+        Args:
+            query: User's Cairo/Starknet programming question
+            chat_history: Previous conversation messages
+            sources: Optional source filtering
+            deadline: Optional latency budget shared by all stages
+            conversation_id: Optional conversation ID the retrieval state is kept under
+            fast_path: Process the query with heuristics instead of the LM
+            judge: Whether to filter and score documents with the retrieval judge
+            limit: Optional maximum number of documents returned
+
+        Returns:
+            PipelineResult without answer, with documents in ranked order
+        """
+        if deadline is None:
+            deadline = self._new_deadline()
+        started_at = time.perf_counter()
+        with dspy.track_usage() as usage_tracker:
+            try:
+                processed_query, documents, _ = await self._aprocess_query_and_retrieve_docs(
+                    query,
+                    self._format_chat_history(chat_history or []),
+                    sources,
+                    deadline,
+                    conversation_id,
+                    fast_path=fast_path,
+                    judge=judge,
+                    grok=False,
+                )
+            except asyncio.CancelledError:
+                self.run_tokens.record_cancellation(
+                    usage_tracker.get_total_tokens(), time.perf_counter() - started_at
+                )
+                raise
+        documents = rank_documents(documents)[:limit]
+        metrics.observe_stage(metrics.STAGE_TOTAL, time.perf_counter() - started_at)
+        return PipelineResult(
+            processed_query=processed_query,
+            documents=documents,
+            grok_citations=[],
+            usage=usage_tracker.get_total_tokens(),
+            formatted_sources=self._format_sources(documents),
+            degradations=list(deadline.degradations),
+        )
+
     @traceable(name="RagPipeline", run_type="chain")
     async def aforward(
         self,
@@ -238,6 +529,8 @@ class RagPipeline(dspy.Module):
         chat_history: list[Message] | None = None,
         mcp_mode: bool = False,
         sources: list[DocumentSource] | None = None,
+        deadline: Deadline | None = None,
+        conversation_id: str | None = None,
     ) -> dspy.Prediction:
         """
         Execute the RAG pipeline and return a DSPy Prediction.
@@ -247,43 +540,66 @@ class RagPipeline(dspy.Module):
             chat_history: Previous conversation messages
             mcp_mode: Return raw documents without generation
             sources: Optional source filtering
+            deadline: Optional latency budget shared by all stages (defaults to the
+                pipeline's configured budget)
+            conversation_id: Optional conversation ID the history summary and retrieval
+                state are kept under
 
         Returns:
-            Prediction containing documents, answer, and formatted sources
+            Prediction containing documents, answer, formatted sources and applied degradations
         """
-        chat_history_str = self._format_chat_history(chat_history or [])
-        processed_query, documents, grok_citations = (
-            await self._aprocess_query_and_retrieve_docs(query, chat_history_str, sources)
-        )
-        logger.info(
-            f"Processed query: {processed_query.original[:100]}... and retrieved {len(documents)} doc titles: {[doc.metadata.get('title') for doc in documents]}"
-        )
+        if deadline is None:
+            deadline = self._new_deadline()
+        started_at = time.perf_counter()
+        try:
+            chat_history_str = await self._acompress_chat_history(
+                chat_history or [], conversation_id, deadline
+            )
+            processed_query, documents, grok_citations = (
+                await self._aprocess_query_and_retrieve_docs(
+                    query, chat_history_str, sources, deadline, conversation_id
+                )
+            )
+            logger.info(
+                f"Processed query: {processed_query.original[:100]}... and retrieved {len(documents)} doc titles: {[doc.metadata.get('title') for doc in documents]}"
+            )
+
+            packed = self._pack_context(documents)
+
+            if mcp_mode:
+                result = await self.mcp_generation_program.acall(query=query, context=packed.text)
+                metrics.observe_stage(metrics.STAGE_TOTAL, time.perf_counter() - started_at)
+                self.run_tokens.observe(self._tracked_usage())
+                return dspy.Prediction(
+                    processed_query=processed_query,
+                    documents=documents,
+                    grok_citations=grok_citations,
+                    answer=result.skill,
+                    formatted_sources=self._format_sources(documents, grok_citations),
+                    degradations=list(deadline.degradations),
+                    context_tokens=packed.tokens_used,
+                )
+
+            result = await self.generation_program.acall(
+                query=query, context=packed.text, chat_history=chat_history_str
+            )
+            metrics.observe_stage(metrics.STAGE_TOTAL, time.perf_counter() - started_at)
+            self.run_tokens.observe(self._tracked_usage())
 
-        if mcp_mode:
-            context = self._prepare_context(documents)
-            result = await self.mcp_generation_program.acall(query=query, context=context)
             return dspy.Prediction(
                 processed_query=processed_query,
                 documents=documents,
                 grok_citations=grok_citations,
-                answer=result.skill,
+                answer=result.answer,
                 formatted_sources=self._format_sources(documents, grok_citations),
+                degradations=list(deadline.degradations),
+                context_tokens=packed.tokens_used,
             )
-
-        context = self._prepare_context(documents)
-
-        result = await self.generation_program.acall(
-            query=query, context=context, chat_history=chat_history_str
-        )
-
-        return dspy.Prediction(
-            processed_query=processed_query,
-            documents=documents,
-            grok_citations=grok_citations,
-            answer=result.answer,
-            formatted_sources=self._format_sources(documents, grok_citations),
-        )
-
+        except asyncio.CancelledError:
+            self.run_tokens.record_cancellation(
+                self._tracked_usage(), time.perf_counter() - started_at
+            )
+            raise
 
     async def aforward_streaming(
         self,
@@ -291,6 +607,8 @@ class RagPipeline(dspy.Module):
         chat_history: list[Message] | None = None,
         mcp_mode: bool = False,
         sources: list[DocumentSource] | None = None,
+        deadline: Deadline | None = None,
+        conversation_id: str | None = None,
     ) -> AsyncGenerator[StreamEvent, None]:
         """
         Execute the complete RAG pipeline with streaming support.
@@ -300,16 +618,32 @@ class RagPipeline(dspy.Module):
             chat_history: Previous conversation messages
             mcp_mode: Return raw documents without generation
             sources: Optional source filtering
+            deadline: Optional latency budget shared by all stages (defaults to the
+                pipeline's configured budget)
+            conversation_id: Optional conversation ID the history summary and retrieval
+                state are kept under
 
         Yields:
             StreamEvent objects for real-time updates
         """
-        event_queue: asyncio.Queue[StreamEvent | None] = asyncio.Queue()
+        if deadline is None:
+            deadline = self._new_deadline()
+        event_queue = StreamEventQueue(
+            coalesce_window_s=self.config.stream_coalesce_window_s,
+            coalesce_max_chars=self.config.stream_coalesce_max_chars,
+        )
+        started_at = time.perf_counter()
+        first_token_seen = False
 
         async def _emit(event: StreamEvent) -> None:
+            nonlocal first_token_seen
+            if event.type == StreamEventType.RESPONSE and not first_token_seen:
+                first_token_seen = True
+                metrics.observe_stage(metrics.STAGE_FIRST_TOKEN, time.perf_counter() - started_at)
             await event_queue.put(event)
 
         async def _run_pipeline() -> None:
+            usage_tracker = None
             try:
                 with dspy.track_usage() as usage_tracker:
                     # Stage 1: Process query
@@ -317,7 +651,9 @@ class RagPipeline(dspy.Module):
                         StreamEvent(type=StreamEventType.PROCESSING, data="Processing query...")
                     )
 
-                    chat_history_str = self._format_chat_history(chat_history or [])
+                    chat_history_str = await self._acompress_chat_history(
+                        chat_history or [], conversation_id, deadline
+                    )
 
                     # Stage 2: Retrieve documents
                     await _emit(
@@ -329,7 +665,7 @@ class RagPipeline(dspy.Module):
 
                     processed_query, documents, grok_citations = (
                         await self._aprocess_query_and_retrieve_docs(
-                            query, chat_history_str, sources
+                            query, chat_history_str, sources, deadline, conversation_id
                         )
                     )
 
@@ -338,6 +674,8 @@ class RagPipeline(dspy.Module):
                     await _emit(StreamEvent(type=StreamEventType.SOURCES, data=formatted_sources))
 
                     final_answer: str | None = None
+                    packed = self._pack_context(documents)
+                    context = packed.text
 
                     if mcp_mode:
                         await _emit(
@@ -346,7 +684,6 @@ class RagPipeline(dspy.Module):
                                 data="Generating skill document...",
                             )
                         )
-                        context = self._prepare_context(documents)
                         mcp_prediction = await self.mcp_generation_program.acall(
                             query=query, context=context
                         )
@@ -368,9 +705,6 @@ class RagPipeline(dspy.Module):
                             )
                         )
 
-                        # Prepare context for generation
-                        context = self._prepare_context(documents)
-
                         # Stream response generation. Use ChatAdapter for streaming, which performs better.
                         with dspy.context(
                             adapter=dspy.adapters.ChatAdapter()
@@ -384,39 +718,44 @@ class RagPipeline(dspy.Module):
                             },
                         ) as rt:
                             chunk_accumulator = ""
-                            async for chunk in self.generation_program.aforward_streaming(
-                                query=query, context=context, chat_history=chat_history_str
-                            ):
-                                if isinstance(chunk, dspy.streaming.StreamResponse):
-                                    # Incremental token
-                                    # Emit thinking events for reasoning field, response events for answer field
-                                    if chunk.signature_field_name == "reasoning":
-                                        await _emit(
-                                            StreamEvent(
-                                                type=StreamEventType.REASONING, data=chunk.chunk
+                            # Closed on cancellation, which aborts the LM stream
+                            generation = contextlib.aclosing(
+                                self.generation_program.aforward_streaming(
+                                    query=query, context=context, chat_history=chat_history_str
+                                )
+                            )
+                            async with generation as chunks:
+                                async for chunk in chunks:
+                                    if isinstance(chunk, dspy.streaming.StreamResponse):
+                                        # Incremental token
+                                        # Emit thinking events for reasoning field, response events for answer field
+                                        if chunk.signature_field_name == "reasoning":
+                                            await _emit(
+                                                StreamEvent(
+                                                    type=StreamEventType.REASONING, data=chunk.chunk
+                                                )
                                             )
-                                        )
-                                    elif chunk.signature_field_name == "answer":
-                                        chunk_accumulator += chunk.chunk
+                                        elif chunk.signature_field_name == "answer":
+                                            chunk_accumulator += chunk.chunk
+                                            await _emit(
+                                                StreamEvent(
+                                                    type=StreamEventType.RESPONSE, data=chunk.chunk
+                                                )
+                                            )
+                                        else:
+                                            logger.warning(
+                                                "Unknown signature field name: %s",
+                                                chunk.signature_field_name,
+                                            )
+                                    elif isinstance(chunk, dspy.Prediction):
+                                        # Final complete answer
+                                        final_answer = getattr(chunk, "answer", None) or chunk_accumulator
                                         await _emit(
                                             StreamEvent(
-                                                type=StreamEventType.RESPONSE, data=chunk.chunk
+                                                type=StreamEventType.FINAL_RESPONSE, data=final_answer
                                             )
                                         )
-                                    else:
-                                        logger.warning(
-                                            "Unknown signature field name: %s",
-                                            chunk.signature_field_name,
-                                        )
-                                elif isinstance(chunk, dspy.Prediction):
-                                    # Final complete answer
-                                    final_answer = getattr(chunk, "answer", None) or chunk_accumulator
-                                    await _emit(
-                                        StreamEvent(
-                                            type=StreamEventType.FINAL_RESPONSE, data=final_answer
-                                        )
-                                    )
-                                    rt.end(outputs={"output": final_answer})
+                                        rt.end(outputs={"output": final_answer})
 
                     # Pipeline completed - yield the final PipelineResult
                     pipeline_result = PipelineResult(
@@ -426,10 +765,18 @@ class RagPipeline(dspy.Module):
                         usage=usage_tracker.get_total_tokens(),
                         answer=final_answer,
                         formatted_sources=formatted_sources,
+                        degradations=list(deadline.degradations),
+                        context_tokens=packed.tokens_used,
                     )
+                    metrics.observe_stage(metrics.STAGE_TOTAL, time.perf_counter() - started_at)
+                    self.run_tokens.observe(pipeline_result.usage)
                     await _emit(StreamEvent(type=StreamEventType.END, data=pipeline_result))
 
             except asyncio.CancelledError:
+                self.run_tokens.record_cancellation(
+                    usage_tracker.get_total_tokens() if usage_tracker is not None else None,
+                    time.perf_counter() - started_at,
+                )
                 raise
             except Exception as e:
                 # Handle pipeline errors
@@ -439,15 +786,12 @@ class RagPipeline(dspy.Module):
                 logger.error("Pipeline error", error=e)
                 await _emit(StreamEvent(StreamEventType.ERROR, data=f"Pipeline error: {str(e)}"))
             finally:
-                await event_queue.put(None)
+                event_queue.close()
 
         pipeline_task = asyncio.create_task(_run_pipeline())
 
         try:
-            while True:
-                event = await event_queue.get()
-                if event is None:
-                    break
+            async for event in event_queue.events():
                 yield event
         finally:
             if not pipeline_task.done():
@@ -455,9 +799,15 @@ class RagPipeline(dspy.Module):
                 with contextlib.suppress(asyncio.CancelledError):
                     await pipeline_task
 
+    @staticmethod
+    def _tracked_usage() -> LMUsage:
+        """LM usage recorded so far by the current run's usage tracker."""
+        tracker = dspy.settings.usage_tracker
+        return tracker.get_total_tokens() if tracker is not None else {}
+
     def _format_chat_history(self, chat_history: list[Message]) -> str:
         """
-        Format chat history for processing.
+        Format chat history for processing, keeping only the most recent messages.
 
         Args:
             chat_history: List of previous messages
@@ -467,13 +817,47 @@ class RagPipeline(dspy.Module):
         """
         if not chat_history:
             return ""
+        return self.history_compressor.truncate(chat_history)
 
-        formatted_messages = []
-        for message in chat_history[-10:]:  # Keep last 10 messages
-            role = "User" if message.role == "user" else "Assistant"
-            formatted_messages.append(f"{role}: {message.content}")
+    async def _acompress_chat_history(
+        self,
+        chat_history: list[Message],
+        conversation_id: str | None,
+        deadline: Deadline,
+    ) -> str:
+        """
+        Format chat history, folding older messages into a per-conversation rolling summary.
 
-        return "\n".join(formatted_messages)
+        Falls back to any cached summary, or else to the most recent messages, when
+        the latency budget is too small or the summarization times out. Without a
+        conversation ID, the most recent messages are kept as they are.
+        """
+        if not chat_history:
+            return ""
+        needs_summary = (
+            conversation_id is not None
+            and self.history_compressor.verbatim_start(chat_history) > 0
+        )
+        if needs_summary and not deadline.allows(
+            HISTORY_SUMMARY_MIN_BUDGET_S, reserve_s=GENERATION_RESERVE_S
+        ):
+            deadline.degrade("history_summary_skipped")
+            needs_summary = False
+        if not needs_summary:
+            # Only reuses an already cached summary, no LM call
+            return await self.history_compressor.acall(
+                chat_history, conversation_id=conversation_id, summarize=False
+            )
+        try:
+            with dspy.context(lm=dspy.LM(self.config.history_summary_lm, max_tokens=2000, temperature=0.2)):
+                return await asyncio.wait_for(
+                    self.history_compressor.acall(chat_history, conversation_id=conversation_id),
+                    timeout=deadline.timeout(reserve_s=GENERATION_RESERVE_S),
+                )
+        except TimeoutError:
+            logger.warning("Chat history summarization exceeded latency budget")
+            deadline.degrade("history_summary_timeout")
+            return self.history_compressor.truncate(chat_history)
 
     def _format_sources(
         self, documents: list[Document], grok_citations: list[str] | None = None
@@ -521,58 +905,39 @@ class RagPipeline(dspy.Module):
 
         return sources
 
-    def _prepare_context(self, documents: list[Document]) -> str:
+    def _pack_context(self, documents: list[Document]) -> PackedContext:
         """
-        Prepare context for generation from retrieved documents.
+        Pack retrieved documents into the generation context within the token budget.
 
         Args:
             documents: Retrieved documents
-            processed_query: Processed query information
 
         Returns:
-            Formatted context string
+            PackedContext with the formatted context and the tokens it uses
         """
-        if not documents:
-            return "No relevant documentation found."
-
-        context_parts = []
-
-        # Add templates if applicable
-
-        # Add retrieved documentation
-        context_parts.append("Relevant Documentation:")
-        context_parts.append("")
-
-        for doc in documents:
-            source_name = doc.metadata.get("source_display", "Unknown Source")
-            title = doc.metadata.get("title", "Untitled Document")
-            url = doc.metadata.get("url") or doc.metadata.get("sourceLink", "")
-            is_virtual = doc.metadata.get("is_virtual", False)
-
-            # For virtual documents (like Grok summaries), include content without a header
-            # This prevents the LLM from citing the container instead of the actual sources
-            if is_virtual:
-                context_parts.append(doc.page_content)
-                context_parts.append("")
-                context_parts.append("---")
-                context_parts.append("")
-                continue
-
-            # For real documents, include header with URL if available
-            if url:
-                context_parts.append(f"## [{title}]({url})")
-            else:
-                context_parts.append(f"## {title}")
+        packed = self.context_packer.pack(documents)
+        if packed.truncated or packed.dropped:
+            logger.info(
+                "Context packed within token budget",
+                token_budget=self.context_packer.token_budget,
+                tokens_used=packed.tokens_used,
+                included=len(packed.included),
+                truncated=packed.truncated,
+                dropped=packed.dropped,
+            )
+        return packed
 
-            context_parts.append(f"*Source: {source_name}*")
-            context_parts.append("")
+    def _prepare_context(self, documents: list[Document]) -> str:
+        """
+        Prepare context for generation from retrieved documents.
 
-            context_parts.append(doc.page_content)
-            context_parts.append("")
-            context_parts.append("---")
-            context_parts.append("")
+        Args:
+            documents: Retrieved documents
 
-        return "\n".join(context_parts)
+        Returns:
+            Formatted context string
+        """
+        return self._pack_context(documents).text
 
     @staticmethod
     def prediction_to_pipeline_result(prediction: dspy.Prediction) -> PipelineResult:
@@ -584,6 +949,8 @@ class RagPipeline(dspy.Module):
             usage=prediction.get_lm_usage(),
             answer=prediction.answer,
             formatted_sources=prediction.formatted_sources,
+            degradations=prediction.get("degradations", None) or [],
+            context_tokens=prediction.get("context_tokens", None),
         )
 
 
@@ -602,6 +969,10 @@ class RagPipelineFactory:
         max_source_count: int = 5,
         similarity_threshold: float = SIMILARITY_THRESHOLD,
         vector_db: Any = None,  # SourceFilteredPgVectorRM instance
+        latency_budget_s: float | None = DEFAULT_LATENCY_BUDGET_S,
+        context_token_budget: int | None = DEFAULT_CONTEXT_TOKEN_BUDGET,
+        retrieval_judge: RetrievalJudge | None = None,
+        grok_search: GrokSearchProgram | None = None,
     ) -> RagPipeline:
         """
         Create a RAG Pipeline with default or provided components.
@@ -617,6 +988,10 @@ class RagPipelineFactory:
             similarity_threshold: Minimum similarity for document inclusion
             sources: Sources to use for retrieval.
             vector_db: Optional pre-initialized vector database instance
+            latency_budget_s: Default end-to-end latency budget (None for unbounded)
+            context_token_budget: Token budget for the generation context (None for unbounded)
+            retrieval_judge: Optional judge shared with other pipelines (creates one if None)
+            grok_search: Optional Grok program shared with other pipelines (creates one if None)
 
         Returns:
             Configured RagPipeline instance
@@ -642,6 +1017,10 @@ class RagPipelineFactory:
             sources=sources,
             max_source_count=max_source_count,
             similarity_threshold=similarity_threshold,
+            latency_budget_s=latency_budget_s,
+            context_token_budget=context_token_budget,
+            retrieval_judge=retrieval_judge,
+            grok_search=grok_search,
         )
 
         return RagPipeline(config)
@@ -0,0 +1,175 @@
+"""
+Embedding and vector search work shared by the requests of a batch.
+
+Requests of a batch run through the pipeline independently, so each one would
+embed its search queries with a call of its own and repeat the vector searches
+other requests already ran. While a RetrievalBatch is active (see
+`use_retrieval_batch`; tasks started inside the block inherit it), the vector
+store instead:
+
+- embeds search queries in batches: texts are collected for a short window and
+  sent to the embedder in one call, off the event loop; each distinct text is
+  embedded once per batch;
+- runs each distinct search (query, sources, k, threshold) once per batch; every
+  request receives its own copy of the results, since later stages annotate
+  document metadata.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import copy
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from typing import Any
+
+import structlog
+
+from cairo_coder.core import metrics
+from cairo_coder.core.circuit_breaker import BREAKER_EMBEDDER, circuit_breaker
+from cairo_coder.core.concurrency import STAGE_EMBEDDING, stage_slot
+from cairo_coder.core.constants import BATCH_EMBEDDING_MAX_TEXTS, BATCH_EMBEDDING_WINDOW_S
+
+logger = structlog.get_logger(__name__)
+
+# Embeds a list of texts, returning one embedding per text (list or array rows)
+BatchEmbedder = Callable[[list[str]], Any]
+
+_current_batch: contextvars.ContextVar[RetrievalBatch | None] = contextvars.ContextVar(
+    "retrieval_batch", default=None
+)
+
+
+def current_retrieval_batch() -> RetrievalBatch | None:
+    """The batch the current request belongs to, if any."""
+    return _current_batch.get()
+
+
+@contextlib.contextmanager
+def use_retrieval_batch(batch: RetrievalBatch) -> Iterator[RetrievalBatch]:
+    """Share retrieval work between the requests run (or started) inside the block."""
+    token = _current_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _current_batch.reset(token)
+
+
+class RetrievalBatch:
+    """Batches embeddings and deduplicates vector searches across requests."""
+
+    def __init__(
+        self,
+        embed: BatchEmbedder,
+        window_s: float = BATCH_EMBEDDING_WINDOW_S,
+        max_texts: int = BATCH_EMBEDDING_MAX_TEXTS,
+    ):
+        """
+        Initialize the batch.
+
+        Args:
+            embed: Embedding function accepting a list of texts
+            window_s: How long a text may wait for others before being embedded
+            max_texts: Pending texts that trigger an embedding call without waiting
+        """
+        if max_texts <= 0:
+            raise ValueError("Embedding batch size must be positive")
+        if window_s < 0:
+            raise ValueError("Embedding batch window must not be negative")
+        self._embed = embed
+        self.window_s = window_s
+        self.max_texts = max_texts
+        self._embeddings: dict[str, asyncio.Future[Any]] = {}
+        self._pending: list[str] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._searches: dict[Hashable, asyncio.Task[Any]] = {}
+        self._embedding_calls: set[asyncio.Task[None]] = set()
+        self.embedding_call_count = 0
+
+    async def embed(self, text: str) -> Any:
+        """Embedding of `text`, computed with the other texts pending in the batch."""
+        future = self._embeddings.get(text)
+        metrics.record_cache_lookup("batch_embedding", hit=future is not None)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._embeddings[text] = future
+            self._pending.append(text)
+            if len(self._pending) >= self.max_texts:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_s, self._flush)
+        # A cancelled request must not cancel the embedding other requests wait for
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        """Send the pending texts to the embedder."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        texts, self._pending = self._pending, []
+        if texts:
+            task = asyncio.create_task(self._embed_texts(texts))
+            self._embedding_calls.add(task)
+            task.add_done_callback(self._embedding_calls.discard)
+
+    async def _embed_texts(self, texts: list[str]) -> None:
+        self.embedding_call_count += 1
+        try:
+            async with stage_slot(STAGE_EMBEDDING):
+                with (
+                    circuit_breaker(BREAKER_EMBEDDER).guard(),
+                    metrics.stage_timer(metrics.STAGE_EMBEDDING),
+                ):
+                    # Embedders are synchronous
+                    embeddings = await asyncio.to_thread(self._embed, texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(
+                    f"Embedder returned {len(embeddings)} embeddings for {len(texts)} texts"
+                )
+        except Exception as exc:
+            logger.warning("Batch embedding failed", texts=len(texts), error=str(exc))
+            for text in texts:
+                # Later requests embed the text again
+                future = self._embeddings.pop(text)
+                future.set_exception(exc)
+                # Retrieved by the waiting requests; silences "never retrieved" warnings
+                future.exception()
+            return
+        for text, embedding in zip(texts, embeddings, strict=True):
+            self._embeddings[text].set_result(embedding)
+
+    async def search(self, key: Hashable, run: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Results of the search identified by `key`, running it with `run` at most once.
+
+        Every caller gets a deep copy of the results. A failed search is forgotten so
+        later requests run it again.
+        """
+        task = self._searches.get(key)
+        metrics.record_cache_lookup("batch_search", hit=task is not None)
+        if task is None:
+            task = asyncio.ensure_future(run())
+            self._searches[key] = task
+        try:
+            results = await asyncio.shield(task)
+        except Exception:
+            if self._searches.get(key) is task:
+                del self._searches[key]
+            raise
+        return copy.deepcopy(results)
+
+    async def aclose(self) -> None:
+        """Cancel the searches and embedding calls still running (abandoned batch)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending = [task for task in self._searches.values() if not task.done()]
+        pending.extend(self._embedding_calls)
+        for task in pending:
+            task.cancel()
+        for future in self._embeddings.values():
+            if not future.done():
+                future.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,132 @@
+"""
+Bounded event queue between a streaming pipeline run and its consumer.
+
+The pipeline produces one StreamEvent per LM chunk, often a handful of characters,
+and each event becomes its own SSE frame. The queue is bounded, so a consumer that
+falls behind (a slow client) suspends the producer instead of letting events pile
+up in memory. On the way out, adjacent RESPONSE or REASONING chunks are merged into
+a single event until the coalescing window elapses or the size limit is reached;
+the text is unchanged, it is just written in fewer, larger frames.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from cairo_coder.core import metrics
+from cairo_coder.core.constants import (
+    STREAM_COALESCE_MAX_CHARS,
+    STREAM_COALESCE_WINDOW_S,
+    STREAM_QUEUE_MAX_EVENTS,
+)
+from cairo_coder.core.types import StreamEvent, StreamEventType
+
+# Text chunk events that can be merged with their neighbours
+COALESCED_EVENT_TYPES = frozenset({StreamEventType.RESPONSE, StreamEventType.REASONING})
+
+# Queued by the coalescing timer to wake up the consumer
+_FLUSH = object()
+
+
+class StreamEventQueue:
+    """Bounded queue of StreamEvents that coalesces adjacent text chunks."""
+
+    def __init__(
+        self,
+        maxsize: int = STREAM_QUEUE_MAX_EVENTS,
+        coalesce_window_s: float = STREAM_COALESCE_WINDOW_S,
+        coalesce_max_chars: int = STREAM_COALESCE_MAX_CHARS,
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            maxsize: Events buffered before `put` waits for the consumer
+            coalesce_window_s: How long a text chunk may wait for the next ones
+                (0 disables coalescing)
+            coalesce_max_chars: Size at which merged text is emitted without waiting
+        """
+        if maxsize <= 0:
+            raise ValueError("Stream queue size must be positive")
+        if coalesce_window_s < 0 or coalesce_max_chars < 0:
+            raise ValueError("Stream coalescing limits must not be negative")
+        self._queue: asyncio.Queue[StreamEvent | object | None] = asyncio.Queue(maxsize)
+        self._closed = False
+        self.coalesce_window_s = coalesce_window_s
+        self.coalesce_max_chars = coalesce_max_chars
+
+    async def put(self, event: StreamEvent) -> None:
+        """Enqueue an event, waiting while the queue is full."""
+        await self._queue.put(event)
+
+    def close(self) -> None:
+        """
+        Mark the end of the stream once the queued events are consumed.
+
+        Never waits, so it can run while the producer is being cancelled.
+        """
+        self._closed = True
+        if not self._queue.full():
+            self._queue.put_nowait(None)
+
+    async def _get(self) -> StreamEvent | object | None:
+        if self._closed and self._queue.empty():
+            return None
+        return await self._queue.get()
+
+    def _wake_consumer(self) -> None:
+        """Timer callback: let a consumer waiting on an empty queue flush its buffer."""
+        if not self._queue.full():
+            self._queue.put_nowait(_FLUSH)
+
+    async def events(self) -> AsyncIterator[StreamEvent]:
+        """Consume the events, merging adjacent text chunks of the same type."""
+        loop = asyncio.get_running_loop()
+        pending: list[StreamEvent] = []
+        pending_chars = 0
+        flush_at = 0.0
+        timer: asyncio.TimerHandle | None = None
+
+        def merged() -> StreamEvent:
+            nonlocal pending, pending_chars, timer
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            first = pending[0]
+            if len(pending) > 1:
+                text = "".join(event.data for event in pending)  # type: ignore[misc]
+                first = StreamEvent(type=first.type, data=text, timestamp=first.timestamp)
+            metrics.record_stream_frame(first.type.value, chunks=len(pending))
+            pending, pending_chars = [], 0
+            return first
+
+        try:
+            while True:
+                event = await self._get()
+                # The window is checked on every event: the wake-up marker is not
+                # enqueued when the queue is full
+                if pending and loop.time() >= flush_at:
+                    yield merged()
+                if event is _FLUSH:
+                    continue
+                if event is None:
+                    if pending:
+                        yield merged()
+                    return
+                assert isinstance(event, StreamEvent)
+                if pending and event.type != pending[0].type:
+                    yield merged()
+                if event.type not in COALESCED_EVENT_TYPES or not isinstance(event.data, str):
+                    yield event
+                    continue
+                pending.append(event)
+                pending_chars += len(event.data)
+                if pending_chars >= self.coalesce_max_chars or self.coalesce_window_s == 0:
+                    yield merged()
+                elif len(pending) == 1:
+                    flush_at = loop.time() + self.coalesce_window_s
+                    timer = loop.call_at(flush_at, self._wake_consumer)
+        finally:
+            if timer is not None:
+                timer.cancel()
@@ -82,6 +82,11 @@ LMUsageEntry = dict[str, Any]
 LMUsage = dict[str, LMUsageEntry]
 
 
+def usage_total_tokens(usage: LMUsage) -> int:
+    """Total tokens of an LM usage, across models."""
+    return sum(int(entry.get("total_tokens", 0) or 0) for entry in usage.values())
+
+
 class RetrievedSourceData(TypedDict):
     """Structure for retrieved source data stored in database."""
 
@@ -225,3 +230,7 @@ class PipelineResult:
     usage: LMUsage
     answer: str | None = None
     formatted_sources: list[FormattedSource] = field(default_factory=list)
+    # Graceful degradations applied to meet the latency budget (e.g. "judge_skipped")
+    degradations: list[str] = field(default_factory=list)
+    # Estimated tokens of documentation context sent to generation
+    context_tokens: int | None = None
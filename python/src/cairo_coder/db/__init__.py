@@ -9,6 +9,7 @@ from .models import UserInteraction
 from .repository import (
     create_user_interaction,
     get_interactions,
+    get_interactions_in_window,
 )
 from .session import close_pool, execute_schema_scripts, get_pool
 
@@ -16,6 +17,7 @@ __all__ = [
     "UserInteraction",
     "create_user_interaction",
     "get_interactions",
+    "get_interactions_in_window",
     "close_pool",
     "execute_schema_scripts",
     "get_pool",
@@ -27,3 +27,19 @@ class UserInteraction(BaseModel):
     generated_answer: Optional[str] = None
     retrieved_sources: Optional[list[RetrievedSourceData]] = None
     llm_usage: Optional[dict[str, Any]] = None
+
+
+class CachedAnswer(BaseModel):
+    """Represents a record in the answer_cache table."""
+
+    cache_key: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    agent_id: str
+    mcp_mode: bool = False
+    history_hash: str
+    normalized_query: str
+    query_embedding: Optional[list[float]] = None
+    answer: str
+    formatted_sources: list[dict[str, Any]] = Field(default_factory=list)
+    retrieved_sources: Optional[list[RetrievedSourceData]] = None
+    hit_count: int = 0
@@ -5,12 +5,14 @@ Data access helpers for the Query Insights persistence layer.
 from __future__ import annotations
 
 import json
+from collections.abc import Callable
 from datetime import datetime
-from typing import Any
+from typing import Any, TypeVar
 
 import structlog
 
-from cairo_coder.db.models import UserInteraction
+from cairo_coder.core import metrics
+from cairo_coder.db.models import CachedAnswer, UserInteraction
 from cairo_coder.db.session import get_pool
 
 logger = structlog.get_logger(__name__)
@@ -76,7 +78,7 @@ async def create_user_interaction(interaction: UserInteraction) -> None:
     """Persist a user interaction in the database."""
     pool = await get_pool()
     try:
-        async with pool.acquire() as connection:
+        async with metrics.acquire(pool, "app") as connection:
             await connection.execute(
                 """
                 INSERT INTO user_interactions (
@@ -125,7 +127,7 @@ async def get_interactions(
     ordered by created_at DESC.
     """
     pool = await get_pool()
-    async with pool.acquire() as connection:
+    async with metrics.acquire(pool, "app") as connection:
         params: list[Any] = []
         filters = []
 
@@ -180,6 +182,58 @@ async def get_interactions(
     return items, int(total)
 
 
+_INTERACTION_JSON_DEFAULTS: dict[str, Any] = {
+    "chat_history": None,
+    "retrieved_sources": None,
+    "llm_usage": None,
+}
+
+
+async def get_interactions_in_window(
+    start_date: datetime,
+    end_date: datetime,
+    agent_id: str | None = None,
+    limit: int | None = None,
+) -> list[UserInteraction]:
+    """
+    Fetch the interactions logged in a time window, oldest first.
+
+    Used to replay production traffic with its original timing.
+
+    Args:
+        start_date: Inclusive start of the window
+        end_date: Inclusive end of the window
+        agent_id: Only return interactions of this agent
+        limit: Maximum number of interactions (the oldest are kept)
+
+    Returns:
+        Interactions ordered by creation time
+    """
+    pool = await get_pool()
+    params: list[Any] = [start_date, end_date]
+    filters = ["created_at >= $1", "created_at <= $2"]
+    if agent_id:
+        params.append(agent_id)
+        filters.append(f"agent_id = ${len(params)}")
+    limit_clause = ""
+    if limit is not None:
+        params.append(limit)
+        limit_clause = f"LIMIT ${len(params)}"
+
+    async with metrics.acquire(pool, "app") as connection:
+        rows = await connection.fetch(
+            f"""
+            SELECT *
+            FROM user_interactions
+            WHERE {" AND ".join(filters)}
+            ORDER BY created_at ASC
+            {limit_clause}
+            """,
+            *params,
+        )
+    return [UserInteraction(**_normalize_row(dict(row), _INTERACTION_JSON_DEFAULTS)) for row in rows]
+
+
 async def migrate_user_interaction(interaction: UserInteraction) -> tuple[bool, bool]:
     """
     Persist a user interaction for migration purposes with upsert behavior.
@@ -197,7 +251,7 @@ async def migrate_user_interaction(interaction: UserInteraction) -> tuple[bool,
     """
     pool = await get_pool()
     try:
-        async with pool.acquire() as connection:
+        async with metrics.acquire(pool, "app") as connection:
             # Single upsert round-trip; infer insert vs update via system column
             row = await connection.fetchrow(
                 """
@@ -255,3 +309,190 @@ async def migrate_user_interaction(interaction: UserInteraction) -> tuple[bool,
         logger.error("Failed to migrate user interaction", error=str(exc), exc_info=True)
         raise
 
+
+
+_ANSWER_CACHE_JSON_DEFAULTS: dict[str, Any] = {"formatted_sources": [], "retrieved_sources": None}
+
+
+async def get_cached_answer(cache_key: str, max_age_s: float) -> CachedAnswer | None:
+    """
+    Fetch a fresh answer cache entry by key and record the hit.
+
+    Args:
+        cache_key: Hex digest identifying the cached answer
+        max_age_s: Maximum age of the entry in seconds
+
+    Returns:
+        The cached answer, or None if missing or expired
+    """
+    pool = await get_pool()
+    async with metrics.acquire(pool, "app") as connection:
+        row = await connection.fetchrow(
+            """
+            UPDATE answer_cache
+            SET hit_count = hit_count + 1, last_hit_at = NOW()
+            WHERE cache_key = $1 AND created_at >= NOW() - make_interval(secs => $2)
+            RETURNING *
+            """,
+            cache_key,
+            float(max_age_s),
+        )
+    normalized = _normalize_row(dict(row) if row else None, _ANSWER_CACHE_JSON_DEFAULTS)
+    return CachedAnswer(**normalized) if normalized else None
+
+
+async def find_cached_answer_candidates(
+    agent_id: str,
+    mcp_mode: bool,
+    history_hash: str,
+    max_age_s: float,
+    limit: int,
+) -> list[CachedAnswer]:
+    """
+    Fetch the most recent fresh cache entries with an embedding for the same scope.
+
+    Used for near-duplicate matching; the similarity itself is computed by the caller.
+    """
+    pool = await get_pool()
+    async with metrics.acquire(pool, "app") as connection:
+        rows = await connection.fetch(
+            """
+            SELECT *
+            FROM answer_cache
+            WHERE agent_id = $1
+              AND mcp_mode = $2
+              AND history_hash = $3
+              AND query_embedding IS NOT NULL
+              AND created_at >= NOW() - make_interval(secs => $4)
+            ORDER BY created_at DESC
+            LIMIT $5
+            """,
+            agent_id,
+            mcp_mode,
+            history_hash,
+            float(max_age_s),
+            limit,
+        )
+    return [CachedAnswer(**_normalize_row(dict(row), _ANSWER_CACHE_JSON_DEFAULTS)) for row in rows]
+
+
+async def upsert_cached_answer(entry: CachedAnswer) -> None:
+    """Insert or refresh an answer cache entry."""
+    pool = await get_pool()
+    async with metrics.acquire(pool, "app") as connection:
+        await connection.execute(
+            """
+            INSERT INTO answer_cache (
+                cache_key,
+                agent_id,
+                mcp_mode,
+                history_hash,
+                normalized_query,
+                query_embedding,
+                answer,
+                formatted_sources,
+                retrieved_sources
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+            ON CONFLICT (cache_key) DO UPDATE SET
+                created_at = NOW(),
+                query_embedding = COALESCE(EXCLUDED.query_embedding, answer_cache.query_embedding),
+                answer = EXCLUDED.answer,
+                formatted_sources = EXCLUDED.formatted_sources,
+                retrieved_sources = EXCLUDED.retrieved_sources
+            """,
+            entry.cache_key,
+            entry.agent_id,
+            entry.mcp_mode,
+            entry.history_hash,
+            entry.normalized_query,
+            entry.query_embedding,
+            entry.answer,
+            _serialize_json_field(entry.formatted_sources),
+            _serialize_json_field(entry.retrieved_sources),
+        )
+
+
+async def delete_expired_cached_answers(max_age_s: float) -> int:
+    """Delete answer cache entries older than `max_age_s` seconds; returns the count."""
+    pool = await get_pool()
+    async with metrics.acquire(pool, "app") as connection:
+        result = await connection.execute(
+            "DELETE FROM answer_cache WHERE created_at < NOW() - make_interval(secs => $1)",
+            float(max_age_s),
+        )
+    # asyncpg returns the command tag, e.g. "DELETE 3"
+    return int(result.split()[-1]) if result else 0
+
+
+BucketStates = dict[str, tuple[float, float]]
+T = TypeVar("T")
+
+
+async def update_rate_limit_buckets(
+    bucket_keys: list[str],
+    update: Callable[[BucketStates], tuple[dict[str, float], T]],
+) -> T:
+    """
+    Atomically read and rewrite rate limit buckets shared by all workers.
+
+    The rows are locked for the duration of `update`, so concurrent workers see each
+    other's debits. Missing buckets are created empty as of the epoch, which refills
+    them to capacity.
+
+    Args:
+        bucket_keys: Keys of the buckets to update
+        update: Receives `{key: (balance, idle_s)}`, with `idle_s` the seconds since
+            the bucket was last written, and returns the new balances and a result
+
+    Returns:
+        The result returned by `update`
+    """
+    keys = sorted(set(bucket_keys))
+    pool = await get_pool()
+    async with metrics.acquire(pool, "app") as connection, connection.transaction():
+        await connection.execute(
+            """
+            INSERT INTO rate_limit_buckets (bucket_key, balance, updated_at)
+            SELECT key, 0, 'epoch' FROM unnest($1::text[]) AS key
+            ON CONFLICT (bucket_key) DO NOTHING
+            """,
+            keys,
+        )
+        # Rows are locked in key order so workers cannot deadlock
+        rows = await connection.fetch(
+            """
+            SELECT bucket_key, balance, EXTRACT(EPOCH FROM NOW() - updated_at) AS idle_s
+            FROM rate_limit_buckets
+            WHERE bucket_key = ANY($1::text[])
+            ORDER BY bucket_key
+            FOR UPDATE
+            """,
+            keys,
+        )
+        balances, result = update(
+            {row["bucket_key"]: (float(row["balance"]), float(row["idle_s"])) for row in rows}
+        )
+        if balances:
+            await connection.execute(
+                """
+                UPDATE rate_limit_buckets AS b
+                SET balance = v.balance, updated_at = NOW()
+                FROM unnest($1::text[], $2::float8[]) AS v(bucket_key, balance)
+                WHERE b.bucket_key = v.bucket_key
+                """,
+                list(balances),
+                list(balances.values()),
+            )
+    return result
+
+
+async def delete_idle_rate_limit_buckets(max_idle_s: float) -> int:
+    """Delete rate limit buckets untouched for `max_idle_s` seconds; returns the count."""
+    pool = await get_pool()
+    async with metrics.acquire(pool, "app") as connection:
+        result = await connection.execute(
+            "DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - make_interval(secs => $1)",
+            float(max_idle_s),
+        )
+    return int(result.split()[-1]) if result else 0
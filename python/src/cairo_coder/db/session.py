@@ -108,4 +108,36 @@ async def execute_schema_scripts() -> None:
                 ON user_interactions(user_id);
             """
         )
+        # Answer cache shared by all server workers (see server/answer_cache.py)
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                cache_key CHAR(64) PRIMARY KEY,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                last_hit_at TIMESTAMPTZ,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                agent_id VARCHAR(50) NOT NULL,
+                mcp_mode BOOLEAN NOT NULL DEFAULT FALSE,
+                history_hash CHAR(64) NOT NULL,
+                normalized_query TEXT NOT NULL,
+                query_embedding REAL[],
+                answer TEXT NOT NULL,
+                formatted_sources JSONB,
+                retrieved_sources JSONB
+            );
+            CREATE INDEX IF NOT EXISTS idx_answer_cache_scope
+                ON answer_cache(agent_id, mcp_mode, history_hash, created_at DESC);
+            """
+        )
+        # Token buckets of the per-user rate limits shared by all server workers
+        # (see server/rate_limit.py)
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket_key VARCHAR(100) PRIMARY KEY,
+                balance DOUBLE PRECISION NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
     logger.info("Database schema initialized.")
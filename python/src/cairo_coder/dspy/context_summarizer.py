@@ -1,10 +1,22 @@
-"""DSPy module for summarizing Cairo/Starknet documentation context."""
+"""DSPy modules for summarizing Cairo/Starknet documentation context and chat history."""
 
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
 
 import dspy
 import structlog
+from langsmith import traceable
 
-from cairo_coder.core.types import ProcessedQuery
+from cairo_coder.core.concurrency import STAGE_LLM, stage_slot
+from cairo_coder.core.constants import (
+    HISTORY_MAX_VERBATIM_MESSAGES,
+    HISTORY_MIN_VERBATIM_MESSAGES,
+    HISTORY_SUMMARY_CACHE_SIZE,
+    HISTORY_VERBATIM_TOKEN_BUDGET,
+)
+from cairo_coder.core.context_packer import estimate_tokens
+from cairo_coder.core.types import Message, ProcessedQuery
 
 logger = structlog.get_logger(__name__)
 
@@ -96,3 +108,166 @@ fn test_add() {
 }
 ```""",
 ).with_inputs("query", "raw_context")
+
+
+class ChatHistorySummarization(dspy.Signature):
+    """Fold older turns of a Cairo/Starknet assistant conversation into a rolling summary.
+
+    Update the previous summary with the new messages so that later turns can still be understood:
+    keep the user's goal, constraints and decisions, the names of contracts, functions, types and
+    tools discussed, and any errors encountered with their fixes. Refer to code by name and purpose
+    instead of copying it, drop pleasantries, and keep the summary under 200 words.
+    """
+
+    previous_summary: str = dspy.InputField(
+        desc="Summary of the conversation so far (empty for the first update)."
+    )
+    new_messages: str = dspy.InputField(desc="Messages to fold into the summary, oldest first.")
+    summary: str = dspy.OutputField(
+        desc="Updated summary of the conversation up to and including the new messages."
+    )
+
+
+@dataclass
+class _HistorySummary:
+    """Rolling summary of the first `message_count` messages of a conversation."""
+
+    message_count: int
+    prefix_hash: str
+    summary: str
+
+
+class ChatHistoryCompressor(dspy.Module):
+    """
+    Token-aware chat history formatter.
+
+    With a conversation ID, the most recent messages are kept verbatim within a
+    token budget, and older messages are folded into a rolling summary cached per
+    conversation and updated incrementally, so each turn only summarizes the
+    messages that just left the verbatim window. When the cached summary cannot be
+    updated (summarization skipped or failed), the messages it does not cover are
+    kept verbatim after it. Whenever no summary is available (no conversation ID,
+    or none cached and summarization skipped or failed), the last
+    `max_verbatim_messages` messages are kept verbatim instead.
+    """
+
+    def __init__(
+        self,
+        verbatim_token_budget: int = HISTORY_VERBATIM_TOKEN_BUDGET,
+        min_verbatim_messages: int = HISTORY_MIN_VERBATIM_MESSAGES,
+        max_verbatim_messages: int = HISTORY_MAX_VERBATIM_MESSAGES,
+        cache_size: int = HISTORY_SUMMARY_CACHE_SIZE,
+    ):
+        super().__init__()
+        self.summarizer = dspy.Predict(ChatHistorySummarization)
+        self.verbatim_token_budget = verbatim_token_budget
+        self.min_verbatim_messages = min_verbatim_messages
+        self.max_verbatim_messages = max_verbatim_messages
+        self.cache_size = cache_size
+        self._summaries: OrderedDict[str, _HistorySummary] = OrderedDict()
+
+    @staticmethod
+    def format_messages(messages: list[Message]) -> str:
+        """Format messages as `User: ...` / `Assistant: ...` lines."""
+        return "\n".join(
+            f"{'User' if message.role == 'user' else 'Assistant'}: {message.content}"
+            for message in messages
+        )
+
+    def verbatim_start(self, chat_history: list[Message]) -> int:
+        """Index of the first message kept verbatim."""
+        start = len(chat_history)
+        tokens = 0
+        while start > 0 and len(chat_history) - start < self.max_verbatim_messages:
+            cost = estimate_tokens(self.format_messages([chat_history[start - 1]]))
+            kept = len(chat_history) - start
+            if kept >= self.min_verbatim_messages and tokens + cost > self.verbatim_token_budget:
+                break
+            tokens += cost
+            start -= 1
+        return start
+
+    def truncate(self, chat_history: list[Message]) -> str:
+        """Format the last `max_verbatim_messages` messages, for use without a summary."""
+        return self.format_messages(chat_history[-self.max_verbatim_messages :])
+
+    @traceable(name="ChatHistoryCompressor", run_type="chain")
+    async def aforward(
+        self,
+        chat_history: list[Message],
+        conversation_id: str | None = None,
+        summarize: bool = True,
+    ) -> str:
+        """
+        Format the chat history, summarizing the messages older than the verbatim window.
+
+        Args:
+            chat_history: Previous conversation messages, oldest first
+            conversation_id: Conversation the rolling summary is cached under
+            summarize: Whether the summary may be updated with an LM call; when False,
+                only an already cached summary is used
+
+        Returns:
+            Formatted chat history string
+        """
+        if conversation_id is None:
+            return self.truncate(chat_history)
+        start = self.verbatim_start(chat_history)
+        if start == 0:
+            return self.format_messages(chat_history)
+
+        cached = self._cached_summary(conversation_id, chat_history)
+        summary = cached.summary if cached else ""
+        summarized_count = cached.message_count if cached else 0
+
+        if summarized_count < start and summarize:
+            try:
+                async with stage_slot(STAGE_LLM):
+                    prediction = await self.summarizer.acall(
+                        previous_summary=summary,
+                        new_messages=self.format_messages(chat_history[summarized_count:start]),
+                    )
+                summary = prediction.summary
+                summarized_count = start
+                self._remember(conversation_id, chat_history, summarized_count, summary)
+            except Exception as e:
+                logger.warning(
+                    "Chat history summarization failed, keeping unsummarized messages verbatim",
+                    error=str(e),
+                )
+
+        if not summary:
+            return self.truncate(chat_history)
+        # A summary not updated this turn (skipped or failed) stops short of the window:
+        # the messages in between are kept verbatim
+        verbatim = self.format_messages(chat_history[min(start, summarized_count) :])
+        return f"Summary of earlier messages: {summary}\n\n{verbatim}"
+
+    def _cached_summary(
+        self, conversation_id: str, chat_history: list[Message]
+    ) -> _HistorySummary | None:
+        """Return the cached summary if it still matches the start of this history."""
+        cached = self._summaries.get(conversation_id)
+        if cached is None or cached.message_count > len(chat_history):
+            return None
+        if cached.prefix_hash != self._prefix_hash(chat_history[: cached.message_count]):
+            # The client sent an edited history; start over
+            return None
+        self._summaries.move_to_end(conversation_id)
+        return cached
+
+    def _remember(
+        self, conversation_id: str, chat_history: list[Message], message_count: int, summary: str
+    ) -> None:
+        """Cache the rolling summary (LRU-bounded)."""
+        self._summaries[conversation_id] = _HistorySummary(
+            message_count=message_count,
+            prefix_hash=self._prefix_hash(chat_history[:message_count]),
+            summary=summary,
+        )
+        self._summaries.move_to_end(conversation_id)
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+
+    def _prefix_hash(self, messages: list[Message]) -> str:
+        return hashlib.sha256(self.format_messages(messages).encode()).hexdigest()
@@ -6,7 +6,10 @@ relevant documents from the vector store based on processed queries.
 """
 
 
+import asyncio
 import os
+from collections import OrderedDict
+from typing import Any
 
 import asyncpg
 import dspy
@@ -14,8 +17,21 @@ import structlog
 from langsmith import traceable
 from psycopg2 import sql
 
+from cairo_coder.core import metrics
+from cairo_coder.core.circuit_breaker import (
+    BREAKER_DB,
+    BREAKER_EMBEDDER,
+    CircuitOpenError,
+    circuit_breaker,
+)
+from cairo_coder.core.concurrency import STAGE_DB, STAGE_EMBEDDING, stage_slot
 from cairo_coder.core.config import VectorStoreConfig
-from cairo_coder.core.constants import SIMILARITY_THRESHOLD
+from cairo_coder.core.constants import (
+    MAX_CHUNK_OVERLAP_CHARS,
+    MIN_CHUNK_OVERLAP_CHARS,
+    SIMILARITY_THRESHOLD,
+)
+from cairo_coder.core.retrieval_batch import RetrievalBatch, current_retrieval_batch
 from cairo_coder.core.types import Document, DocumentSource, ProcessedQuery
 from cairo_coder.dspy.pgvector_rm import PgVectorRM
 from cairo_coder.dspy.templates import (
@@ -27,7 +43,90 @@ from cairo_coder.dspy.templates import (
 
 logger = structlog.get_logger(__name__)
 
+RETRIEVAL_FALLBACK_CACHE_SIZE = 512
+
+
+def _stitch_chunks(previous: str, following: str) -> str:
+    """Concatenate two consecutive chunks, removing the text they overlap on."""
+    tail = previous[-MAX_CHUNK_OVERLAP_CHARS:]
+    probe = following[:MIN_CHUNK_OVERLAP_CHARS]
+    if len(probe) == MIN_CHUNK_OVERLAP_CHARS:
+        # The first match in the tail is the longest suffix/prefix overlap
+        index = tail.find(probe)
+        while index != -1:
+            if following.startswith(tail[index:]):
+                return previous + following[len(tail) - index :]
+            index = tail.find(probe, index + 1)
+    return f"{previous}\n\n{following}"
+
+
+def merge_adjacent_chunks(documents: list[Document]) -> list[Document]:
+    """
+    Merge adjacent or overlapping chunks of the same page into a single document.
+
+    Chunks are grouped by source and page (`name`, falling back to `sourceLink`) and
+    runs of consecutive `chunkNumber`s are stitched together. The merged document keeps
+    the metadata of its first chunk, the best similarity of the run and the number of
+    chunks it covers (`mergedChunkCount`). Skill chunks are left untouched since they
+    are expanded into full skill documents later, as are documents without a chunk number.
+
+    Args:
+        documents: Retrieved documents
 
+    Returns:
+        Documents with adjacent chunks merged, in first-seen order
+    """
+    runs_by_page: dict[tuple[str, str], list[Document]] = {}
+    passthrough: list[tuple[int, Document]] = []
+    first_seen: dict[tuple[str, str], int] = {}
+
+    for position, doc in enumerate(documents):
+        page = doc.metadata.get("name") or doc.metadata.get("sourceLink")
+        if (
+            not page
+            or not isinstance(doc.metadata.get("chunkNumber"), int)
+            or doc.metadata.get("source") == DocumentSource.CAIRO_SKILLS
+        ):
+            passthrough.append((position, doc))
+            continue
+        key = (str(doc.metadata.get("source", "")), str(page))
+        runs_by_page.setdefault(key, []).append(doc)
+        first_seen.setdefault(key, position)
+
+    merged: list[tuple[int, Document]] = list(passthrough)
+    for key, chunks in runs_by_page.items():
+        position = first_seen[key]
+        run: list[Document] = []
+        for chunk in sorted(chunks, key=lambda d: (d.metadata["chunkNumber"], d.page_content)):
+            if run and chunk.metadata["chunkNumber"] > run[-1].metadata["chunkNumber"] + 1:
+                merged.append((position, _merge_run(run)))
+                run = []
+            if run and chunk.metadata["chunkNumber"] == run[-1].metadata["chunkNumber"]:
+                # Same chunk retrieved twice (e.g. by several search queries)
+                continue
+            run.append(chunk)
+        merged.append((position, _merge_run(run)))
+
+    merged.sort(key=lambda item: item[0])
+    return [doc for _, doc in merged]
+
+
+def _merge_run(run: list[Document]) -> Document:
+    """Build a single document from a run of consecutive chunks."""
+    if len(run) == 1:
+        return run[0]
+    content = run[0].page_content
+    for chunk in run[1:]:
+        content = _stitch_chunks(content, chunk.page_content)
+    metadata = {**run[0].metadata, "mergedChunkCount": len(run)}
+    similarities = [
+        chunk.metadata["similarity"]
+        for chunk in run
+        if isinstance(chunk.metadata.get("similarity"), int | float)
+    ]
+    if similarities:
+        metadata["similarity"] = max(similarities)
+    return Document(page_content=content, metadata=metadata)  # type: ignore[arg-type]
 
 
 
@@ -49,6 +148,14 @@ class SourceFilteredPgVectorRM(PgVectorRM):
         self.pool = None  # Lazy-init async pool
         self.db_url = kwargs.get("db_url")
 
+    def embed(self, text: str | list[str]) -> Any:
+        """
+        Embed a text, or a list of texts (one embedding per text), with the store's embedder.
+
+        Embedders are synchronous: call it off the event loop.
+        """
+        return self._get_embeddings(text)
+
     async def _ensure_pool(self):
         """Lazily create asyncpg pool if not initialized."""
         if self.pool is None:
@@ -73,33 +180,79 @@ class SourceFilteredPgVectorRM(PgVectorRM):
             return []
 
         await self._ensure_pool()
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(
-                f"SELECT content, metadata FROM {self.pg_table_name} "
-                "WHERE metadata->>'uniqueId' = ANY($1::text[])",
-                unique_ids,
-            )
+        async with (
+            stage_slot(STAGE_DB),
+            metrics.acquire(self.pool, "vector_store") as conn,
+        ):
+            with circuit_breaker(BREAKER_DB).guard():
+                rows = await conn.fetch(
+                    f"SELECT content, metadata FROM {self.pg_table_name} "
+                    "WHERE metadata->>'uniqueId' = ANY($1::text[])",
+                    unique_ids,
+                )
 
         return [{"content": row["content"], "metadata": row["metadata"]} for row in rows]
 
     @traceable(name="AsyncDocumentRetriever", run_type="retriever")
-    async def aforward(self, query: str, k: int | None = None, sources: list[DocumentSource] | None = None) -> list[dspy.Example]:
+    async def aforward(
+        self,
+        query: str,
+        k: int | None = None,
+        sources: list[DocumentSource] | None = None,
+        timeout: float | None = None,
+    ) -> list[dspy.Example]:
         """Async search with PgVector for k top passages using cosine similarity with source filtering.
 
+        Within a retrieval batch (see `cairo_coder.core.retrieval_batch`), identical
+        searches run once and query embeddings are computed in batches.
+
         Args:
             query (str): The query to search for.
             k (int): The number of top passages to retrieve. Defaults to the value set in the constructor.
+            timeout (float): Optional statement timeout in seconds. asyncpg cancels the query
+                server-side and raises TimeoutError when it is exceeded.
 
         Returns:
             list[dspy.Example]: List of retrieved passages as DSPy Examples.
         """
+        batch = current_retrieval_batch()
+        if batch is None:
+            return await self._asearch(query, k, sources, timeout)
+        search_key = (
+            self.pg_table_name,
+            query,
+            tuple(sorted(source.value for source in sources or [])),
+            k if k else self.k,
+            getattr(self, "similarity_threshold", 0.35),
+        )
+        return await batch.search(
+            search_key, lambda: self._asearch(query, k, sources, timeout, batch)
+        )
+
+    async def _asearch(
+        self,
+        query: str,
+        k: int | None = None,
+        sources: list[DocumentSource] | None = None,
+        timeout: float | None = None,
+        batch: RetrievalBatch | None = None,
+    ) -> list[dspy.Example]:
+        """Embed the query (through `batch` when given) and run the vector search."""
         # Select connection strategy via env var.
         # If OPTIMIZER_RUN is truthy, use per-call connections;
         # otherwise use a (loop-local) pool.
         per_call = os.getenv("OPTIMIZER_RUN", "").lower() in {"1", "true", "yes", "on"}
 
-        # Embed query (assuming _get_embeddings is sync; make async if needed)
-        query_embedding_raw = self._get_embeddings(query)
+        if batch is not None:
+            query_embedding_raw = await batch.embed(query)
+        else:
+            # Embedders are synchronous: embed off the event loop
+            async with stage_slot(STAGE_EMBEDDING):
+                with (
+                    circuit_breaker(BREAKER_EMBEDDER).guard(),
+                    metrics.stage_timer(metrics.STAGE_EMBEDDING),
+                ):
+                    query_embedding_raw = await asyncio.to_thread(self._get_embeddings, query)
 
         if hasattr(query_embedding_raw, "tolist"):
             # numpy array
@@ -157,13 +310,24 @@ class SourceFilteredPgVectorRM(PgVectorRM):
         if per_call:
             conn = await asyncpg.connect(dsn=self.db_url)
             try:
-                rows = await conn.fetch(sql_query, *params)
+                with (
+                    circuit_breaker(BREAKER_DB).guard(),
+                    metrics.stage_timer(metrics.STAGE_VECTOR_SEARCH),
+                ):
+                    rows = await conn.fetch(sql_query, *params, timeout=timeout)
             finally:
                 await conn.close()
         else:
             await self._ensure_pool()
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch(sql_query, *params)
+            async with (
+                stage_slot(STAGE_DB),
+                metrics.acquire(self.pool, "vector_store") as conn,
+            ):
+                with (
+                    circuit_breaker(BREAKER_DB).guard(),
+                    metrics.stage_timer(metrics.STAGE_VECTOR_SEARCH),
+                ):
+                    rows = await conn.fetch(sql_query, *params, timeout=timeout)
 
         for row in rows:
             # Convert asyncpg Record to dict using column names
@@ -306,9 +470,16 @@ class DocumentRetrieverProgram(dspy.Module):
             self.vector_db = vector_db
         self.max_source_count = max_source_count
         self.similarity_threshold = similarity_threshold
+        # Last results per (search query, sources), served when a search times out
+        self._fallback_cache: OrderedDict[tuple[str, tuple[str, ...]], list[dspy.Example]] = (
+            OrderedDict()
+        )
 
     async def aforward(
-        self, processed_query: ProcessedQuery, sources: list[DocumentSource] | None = None
+        self,
+        processed_query: ProcessedQuery,
+        sources: list[DocumentSource] | None = None,
+        statement_timeout: float | None = None,
     ) -> dspy.Prediction:
         """
         Execute the document retrieval process asynchronously.
@@ -316,25 +487,35 @@ class DocumentRetrieverProgram(dspy.Module):
         Args:
             processed_query: ProcessedQuery object with search terms and metadata
             sources: Optional list of DocumentSource to filter by
+            statement_timeout: Optional per-query timeout in seconds. Timed-out searches
+                fall back to the last cached result for the same search query.
 
         Returns:
-            dspy.Prediction containing list of relevant Document objects, ranked by similarity
+            dspy.Prediction containing list of relevant Document objects, ranked by similarity,
+            and the list of degradations applied during retrieval
         """
         # Use sources from processed query if not provided
         if sources is None:
             sources = processed_query.resources
 
         # Step 1: Fetch documents from vector store
-        documents = await self._afetch_documents(processed_query, sources)
+        degradations: list[str] = []
+        documents = await self._afetch_documents(
+            processed_query, sources, statement_timeout, degradations
+        )
 
         if not documents:
-            empty_prediction = dspy.Prediction(documents=[])
+            empty_prediction = dspy.Prediction(documents=[], degradations=degradations)
             empty_prediction.set_lm_usage({})
             return empty_prediction
 
-        # Step 2: Enrich context with appropriate templates based on query type.
+        # Step 2: Merge adjacent chunks of the same page so they are judged and
+        # rendered as a single context block.
+        documents = merge_adjacent_chunks(documents)
+
+        # Step 3: Enrich context with appropriate templates based on query type.
         enhanced_documents = self._enhance_context(processed_query, documents)
-        prediction = dspy.Prediction(documents=enhanced_documents)
+        prediction = dspy.Prediction(documents=enhanced_documents, degradations=degradations)
         prediction.set_lm_usage({})
         return prediction
 
@@ -378,7 +559,11 @@ class DocumentRetrieverProgram(dspy.Module):
         return list(documents)
 
     async def _afetch_documents(
-        self, processed_query: ProcessedQuery, sources: list[DocumentSource]
+        self,
+        processed_query: ProcessedQuery,
+        sources: list[DocumentSource],
+        statement_timeout: float | None = None,
+        degradations: list[str] | None = None,
     ) -> list[Document]:
         """
         Fetch documents from vector store using similarity search asynchronously.
@@ -386,6 +571,8 @@ class DocumentRetrieverProgram(dspy.Module):
         Args:
             processed_query: ProcessedQuery with search terms
             sources: List of DocumentSource to search within
+            statement_timeout: Optional per-query timeout in seconds
+            degradations: Optional list collecting the degradations applied
 
         Returns:
             List of Document objects from vector store
@@ -394,8 +581,34 @@ class DocumentRetrieverProgram(dspy.Module):
 
         retrieved_examples: list[dspy.Example] = []
         for search_query in search_queries:
-            # Use async version of retriever
-            examples = await self.vector_db.aforward(query=search_query, sources=sources)
+            cache_key = (search_query, tuple(sorted(source.value for source in sources or [])))
+            try:
+                # Use async version of retriever
+                if statement_timeout is None:
+                    examples = await self.vector_db.aforward(query=search_query, sources=sources)
+                else:
+                    examples = await self.vector_db.aforward(
+                        query=search_query, sources=sources, timeout=statement_timeout
+                    )
+            except (TimeoutError, CircuitOpenError) as exc:
+                examples = self._fallback_cache.get(cache_key, [])
+                circuit_open = isinstance(exc, CircuitOpenError)
+                logger.warning(
+                    "Vector search circuit open, using cached fallback"
+                    if circuit_open
+                    else "Vector search timed out, using cached fallback",
+                    search_query=search_query[:120],
+                    cached_results=len(examples),
+                )
+                if degradations is not None:
+                    if examples:
+                        degradation = "retrieval_cached_fallback"
+                    else:
+                        degradation = "retrieval_circuit_open" if circuit_open else "retrieval_timeout"
+                    if degradation not in degradations:
+                        degradations.append(degradation)
+            else:
+                self._remember_results(cache_key, examples)
             retrieved_examples.extend(examples)
 
         # Convert to Document objects and deduplicate using a set
@@ -406,6 +619,15 @@ class DocumentRetrieverProgram(dspy.Module):
 
         return list(documents)
 
+    def _remember_results(
+        self, cache_key: tuple[str, tuple[str, ...]], examples: list[dspy.Example]
+    ) -> None:
+        """Store the latest results for a search query as a timeout fallback (LRU-bounded)."""
+        self._fallback_cache[cache_key] = examples
+        self._fallback_cache.move_to_end(cache_key)
+        while len(self._fallback_cache) > RETRIEVAL_FALLBACK_CACHE_SIZE:
+            self._fallback_cache.popitem(last=False)
+
     def _enhance_context(self, processed_query: ProcessedQuery, context: list[Document]) -> list[Document]:
         """
         Enhance context with appropriate templates based on query type.
@@ -5,6 +5,7 @@ This module implements the GenerationProgram that generates Cairo code responses
 based on user queries and retrieved documentation context.
 """
 
+import contextlib
 import os
 from collections.abc import AsyncGenerator
 from typing import Optional
@@ -15,6 +16,7 @@ from dspy import InputField, OutputField, Signature
 from dspy.adapters.chat_adapter import AdapterParseError
 from langsmith import traceable
 
+from cairo_coder.core.concurrency import STAGE_LLM, stage_slot
 from cairo_coder.core.types import Message
 
 logger = structlog.get_logger(__name__)
@@ -282,9 +284,10 @@ class GenerationProgram(dspy.Module):
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                return await self.generation_program.acall(
-                    query=query, context=context, chat_history=chat_history
-                )
+                async with stage_slot(STAGE_LLM):
+                    return await self.generation_program.acall(
+                        query=query, context=context, chat_history=chat_history
+                    )
             except AdapterParseError as e:
                 if attempt < max_retries - 1:
                     continue
@@ -323,10 +326,13 @@ class GenerationProgram(dspy.Module):
 
         # Execute the streaming generation. Do not swallow exceptions here;
         # let them propagate so callers can emit structured error events.
-        output_stream = stream_generation(query=query, context=context, chat_history=chat_history)
-
-        async for chunk in output_stream:
-            yield chunk
+        # The stream is closed when this generator is, so an abandoned generation
+        # cancels the task streaming from the LM instead of leaving it running.
+        async with stage_slot(STAGE_LLM), contextlib.aclosing(
+            stream_generation(query=query, context=context, chat_history=chat_history)
+        ) as output_stream:
+            async for chunk in output_stream:
+                yield chunk
 
     def _format_chat_history(self, chat_history: list[Message]) -> str:
         """
@@ -377,7 +383,8 @@ class SkillGenerationProgram(dspy.Module):
         """
         Generate a skill document asynchronously.
         """
-        return await self.generation_program.acall(query=query, context=context)
+        async with stage_slot(STAGE_LLM):
+            return await self.generation_program.acall(query=query, context=context)
 
 
 def create_generation_program(program_type: str) -> GenerationProgram:
@@ -10,17 +10,32 @@ Behavior:
 - Activated upstream when DocumentSource.STARKNET_BLOG is in the requested sources.
 - Returns one primary virtual Document containing the Grok-composed answer
   plus an inline source list inside the content.
-- Does not create per-citation documents; citations are emitted via SOURCES.
+- Does not create per-citation documents; citations are returned on the
+  prediction (`citations`) and emitted via SOURCES.
+- Answers to queries without chat history are cached per normalized query and
+  search terms (see GrokAnswerCache); past their TTL they are served stale while
+  a refresh runs in the background. Answers shaped by a user's conversation are
+  not cached, so they are never served to other users.
 
 Environment:
 - Set XAI_API_KEY with a valid xAI API key.
+
+The xAI client (a gRPC channel) is created on first use and shared by all the
+programs of the process, so agents do not each open a channel and no channel is
+created before `cairo-coder --preload` forks the workers.
 """
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import json
 import os
 import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from urllib.parse import urlparse
 
 import dspy
@@ -30,6 +45,15 @@ from xai_sdk import AsyncClient as XaiClient
 from xai_sdk.chat import Response, user
 from xai_sdk.tools import web_search, x_search
 
+from cairo_coder.core import metrics
+from cairo_coder.core.circuit_breaker import BREAKER_GROK, CircuitOpenError, circuit_breaker
+from cairo_coder.core.concurrency import STAGE_LLM, stage_slot
+from cairo_coder.core.constants import (
+    GROK_CACHE_MAX_ENTRIES,
+    GROK_CACHE_STALE_S,
+    GROK_CACHE_TTL_S,
+    GROK_TIMEOUT_S,
+)
 from cairo_coder.core.types import Document, DocumentSource, ProcessedQuery
 
 logger = structlog.get_logger(__name__)
@@ -46,23 +70,149 @@ def _mk_unique_id(prefix: str, content: str, idx: int = 0) -> str:
     return f"{prefix}-{_sha1(content)[:10]}-{idx}"
 
 
+# xAI clients shared by the programs of the process, by API key
+_clients: dict[str, XaiClient] = {}
 
-class GrokSearchProgram(dspy.Module):
+
+def _shared_client(api_key: str) -> XaiClient:
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients[api_key] = XaiClient(api_key=api_key)
+    return client
+
+
+def open_client_count() -> int:
+    """Number of xAI clients (gRPC channels) opened by the process."""
+    return len(_clients)
+
+
+@dataclass
+class GrokAnswer:
+    """Grok answer and the citation URLs extracted from it."""
+
+    answer: str
+    citations: list[str]
+    fetched_at: float
+
+
+class GrokAnswerCache:
     """
-    DSPy module that queries xAI's Grok Responses API with web and X search tools.
+    In-process TTL cache of Grok answers, with stale-while-revalidate refresh.
 
-    aforward returns a list[Document] suitable for inclusion in the RAG pipeline.
+    Entries younger than `ttl_s` are served as is. Older ones are still served for
+    `stale_s` more, while a single background task per key fetches a fresh answer;
+    past that, the answer is fetched again before responding.
     """
 
     def __init__(
         self,
-    ) -> None:
+        ttl_s: float = GROK_CACHE_TTL_S,
+        stale_s: float = GROK_CACHE_STALE_S,
+        max_entries: int = GROK_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_s: Age under which answers are fresh
+            stale_s: Additional age during which stale answers are served
+            max_entries: Answers kept (least recently used ones are dropped)
+            clock: Monotonic clock, replaceable in tests
+        """
+        if ttl_s <= 0 or stale_s < 0 or max_entries <= 0:
+            raise ValueError("Grok cache TTL and size must be positive")
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, GrokAnswer] = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task[None]] = {}
+
+    @staticmethod
+    def key(processed_query: ProcessedQuery) -> str:
+        """Cache key of a query: its normalized text and search terms."""
+
+        def normalize(text: str) -> str:
+            return " ".join(text.lower().split()).rstrip("?!. ")
+
+        payload = json.dumps(
+            [
+                normalize(processed_query.original),
+                sorted({normalize(term) for term in processed_query.search_queries}),
+            ]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> tuple[GrokAnswer, bool] | None:
+        """Cached answer and whether it is still fresh, or None when missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = self._clock() - entry.fetched_at
+        if age >= self.ttl_s + self.stale_s:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry, age < self.ttl_s
+
+    def put(self, key: str, answer: str, citations: list[str]) -> GrokAnswer:
+        """Store a freshly fetched answer."""
+        entry = GrokAnswer(answer=answer, citations=list(citations), fetched_at=self._clock())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def refresh(self, key: str, fetch: Callable[[], Awaitable[tuple[str, list[str]]]]) -> None:
+        """Fetch a new answer for `key` in the background, unless already refreshing."""
+        if key in self._refreshing:
+            return
+
+        async def run() -> None:
+            try:
+                answer, citations = await fetch()
+                self.put(key, answer, citations)
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                logger.warning("Grok cache refresh failed, keeping stale answer", error=str(e))
+            finally:
+                del self._refreshing[key]
+
+        self._refreshing[key] = asyncio.create_task(run())
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        self._entries.clear()
+
+
+# Answers shared by the programs of the process
+_answer_cache = GrokAnswerCache()
+
+
+class GrokSearchProgram(dspy.Module):
+    """
+    DSPy module that queries xAI's Grok Responses API with web and X search tools.
+
+    aforward returns a list[Document] suitable for inclusion in the RAG pipeline,
+    and the citation URLs of the answer.
+    """
+
+    def __init__(self, cache: GrokAnswerCache | None = None) -> None:
+        """
+        Initialize the program.
+
+        Args:
+            cache: Answer cache (defaults to the cache shared by the process)
+        """
         super().__init__()
         api_key = os.getenv("XAI_API_KEY")
         if not api_key:
             raise RuntimeError("XAI_API_KEY must be set for GrokSearchProgram")
-        self.client = XaiClient(api_key=api_key)
-        self.last_citations: list[str] = []
+        self.api_key = api_key
+        self.cache = cache or _answer_cache
 
     @staticmethod
     def _extract_urls_from_text(text: str) -> list[str]:
@@ -88,6 +238,11 @@ class GrokSearchProgram(dspy.Module):
                 result.append(u)
         return result
 
+    @property
+    def client(self) -> XaiClient:
+        """xAI client shared by the process, created on first use."""
+        return _shared_client(self.api_key)
+
     @staticmethod
     def _domain_from_url(url: str) -> str:
         try:
@@ -97,6 +252,43 @@ class GrokSearchProgram(dspy.Module):
 
     @traceable(name="GrokSearchProgram", run_type="llm")
     async def aforward(self, processed_query: ProcessedQuery, chat_history: str) -> dspy.Prediction:
+        """
+        Answer a query with Grok's web and X search, from the cache when possible.
+
+        Only queries without chat history use the cache: the history is part of the
+        prompt, and cached answers are shared by every user.
+
+        Returns:
+            Prediction with the summary `documents` and the answer's `citations`
+
+        Raises:
+            CircuitOpenError: If the answer is not cached and Grok's breaker is open
+        """
+        if chat_history:
+            answer, citations = await self._search(processed_query, chat_history)
+            return self._prediction(answer, citations)
+        key = self.cache.key(processed_query)
+        cached = self.cache.get(key)
+        metrics.record_cache_lookup("grok", hit=cached is not None)
+        if cached is None:
+            answer, citations = await self._search(processed_query, chat_history)
+            self.cache.put(key, answer, citations)
+        else:
+            entry, fresh = cached
+            answer, citations = entry.answer, list(entry.citations)
+            if not fresh:
+                self.cache.refresh(
+                    key,
+                    lambda: asyncio.wait_for(
+                        self._search(processed_query, chat_history), GROK_TIMEOUT_S
+                    ),
+                )
+        return self._prediction(answer, citations)
+
+    async def _search(
+        self, processed_query: ProcessedQuery, chat_history: str
+    ) -> tuple[str, list[str]]:
+        """Query Grok; returns its answer and the citation URLs found in it."""
         formatted_query = f"""Answer the following query: {processed_query.original}. \
             Here is the chat history: {chat_history}, that might be relevant to the question. \
             For more context, here are some semantic terms associated with the question: \
@@ -110,13 +302,17 @@ class GrokSearchProgram(dspy.Module):
         )
         logger.info(f"Formatted query: {formatted_query}")
         chat.append(user(formatted_query))
-        response: Response = await chat.sample()
+        async with stage_slot(STAGE_LLM):
+            with circuit_breaker(BREAKER_GROK).guard():
+                response: Response = await chat.sample()
         answer: str = response.content
         # Extract citations from Grok's answer content (regex), not from response.citations
         citations_urls: list[str] = self._extract_urls_from_text(answer)
-        self.last_citations = list(citations_urls or [])
         logger.info(f"Answer: {answer}")
         logger.info(f"Citations URLs: {citations_urls}")
+        return answer, citations_urls
+
+    def _prediction(self, answer: str, citations_urls: list[str]) -> dspy.Prediction:
 
         # Preserve Grok's inline links; optionally add a markdown list of sources
         answer_with_sources = answer
@@ -148,6 +344,6 @@ class GrokSearchProgram(dspy.Module):
             )
         )
 
-        prediction = dspy.Prediction(documents=documents)
+        prediction = dspy.Prediction(documents=documents, citations=citations_urls)
         prediction.set_lm_usage({})
         return prediction
@@ -87,8 +87,8 @@ class PgVectorRM(dspy.Retrieve):
         else:
             self.embedding_func = embedding_func
 
-        self.conn = psycopg2.connect(db_url)
-        register_vector(self.conn)
+        self.db_url = db_url
+        self.connect()
         self.pg_table_name = pg_table_name
         self.fields = fields or ["text"]
         self.content_field = content_field
@@ -97,6 +97,15 @@ class PgVectorRM(dspy.Retrieve):
 
         super().__init__(k=k)
 
+    def connect(self) -> None:
+        """Open the psycopg2 connection (again in a worker forked without one)."""
+        self.conn = psycopg2.connect(self.db_url)
+        register_vector(self.conn)
+
+    def close_connection(self) -> None:
+        """Close the psycopg2 connection, which forked workers must not share."""
+        self.conn.close()
+
     def forward(self, query: str, k: int = None):
         """Search with PgVector for k top passages for query using cosine similarity
 
@@ -13,6 +13,10 @@ import dspy
 import structlog
 from langsmith import traceable
 
+from cairo_coder.core import metrics
+from cairo_coder.core.circuit_breaker import BREAKER_QUERY_LM, circuit_breaker
+from cairo_coder.core.concurrency import STAGE_LLM, stage_slot
+from cairo_coder.core.hedging import hedged
 from cairo_coder.core.types import DocumentSource, ProcessedQuery
 
 logger = structlog.get_logger(__name__)
@@ -137,9 +141,19 @@ class QueryProcessorProgram(dspy.Module):
 
         Returns:
             dspy.Prediction containing processed_query and attached usage
+
+        Raises:
+            CircuitOpenError: If the query processing LM's breaker is open
         """
         # Execute the DSPy retrieval program
-        result = await self.retrieval_program.acall(query=query, chat_history=chat_history)
+        async def process():
+            async with stage_slot(STAGE_LLM):
+                with circuit_breaker(BREAKER_QUERY_LM).guard():
+                    return await self.retrieval_program.acall(
+                        query=query, chat_history=chat_history
+                    )
+
+        result = await hedged(metrics.STAGE_QUERY_PROCESSING, process)
 
         # Parse and validate the results
         search_queries = result.search_queries
@@ -156,6 +170,27 @@ class QueryProcessorProgram(dspy.Module):
 
         return dspy.Prediction(processed_query=processed_query)
 
+    def heuristic_process(self, query: str) -> ProcessedQuery:
+        """
+        Build a ProcessedQuery without calling the LM.
+
+        Used as a fallback when the LM-based analysis cannot run in time: the raw
+        query is used as the only search query and all sources are searched.
+
+        Args:
+            query: The user's Cairo/Starknet programming question
+
+        Returns:
+            ProcessedQuery derived from keyword heuristics only
+        """
+        return ProcessedQuery(
+            original=query,
+            search_queries=[query],
+            is_contract_related=self._is_contract_query(query),
+            is_test_related=self._is_test_query(query),
+            resources=list(DocumentSource),
+        )
+
     def _validate_resources(self, resources: list[str]) -> list[DocumentSource]:
         """
         Validate and convert resource strings to DocumentSource enum values.
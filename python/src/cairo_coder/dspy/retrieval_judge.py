@@ -16,7 +16,11 @@ import dspy
 import structlog
 from langsmith import traceable
 
-from cairo_coder.core.constants import SIMILARITY_THRESHOLD
+from cairo_coder.core import metrics
+from cairo_coder.core.circuit_breaker import BREAKER_JUDGE_LM, circuit_breaker
+from cairo_coder.core.concurrency import STAGE_LLM, stage_slot
+from cairo_coder.core.constants import LLM_JUDGE_SCORE_KEY, SIMILARITY_THRESHOLD
+from cairo_coder.core.hedging import hedged
 from cairo_coder.core.types import Document
 from cairo_coder.dspy.templates import CONTRACT_TEMPLATE_TITLE, TEST_TEMPLATE_TITLE
 
@@ -24,7 +28,6 @@ logger = structlog.get_logger(__name__)
 
 TEMPLATE_TITLES = {CONTRACT_TEMPLATE_TITLE, TEST_TEMPLATE_TITLE}
 JUDGE_DOCUMENT_PREVIEW_MAX_LEN = 1000
-LLM_JUDGE_SCORE_KEY = "llm_judge_score"
 LLM_JUDGE_REASON_KEY = "llm_judge_reason"
 
 
@@ -148,9 +151,17 @@ class RetrievalJudge(dspy.Module):
         # TODO: can we use dspy.Parallel here instead of asyncio gather?
         if judged_payloads:
             try:
-                # Judge concurrently
+                # Judge concurrently, within the worker's LLM call limit
                 async def judge_one(doc_string: str):
-                    return await self.rater.acall(query=query, system_resource=doc_string)
+                    async def rate():
+                        # Time queued for a slot is not the LM's latency
+                        async with stage_slot(STAGE_LLM):
+                            with circuit_breaker(BREAKER_JUDGE_LM).guard():
+                                return await self.rater.acall(
+                                    query=query, system_resource=doc_string
+                                )
+
+                    return await hedged(metrics.STAGE_JUDGE, rate)
 
                 results = await asyncio.gather(
                     *[judge_one(ds) for ds in judged_payloads], return_exceptions=True
@@ -163,6 +174,8 @@ class RetrievalJudge(dspy.Module):
                     results=results,
                     keep_docs=keep_docs,
                 )
+                templates = len(documents) - len(judged_indices)
+                metrics.record_judge(judged=len(judged_indices), kept=len(keep_docs) - templates)
             except Exception as e:
                 logger.error(
                     "Retrieval judge failed (async), returning all docs",
@@ -0,0 +1,140 @@
+"""
+Admission control for the chat completion and retrieval endpoints.
+
+Each worker serves at most MAX_CONCURRENT_REQUESTS requests at once. Requests
+beyond that wait in a bounded priority queue: streaming chat first, then
+non-streaming chat and retrieval, then MCP and batch traffic. Clients can lower
+(never raise) their priority with the `x-request-priority` header, which eval
+and other bulk tooling should set to `background`. When the queue is full, or a
+request waited longer than ADMISSION_MAX_WAIT_S, the request is rejected with
+429 and a Retry-After estimated from recent request durations.
+
+A streaming request keeps its slot until its response has been sent, or abandoned
+by its client (see `on_response_end`).
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+from fastapi import HTTPException
+
+from cairo_coder.core import metrics
+from cairo_coder.core.concurrency import (
+    LimitExceededError,
+    Priority,
+    PriorityLimiter,
+    set_request_priority,
+)
+from cairo_coder.core.constants import (
+    ADMISSION_MAX_WAIT_S,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_QUEUED_REQUESTS,
+)
+
+REQUEST_QUEUE = "request"
+PRIORITY_HEADER = "x-request-priority"
+
+
+def request_priority(stream: bool, mcp_mode: bool, header: str | None = None) -> Priority:
+    """
+    Priority of a request.
+
+    Args:
+        stream: Whether the answer is streamed to the client
+        mcp_mode: Whether the request comes from an MCP client
+        header: Optional `x-request-priority` value; it can only lower the priority
+
+    Raises:
+        ValueError: If the header is not a priority name
+    """
+    if mcp_mode:
+        priority = Priority.BACKGROUND
+    elif stream:
+        priority = Priority.INTERACTIVE
+    else:
+        priority = Priority.STANDARD
+    if header is None:
+        return priority
+    try:
+        requested = Priority[header.strip().upper()]
+    except KeyError as exc:
+        names = ", ".join(p.label for p in Priority)
+        raise ValueError(f"{PRIORITY_HEADER} must be one of: {names}") from exc
+    return max(priority, requested)
+
+
+def too_many_requests(message: str, code: str, retry_after_s: int) -> HTTPException:
+    """OpenAI-style 429 error carrying a Retry-After header."""
+    return HTTPException(
+        status_code=429,
+        detail={
+            "error": {
+                "message": message,
+                "type": "rate_limit_error",
+                "code": code,
+            }
+        },
+        headers={"Retry-After": str(retry_after_s)},
+    )
+
+
+class AdmissionController:
+    """Bounds the requests a worker serves at once, queueing the others by priority."""
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        max_queued: int = MAX_QUEUED_REQUESTS,
+        max_wait_s: float | None = ADMISSION_MAX_WAIT_S,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrent: Requests served at once
+            max_queued: Requests waiting for a slot before new ones are rejected
+            max_wait_s: Time after which a waiting request is rejected
+        """
+        self.limiter = PriorityLimiter(REQUEST_QUEUE, max_concurrent, max_queued, max_wait_s)
+
+    async def admit(self, priority: Priority, bounded: bool = True) -> float:
+        """
+        Wait for a request slot and set the request priority for the pipeline stages.
+
+        Args:
+            priority: Request priority
+            bounded: Whether the request may be rejected (batch items just wait)
+
+        Returns:
+            Admission time, to pass to `release`
+
+        Raises:
+            HTTPException: 429 when the queue is full or the wait timed out
+        """
+        set_request_priority(priority)
+        try:
+            await self.limiter.acquire(priority, bounded)
+        except LimitExceededError as exc:
+            metrics.record_admission_rejection(exc.reason)
+            raise too_many_requests(
+                "The server is overloaded, please retry later",
+                "server_overloaded",
+                exc.retry_after_s,
+            ) from exc
+        return time.perf_counter()
+
+    def release(self, admitted_at: float) -> None:
+        """Free the slot taken by `admit`."""
+        self.limiter.release(time.perf_counter() - admitted_at)
+
+
+def create_admission_controller_from_env() -> AdmissionController:
+    """Create the admission controller configured by environment variables."""
+    max_wait = os.getenv("ADMISSION_MAX_WAIT_S", str(ADMISSION_MAX_WAIT_S))
+    return AdmissionController(
+        max_concurrent=int(os.getenv("MAX_CONCURRENT_REQUESTS", str(MAX_CONCURRENT_REQUESTS))),
+        max_queued=int(os.getenv("MAX_QUEUED_REQUESTS", str(MAX_QUEUED_REQUESTS))),
+        max_wait_s=float(max_wait) if max_wait else None,
+    )
@@ -0,0 +1,255 @@
+"""
+Answer cache for repeated questions, shared by all server workers.
+
+Answers are stored in Postgres (`answer_cache` table) keyed on the agent, MCP mode,
+a hash of the chat history and the normalized query. When a similarity threshold is
+configured, a miss on the exact key falls back to comparing the query embedding with
+the most recent entries of the same scope, so near-duplicate questions are served too.
+
+The cache is opt-in through environment variables:
+- ANSWER_CACHE_ENABLED=true enables exact-match caching
+- ANSWER_CACHE_SIMILARITY_THRESHOLD=<0..1> enables near-duplicate matching
+- ANSWER_CACHE_TTL_S=<seconds> overrides the entry lifetime
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from collections.abc import AsyncGenerator, Callable
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import structlog
+
+from cairo_coder.core.concurrency import STAGE_EMBEDDING, stage_slot
+from cairo_coder.core.constants import ANSWER_CACHE_CANDIDATE_LIMIT, ANSWER_CACHE_TTL_S
+from cairo_coder.core.types import (
+    Document,
+    Message,
+    PipelineResult,
+    ProcessedQuery,
+    StreamEvent,
+    StreamEventType,
+)
+from cairo_coder.db.models import CachedAnswer
+from cairo_coder.db.repository import (
+    find_cached_answer_candidates,
+    get_cached_answer,
+    upsert_cached_answer,
+)
+
+logger = structlog.get_logger(__name__)
+
+Embedder = Callable[[str], Any]
+
+
+@dataclass
+class AnswerCacheKey:
+    """Scope and normalized query identifying a cached answer."""
+
+    agent_id: str
+    mcp_mode: bool
+    history_hash: str
+    normalized_query: str
+    # Computed lazily, only when near-duplicate matching is enabled
+    query_embedding: list[float] | None = None
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 hex digest used as the primary key of the cache entry."""
+        payload = json.dumps(
+            [self.agent_id, self.mcp_mode, self.history_hash, self.normalized_query]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AnswerCache:
+    """Postgres-backed cache of final answers and their sources."""
+
+    def __init__(
+        self,
+        ttl_s: float = ANSWER_CACHE_TTL_S,
+        similarity_threshold: float | None = None,
+        embedder: Embedder | None = None,
+        candidate_limit: int = ANSWER_CACHE_CANDIDATE_LIMIT,
+    ):
+        """
+        Initialize the answer cache.
+
+        Args:
+            ttl_s: Lifetime of cache entries in seconds
+            similarity_threshold: Minimum cosine similarity for near-duplicate matches,
+                or None to only serve exact matches
+            embedder: Function embedding a query (required for near-duplicate matching)
+            candidate_limit: Number of recent entries compared by embedding
+        """
+        if ttl_s <= 0:
+            raise ValueError("Answer cache TTL must be positive")
+        if similarity_threshold is not None:
+            if not 0 < similarity_threshold <= 1:
+                raise ValueError("Answer cache similarity threshold must be in (0, 1]")
+            if embedder is None:
+                raise ValueError("Near-duplicate matching requires an embedder")
+        self.ttl_s = ttl_s
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+        self.candidate_limit = candidate_limit
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lowercase the query, collapse whitespace and strip trailing punctuation."""
+        return " ".join(query.lower().split()).rstrip("?!. ")
+
+    @staticmethod
+    def hash_history(history: list[Message]) -> str:
+        """Hash the chat history preceding the query."""
+        payload = json.dumps(
+            [
+                [message.role.value if hasattr(message.role, "value") else message.role, message.content]
+                for message in history
+            ]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def build_key(
+        self, agent_id: str, mcp_mode: bool, query: str, history: list[Message]
+    ) -> AnswerCacheKey:
+        """Build the cache key of a chat completion request."""
+        return AnswerCacheKey(
+            agent_id=agent_id,
+            mcp_mode=mcp_mode,
+            history_hash=self.hash_history(history),
+            normalized_query=self.normalize_query(query),
+        )
+
+    async def lookup(self, key: AnswerCacheKey) -> CachedAnswer | None:
+        """
+        Find a cached answer for the key, falling back to near-duplicate matching.
+
+        Lookup failures are logged and treated as misses so the cache never fails a request.
+        """
+        try:
+            entry = await get_cached_answer(key.digest, self.ttl_s)
+            if entry is not None or self.similarity_threshold is None:
+                return entry
+
+            key.query_embedding = await self._embed(key.normalized_query)
+            candidates = await find_cached_answer_candidates(
+                agent_id=key.agent_id,
+                mcp_mode=key.mcp_mode,
+                history_hash=key.history_hash,
+                max_age_s=self.ttl_s,
+                limit=self.candidate_limit,
+            )
+            match = self._closest(key.query_embedding, candidates)
+            if match is None:
+                return None
+            logger.info(
+                "Answer cache near-duplicate match",
+                query=key.normalized_query[:100],
+                matched_query=match.normalized_query[:100],
+            )
+            # Re-fetch through the key to record the hit
+            return await get_cached_answer(match.cache_key, self.ttl_s)
+        except Exception as exc:
+            logger.warning("Answer cache lookup failed, running the pipeline", error=str(exc))
+            return None
+
+    async def store(self, key: AnswerCacheKey, result: PipelineResult) -> None:
+        """Store a pipeline result if it is a complete, non-degraded answer."""
+        if not result.answer or result.degradations:
+            return
+        try:
+            if self.similarity_threshold is not None and key.query_embedding is None:
+                key.query_embedding = await self._embed(key.normalized_query)
+            await upsert_cached_answer(
+                CachedAnswer(
+                    cache_key=key.digest,
+                    agent_id=key.agent_id,
+                    mcp_mode=key.mcp_mode,
+                    history_hash=key.history_hash,
+                    normalized_query=key.normalized_query,
+                    query_embedding=key.query_embedding,
+                    answer=result.answer,
+                    formatted_sources=list(result.formatted_sources),
+                    retrieved_sources=[
+                        {"page_content": doc.page_content, "metadata": doc.metadata}
+                        for doc in result.documents
+                    ],
+                )
+            )
+        except Exception as exc:
+            logger.warning("Failed to store answer in cache", error=str(exc))
+
+    async def _embed(self, text: str) -> list[float]:
+        """Embed text off the event loop (embedders are synchronous)."""
+        assert self.embedder is not None
+        async with stage_slot(STAGE_EMBEDDING):
+            embedding = await asyncio.to_thread(self.embedder, text)
+        return [float(value) for value in np.asarray(embedding, dtype=np.float32).ravel()]
+
+    def _closest(
+        self, embedding: list[float], candidates: list[CachedAnswer]
+    ) -> CachedAnswer | None:
+        """Return the most similar candidate above the similarity threshold."""
+        candidates = [c for c in candidates if c.query_embedding and len(c.query_embedding) == len(embedding)]
+        if not candidates or self.similarity_threshold is None:
+            return None
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        matrix = np.asarray([c.query_embedding for c in candidates], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        similarities = (matrix @ query_vector) / np.where(norms == 0, 1, norms)
+        best = int(np.argmax(similarities))
+        return candidates[best] if similarities[best] >= self.similarity_threshold else None
+
+    @staticmethod
+    def to_pipeline_result(entry: CachedAnswer, query: str) -> PipelineResult:
+        """Rebuild the PipelineResult of a cached answer (no LM usage)."""
+        return PipelineResult(
+            processed_query=ProcessedQuery(original=query, search_queries=[query]),
+            documents=[
+                Document(page_content=source["page_content"], metadata=dict(source["metadata"]))
+                for source in entry.retrieved_sources or []
+            ],
+            grok_citations=[],
+            usage={},
+            answer=entry.answer,
+            formatted_sources=entry.formatted_sources,  # type: ignore[arg-type]
+        )
+
+    @staticmethod
+    async def replay(entry: CachedAnswer, query: str) -> AsyncGenerator[StreamEvent, None]:
+        """Replay a cached answer as the stream events of a pipeline run."""
+        for event in pipeline_result_events(AnswerCache.to_pipeline_result(entry, query)):
+            yield event
+
+
+def pipeline_result_events(result: PipelineResult) -> list[StreamEvent]:
+    """Stream events equivalent to a completed pipeline run (sources, answer, result)."""
+    return [
+        StreamEvent(type=StreamEventType.SOURCES, data=list(result.formatted_sources)),  # type: ignore[arg-type]
+        StreamEvent(type=StreamEventType.RESPONSE, data=result.answer),
+        StreamEvent(type=StreamEventType.FINAL_RESPONSE, data=result.answer),
+        StreamEvent(type=StreamEventType.END, data=result),  # type: ignore[arg-type]
+    ]
+
+
+def create_answer_cache_from_env(embedder: Embedder | None = None) -> AnswerCache | None:
+    """
+    Create the answer cache configured by environment variables.
+
+    Returns:
+        AnswerCache instance, or None when ANSWER_CACHE_ENABLED is not set
+    """
+    if os.getenv("ANSWER_CACHE_ENABLED", "").lower() not in {"1", "true", "yes", "on"}:
+        return None
+    threshold = os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD")
+    return AnswerCache(
+        ttl_s=float(os.getenv("ANSWER_CACHE_TTL_S", str(ANSWER_CACHE_TTL_S))),
+        similarity_threshold=float(threshold) if threshold else None,
+        embedder=embedder,
+    )
@@ -3,42 +3,108 @@ FastAPI server for Cairo Coder.
 
 This module implements the FastAPI application that provides OpenAI-compatible
 API endpoints and behaviors.
+
+Importing this module stays cheap: DSPy and the pipeline modules are imported when
+the application is created and by the lifespan, not at import time, so the
+process manager, CLI tools and tests do not pay for them.
 """
 
+from __future__ import annotations
+
 import argparse
+import asyncio
+import dataclasses
 import hashlib
-import json
+import importlib
 import os
+import sys
 import time
 import uuid
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
 
-import dspy
 import langsmith as ls
 import structlog
 import uvicorn
-from dspy.adapters import ChatAdapter, XMLAdapter
 from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 
+from cairo_coder.core import metrics
 from cairo_coder.core.agent_factory import AgentFactory, create_agent_factory
+from cairo_coder.core.cancellation import on_cancelled_run
+from cairo_coder.core.circuit_breaker import configure_circuit_breakers_from_env
+from cairo_coder.core.concurrency import Priority, configure_stage_limits_from_env
 from cairo_coder.core.config import VectorStoreConfig, load_config
-from cairo_coder.core.constants import DEFAULT_HOST, DEFAULT_PORT
-from cairo_coder.core.rag_pipeline import RagPipeline
-from cairo_coder.core.types import Message, PipelineResult, Role, StreamEventType
+from cairo_coder.core.constants import (
+    BATCH_DEFAULT_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    BATCH_MAX_REQUESTS,
+    CLIENT_CLOSED_REQUEST_STATUS,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    RATE_LIMIT_BUCKET_IDLE_TTL_S,
+)
+from cairo_coder.core.context_packer import document_score
+from cairo_coder.core.deadline import Deadline
+from cairo_coder.core.hedging import configure_hedging_from_env, hedged
+from cairo_coder.core.retrieval_batch import RetrievalBatch, use_retrieval_batch
+from cairo_coder.core.types import (
+    DocumentSource,
+    LMUsage,
+    Message,
+    PipelineResult,
+    Role,
+    StreamEvent,
+    StreamEventType,
+)
 from cairo_coder.db import session as db_session
-from cairo_coder.db.models import UserInteraction
-from cairo_coder.db.repository import create_user_interaction
-from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
-from cairo_coder.dspy.suggestion_program import SuggestionGeneration
+from cairo_coder.db.models import CachedAnswer, UserInteraction
+from cairo_coder.db.repository import (
+    create_user_interaction,
+    delete_expired_cached_answers,
+    delete_idle_rate_limit_buckets,
+)
+from cairo_coder.server.admission import (
+    PRIORITY_HEADER,
+    create_admission_controller_from_env,
+    request_priority,
+)
+from cairo_coder.server.answer_cache import (
+    AnswerCache,
+    AnswerCacheKey,
+    create_answer_cache_from_env,
+)
+from cairo_coder.server.coalescing import RequestCoalescer, coalescing_key
+from cairo_coder.server.disconnect import (
+    ClientDisconnectedError,
+    cancel_on_disconnect,
+    on_response_end,
+    stream_until_disconnect,
+)
 from cairo_coder.server.insights_api import router as insights_router
+from cairo_coder.server.prefork import bind_socket, serve_preforked
+from cairo_coder.server.profiling import (
+    create_profiles_router,
+    create_request_profiler_from_env,
+)
+from cairo_coder.server.rate_limit import (
+    KIND_API_KEY,
+    KIND_USER,
+    RateLimitKey,
+    create_rate_limiter_from_env,
+)
+from cairo_coder.server.sse import DONE_FRAME, ChatChunkEncoder
+from cairo_coder.server.warmup import WARMUP_EAGER, warm_connections, warmup_mode_from_env
 from cairo_coder.utils.logging import setup_logging
 
-# Configure structured logging
-setup_logging(os.environ.get("LOG_LEVEL", "INFO"), os.environ.get("LOG_FORMAT", "console"))
+if TYPE_CHECKING:
+    from cairo_coder.core.rag_pipeline import RagPipeline
+    from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
+
 logger = structlog.get_logger(__name__)
 
 
@@ -59,9 +125,20 @@ def hash_user_id(user_id: str | None) -> str | None:
         return None
     return hashlib.sha256(user_id.encode()).hexdigest()[:32]
 
+
+def request_rate_limit_key(req: Request) -> RateLimitKey | None:
+    """Rate limit identity of a request: its hashed API key, else its hashed user ID."""
+    api_key = req.headers.get("x-api-key")
+    if api_key:
+        return RateLimitKey(KIND_API_KEY, hash_user_id(api_key))
+    user_id = req.headers.get("x-user-id")
+    return RateLimitKey(KIND_USER, hash_user_id(user_id)) if user_id else None
+
 # Global vector DB instance managed by FastAPI lifecycle
 _vector_db: SourceFilteredPgVectorRM | None = None
 _agent_factory: AgentFactory | None = None
+# Optional answer cache shared across workers (disabled unless ANSWER_CACHE_ENABLED)
+_answer_cache: AnswerCache | None = None
 
 
 # OpenAI-compatible Request/Response Models
@@ -163,13 +240,71 @@ class SuggestionResponse(BaseModel):
     suggestions: list[str] = Field(..., description="List of 4-5 follow-up suggestions")
 
 
+class BatchChatCompletionRequest(BaseModel):
+    """Independent chat completion requests answered in one batch."""
+
+    requests: list[ChatCompletionRequest] = Field(
+        ..., min_length=1, max_length=BATCH_MAX_REQUESTS, description="Requests to answer"
+    )
+    max_concurrency: int = Field(
+        BATCH_DEFAULT_CONCURRENCY,
+        ge=1,
+        le=BATCH_MAX_CONCURRENCY,
+        description="Requests run at the same time",
+    )
+
+
+class BatchChatCompletionResult(BaseModel):
+    """One NDJSON line of a batch response: the response or error of a request."""
+
+    index: int = Field(..., description="Position of the request in the batch")
+    response: ChatCompletionResponse | None = Field(None, description="Chat completion")
+    error: ErrorDetail | None = Field(None, description="Error, when the request failed")
+
+
+class RetrieveRequest(BaseModel):
+    """Request model for retrieving documentation without generating an answer."""
+
+    query: str = Field(..., min_length=1, description="Question to retrieve documentation for")
+    chat_history: list[ChatMessage] = Field(
+        default_factory=list, description="Previous conversation messages"
+    )
+    sources: list[DocumentSource] | None = Field(
+        None, description="Sources to search (defaults to the sources picked for the query)"
+    )
+    limit: int | None = Field(None, ge=1, description="Maximum number of documents returned")
+    fast: bool = Field(False, description="Process the query with heuristics instead of the LM")
+    judge: bool = Field(True, description="Filter and score documents with the retrieval judge")
+
+
+class RetrievedDocument(BaseModel):
+    """A retrieved documentation chunk."""
+
+    page_content: str = Field(..., description="Document content")
+    metadata: dict = Field(..., description="Document metadata")
+    score: float = Field(..., description="Judge score, or similarity when not judged")
+
+
+class RetrieveResponse(BaseModel):
+    """Response model for retrieval-only requests."""
+
+    search_queries: list[str] = Field(..., description="Search queries derived from the query")
+    resources: list[str] = Field(..., description="Sources picked for the query")
+    documents: list[RetrievedDocument] = Field(..., description="Documents in ranked order")
+    sources: list[dict] = Field(..., description="Formatted sources of the documents")
+    degradations: list[str] = Field(
+        default_factory=list, description="Stages skipped to meet the latency budget"
+    )
+    usage: dict = Field(default_factory=dict, description="LM usage by model")
+
+
 async def log_interaction_task(
     agent_id: str,
     mcp_mode: bool,
     query: str,
     chat_history: list[Message],
     response: ChatCompletionResponse,
-    pipeline_result: "PipelineResult",
+    pipeline_result: PipelineResult,
     conversation_id: str | None = None,
     user_id: str | None = None,
 ) -> None:
@@ -205,7 +340,7 @@ async def log_interaction_raw(
     query: str,
     chat_history: list[Message],
     generated_answer: str | None,
-    pipeline_result: "PipelineResult",
+    pipeline_result: PipelineResult,
     conversation_id: str | None = None,
     user_id: str | None = None,
 ) -> None:
@@ -252,7 +387,24 @@ class CairoCoderServer:
         Args:
             vector_store_config: Configuration of the vector store to use
         """
+        # Configure structured logging
+        setup_logging(os.environ.get("LOG_LEVEL", "INFO"), os.environ.get("LOG_FORMAT", "console"))
         self.vector_store_config = vector_store_config
+        # Identical in-flight requests share a single pipeline run
+        self.coalescer = RequestCoalescer()
+        # Bounded, prioritized request queue and per-stage concurrency limits
+        self.admission = create_admission_controller_from_env()
+        configure_stage_limits_from_env()
+        # Optional duplicate LLM requests for slow calls (disabled unless LLM_HEDGE_BUDGET is set)
+        configure_hedging_from_env()
+        # Per-dependency circuit breakers, skipping failing optional stages
+        configure_circuit_breakers_from_env()
+        # Optional per-user and per-API-key limits (disabled unless RATE_LIMIT_* is set)
+        self.rate_limiter = create_rate_limiter_from_env()
+        # Charges of cancelled runs still in progress
+        self._pending_charges: set[asyncio.Task[None]] = set()
+        # Opt-in pyinstrument profiling (disabled unless PROFILING_ADMIN_TOKEN is set)
+        self.profiler = create_request_profiler_from_env()
 
         # Initialize FastAPI app with lifespan
         self.app = FastAPI(
@@ -271,7 +423,15 @@ class CairoCoderServer:
             allow_headers=["*"],
         )
 
+        # The lifespan prunes idle shared rate limit buckets
+        self.app.state.rate_limiter = self.rate_limiter
+        # Set by the lifespan once the worker is warm (see server/warmup.py)
+        self.app.state.warmup_mode = warmup_mode_from_env()
+        self.app.state.ready = False
+
         self.app.include_router(insights_router)
+        if self.profiler is not None:
+            self.app.include_router(create_profiles_router(self.profiler))
 
         # Setup global exception handler
         self._setup_exception_handlers()
@@ -279,6 +439,9 @@ class CairoCoderServer:
         # Setup routes
         self._setup_routes()
 
+        import dspy
+        from dspy.adapters import ChatAdapter
+
         embedder = dspy.Embedder("gemini/gemini-embedding-001", dimensions=3072, batch_size=512)
         dspy.configure(
             lm=dspy.LM("gemini/gemini-3-flash-preview", max_tokens=30000, cache=False),
@@ -332,6 +495,19 @@ class CairoCoderServer:
             """Health check endpoint - matches TypeScript backend."""
             return {"status": "ok"}
 
+        @self.app.get("/ready")
+        async def readiness_check():
+            """Readiness probe: 503 until the worker has finished warming up."""
+            if not self.app.state.ready:
+                return JSONResponse(status_code=503, content={"status": "warming_up"})
+            return {"status": "ready"}
+
+        @self.app.get("/metrics", include_in_schema=False)
+        async def prometheus_metrics():
+            """Prometheus metrics, aggregated across workers."""
+            payload, content_type = metrics.render_latest()
+            return Response(content=payload, media_type=content_type)
+
         @self.app.get("/v1/agents")
         async def list_agents(
             agent_factory: AgentFactory = Depends(get_agent_factory),
@@ -427,18 +603,307 @@ class CairoCoderServer:
                 request, req, background_tasks, agent_factory, None, mcp_mode, vector_db
             )
 
+        @self.app.post("/v1/agents/{agent_id}/batch/chat/completions")
+        async def agent_batch_chat_completions(
+            agent_id: str,
+            request: BatchChatCompletionRequest,
+            req: Request,
+            background_tasks: BackgroundTasks,
+            mcp: str | None = Header(None),
+            x_mcp_mode: str | None = Header(None, alias="x-mcp-mode"),
+            vector_db: SourceFilteredPgVectorRM = Depends(get_vector_db),
+            agent_factory: AgentFactory = Depends(get_agent_factory),
+        ):
+            """Agent-specific batch chat completions, streamed back as NDJSON."""
+            try:
+                agent_factory.get_agent_info(agent_id=agent_id)
+            except ValueError as exc:
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "error": {
+                            "message": str(exc),
+                            "type": "invalid_request_error",
+                            "code": "agent_not_found",
+                        }
+                    },
+                ) from exc
+
+            mcp_mode = bool(mcp or x_mcp_mode)
+
+            return await self._serve_batch_chat_completions(
+                request, req, background_tasks, agent_factory, agent_id, mcp_mode, vector_db
+            )
+
+        @self.app.post("/v1/batch/chat/completions")
+        async def batch_chat_completions(
+            request: BatchChatCompletionRequest,
+            req: Request,
+            background_tasks: BackgroundTasks,
+            mcp: str | None = Header(None),
+            x_mcp_mode: str | None = Header(None, alias="x-mcp-mode"),
+            vector_db: SourceFilteredPgVectorRM = Depends(get_vector_db),
+            agent_factory: AgentFactory = Depends(get_agent_factory),
+        ):
+            """Batch chat completions, streamed back as NDJSON in completion order."""
+            mcp_mode = bool(mcp or x_mcp_mode)
+
+            return await self._serve_batch_chat_completions(
+                request, req, background_tasks, agent_factory, None, mcp_mode, vector_db
+            )
+
+        @self.app.post("/v1/agents/{agent_id}/retrieve", response_model=RetrieveResponse)
+        async def agent_retrieve(
+            agent_id: str,
+            request: RetrieveRequest,
+            req: Request,
+            vector_db: SourceFilteredPgVectorRM = Depends(get_vector_db),
+            agent_factory: AgentFactory = Depends(get_agent_factory),
+        ):
+            """Agent-specific retrieval, without generation."""
+            try:
+                agent_factory.get_agent_info(agent_id=agent_id)
+            except ValueError as exc:
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "error": {
+                            "message": str(exc),
+                            "type": "invalid_request_error",
+                            "code": "agent_not_found",
+                        }
+                    },
+                ) from exc
+
+            return await self._serve_retrieve(request, req, agent_factory, agent_id)
+
+        @self.app.post("/v1/retrieve", response_model=RetrieveResponse)
+        async def retrieve(
+            request: RetrieveRequest,
+            req: Request,
+            vector_db: SourceFilteredPgVectorRM = Depends(get_vector_db),
+            agent_factory: AgentFactory = Depends(get_agent_factory),
+        ):
+            """Retrieve ranked documentation for a query, without generation."""
+            return await self._serve_retrieve(request, req, agent_factory, None)
+
         @self.app.post("/v1/suggestions", response_model=SuggestionResponse)
         async def generate_suggestions(request: SuggestionRequest):
             """Generate follow-up conversation suggestions based on chat history."""
+            import dspy
+            from dspy.adapters import XMLAdapter
+
+            from cairo_coder.dspy.suggestion_program import SuggestionGeneration
+
             formatted_history = self._format_chat_history_for_suggestions(request.chat_history)
             suggestion_program = dspy.Predict(SuggestionGeneration)
             with dspy.context(
                 lm=dspy.LM("gemini/gemini-flash-lite-latest", max_tokens=10000), adapter=XMLAdapter()
             ):
-                result = await suggestion_program.acall(chat_history=formatted_history)
+                result = await hedged(
+                    metrics.STAGE_SUGGESTIONS,
+                    lambda: suggestion_program.acall(chat_history=formatted_history),
+                )
             suggestions = result.suggestions if isinstance(result.suggestions, list) else []
             return SuggestionResponse(suggestions=suggestions)
 
+    async def _serve_batch_chat_completions(
+        self,
+        request: BatchChatCompletionRequest,
+        req: Request,
+        background_tasks: BackgroundTasks,
+        agent_factory: AgentFactory,
+        agent_id: str | None,
+        mcp_mode: bool,
+        vector_db: SourceFilteredPgVectorRM,
+    ) -> StreamingResponse:
+        """
+        Answer the requests of a batch, streaming one NDJSON line per request as it finishes.
+
+        Requests run with bounded concurrency and always non-streaming. They share a
+        RetrievalBatch, so their search queries are embedded together and identical
+        searches run once; identical questions share a pipeline run through the
+        coalescer. Headers apply to every request of the batch, and each request
+        counts against the client's rate limit.
+        """
+        await self._check_rate_limit(req, requests=len(request.requests))
+        api_key = req.headers.get("x-api-key")
+        user_id = hash_user_id(api_key) if api_key else hash_user_id(req.headers.get("x-user-id"))
+        budget_header = req.headers.get("x-latency-budget-ms")
+        if budget_header is not None:
+            # Validate the header before the response starts
+            Deadline.from_header(budget_header)
+        bypass_cache = "no-cache" in req.headers.get("cache-control", "").lower()
+
+        effective_agent_id = agent_id or "cairo-coder"
+        agent = agent_factory.get_or_create_agent(agent_id=effective_agent_id, mcp_mode=mcp_mode)
+        semaphore = asyncio.Semaphore(request.max_concurrency)
+
+        async def run_one(index: int, item: ChatCompletionRequest) -> BatchChatCompletionResult:
+            async with semaphore:
+                # Batch items wait for a request slot (at background priority) rather
+                # than being rejected
+                admitted_at = await self.admission.admit(Priority.BACKGROUND, bounded=False)
+                try:
+                    return await run_admitted(index, item)
+                finally:
+                    self.admission.release(admitted_at)
+
+        async def run_admitted(
+            index: int, item: ChatCompletionRequest
+        ) -> BatchChatCompletionResult:
+            messages = [Message(role=msg.role, content=msg.content) for msg in item.messages]
+            query, chat_history = messages[-1].content, messages[:-1]
+            # Each request gets the full budget from the moment it starts
+            deadline = (
+                Deadline.from_header(budget_header) if budget_header is not None else None
+            )
+            cache_key: AnswerCacheKey | None = None
+            cached: CachedAnswer | None = None
+            try:
+                if _answer_cache is not None:
+                    cache_key = _answer_cache.build_key(
+                        effective_agent_id, mcp_mode, query, chat_history
+                    )
+                    if not bypass_cache:
+                        cached = await _answer_cache.lookup(cache_key)
+                        metrics.record_cache_lookup("answer", hit=cached is not None)
+                response, pipeline_result = await self._generate_chat_completion(
+                    agent,
+                    query,
+                    chat_history,
+                    mcp_mode,
+                    deadline,
+                    cached=cached,
+                    coalesce_key=coalescing_key(
+                        effective_agent_id,
+                        mcp_mode,
+                        query,
+                        chat_history,
+                        budget_s=deadline.budget_s if deadline is not None else None,
+                    ),
+                )
+            except Exception as exc:
+                logger.error(
+                    "Batch request failed", index=index, error=str(exc), exc_info=True
+                )
+                return BatchChatCompletionResult(
+                    index=index,
+                    error=ErrorDetail(
+                        message=f"Internal server error: {exc}",
+                        type="server_error",
+                        code="internal_error",
+                    ),
+                )
+            # Background tasks run once the whole batch has been streamed
+            if cached is None and cache_key is not None and _answer_cache is not None:
+                background_tasks.add_task(_answer_cache.store, cache_key, pipeline_result)
+            background_tasks.add_task(
+                log_interaction_task,
+                agent_id=effective_agent_id,
+                mcp_mode=mcp_mode,
+                query=query,
+                chat_history=chat_history,
+                response=response,
+                pipeline_result=pipeline_result,
+                user_id=user_id,
+            )
+            return BatchChatCompletionResult(index=index, response=response)
+
+        async def results() -> AsyncGenerator[str, None]:
+            metrics.set_request_labels(effective_agent_id, mcp_mode, mode="batch")
+            batch = RetrievalBatch(embed=vector_db.embed)
+            with use_retrieval_batch(batch):
+                tasks = [
+                    asyncio.create_task(run_one(index, item))
+                    for index, item in enumerate(request.requests)
+                ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    yield result.model_dump_json(exclude_none=True) + "\n"
+            finally:
+                # The client went away: stop the requests still running
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await batch.aclose()
+                logger.info(
+                    "Batch completed",
+                    requests=len(tasks),
+                    embedding_calls=batch.embedding_call_count,
+                )
+
+        async def results_until_disconnect() -> AsyncGenerator[str, None]:
+            try:
+                async for line in stream_until_disconnect(req, results()):
+                    yield line
+            except ClientDisconnectedError:
+                metrics.record_sse_disconnect()
+
+        return StreamingResponse(
+            results_until_disconnect(),
+            media_type="application/x-ndjson",
+            background=background_tasks,
+        )
+
+    async def _serve_retrieve(
+        self,
+        request: RetrieveRequest,
+        req: Request,
+        agent_factory: AgentFactory,
+        agent_id: str | None = None,
+    ) -> RetrieveResponse | Response:
+        """Serve a retrieval-only request."""
+        conversation_id = req.headers.get("x-conversation-id")
+        budget_header = req.headers.get("x-latency-budget-ms")
+        deadline = Deadline.from_header(budget_header) if budget_header is not None else None
+
+        effective_agent_id = agent_id or "cairo-coder"
+        metrics.set_request_labels(effective_agent_id, mcp_mode=False, mode="retrieve")
+        agent = agent_factory.get_or_create_agent(agent_id=effective_agent_id)
+
+        priority = request_priority(False, False, req.headers.get(PRIORITY_HEADER))
+        await self._check_rate_limit(req)
+        admitted_at = await self.admission.admit(priority)
+        try:
+            result = await cancel_on_disconnect(
+                req,
+                agent.aretrieve(
+                    query=request.query,
+                    chat_history=[
+                        Message(role=msg.role, content=msg.content)
+                        for msg in request.chat_history
+                    ],
+                    sources=request.sources,
+                    deadline=deadline,
+                    conversation_id=conversation_id,
+                    fast_path=request.fast,
+                    judge=request.judge,
+                    limit=request.limit,
+                ),
+            )
+        except ClientDisconnectedError:
+            return self._client_disconnected()
+        finally:
+            self.admission.release(admitted_at)
+        await self._charge_usage(result.usage)
+        return RetrieveResponse(
+            search_queries=result.processed_query.search_queries,
+            resources=[source.value for source in result.processed_query.resources],
+            documents=[
+                RetrievedDocument(
+                    page_content=doc.page_content,
+                    metadata=dict(doc.metadata),
+                    score=document_score(doc),
+                )
+                for doc in result.documents
+            ],
+            sources=list(result.formatted_sources),
+            degradations=result.degradations,
+            usage=result.usage,
+        )
+
     async def _handle_chat_completion(
         self,
         request: ChatCompletionRequest,
@@ -449,7 +914,116 @@ class CairoCoderServer:
         mcp_mode: bool = False,
         vector_db: SourceFilteredPgVectorRM | None = None,
     ):
-        """Handle chat completion request."""
+        """
+        Handle chat completion request once admitted.
+
+        Rejected with 429 when the client is over its rate limit or the server is
+        overloaded.
+        """
+        # Fall back to cairo-coder; profiling and serving get the resolved ID
+        agent_id = agent_id or "cairo-coder"
+        metrics.set_request_labels(agent_id, mcp_mode)
+        priority = request_priority(request.stream, mcp_mode, req.headers.get(PRIORITY_HEADER))
+        await self._check_rate_limit(req)
+        admitted_at = await self.admission.admit(priority)
+        try:
+            response = await self._profile_chat_completion(
+                request, req, background_tasks, agent_factory, agent_id, mcp_mode, vector_db
+            )
+        except ClientDisconnectedError:
+            self.admission.release(admitted_at)
+            return self._client_disconnected()
+        except BaseException:
+            self.admission.release(admitted_at)
+            raise
+        if isinstance(response, StreamingResponse):
+            # Keep the slot until the response has been sent or abandoned
+            response = on_response_end(response, lambda: self.admission.release(admitted_at))
+        else:
+            self.admission.release(admitted_at)
+        return response
+
+    @staticmethod
+    def _client_disconnected() -> Response:
+        """Response to a client that disconnected before it was ready (never sent)."""
+        metrics.record_client_disconnect()
+        logger.info("Client disconnected, request cancelled")
+        return Response(status_code=CLIENT_CLOSED_REQUEST_STATUS)
+
+    async def _check_rate_limit(self, req: Request, requests: int = 1) -> None:
+        """
+        Take `requests` from the client's rate limit (429 when exhausted).
+
+        The LM tokens of the request's pipeline runs cancelled later on (client
+        disconnects) are charged as well.
+        """
+        on_cancelled_run(self._charge_cancelled_run)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.check(request_rate_limit_key(req), requests)
+
+    async def _charge_usage(self, usage: LMUsage) -> None:
+        """Charge the LLM tokens used by the request to the client's rate limit."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.charge(usage)
+
+    def _charge_cancelled_run(self, usage: LMUsage) -> None:
+        """Record and charge the LLM tokens a cancelled run used, in a background task."""
+        metrics.record_lm_usage(usage)
+        if self.rate_limiter is None:
+            return
+        # The request is being cancelled: the charge cannot be awaited in it
+        task = asyncio.create_task(self.rate_limiter.charge(usage))
+        self._pending_charges.add(task)
+        task.add_done_callback(self._pending_charges.discard)
+
+    async def _profile_chat_completion(
+        self,
+        request: ChatCompletionRequest,
+        req: Request,
+        background_tasks: BackgroundTasks,
+        agent_factory: AgentFactory,
+        agent_id: str | None = None,
+        mcp_mode: bool = False,
+        vector_db: SourceFilteredPgVectorRM | None = None,
+    ):
+        """Serve chat completion request, profiling it when requested or sampled."""
+        if self.profiler is None or not self.profiler.should_profile(req.headers.get("x-profile")):
+            return await self._serve_chat_completion(
+                request, req, background_tasks, agent_factory, agent_id, mcp_mode, vector_db
+            )
+
+        session = self.profiler.start(
+            f"{agent_id}{'-mcp' if mcp_mode else ''}{'-stream' if request.stream else ''}"
+        )
+        try:
+            response = await self._serve_chat_completion(
+                request, req, background_tasks, agent_factory, agent_id, mcp_mode, vector_db
+            )
+        except BaseException:
+            await self.profiler.finish(session)
+            raise
+        if isinstance(response, StreamingResponse):
+            # Keep profiling until the response has been sent or abandoned
+            response = on_response_end(
+                response, lambda: self.profiler.finish_in_background(session)
+            )
+        else:
+            await self.profiler.finish(session)
+            response = JSONResponse(content=jsonable_encoder(response))
+        response.headers["x-profile-id"] = session.profile_id
+        return response
+
+    async def _serve_chat_completion(
+        self,
+        request: ChatCompletionRequest,
+        req: Request,
+        background_tasks: BackgroundTasks,
+        agent_factory: AgentFactory,
+        agent_id: str | None = None,
+        mcp_mode: bool = False,
+        vector_db: SourceFilteredPgVectorRM | None = None,
+    ):
+        """Serve a chat completion request."""
         # Extract conversation ID from header
         conversation_id = req.headers.get("x-conversation-id")
         # Extract user identifier for anonymized tracking
@@ -457,6 +1031,9 @@ class CairoCoderServer:
         api_key = req.headers.get("x-api-key")
         raw_user_id = req.headers.get("x-user-id")
         user_id = hash_user_id(api_key) if api_key else hash_user_id(raw_user_id)
+        # Optional per-request latency budget; defaults to the agent's budget
+        budget_header = req.headers.get("x-latency-budget-ms")
+        deadline = Deadline.from_header(budget_header) if budget_header is not None else None
 
         # Convert messages to internal format
         messages = []
@@ -475,11 +1052,56 @@ class CairoCoderServer:
             mcp_mode=mcp_mode,
         )
 
+        # Serve repeated questions from the answer cache; `Cache-Control: no-cache`
+        # bypasses the lookup but still refreshes the entry
+        cache_key: AnswerCacheKey | None = None
+        cached: CachedAnswer | None = None
+        if _answer_cache is not None:
+            cache_key = _answer_cache.build_key(effective_agent_id, mcp_mode, query, messages[:-1])
+            if "no-cache" not in req.headers.get("cache-control", "").lower():
+                cached = await _answer_cache.lookup(cache_key)
+                metrics.record_cache_lookup("answer", hit=cached is not None)
+            if cached is not None:
+                logger.info("Serving answer from cache", agent_id=effective_agent_id, mcp_mode=mcp_mode)
+                cache_key = None
+
+        coalesce_key = coalescing_key(
+            effective_agent_id,
+            mcp_mode,
+            query,
+            messages[:-1],
+            conversation_id=conversation_id,
+            budget_s=deadline.budget_s if deadline is not None else None,
+        )
+
         # Handle streaming vs non-streaming
         if request.stream:
+            if cached is not None:
+                events = AnswerCache.replay(cached, query)
+            else:
+                events = self.coalescer.stream(
+                    coalesce_key,
+                    lambda: agent.aforward_streaming(
+                        query=query,
+                        chat_history=messages[:-1],
+                        mcp_mode=mcp_mode,
+                        deadline=deadline,
+                        conversation_id=conversation_id,
+                    ),
+                )
             return StreamingResponse(
                 self._stream_chat_completion(
-                    agent, query, messages[:-1], mcp_mode, effective_agent_id, conversation_id, user_id
+                    agent,
+                    query,
+                    messages[:-1],
+                    mcp_mode,
+                    effective_agent_id,
+                    conversation_id,
+                    user_id,
+                    deadline,
+                    events=events,
+                    cache_key=cache_key,
+                    req=req,
                 ),
                 media_type="text/event-stream",
                 headers={
@@ -489,7 +1111,21 @@ class CairoCoderServer:
                 },
             )
         chat_history = messages[:-1]
-        response, pipeline_result = await self._generate_chat_completion(agent, query, chat_history, mcp_mode)
+        response, pipeline_result = await cancel_on_disconnect(
+            req,
+            self._generate_chat_completion(
+                agent,
+                query,
+                chat_history,
+                mcp_mode,
+                deadline,
+                cached=cached,
+                coalesce_key=coalesce_key,
+                conversation_id=conversation_id,
+            ),
+        )
+        if cache_key is not None and _answer_cache is not None:
+            background_tasks.add_task(_answer_cache.store, cache_key, pipeline_result)
 
         background_tasks.add_task(
             log_interaction_task,
@@ -514,20 +1150,23 @@ class CairoCoderServer:
         agent_id: str,
         conversation_id: str | None = None,
         user_id: str | None = None,
+        deadline: Deadline | None = None,
+        events: AsyncIterator[StreamEvent] | None = None,
+        cache_key: AnswerCacheKey | None = None,
+        req: Request | None = None,
     ) -> AsyncGenerator[str, None]:
-        """Stream chat completion response - replicates TypeScript streaming."""
-        response_id = str(uuid.uuid4())
-        created = int(time.time())
+        """
+        Stream chat completion response - replicates TypeScript streaming.
+
+        `events` replaces the agent run with a pre-recorded event stream (cached
+        answers); when `cache_key` is set, the completed result is stored in the
+        answer cache. When `req` is given, the run is cancelled as soon as its
+        client disconnects.
+        """
+        encoder = ChatChunkEncoder(str(uuid.uuid4()), int(time.time()))
 
         # Send initial chunk
-        initial_chunk = {
-            "id": response_id,
-            "object": "chat.completion.chunk",
-            "created": created,
-            "model": "cairo-coder",
-            "choices": [{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}],
-        }
-        yield f"data: {json.dumps(initial_chunk)}\n\n"
+        yield encoder.role()
 
         # Process agent and stream responses
         final_response = ""
@@ -535,66 +1174,34 @@ class CairoCoderServer:
 
         try:
             with ls.trace(name="RagPipelineStreaming", run_type="chain", inputs={"query": query, "chat_history": history, "mcp_mode": mcp_mode}) as rt:
-                async for event in agent.aforward_streaming(
-                    query=query, chat_history=history, mcp_mode=mcp_mode
-                ):
-                    if event.type == StreamEventType.SOURCES:
-                        # Emit sources event for clients to display
-                        sources_chunk = {
-                            "type": "sources",
-                            "data": event.data,
-                        }
-                        yield f"data: {json.dumps(sources_chunk)}\n\n"
-                    elif event.type == StreamEventType.REASONING:
-                        # Emit thinking event for clients to display
-                        reasoning_chunk = {
-                            "type": "reasoning",
-                            "data": event.data,
-                        }
-                        yield f"data: {json.dumps(reasoning_chunk)}\n\n"
-                    elif event.type == StreamEventType.PROCESSING:
-                        # Emit processing event for clients to display
-                        processing_chunk = {
-                            "type": "processing",
-                            "data": event.data,
-                        }
-                        yield f"data: {json.dumps(processing_chunk)}\n\n"
-                    elif event.type == StreamEventType.RESPONSE:
+                if events is None:
+                    events = agent.aforward_streaming(
+                        query=query,
+                        chat_history=history,
+                        mcp_mode=mcp_mode,
+                        deadline=deadline,
+                        conversation_id=conversation_id,
+                    )
+                if req is not None:
+                    events = stream_until_disconnect(req, events)
+                async for event in events:
+                    if event.type == StreamEventType.RESPONSE:
                         # Send content chunk
-                        chunk = {
-                            "id": response_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": "cairo-coder",
-                            "choices": [
-                                {"index": 0, "delta": {"content": event.data}, "finish_reason": None}
-                            ],
-                        }
-                        yield f"data: {json.dumps(chunk)}\n\n"
+                        yield encoder.content(event.data)
+                    elif event.type in (
+                        StreamEventType.SOURCES,
+                        StreamEventType.REASONING,
+                        StreamEventType.PROCESSING,
+                    ):
+                        # Emit sources, thinking and processing events for clients to display
+                        yield encoder.event(event.type.value, event.data)
                     elif event.type == StreamEventType.FINAL_RESPONSE:
                         # Emit an explicit final response event for clients
                         final_response = event.data
-                        final_event = {
-                            "type": "final_response",
-                            "data": event.data,
-                        }
-                        yield f"data: {json.dumps(final_event)}\n\n"
+                        yield encoder.event(event.type.value, event.data)
                     elif event.type == StreamEventType.ERROR:
                         # Emit an error as a final delta and stop
-                        error_chunk = {
-                            "id": response_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": "cairo-coder",
-                            "choices": [
-                                {
-                                    "index": 0,
-                                    "delta": {"content": f"\n\nError: {event.data}"},
-                                    "finish_reason": "stop",
-                                }
-                            ],
-                        }
-                        yield f"data: {json.dumps(error_chunk)}\n\n"
+                        yield encoder.finish(f"\n\nError: {event.data}")
                         rt.end(outputs={"output": final_response})
                         break
                     elif event.type == StreamEventType.END:
@@ -603,25 +1210,24 @@ class CairoCoderServer:
                         rt.end(outputs={"output": final_response})
                         break
 
+        except ClientDisconnectedError:
+            # The run is already cancelled and nobody is left to send the end to
+            metrics.record_sse_disconnect()
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away; the coalescer or pipeline cancels the run
+            metrics.record_sse_disconnect()
+            raise
         except Exception as e:
             logger.error("Error during agent streaming", error=str(e), exc_info=True)
-            error_chunk = {
-                "id": response_id,
-                "object": "chat.completion.chunk",
-                "created": created,
-                "model": "cairo-coder",
-                "choices": [
-                    {
-                        "index": 0,
-                        "delta": {"content": "\n\n Could not generate a response due to a technical issue. Please try again later."},
-                        "finish_reason": "stop",
-                    }
-                ],
-            }
-            yield f"data: {json.dumps(error_chunk)}\n\n"
+            yield encoder.finish(
+                "\n\n Could not generate a response due to a technical issue. Please try again later."
+            )
         finally:
             # Log interaction regardless of client disconnects or errors
             if pipeline_result is not None:
+                metrics.record_lm_usage(pipeline_result.usage)
+                await self._charge_usage(pipeline_result.usage)
                 try:
                     await log_interaction_raw(
                         agent_id=agent_id,
@@ -635,17 +1241,12 @@ class CairoCoderServer:
                     )
                 except Exception as log_error:
                     logger.error("Failed to log streaming interaction", error=str(log_error), exc_info=True)
+                if cache_key is not None and _answer_cache is not None:
+                    await _answer_cache.store(cache_key, pipeline_result)
 
         # Send final chunk
-        final_chunk = {
-            "id": response_id,
-            "object": "chat.completion.chunk",
-            "created": created,
-            "model": "cairo-coder",
-            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
-        }
-        yield f"data: {json.dumps(final_chunk)}\n\n"
-        yield "data: [DONE]\n\n"
+        yield encoder.finish()
+        yield DONE_FRAME
 
         # Logging is handled in finally above
 
@@ -670,22 +1271,66 @@ class CairoCoderServer:
         return "\n".join(formatted)
 
     async def _generate_chat_completion(
-        self, agent: RagPipeline, query: str, history: list[Message], mcp_mode: bool
+        self,
+        agent: RagPipeline,
+        query: str,
+        history: list[Message],
+        mcp_mode: bool,
+        deadline: Deadline | None = None,
+        cached: CachedAnswer | None = None,
+        coalesce_key: str | None = None,
+        conversation_id: str | None = None,
     ) -> tuple[ChatCompletionResponse, PipelineResult]:
-        """Generate non-streaming chat completion response."""
+        """
+        Generate non-streaming chat completion response.
+
+        Served from `cached` when given; otherwise, when `coalesce_key` is set, the
+        pipeline run is shared with identical in-flight requests. Coalesced followers
+        report the shared run's usage, but only its leader is charged for it; the
+        returned PipelineResult carries the usage the request accounts for.
+        """
         response_id = str(uuid.uuid4())
         created = int(time.time())
 
-        # Process agent and collect response via DSPy Prediction
-        pipeline_prediction = await agent.acall(query=query, chat_history=history, mcp_mode=mcp_mode)
-        pipeline_result = RagPipeline.prediction_to_pipeline_result(pipeline_prediction)
+        async def _run_pipeline() -> PipelineResult:
+            # Process agent and collect response via DSPy Prediction
+            pipeline_prediction = await agent.acall(
+                query=query,
+                chat_history=history,
+                mcp_mode=mcp_mode,
+                deadline=deadline,
+                conversation_id=conversation_id,
+            )
+            from cairo_coder.core.rag_pipeline import RagPipeline
 
-        answer = pipeline_result.answer
+            return RagPipeline.prediction_to_pipeline_result(pipeline_prediction)
 
-        # Get accumulated usage from the pipeline result
+        # Cache hits and coalesced followers carry no LM usage of their own
+        owns_usage = cached is None
+        if cached is not None:
+            pipeline_result = AnswerCache.to_pipeline_result(cached, query)
+        elif coalesce_key is not None:
+            pipeline_result, owns_usage = await self.coalescer.result(coalesce_key, _run_pipeline)
+        else:
+            pipeline_result = await _run_pipeline()
+        # Usage reported to the client, shared with the leader for coalesced followers
         lm_usage = pipeline_result.usage
+        if not owns_usage:
+            pipeline_result = dataclasses.replace(pipeline_result, usage={})
+        metrics.record_lm_usage(pipeline_result.usage)
+        await self._charge_usage(pipeline_result.usage)
+        if pipeline_result.degradations:
+            logger.info(
+                "Pipeline degraded to meet latency budget",
+                degradations=pipeline_result.degradations,
+                response_id=response_id,
+            )
+
+        answer = pipeline_result.answer
+
         if not lm_usage:
-            logger.warning("No LM usage data available from pipeline - this is unexpected")
+            if owns_usage:
+                logger.warning("No LM usage data available from pipeline - this is unexpected")
             lm_usage = {}
         else:
             logger.info(f"LM usage from pipeline: {lm_usage}")
@@ -790,40 +1435,74 @@ async def lifespan(app: FastAPI):
     Args:
         app: FastAPI application instance
     """
-    global _vector_db, _agent_factory
+    global _vector_db, _agent_factory, _answer_cache
 
     logger.info("Starting Cairo Coder server - initializing resources")
 
-    # Initialize SQL persistence layer
-    await db_session.get_pool()
-    await db_session.execute_schema_scripts()
+    # The pipeline modules are imported in a thread while the database is set up
+    pipeline_import = asyncio.create_task(
+        asyncio.to_thread(importlib.import_module, "cairo_coder.agents.registry")
+    )
+    try:
+        # Initialize SQL persistence layer
+        await db_session.get_pool()
+        await db_session.execute_schema_scripts()
+    finally:
+        await pipeline_import
 
     # Load config once
     config = load_config()
     vector_store_config = config.vector_store
 
-    # embedding_func will default to dspy.settings.embedder (configured in __init__)
-    _vector_db = SourceFilteredPgVectorRM(
-        db_url=vector_store_config.dsn,
-        pg_table_name=vector_store_config.table_name,
-        content_field="content",
-        fields=["id", "content", "metadata"],
-        k=5,  # Default k, will be overridden by retriever
-        include_similarity=True,
-    )
+    preloaded = _agent_factory is not None
+    if preloaded:
+        # Built before the workers were forked (`--preload`), without a connection
+        _vector_db.connect()
+    else:
+        _vector_db = create_vector_db(vector_store_config)
+        # Initialize Agent Factory with vector DB and config
+        _agent_factory = create_agent_factory(vector_db=_vector_db, vector_store_config=vector_store_config)
+    eager = preloaded or app.state.warmup_mode == WARMUP_EAGER
+    if eager and not preloaded:
+        start = time.perf_counter()
+        built = _agent_factory.preload_agents()
+        logger.info("Agents built", agents=built, duration_s=round(time.perf_counter() - start, 3))
 
     # Ensure connection pool is initialized
     await _vector_db._ensure_pool()
 
-    # Initialize Agent Factory with vector DB and config
-    _agent_factory = create_agent_factory(vector_db=_vector_db, vector_store_config=vector_store_config)
+    _answer_cache = create_answer_cache_from_env(embedder=_vector_db.embed)
+    if _answer_cache is not None:
+        pruned = await delete_expired_cached_answers(_answer_cache.ttl_s)
+        logger.info(
+            "Answer cache enabled",
+            ttl_s=_answer_cache.ttl_s,
+            similarity_threshold=_answer_cache.similarity_threshold,
+            pruned_entries=pruned,
+        )
+
+    rate_limiter = getattr(app.state, "rate_limiter", None)
+    if rate_limiter is not None and rate_limiter.shared:
+        pruned = await delete_idle_rate_limit_buckets(RATE_LIMIT_BUCKET_IDLE_TTL_S)
+        logger.info("Shared rate limits enabled", pruned_buckets=pruned)
 
     logger.info("Vector DB and Agent Factory initialized successfully")
 
+    warmup: asyncio.Task | None = None
+    if eager:
+        # Requests are accepted meanwhile; /ready flips once connections are warm
+        warmup = asyncio.create_task(_warm_up(app, _vector_db))
+    else:
+        app.state.ready = True
+
     yield  # Server is running
 
     # Cleanup
     logger.info("Shutting down Cairo Coder server - cleaning up resources")
+    app.state.ready = False
+    if warmup is not None:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
 
     await db_session.close_pool()
 
@@ -834,6 +1513,66 @@ async def lifespan(app: FastAPI):
 
     _vector_db = None
     _agent_factory = None
+    _answer_cache = None
+    metrics.mark_worker_exited()
+
+async def _warm_up(app: FastAPI, vector_db: SourceFilteredPgVectorRM) -> None:
+    """Warm the connections of the worker, then mark it ready."""
+    import dspy
+
+    durations = await warm_connections(
+        {"app": await db_session.get_pool(), "vector_store": vector_db.pool},
+        embed=vector_db.embed,
+        lm=dspy.settings.lm,
+    )
+    app.state.ready = True
+    logger.info("Warm-up completed, worker ready", durations_s=durations)
+
+
+def create_vector_db(vector_store_config: VectorStoreConfig) -> SourceFilteredPgVectorRM:
+    """Create the vector store client (its asyncpg pool is opened separately)."""
+    from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
+
+    # embedding_func will default to dspy.settings.embedder (configured in __init__)
+    return SourceFilteredPgVectorRM(
+        db_url=vector_store_config.dsn,
+        pg_table_name=vector_store_config.table_name,
+        content_field="content",
+        fields=["id", "content", "metadata"],
+        k=5,  # Default k, will be overridden by retriever
+        include_similarity=True,
+    )
+
+
+def preload_agents() -> int:
+    """
+    Build the vector store client and every agent before the workers are forked.
+
+    The lifespan of each worker reuses them; the vector store's synchronous
+    connection is closed here and reopened by each worker.
+
+    Returns:
+        Number of agents built
+
+    Raises:
+        RuntimeError: If building the agents opened an xAI gRPC channel, which
+            cannot be shared with forked workers
+    """
+    from cairo_coder.dspy.grok_search import open_client_count
+
+    global _vector_db, _agent_factory
+    vector_store_config = load_config().vector_store
+    _vector_db = create_vector_db(vector_store_config)
+    _agent_factory = create_agent_factory(vector_db=_vector_db, vector_store_config=vector_store_config)
+    built = _agent_factory.preload_agents()
+    _vector_db.close_connection()
+    if open_client_count():
+        raise RuntimeError(
+            "--preload is not supported: building the agents opened an xAI gRPC channel "
+            "before the workers are forked"
+        )
+    return built
+
 
 def create_app_factory():
     """Factory function for creating the app, used by uvicorn in reload mode."""
@@ -843,7 +1582,35 @@ def main():
     parser = argparse.ArgumentParser(description="Cairo Coder Server")
     parser.add_argument("--dev", action="store_true", help="Enable development mode with reload")
     parser.add_argument("--workers", type=int, default=5, help="Number of workers to run")
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Build the agents once, then fork the workers from the preloaded process",
+    )
     args = parser.parse_args()
+    if args.preload and args.dev:
+        parser.error("--preload cannot be combined with --dev")
+
+    # Workers write their metric samples to a shared directory so /metrics
+    # reports all of them, whichever worker serves the scrape
+    metrics.prepare_multiprocess_dir()
+
+    if args.preload:
+        if not metrics.MULTIPROCESS_MODE:
+            # prometheus_client picks its value storage when first imported, which
+            # forked workers inherit: start over with the metrics directory set
+            os.execv(sys.executable, [sys.executable, *sys.argv])
+        sock = bind_socket(DEFAULT_HOST, DEFAULT_PORT)
+        app = create_app_factory()
+        start = time.perf_counter()
+        built = preload_agents()
+        logger.info(
+            "Agents preloaded before forking",
+            agents=built,
+            duration_s=round(time.perf_counter() - start, 3),
+        )
+        serve_preforked(app, sock, workers=args.workers)
+        return
 
     uvicorn.run(
         "cairo_coder.server.app:create_app_factory",
@@ -0,0 +1,209 @@
+"""
+Single-flight coalescing of identical in-flight chat completion requests.
+
+When several requests with the same agent, MCP mode, query, chat history,
+conversation and latency budget arrive while a pipeline run for them is still in progress, only the first one (the leader)
+runs the pipeline. The run happens in its own task so it is not tied to the leader's
+connection; every request subscribes to it:
+
+- streaming requests receive the run's StreamEvents (the backlog, then live events);
+- non-streaming requests await the final PipelineResult.
+
+A streaming request attached to a non-streaming run receives the equivalent events
+once the result is available. The run is cancelled when every subscriber has left.
+Coalescing is per worker process; cross-worker reuse is the answer cache's job.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import json
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+
+import structlog
+
+from cairo_coder.core import metrics
+from cairo_coder.core.types import Message, PipelineResult, StreamEvent, StreamEventType
+from cairo_coder.server.answer_cache import AnswerCache, pipeline_result_events
+
+logger = structlog.get_logger(__name__)
+
+StreamFactory = Callable[[], AsyncIterator[StreamEvent]]
+ResultFactory = Callable[[], Awaitable[PipelineResult]]
+
+
+def coalescing_key(
+    agent_id: str,
+    mcp_mode: bool,
+    query: str,
+    history: list[Message],
+    conversation_id: str | None = None,
+    budget_s: float | None = None,
+) -> str:
+    """
+    Key identifying requests that can share a pipeline run.
+
+    Requests of different conversations never share a run, as the run updates the
+    state of its own conversation only; nor do requests with different latency budgets.
+    """
+    payload = json.dumps(
+        [agent_id, mcp_mode, query, AnswerCache.hash_history(history), conversation_id, budget_s]
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Flight:
+    """A pipeline run shared by every request with the same key."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: list[StreamEvent] = []
+        self.result: PipelineResult | None = None
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.done = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+        self._published = asyncio.Event()
+
+    def publish(self, event: StreamEvent) -> None:
+        """Append an event and wake up the streaming subscribers."""
+        self.events.append(event)
+        self._published.set()
+        self._published = asyncio.Event()
+
+    def finish(self) -> None:
+        """Mark the run as complete and wake up every subscriber."""
+        if self.result is None and self.error is None:
+            self.error = RuntimeError("Pipeline ended without a result")
+        self.done.set()
+        self._published.set()
+
+    async def wait_for_event(self, index: int) -> None:
+        """Wait until the event at `index` is published or the run completes."""
+        while index >= len(self.events) and not self.done.is_set():
+            await self._published.wait()
+
+
+class RequestCoalescer:
+    """Coalesces identical in-flight requests onto a single pipeline run."""
+
+    def __init__(self) -> None:
+        self._flights: dict[str, _Flight] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Number of pipeline runs currently shared."""
+        return len(self._flights)
+
+    async def stream(
+        self, key: str, start: StreamFactory
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """
+        Stream the events of the run for `key`, starting it with `start` if needed.
+
+        Followers receive a copy of the final PipelineResult without LM usage, so
+        token usage is only accounted once when interactions are logged.
+        """
+        flight, leader = self._join(key, lambda flight: self._run_stream(flight, start))
+        try:
+            index = 0
+            while True:
+                await flight.wait_for_event(index)
+                if index >= len(flight.events):
+                    break
+                event = flight.events[index]
+                index += 1
+                if not leader and event.type == StreamEventType.END:
+                    event = StreamEvent(
+                        type=StreamEventType.END,
+                        data=dataclasses.replace(event.data, usage={}),  # type: ignore[arg-type]
+                    )
+                yield event
+        finally:
+            await self._leave(flight)
+
+    async def result(self, key: str, start: ResultFactory) -> tuple[PipelineResult, bool]:
+        """
+        Await the PipelineResult of the run for `key`, starting it with `start` if needed.
+
+        Returns:
+            Tuple of (result, is_leader); every request gets the shared run's result,
+            whose LM usage only the leader accounts for
+
+        Raises:
+            The exception raised by the shared run, if any
+        """
+        flight, leader = self._join(key, lambda flight: self._run_result(flight, start))
+        try:
+            await flight.done.wait()
+        finally:
+            await self._leave(flight)
+        if flight.error is not None:
+            raise flight.error
+        assert flight.result is not None
+        return flight.result, leader
+
+    def _join(
+        self, key: str, runner: Callable[[_Flight], Awaitable[None]]
+    ) -> tuple[_Flight, bool]:
+        """Attach to the flight for `key`, creating it (as leader) if needed."""
+        flight = self._flights.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = _Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(runner(flight))
+        else:
+            logger.info("Coalescing request onto in-flight pipeline run", key=key[:12])
+        metrics.record_cache_lookup("coalescing", hit=not leader)
+        flight.subscribers += 1
+        return flight, leader
+
+    async def _leave(self, flight: _Flight) -> None:
+        """Detach from a flight, cancelling the run if nobody is left waiting for it."""
+        flight.subscribers -= 1
+        if flight.subscribers > 0 or flight.done.is_set():
+            return
+        self._forget(flight)
+        if flight.task is not None and not flight.task.done():
+            flight.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await flight.task
+
+    def _forget(self, flight: _Flight) -> None:
+        """Stop routing new requests to a flight."""
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def _run_stream(self, flight: _Flight, start: StreamFactory) -> None:
+        """Run a streaming pipeline, recording its events and final result."""
+        try:
+            async for event in start():
+                flight.publish(event)
+                if event.type == StreamEventType.END:
+                    flight.result = event.data  # type: ignore[assignment]
+                elif event.type == StreamEventType.ERROR:
+                    flight.error = RuntimeError(str(event.data))
+        except Exception as exc:
+            flight.error = exc
+            flight.publish(StreamEvent(type=StreamEventType.ERROR, data=f"Pipeline error: {exc}"))
+        finally:
+            self._forget(flight)
+            flight.finish()
+
+    async def _run_result(self, flight: _Flight, start: ResultFactory) -> None:
+        """Run a non-streaming pipeline; streaming subscribers get equivalent events."""
+        try:
+            flight.result = await start()
+        except Exception as exc:
+            flight.error = exc
+            flight.publish(StreamEvent(type=StreamEventType.ERROR, data=f"Pipeline error: {exc}"))
+        else:
+            for event in pipeline_result_events(flight.result):
+                flight.publish(event)
+        finally:
+            self._forget(flight)
+            flight.finish()
@@ -0,0 +1,154 @@
+"""
+Client disconnect detection.
+
+Starlette does not stop a request when its client goes away: a non-streaming
+handler runs to completion, and a streaming response (under ASGI 2.4 servers such
+as uvicorn) only notices on its next write, which can be seconds away while the
+documents are retrieved and judged. Both helpers here watch the connection for the
+`http.disconnect` message instead, and cancel the work as soon as it arrives; the
+cancellation then reaches the LM calls in flight (see `core/cancellation.py`).
+
+The work runs in a task of its own, started with a copy of the request's context.
+
+Cleanup that must follow a streaming response (freeing its admission slot, stopping
+its profiler) cannot live in the body generator: when the client is gone before the
+response starts, Starlette (under ASGI < 2.4) cancels the stream before the generator
+ever runs, so its `finally` never does. `on_response_end` attaches the cleanup to the
+response call instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Coroutine
+from typing import Any, TypeVar
+
+import structlog
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnectedError(Exception):
+    """The client disconnected before its response was complete."""
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return once the client of `request` has disconnected."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _cancel(*tasks: asyncio.Future[Any]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def cancel_on_disconnect(request: Request, work: Coroutine[Any, Any, T]) -> T:
+    """
+    Await `work`, cancelling it if the client disconnects first.
+
+    Raises:
+        ClientDisconnectedError: If the client disconnected (`work` is cancelled)
+    """
+    work_task = asyncio.ensure_future(work)
+    disconnect = asyncio.create_task(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({work_task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Also reached when the caller itself is cancelled
+        pending = [task for task in (work_task, disconnect) if not task.done()]
+        await _cancel(*pending)
+    if work_task.cancelled() and disconnect.done() and not disconnect.cancelled():
+        raise ClientDisconnectedError
+    return work_task.result()
+
+
+async def stream_until_disconnect(
+    request: Request, items: AsyncIterator[T]
+) -> AsyncGenerator[T, None]:
+    """
+    Yield the items of `items` until the client disconnects.
+
+    `items` is iterated in a task of its own, one item ahead of the consumer; it is
+    closed when the client disconnects, when the consumer stops, or on errors.
+
+    Raises:
+        ClientDisconnectedError: If the client disconnected before the end of `items`
+    """
+    buffer: asyncio.Queue[T] = asyncio.Queue(maxsize=1)
+
+    async def pump() -> None:
+        try:
+            async for item in items:
+                await buffer.put(item)
+        finally:
+            aclose = getattr(items, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    pump_task = asyncio.create_task(pump())
+    disconnect = asyncio.create_task(wait_for_disconnect(request))
+    try:
+        while True:
+            next_item = asyncio.ensure_future(buffer.get())
+            done, _ = await asyncio.wait(
+                {next_item, pump_task, disconnect}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_item in done:
+                yield next_item.result()
+                continue
+            next_item.cancel()
+            if disconnect in done:
+                raise ClientDisconnectedError
+            # `items` is exhausted (or failed): hand over what is left
+            while not buffer.empty():
+                yield buffer.get_nowait()
+            pump_task.result()
+            return
+    finally:
+        await _cancel(pump_task, disconnect)
+
+
+class _FinalizedStreamingResponse(StreamingResponse):
+    """A streaming response calling finalizers once it was sent or abandoned."""
+
+    def __init__(self, response: StreamingResponse):
+        # Takes over the body, headers and background tasks of `response`
+        self.__dict__.update(response.__dict__)
+        self.finalizers: list[Callable[[], None]] = []
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            for finalizer in reversed(self.finalizers):
+                try:
+                    finalizer()
+                except Exception as exc:
+                    logger.error("Response finalizer failed", error=str(exc), exc_info=True)
+
+
+def on_response_end(
+    response: StreamingResponse, finalizer: Callable[[], None]
+) -> StreamingResponse:
+    """
+    Call `finalizer` once `response` has been sent, failed, or was abandoned by its client.
+
+    Finalizers are synchronous, as they may run while the request is being cancelled;
+    the last one attached runs first.
+
+    Returns:
+        The response to return in place of `response`
+    """
+    if not isinstance(response, _FinalizedStreamingResponse):
+        response = _FinalizedStreamingResponse(response)
+    response.finalizers.append(finalizer)
+    return response
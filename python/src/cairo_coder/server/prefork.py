@@ -0,0 +1,117 @@
+"""
+Pre-fork worker supervisor.
+
+uvicorn starts its workers with the `spawn` method, so each one imports the
+application and builds its agents from scratch, in its own memory. `serve_preforked`
+binds the socket and lets the caller preload the application in the parent, then
+forks the workers from it: imported modules and compiled programs are shared
+copy-on-write. The parent's heap is frozen out of the garbage collector first, so
+collections in the workers do not write to (and copy) the shared pages.
+
+Dead workers are replaced by a new fork of the preloaded parent; SIGINT and SIGTERM
+are forwarded to the workers, which shut down gracefully.
+
+Anything holding a connection, a thread or an event loop must be created after the
+fork, in the application lifespan.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gc
+import os
+import signal
+import socket
+import time
+
+import structlog
+import uvicorn
+from fastapi import FastAPI
+
+logger = structlog.get_logger(__name__)
+
+# Pause before replacing a dead worker, so a crashing worker cannot spin the parent
+RESPAWN_DELAY_S = 1.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket shared by the forked workers."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: FastAPI, sock: socket.socket, log_level: str) -> None:
+    """Serve `app` on the inherited socket, in a forked worker; never returns."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        uvicorn.Server(uvicorn.Config(app, log_level=log_level)).run(sockets=[sock])
+    except BaseException as exc:
+        logger.error("Worker crashed", pid=os.getpid(), error=str(exc), exc_info=True)
+        exit_code = 1
+    finally:
+        os._exit(exit_code)
+
+
+def serve_preforked(
+    app: FastAPI, sock: socket.socket, workers: int, log_level: str = "info"
+) -> None:
+    """
+    Fork `workers` processes serving `app` on `sock` and supervise them until stopped.
+
+    Args:
+        app: Application, preloaded in this process
+        sock: Socket from `bind_socket`
+        workers: Number of worker processes
+        log_level: uvicorn log level of the workers
+    """
+    if workers <= 0:
+        raise ValueError("At least one worker is required")
+
+    # Objects allocated so far are never collected, so workers keep sharing them
+    gc.collect()
+    gc.freeze()
+
+    children: set[int] = set()
+    stopping = False
+
+    def fork_worker() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, log_level)
+        children.add(pid)
+
+    def stop(signum: int, _frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        fork_worker()
+    logger.info("Workers forked from the preloaded application", workers=sorted(children))
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            logger.warning(
+                "Worker exited, forking a replacement",
+                pid=pid,
+                exit_code=os.waitstatus_to_exitcode(status),
+            )
+            time.sleep(RESPAWN_DELAY_S)
+            if not stopping:
+                fork_worker()
+    sock.close()
+    logger.info("All workers stopped")
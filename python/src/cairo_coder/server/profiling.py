@@ -0,0 +1,243 @@
+"""
+Opt-in per-request profiling with pyinstrument.
+
+A chat completion request is profiled when it carries `x-profile: <admin token>` or
+is picked by the sampling rate. The profiler runs in async mode, so it follows the
+request across awaits (including the pipeline tasks it starts) and ignores the
+other requests served concurrently. For streaming responses, profiling stops when
+the response has been sent or abandoned by its client, and the reports are then
+written in a background thread.
+
+Each session is written to a bounded on-disk ring as an HTML report and a
+speedscope JSON file, listed and served by the `/admin/profiles` endpoints, which
+require `x-admin-token: <admin token>`.
+
+Configuration (environment variables):
+- PROFILING_ADMIN_TOKEN: enables profiling and guards the admin endpoints
+- PROFILING_SAMPLE_RATE: fraction of requests profiled without the header (default 0)
+- PROFILING_DIR: report directory (default: a temporary directory)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import structlog
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+from cairo_coder.core.constants import PROFILING_INTERVAL_S, PROFILING_MAX_SESSIONS
+
+logger = structlog.get_logger(__name__)
+
+PROFILE_ID_PATTERN = re.compile(r"^\d{13}-[a-z0-9-]{1,64}-[0-9a-f]{8}$")
+REPORT_SUFFIXES = {"html": ".html", "speedscope": ".speedscope.json"}
+
+
+@dataclass
+class ProfileSession:
+    """A running profiler and the request it belongs to."""
+
+    profile_id: str
+    profiler: Profiler
+
+
+@dataclass
+class ProfileInfo:
+    """Metadata of a stored profile."""
+
+    id: str
+    label: str
+    created_at: datetime
+    size_bytes: int
+
+
+class RequestProfiler:
+    """Profiles selected requests and keeps their reports in a bounded directory."""
+
+    def __init__(
+        self,
+        admin_token: str,
+        directory: Path,
+        sample_rate: float = 0.0,
+        max_sessions: int = PROFILING_MAX_SESSIONS,
+        interval_s: float = PROFILING_INTERVAL_S,
+    ):
+        """
+        Initialize the profiler.
+
+        Args:
+            admin_token: Token enabling profiling per request and guarding the reports
+            directory: Directory the reports are written to
+            sample_rate: Fraction of requests profiled without the header
+            max_sessions: Number of reports kept (oldest deleted first)
+            interval_s: Sampling interval of pyinstrument
+        """
+        if not admin_token:
+            raise ValueError("Profiling requires an admin token")
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("Profiling sample rate must be in [0, 1]")
+        if max_sessions <= 0:
+            raise ValueError("Profiling must keep at least one session")
+        self.admin_token = admin_token
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_sessions = max_sessions
+        self.interval_s = interval_s
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def is_admin(self, token: str | None) -> bool:
+        """Whether `token` is the admin token (constant-time comparison)."""
+        return token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def should_profile(self, header_value: str | None) -> bool:
+        """Whether a request with this `x-profile` header value should be profiled."""
+        if header_value is not None:
+            return self.is_admin(header_value)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, label: str) -> ProfileSession:
+        """Start profiling the current request (and the tasks it creates)."""
+        safe_label = re.sub(r"[^a-z0-9-]+", "-", label.lower()).strip("-")[:64] or "request"
+        profile_id = f"{int(time.time() * 1000):013d}-{safe_label}-{uuid.uuid4().hex[:8]}"
+        profiler = Profiler(interval=self.interval_s, async_mode="enabled")
+        profiler.start()
+        return ProfileSession(profile_id=profile_id, profiler=profiler)
+
+    async def finish(self, session: ProfileSession) -> None:
+        """Stop a session and store its reports; failures are logged, never raised."""
+        if self._stop(session):
+            await asyncio.to_thread(self._store, session)
+
+    def finish_in_background(self, session: ProfileSession) -> None:
+        """Stop a session now and store its reports in a background thread (never raises)."""
+        if self._stop(session):
+            asyncio.get_running_loop().run_in_executor(None, self._store, session)
+
+    def _stop(self, session: ProfileSession) -> bool:
+        try:
+            session.profiler.stop()
+        except Exception as e:
+            logger.warning("Failed to stop request profiler", error=str(e), exc_info=True)
+            return False
+        return True
+
+    def _store(self, session: ProfileSession) -> None:
+        try:
+            self._write_reports(session)
+            logger.info("Stored request profile", profile_id=session.profile_id)
+        except Exception as e:
+            logger.warning("Failed to store request profile", error=str(e), exc_info=True)
+
+    def list_profiles(self) -> list[ProfileInfo]:
+        """Stored profiles, most recent first."""
+        profiles = []
+        for path in self._html_reports():
+            profile_id = path.name.removesuffix(REPORT_SUFFIXES["html"])
+            created_ms, label = profile_id.split("-", 1)
+            profiles.append(
+                ProfileInfo(
+                    id=profile_id,
+                    label=label.rsplit("-", 1)[0],
+                    created_at=datetime.fromtimestamp(int(created_ms) / 1000, tz=timezone.utc),
+                    size_bytes=path.stat().st_size,
+                )
+            )
+        return sorted(profiles, key=lambda profile: profile.id, reverse=True)
+
+    def report_path(self, profile_id: str, report_format: str) -> Path | None:
+        """Path of a stored report, or None if unknown."""
+        suffix = REPORT_SUFFIXES.get(report_format)
+        if suffix is None or not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.is_file() else None
+
+    def _write_reports(self, session: ProfileSession) -> None:
+        base = self.directory / session.profile_id
+        speedscope = session.profiler.output(renderer=SpeedscopeRenderer())
+        Path(f"{base}{REPORT_SUFFIXES['speedscope']}").write_text(speedscope)
+        # The HTML report is written last: its presence marks a complete session
+        Path(f"{base}{REPORT_SUFFIXES['html']}").write_text(session.profiler.output_html())
+        self._prune()
+
+    def _html_reports(self) -> list[Path]:
+        return [
+            path
+            for path in self.directory.glob(f"*{REPORT_SUFFIXES['html']}")
+            if PROFILE_ID_PATTERN.match(path.name.removesuffix(REPORT_SUFFIXES["html"]))
+        ]
+
+    def _prune(self) -> None:
+        """Delete the oldest sessions beyond `max_sessions`."""
+        reports = sorted(self._html_reports(), key=lambda path: path.name)
+        for path in reports[: max(0, len(reports) - self.max_sessions)]:
+            profile_id = path.name.removesuffix(REPORT_SUFFIXES["html"])
+            for suffix in REPORT_SUFFIXES.values():
+                (self.directory / f"{profile_id}{suffix}").unlink(missing_ok=True)
+
+
+def create_profiles_router(profiler: RequestProfiler) -> APIRouter:
+    """Admin endpoints listing and serving the stored profiles."""
+    router = APIRouter(prefix="/admin/profiles", tags=["Admin"])
+
+    def _require_admin(token: str | None) -> None:
+        if not profiler.is_admin(token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    @router.get("")
+    async def list_profiles(
+        x_admin_token: str | None = Header(None, alias="x-admin-token"),
+    ) -> list[ProfileInfo]:
+        """List stored profiles, most recent first."""
+        _require_admin(x_admin_token)
+        return await asyncio.to_thread(profiler.list_profiles)
+
+    @router.get("/{profile_id}")
+    async def get_profile(
+        profile_id: str,
+        format: str = "html",
+        x_admin_token: str | None = Header(None, alias="x-admin-token"),
+    ) -> FileResponse:
+        """Serve a stored profile as an HTML report or a speedscope JSON file."""
+        _require_admin(x_admin_token)
+        path = profiler.report_path(profile_id, format)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        if format == "speedscope":
+            return FileResponse(path, media_type="application/json", filename=path.name)
+        return FileResponse(path, media_type="text/html")
+
+    return router
+
+
+def create_request_profiler_from_env() -> RequestProfiler | None:
+    """
+    Create the request profiler configured by environment variables.
+
+    Returns:
+        RequestProfiler instance, or None when PROFILING_ADMIN_TOKEN is not set
+    """
+    admin_token = os.getenv("PROFILING_ADMIN_TOKEN")
+    if not admin_token:
+        return None
+    directory = os.getenv("PROFILING_DIR") or os.path.join(
+        tempfile.gettempdir(), "cairo-coder-profiles"
+    )
+    return RequestProfiler(
+        admin_token=admin_token,
+        directory=Path(directory),
+        sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0") or 0),
+    )
@@ -0,0 +1,262 @@
+"""
+Per-user and per-API-key rate limits.
+
+Requests are identified by their hashed `x-api-key` header, or else by their hashed
+`x-user-id` header; anonymous requests are not limited. Each identity has two token
+buckets, refilled continuously and holding one minute of allowance:
+
+- requests: a request takes one token (a batch takes one per item);
+- LLM tokens: the tokens a request used are charged once it has finished. Requests
+  are admitted while the balance is positive, so a client that overdraws waits
+  until its debt has been refilled.
+
+API keys and frontend users have separate limits (RATE_LIMIT_API_KEY_RPM,
+RATE_LIMIT_API_KEY_TPM, RATE_LIMIT_USER_RPM, RATE_LIMIT_USER_TPM); 0 disables a
+limit. Buckets live in each worker unless RATE_LIMIT_SHARED=true, which keeps them
+in Postgres (`rate_limit_buckets`) so limits hold across workers. When Postgres
+fails, the worker falls back to its own buckets rather than failing requests.
+
+Rejected requests get an OpenAI-style 429 with code `rate_limit_exceeded`.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import math
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+import structlog
+
+from cairo_coder.core import metrics
+from cairo_coder.core.constants import (
+    MIN_RETRY_AFTER_S,
+    RATE_LIMIT_API_KEY_RPM,
+    RATE_LIMIT_API_KEY_TPM,
+    RATE_LIMIT_MAX_LOCAL_BUCKETS,
+    RATE_LIMIT_USER_RPM,
+    RATE_LIMIT_USER_TPM,
+)
+from cairo_coder.core.types import LMUsage, usage_total_tokens
+from cairo_coder.db.repository import BucketStates, update_rate_limit_buckets
+from cairo_coder.server.admission import too_many_requests
+
+logger = structlog.get_logger(__name__)
+
+KIND_API_KEY = "api_key"
+KIND_USER = "user"
+
+RESOURCE_REQUESTS = "requests"
+RESOURCE_TOKENS = "tokens"
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class RateLimitKey:
+    """Identity whose requests are limited together."""
+
+    kind: str  # KIND_API_KEY or KIND_USER
+    subject: str  # Hashed API key or user ID
+
+    def bucket_key(self, resource: str) -> str:
+        """Key of the identity's bucket for a resource."""
+        return f"{self.kind}:{self.subject}:{resource}"
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Per-minute limits of one kind of identity (0 disables a limit)."""
+
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+
+@dataclass
+class TokenBucket:
+    """Balance refilled at a constant rate up to a capacity; it may go into debt."""
+
+    capacity: float
+    refill_per_s: float
+    balance: float
+
+    @classmethod
+    def per_minute(cls, limit: int, state: tuple[float, float] | None) -> TokenBucket:
+        """
+        Bucket of a per-minute limit, refilled since it was last stored.
+
+        Args:
+            limit: Allowance per minute (and capacity)
+            state: Stored `(balance, idle_s)`, or None for a new (full) bucket
+        """
+        bucket = cls(capacity=float(limit), refill_per_s=limit / 60.0, balance=float(limit))
+        if state is not None:
+            balance, idle_s = state
+            bucket.balance = min(bucket.capacity, balance + max(0.0, idle_s) * bucket.refill_per_s)
+        return bucket
+
+    def wait_s(self, level: float) -> float:
+        """Seconds until the balance reaches `level`."""
+        return max(0.0, (level - self.balance) / self.refill_per_s)
+
+
+_current_key: contextvars.ContextVar[RateLimitKey | None] = contextvars.ContextVar(
+    "rate_limit_key", default=None
+)
+
+
+class RateLimiter:
+    """Token-bucket limits on the requests and LLM tokens of each user and API key."""
+
+    def __init__(
+        self,
+        api_key_policy: RateLimitPolicy,
+        user_policy: RateLimitPolicy,
+        shared: bool = False,
+        max_local_buckets: int = RATE_LIMIT_MAX_LOCAL_BUCKETS,
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            api_key_policy: Limits of requests identified by an API key
+            user_policy: Limits of requests identified by a user ID
+            shared: Whether buckets are kept in Postgres, shared by all workers
+            max_local_buckets: Buckets kept in the worker before the least recently
+                used are dropped
+        """
+        for policy in (api_key_policy, user_policy):
+            if policy.requests_per_minute < 0 or policy.tokens_per_minute < 0:
+                raise ValueError("Rate limits must not be negative")
+        if max_local_buckets <= 0:
+            raise ValueError("Rate limiter must keep at least one bucket")
+        self.policies = {KIND_API_KEY: api_key_policy, KIND_USER: user_policy}
+        self.shared = shared
+        self.max_local_buckets = max_local_buckets
+        # Bucket key -> (balance, monotonic time it was stored)
+        self._local: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def check(self, key: RateLimitKey | None, requests: int = 1) -> None:
+        """
+        Admit a request of `key`, taking `requests` request tokens.
+
+        The key is remembered for the request, so `charge` debits its LLM tokens.
+
+        Raises:
+            HTTPException: 429 when a request or LLM token limit is exhausted
+        """
+        _current_key.set(key)
+        if key is None:
+            return
+        policy = self.policies[key.kind]
+        limits = {
+            resource: limit
+            for resource, limit in (
+                (RESOURCE_REQUESTS, policy.requests_per_minute),
+                (RESOURCE_TOKENS, policy.tokens_per_minute),
+            )
+            if limit
+        }
+        if not limits:
+            return
+
+        def take(states: BucketStates) -> tuple[dict[str, float], dict[str, float]]:
+            buckets = {
+                resource: TokenBucket.per_minute(limit, states.get(key.bucket_key(resource)))
+                for resource, limit in limits.items()
+            }
+            # A request needs a request token and an LLM token balance out of debt
+            waits = {}
+            if RESOURCE_REQUESTS in buckets and buckets[RESOURCE_REQUESTS].balance < 1:
+                waits[RESOURCE_REQUESTS] = buckets[RESOURCE_REQUESTS].wait_s(1)
+            if RESOURCE_TOKENS in buckets and buckets[RESOURCE_TOKENS].balance <= 0:
+                waits[RESOURCE_TOKENS] = buckets[RESOURCE_TOKENS].wait_s(0)
+            if not waits and RESOURCE_REQUESTS in buckets:
+                buckets[RESOURCE_REQUESTS].balance -= requests
+            balances = {key.bucket_key(resource): b.balance for resource, b in buckets.items()}
+            return balances, waits
+
+        waits = await self._update([key.bucket_key(resource) for resource in limits], take)
+        if not waits:
+            return
+        resource, wait_s = max(waits.items(), key=lambda item: item[1])
+        retry_after_s = max(MIN_RETRY_AFTER_S, math.ceil(wait_s))
+        metrics.record_admission_rejection(f"rate_limit_{resource}")
+        logger.info(
+            "Rate limit exceeded", kind=key.kind, resource=resource, retry_after_s=retry_after_s
+        )
+        raise too_many_requests(
+            f"Rate limit reached for {resource} per minute (limit: {limits[resource]}). "
+            f"Please try again in {retry_after_s}s.",
+            "rate_limit_exceeded",
+            retry_after_s,
+        )
+
+    async def charge(self, usage: LMUsage) -> None:
+        """Debit the LLM tokens used by the current request from its bucket."""
+        key = _current_key.get()
+        if key is None:
+            return
+        limit = self.policies[key.kind].tokens_per_minute
+        tokens = usage_total_tokens(usage)
+        if not limit or tokens <= 0:
+            return
+        bucket_key = key.bucket_key(RESOURCE_TOKENS)
+
+        def debit(states: BucketStates) -> tuple[dict[str, float], None]:
+            bucket = TokenBucket.per_minute(limit, states.get(bucket_key))
+            return {bucket_key: bucket.balance - tokens}, None
+
+        await self._update([bucket_key], debit)
+
+    async def _update(
+        self,
+        bucket_keys: list[str],
+        update: Callable[[BucketStates], tuple[dict[str, float], T]],
+    ) -> T:
+        """Apply `update` to the shared buckets, or to the worker's own."""
+        if self.shared:
+            try:
+                return await update_rate_limit_buckets(bucket_keys, update)
+            except Exception as exc:
+                logger.warning(
+                    "Shared rate limit buckets unavailable, using the worker's own",
+                    error=str(exc),
+                )
+        now = time.monotonic()
+        states: BucketStates = {}
+        for bucket_key in bucket_keys:
+            stored = self._local.get(bucket_key)
+            if stored is not None:
+                balance, stored_at = stored
+                states[bucket_key] = (balance, now - stored_at)
+        balances, result = update(states)
+        for bucket_key, balance in balances.items():
+            self._local[bucket_key] = (balance, now)
+            self._local.move_to_end(bucket_key)
+        while len(self._local) > self.max_local_buckets:
+            self._local.popitem(last=False)
+        return result
+
+
+def create_rate_limiter_from_env() -> RateLimiter | None:
+    """Create the rate limiter configured by environment variables (None if no limit is set)."""
+    api_key_policy = RateLimitPolicy(
+        requests_per_minute=int(os.getenv("RATE_LIMIT_API_KEY_RPM", str(RATE_LIMIT_API_KEY_RPM))),
+        tokens_per_minute=int(os.getenv("RATE_LIMIT_API_KEY_TPM", str(RATE_LIMIT_API_KEY_TPM))),
+    )
+    user_policy = RateLimitPolicy(
+        requests_per_minute=int(os.getenv("RATE_LIMIT_USER_RPM", str(RATE_LIMIT_USER_RPM))),
+        tokens_per_minute=int(os.getenv("RATE_LIMIT_USER_TPM", str(RATE_LIMIT_USER_TPM))),
+    )
+    if api_key_policy == RateLimitPolicy() and user_policy == RateLimitPolicy():
+        return None
+    return RateLimiter(
+        api_key_policy,
+        user_policy,
+        shared=os.getenv("RATE_LIMIT_SHARED", "false").lower() in ("1", "true", "yes"),
+    )
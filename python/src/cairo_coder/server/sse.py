@@ -0,0 +1,127 @@
+"""
+Server-sent event encoding for chat completion streams.
+
+Every content chunk of a response shares the same envelope (`id`, `object`,
+`created`, `model`) and only differs by its delta, so ChatChunkEncoder serializes
+the envelope once per response, as a prefix and a suffix around the delta, and
+each chunk only escapes its text. Frames are laid out exactly as `json.dumps`
+of the full chunk dict would produce them.
+
+String escaping uses the stdlib's C string encoder for short chunks and orjson,
+when installed, for longer ones (coalesced chunks), where it is faster. orjson
+keeps non-ASCII characters as UTF-8 instead of `\\u` escapes; both decode to the
+same text.
+"""
+
+from __future__ import annotations
+
+import json
+from json.encoder import encode_basestring_ascii
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional accelerator
+    orjson = None
+
+DONE_FRAME = "data: [DONE]\n\n"
+MODEL_NAME = "cairo-coder"
+
+# Below this length the stdlib encoder beats orjson (whose bytes must be decoded)
+ORJSON_MIN_CHARS = 128
+
+# Stands for the delta text while the envelope is serialized
+_PLACEHOLDER = "\x00delta\x00"
+
+
+def escape_json_string(text: str, use_orjson: bool | None = None) -> str:
+    """
+    JSON string literal (with quotes) for `text`.
+
+    Args:
+        text: String to encode
+        use_orjson: Force (True) or avoid (False) orjson; by default orjson is
+            used, when installed, for strings of at least ORJSON_MIN_CHARS
+    """
+    if use_orjson is None:
+        use_orjson = orjson is not None and len(text) >= ORJSON_MIN_CHARS
+    if use_orjson:
+        return orjson.dumps(text).decode()
+    return encode_basestring_ascii(text)
+
+
+def sse_frame(payload: Any) -> str:
+    """SSE frame carrying `payload` as JSON."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _split_around_placeholder(payload: dict[str, Any]) -> tuple[str, str]:
+    """Serialized `payload` split where its placeholder string sits."""
+    frame = sse_frame(payload)
+    prefix, suffix = frame.split(json.dumps(_PLACEHOLDER))
+    return prefix, suffix
+
+
+class ChatChunkEncoder:
+    """Encodes the SSE frames of one chat completion stream."""
+
+    def __init__(
+        self,
+        response_id: str,
+        created: int,
+        model: str = MODEL_NAME,
+        use_orjson: bool | None = None,
+    ):
+        """
+        Pre-serialize the frame envelopes of a response.
+
+        Args:
+            response_id: Chat completion ID shared by the chunks
+            created: Creation timestamp shared by the chunks
+            model: Model name reported to clients
+            use_orjson: See `escape_json_string`
+        """
+        self.response_id = response_id
+        self.created = created
+        self.model = model
+        self.use_orjson = use_orjson
+        self._content_prefix, self._content_suffix = _split_around_placeholder(
+            self.chunk({"content": _PLACEHOLDER})
+        )
+        # Typed events whose data is a string, by event type
+        self._event_affixes: dict[str, tuple[str, str]] = {}
+
+    def chunk(self, delta: dict[str, Any], finish_reason: str | None = None) -> dict[str, Any]:
+        """A `chat.completion.chunk` payload of this response."""
+        return {
+            "id": self.response_id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    def role(self) -> str:
+        """Initial frame announcing the assistant role."""
+        return sse_frame(self.chunk({"role": "assistant"}))
+
+    def content(self, text: str) -> str:
+        """Frame of a content delta (the hot path: one per streamed chunk)."""
+        return (
+            self._content_prefix + escape_json_string(text, self.use_orjson) + self._content_suffix
+        )
+
+    def finish(self, content: str | None = None) -> str:
+        """Frame ending the completion, optionally with a last content delta."""
+        delta = {} if content is None else {"content": content}
+        return sse_frame(self.chunk(delta, finish_reason="stop"))
+
+    def event(self, event_type: str, data: Any) -> str:
+        """Frame of a typed event (`sources`, `reasoning`, `processing`, ...)."""
+        if not isinstance(data, str):
+            return sse_frame({"type": event_type, "data": data})
+        affixes = self._event_affixes.get(event_type)
+        if affixes is None:
+            affixes = _split_around_placeholder({"type": event_type, "data": _PLACEHOLDER})
+            self._event_affixes[event_type] = affixes
+        return affixes[0] + escape_json_string(data, self.use_orjson) + affixes[1]
@@ -0,0 +1,95 @@
+"""
+Startup warm-up and readiness.
+
+Agents are built lazily by default: the first request to each agent and mode pays
+for loading the compiled programs (once per worker, shared by all agents) and
+creating the DSPy modules. With WARMUP_MODE=eager, the lifespan builds every
+registry agent (in both modes) before the worker accepts requests, then warms the
+connections the first requests would open: a `SELECT 1` on each database pool, one
+embedding call and a one-token LM call.
+
+`/ready` answers 503 until the warm-up has finished, while `/health` only reports
+that the process is alive. A failed connection warm-up is logged and does not keep
+the worker out of rotation: the provider may recover before the first request.
+
+Under `cairo-coder --preload`, the agents are built once in the parent process
+before the workers are forked (see `server/prefork.py`); the connection warm-up
+then runs in each worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+import structlog
+
+if TYPE_CHECKING:
+    import dspy
+
+logger = structlog.get_logger(__name__)
+
+WARMUP_LAZY = "lazy"
+WARMUP_EAGER = "eager"
+
+WARMUP_TEXT = "Cairo"
+
+
+def warmup_mode_from_env() -> str:
+    """
+    Warm-up mode set by WARMUP_MODE (`lazy` by default).
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    mode = os.getenv("WARMUP_MODE", WARMUP_LAZY).strip().lower() or WARMUP_LAZY
+    if mode not in (WARMUP_LAZY, WARMUP_EAGER):
+        raise ValueError(f"WARMUP_MODE must be '{WARMUP_LAZY}' or '{WARMUP_EAGER}', got '{mode}'")
+    return mode
+
+
+async def _ping_pool(pool: Any) -> None:
+    async with pool.acquire() as connection:
+        await connection.fetchval("SELECT 1")
+
+
+async def warm_connections(
+    pools: dict[str, Any],
+    embed: Callable[[str], Any] | None = None,
+    lm: dspy.LM | None = None,
+) -> dict[str, float | None]:
+    """
+    Open the connections the first requests would otherwise open.
+
+    Args:
+        pools: asyncpg pools by name
+        embed: Embedding function called once (blocking, so run in a thread)
+        lm: LM sent a one-token request
+
+    Returns:
+        Duration of each step in seconds, or None for failed steps
+    """
+    steps: dict[str, Callable[[], Awaitable[Any]]] = {
+        f"db_{name}": (lambda pool=pool: _ping_pool(pool)) for name, pool in pools.items()
+    }
+    if embed is not None:
+        steps["embedding"] = lambda: asyncio.to_thread(embed, WARMUP_TEXT)
+    if lm is not None:
+        steps["lm"] = lambda: lm.acall(
+            messages=[{"role": "user", "content": WARMUP_TEXT}], max_tokens=1
+        )
+
+    async def run(name: str, step: Callable[[], Awaitable[Any]]) -> float | None:
+        start = time.perf_counter()
+        try:
+            await step()
+        except Exception as exc:
+            logger.warning("Warm-up step failed", step=name, error=str(exc))
+            return None
+        return time.perf_counter() - start
+
+    durations = await asyncio.gather(*(run(name, step) for name, step in steps.items()))
+    return dict(zip(steps, durations, strict=True))
@@ -0,0 +1,181 @@
+"""Fixture corpus and vector store for the offline pipeline benchmarks.
+
+The corpus is a deterministic set of synthetic documentation chunks spread over a
+few sources, with the metadata written by the ingesters. It is embedded with the
+stand-in embedder and loaded into a pgvector table, either in a throwaway
+testcontainers Postgres or in a database given by DSN.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import asyncpg
+
+from cairo_coder.core.config import VectorStoreConfig
+from cairo_coder.core.types import DocumentSource
+from cairo_coder_tools.benchmarks.standins import VOCABULARY, StandinEmbedder
+
+PGVECTOR_IMAGE = "pgvector/pgvector:pg16"
+DEFAULT_TABLE_NAME = "benchmark_documents"
+
+# Starknet blog is left out: it would enable the live Grok augmentation
+CORPUS_SOURCES = (
+    DocumentSource.CAIRO_BOOK,
+    DocumentSource.STARKNET_DOCS,
+    DocumentSource.CORELIB_DOCS,
+    DocumentSource.OPENZEPPELIN_DOCS,
+)
+
+TOPICS = (
+    "storage",
+    "events",
+    "traits",
+    "generics",
+    "testing",
+    "components",
+    "dispatchers",
+    "syscalls",
+    "arrays",
+    "ownership",
+    "errors",
+    "deployment",
+)
+
+BENCHMARK_QUERIES = (
+    "How do I declare and read a storage variable in a Cairo contract?",
+    "How do I emit an event from a Starknet contract?",
+    "Write a generic trait with an implementation for u256",
+    "How do I test a contract with snforge and assert on events?",
+    "How do I call another contract with a dispatcher?",
+    "What is the difference between an Array and a Span?",
+    "How do I embed an OpenZeppelin component in my contract?",
+    "How do I handle errors with Option and Result?",
+)
+
+
+@dataclass
+class FixtureDocument:
+    """A corpus chunk, as stored in the vector table."""
+
+    content: str
+    metadata: dict[str, object]
+
+
+def build_corpus(pages_per_topic: int = 2, chunks_per_page: int = 3, seed: int = 0) -> list[FixtureDocument]:
+    """
+    Build the deterministic fixture corpus.
+
+    Args:
+        pages_per_topic: Pages generated per (source, topic) pair
+        chunks_per_page: Chunks per page (consecutive chunk numbers, mergeable)
+        seed: Seed of the filler text
+
+    Returns:
+        List of fixture documents
+    """
+    rng = random.Random(seed)
+    documents = []
+    for source in CORPUS_SOURCES:
+        for topic in TOPICS:
+            for page in range(pages_per_topic):
+                name = f"{source.value}-{topic}-{page}"
+                for chunk in range(chunks_per_page):
+                    filler = " ".join(rng.choice(VOCABULARY) for _ in range(120))
+                    content = f"# {topic.title()} ({chunk + 1}/{chunks_per_page})\n\n{topic} {filler} {topic}"
+                    documents.append(
+                        FixtureDocument(
+                            content=content,
+                            metadata={
+                                "name": name,
+                                "title": f"{topic.title()} {page}",
+                                "uniqueId": f"{name}-{chunk}",
+                                "chunkNumber": chunk,
+                                "contentHash": hashlib.sha256(content.encode()).hexdigest()[:16],
+                                "source": source.value,
+                                "sourceLink": f"https://docs.example/{source.value}/{topic}-{page}#chunk-{chunk}",
+                            },
+                        )
+                    )
+    return documents
+
+
+async def load_corpus(
+    dsn: str,
+    table_name: str,
+    documents: list[FixtureDocument],
+    embedder: StandinEmbedder,
+) -> None:
+    """(Re)create the vector table and load the embedded corpus into it."""
+    conn = await asyncpg.connect(dsn=dsn)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+        await conn.execute(
+            f"""
+            CREATE TABLE {table_name} (
+                id SERIAL PRIMARY KEY,
+                content TEXT NOT NULL,
+                metadata JSONB NOT NULL,
+                embedding vector({embedder.dimensions}) NOT NULL
+            )
+            """
+        )
+        await conn.executemany(
+            f"INSERT INTO {table_name} (content, metadata, embedding) VALUES ($1, $2::jsonb, $3::vector)",
+            [
+                (
+                    document.content,
+                    json.dumps(document.metadata),
+                    "[" + ",".join(f"{x:.6f}" for x in embedder.embed(document.content)) + "]",
+                )
+                for document in documents
+            ],
+        )
+    finally:
+        await conn.close()
+
+
+def vector_store_config_from_dsn(dsn: str, table_name: str = DEFAULT_TABLE_NAME) -> VectorStoreConfig:
+    """Build the vector store config of a `postgresql://` DSN."""
+    url = urlparse(dsn)
+    return VectorStoreConfig(
+        host=url.hostname or "localhost",
+        port=url.port or 5432,
+        database=url.path.lstrip("/"),
+        user=url.username or "",
+        password=url.password or "",
+        table_name=table_name,
+    )
+
+
+@contextlib.contextmanager
+def pgvector_database(dsn: str | None = None) -> Iterator[str]:
+    """
+    Yield the DSN of the benchmark database.
+
+    Uses `dsn` when given; otherwise starts a throwaway pgvector container
+    (requires Docker and the `testcontainers` dev dependency).
+    """
+    if dsn is not None:
+        yield dsn
+        return
+    try:
+        from testcontainers.postgres import PostgresContainer
+    except ImportError as e:
+        raise RuntimeError(
+            "Running the benchmarks without --dsn requires testcontainers (uv sync --dev)"
+        ) from e
+
+    container = PostgresContainer(PGVECTOR_IMAGE)
+    container.start()
+    try:
+        yield container.get_connection_url().replace("postgresql+psycopg2", "postgresql")
+    finally:
+        container.stop()
@@ -0,0 +1,133 @@
+"""Import-time benchmark.
+
+Imports a module in fresh interpreters started with `-X importtime` and parses
+the timings CPython writes to stderr: the total import time (best of several
+runs, as the first run also pays for cold disk caches) and the packages that
+cost the most. Every worker restart and autoscaled replica pays the server's
+import time before it can serve, so `bench imports` fails when it exceeds a
+budget, or when a module that should load lazily (DSPy and the pipeline,
+imported by the lifespan) is imported eagerly again.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+SERVER_MODULE = "cairo_coder.server.app"
+# Import time budget of the server module, and modules it must not import
+SERVER_IMPORT_BUDGET_MS = 1500.0
+SERVER_LAZY_MODULES = ("dspy", "litellm", "xai_sdk", "psycopg2", "cairo_coder.core.rag_pipeline")
+
+# "import time: <self us> | <cumulative us> | <indentation><module>"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+@dataclass
+class ModuleImport:
+    """Import of one module, as reported by `-X importtime`."""
+
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int  # Nesting level: 0 for the measured statement and interpreter startup
+
+
+@dataclass
+class ImportReport:
+    """Import time of a module and of the modules it imports."""
+
+    module: str
+    total_ms: float
+    runs_ms: list[float]
+    imports: list[ModuleImport] = field(default_factory=list)
+
+    @property
+    def modules(self) -> set[str]:
+        return {entry.name for entry in self.imports}
+
+    def slowest(self, count: int) -> list[ModuleImport]:
+        """Modules imported by the measured one (or at startup) that took the longest."""
+        entries = [e for e in self.imports if e.depth <= 1 and e.name != self.module]
+        return sorted(entries, key=lambda entry: entry.cumulative_us, reverse=True)[:count]
+
+    def eager_imports(self, lazy_modules: tuple[str, ...]) -> list[str]:
+        """Modules of `lazy_modules` that were imported."""
+        return [name for name in lazy_modules if name in self.modules]
+
+
+def parse_importtime(output: str) -> list[ModuleImport]:
+    """Parse the `-X importtime` lines of an interpreter's stderr."""
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        imports.append(
+            ModuleImport(
+                name=name,
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=max(0, (len(indent) - 1) // 2),
+            )
+        )
+    return imports
+
+
+def _import_once(module: str) -> list[ModuleImport]:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(path for path in sys.path if path)}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    return parse_importtime(completed.stderr)
+
+
+def measure_import_time(module: str, runs: int = 3) -> ImportReport:
+    """
+    Import `module` in `runs` fresh interpreters and keep the fastest run.
+
+    Args:
+        module: Dotted module name
+        runs: Interpreters started
+
+    Returns:
+        Report of the fastest run
+    """
+    if runs <= 0:
+        raise ValueError("At least one run is required")
+    best: list[ModuleImport] = []
+    runs_ms = []
+    for _ in range(runs):
+        imports = _import_once(module)
+        measured = next((entry for entry in imports if entry.name == module), None)
+        if measured is None:
+            raise RuntimeError(f"No import time reported for {module} (already imported?)")
+        runs_ms.append(measured.cumulative_us / 1000)
+        if runs_ms[-1] == min(runs_ms):
+            best = imports
+    return ImportReport(module=module, total_ms=min(runs_ms), runs_ms=runs_ms, imports=best)
+
+
+def format_import_report(report: ImportReport, top: int = 15) -> str:
+    """Human-readable import time report."""
+    runs = ", ".join(f"{run_ms:.0f}" for run_ms in report.runs_ms)
+    lines = [
+        f"import {report.module}: {report.total_ms:.0f} ms (best of {len(report.runs_ms)}: {runs})",
+        "",
+        f"{'module':<40} {'cumulative ms':>14} {'self ms':>10}",
+    ]
+    for entry in report.slowest(top):
+        lines.append(
+            f"{entry.name:<40} {entry.cumulative_us / 1000:>14.1f} {entry.self_us / 1000:>10.1f}"
+        )
+    return "\n".join(lines)
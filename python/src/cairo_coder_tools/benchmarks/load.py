@@ -0,0 +1,329 @@
+"""Load generator for the chat completion endpoints.
+
+Drives `/v1/chat/completions` (or `/v1/agents/{id}/chat/completions`) with a mix
+of streaming and non-streaming clients, on one of two arrival schedules:
+
+- closed loop: `concurrency` clients each send their next request as soon as the
+  previous one completes, so the offered load adapts to the server's speed;
+- open loop: requests arrive as a Poisson process at `rate_qps` whatever the
+  response times, which exposes queueing once the server saturates.
+
+For each request the client records the time to the `sources` event, the time to
+the first content token, the decode rate and the total latency. The report gives
+their distributions, the error rate and the overall throughput. Token counts are
+estimated from the answer length, the same way for both response kinds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+import httpx
+
+from cairo_coder_tools.benchmarks.corpus import BENCHMARK_QUERIES
+from cairo_coder_tools.benchmarks.pipeline import StageStats
+from cairo_coder_tools.benchmarks.standins import CHARS_PER_TOKEN
+
+ARRIVAL_CLOSED = "closed"
+ARRIVAL_OPEN = "open"
+
+
+@dataclass
+class LoadConfig:
+    """Parameters of a load test."""
+
+    base_url: str
+    agent_id: str | None = None
+    arrival: str = ARRIVAL_CLOSED
+    # Closed loop: number of clients; open loop: cap on requests in flight
+    concurrency: int = 8
+    # Open loop only
+    rate_qps: float = 2.0
+    duration_s: float = 60.0
+    # Fraction of streaming requests (1.0 = streaming only)
+    stream_ratio: float = 0.5
+    queries: tuple[str, ...] = BENCHMARK_QUERIES
+    # Suffix each query with the request number so identical in-flight requests are
+    # not coalesced and the answer cache does not serve them
+    unique_queries: bool = True
+    timeout_s: float = 180.0
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        if self.arrival not in (ARRIVAL_CLOSED, ARRIVAL_OPEN):
+            raise ValueError(f"Unknown arrival schedule: {self.arrival}")
+        if self.concurrency <= 0:
+            raise ValueError("Load test concurrency must be positive")
+        if self.arrival == ARRIVAL_OPEN and self.rate_qps <= 0:
+            raise ValueError("Open-loop arrival rate must be positive")
+        if self.duration_s <= 0:
+            raise ValueError("Load test duration must be positive")
+        if not 0 <= self.stream_ratio <= 1:
+            raise ValueError("Streaming ratio must be in [0, 1]")
+        if not self.queries:
+            raise ValueError("Load test needs at least one query")
+
+    @property
+    def endpoint(self) -> str:
+        """URL of the chat completion endpoint under test."""
+        base = self.base_url.rstrip("/")
+        if self.agent_id:
+            return f"{base}/v1/agents/{self.agent_id}/chat/completions"
+        return f"{base}/v1/chat/completions"
+
+
+@dataclass
+class RequestResult:
+    """Measurements of one request (times in seconds from its start)."""
+
+    stream: bool
+    started_at: float
+    latency_s: float
+    status: int | None
+    error: str | None = None
+    time_to_sources_s: float | None = None
+    time_to_first_token_s: float | None = None
+    tokens: int = 0
+    answer: str = ""
+    # URLs of the `sources` event (streaming responses only)
+    source_urls: list[str] | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the request completed successfully."""
+        return self.error is None
+
+    @property
+    def tokens_per_s(self) -> float | None:
+        """Decode rate: tokens after the first one, over the time they took."""
+        if self.time_to_first_token_s is None or self.tokens <= 1:
+            return None
+        decode_s = self.latency_s - self.time_to_first_token_s
+        return (self.tokens - 1) / decode_s if decode_s > 0 else None
+
+
+@dataclass
+class LoadReport:
+    """Aggregated results of a load test."""
+
+    config: dict[str, Any]
+    wall_time_s: float
+    requests: int
+    errors: int
+    errors_by_kind: dict[str, int]
+    throughput_rps: float
+    throughput_tokens_per_s: float
+    latency: dict[str, StageStats] = field(default_factory=dict)
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of failed requests."""
+        return self.errors / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable representation."""
+        return {**asdict(self), "error_rate": self.error_rate}
+
+
+class StreamError(Exception):
+    """The server reported an error inside an SSE stream."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of generated text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def summarize(
+    results: list[RequestResult], wall_time_s: float, config: dict[str, Any]
+) -> LoadReport:
+    """Aggregate request results into a report, recording `config` with it."""
+    ok = [result for result in results if result.ok]
+    streamed = [result for result in ok if result.stream]
+
+    def stats(values: list[float | None]) -> StageStats | None:
+        samples = [value for value in values if value is not None]
+        return StageStats.from_samples(samples) if samples else None
+
+    distributions = {
+        "latency": stats([r.latency_s for r in ok]),
+        "latency_stream": stats([r.latency_s for r in streamed]),
+        "latency_non_stream": stats([r.latency_s for r in ok if not r.stream]),
+        "time_to_sources": stats([r.time_to_sources_s for r in streamed]),
+        "time_to_first_token": stats([r.time_to_first_token_s for r in streamed]),
+        "tokens_per_s": stats([r.tokens_per_s for r in streamed]),
+    }
+    errors = Counter(result.error or "" for result in results if not result.ok)
+    return LoadReport(
+        config=config,
+        wall_time_s=wall_time_s,
+        requests=len(results),
+        errors=sum(errors.values()),
+        errors_by_kind=dict(errors),
+        throughput_rps=len(ok) / wall_time_s if wall_time_s > 0 else 0.0,
+        throughput_tokens_per_s=(sum(r.tokens for r in ok) / wall_time_s)
+        if wall_time_s > 0
+        else 0.0,
+        latency={name: value for name, value in distributions.items() if value is not None},
+    )
+
+
+def format_load_report(report: LoadReport) -> str:
+    """Human-readable summary of a load report."""
+    lines = [
+        f"{report.requests} requests in {report.wall_time_s:.1f}s: "
+        f"{report.throughput_rps:.2f} req/s, {report.throughput_tokens_per_s:.0f} tokens/s, "
+        f"error rate {report.error_rate:.1%}",
+    ]
+    for kind, count in sorted(report.errors_by_kind.items()):
+        lines.append(f"  {count} x {kind}")
+    lines.append(f"  {'metric':<22}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in report.latency.items():
+        scale, unit = (1.0, "") if name == "tokens_per_s" else (1000.0, " ms")
+        lines.append(
+            f"  {name + unit:<22}{stats.count:>7}{stats.p50 * scale:>10.1f}"
+            f"{stats.p95 * scale:>10.1f}{stats.p99 * scale:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+async def _sse_payloads(response: httpx.Response) -> AsyncIterator[dict[str, Any] | str]:
+    """JSON payloads of an SSE response (`[DONE]` is yielded as a string)."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        data = line.removeprefix("data: ")
+        yield data if data == "[DONE]" else json.loads(data)
+
+
+async def send_request(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    messages: list[dict[str, str]],
+    stream: bool,
+    start: float,
+    test_start: float,
+    headers: dict[str, str] | None = None,
+) -> RequestResult:
+    """
+    Send one chat completion request and measure it.
+
+    Args:
+        client: HTTP client
+        endpoint: Chat completion URL
+        messages: Conversation, ending with the user message
+        stream: Whether to request a streaming response
+        start: `time.perf_counter()` at which the request arrived; time spent
+            waiting for a client slot counts towards its latency
+        test_start: `time.perf_counter()` at which the test started
+        headers: Extra request headers
+
+    Returns:
+        RequestResult (failures are recorded, never raised)
+    """
+    payload = {"messages": messages, "stream": stream}
+    result = RequestResult(stream=stream, started_at=start - test_start, latency_s=0.0, status=None)
+    try:
+        if not stream:
+            response = await client.post(endpoint, json=payload, headers=headers)
+            result.status = response.status_code
+            response.raise_for_status()
+            result.answer = response.json()["choices"][0]["message"]["content"] or ""
+        else:
+            answer = []
+            async with client.stream("POST", endpoint, json=payload, headers=headers) as response:
+                result.status = response.status_code
+                response.raise_for_status()
+                async for event in _sse_payloads(response):
+                    if event == "[DONE]":
+                        break
+                    elapsed = time.perf_counter() - start
+                    if isinstance(event, dict) and event.get("type") == "sources":
+                        result.time_to_sources_s = result.time_to_sources_s or elapsed
+                        result.source_urls = [
+                            source.get("metadata", {}).get("url", "")
+                            for source in event.get("data") or []
+                        ]
+                    elif isinstance(event, dict) and "choices" in event:
+                        choice = event["choices"][0]
+                        content = choice.get("delta", {}).get("content")
+                        if content:
+                            if content.startswith("\n\nError:"):
+                                raise StreamError("stream error event")
+                            if result.time_to_first_token_s is None:
+                                result.time_to_first_token_s = elapsed
+                            answer.append(content)
+                else:
+                    raise StreamError("stream ended without [DONE]")
+            result.answer = "".join(answer)
+        result.tokens = estimate_tokens(result.answer)
+    except httpx.HTTPStatusError as e:
+        result.error = f"HTTP {e.response.status_code}"
+    except httpx.TimeoutException:
+        result.error = "timeout"
+    except StreamError as e:
+        result.error = str(e)
+    except Exception as e:
+        result.error = type(e).__name__
+    result.latency_s = time.perf_counter() - start
+    return result
+
+
+async def run_load_test(config: LoadConfig) -> LoadReport:
+    """Run a load test against a running server."""
+    rng = random.Random(config.seed)
+    counter = itertools.count()
+    results: list[RequestResult] = []
+    limits = httpx.Limits(
+        max_connections=config.concurrency, max_keepalive_connections=config.concurrency
+    )
+
+    async with httpx.AsyncClient(timeout=config.timeout_s, limits=limits) as client:
+        test_start = time.perf_counter()
+        stop_at = test_start + config.duration_s
+
+        async def one_request(start: float) -> None:
+            index = next(counter)
+            query = config.queries[index % len(config.queries)]
+            if config.unique_queries:
+                query = f"{query} (request {index})"
+            stream = rng.random() < config.stream_ratio
+            messages = [{"role": "user", "content": query}]
+            results.append(
+                await send_request(client, config.endpoint, messages, stream, start, test_start)
+            )
+
+        if config.arrival == ARRIVAL_CLOSED:
+
+            async def client_loop() -> None:
+                while (now := time.perf_counter()) < stop_at:
+                    await one_request(now)
+
+            await asyncio.gather(*(client_loop() for _ in range(config.concurrency)))
+        else:
+            in_flight = asyncio.Semaphore(config.concurrency)
+            tasks: set[asyncio.Task[None]] = set()
+
+            async def bounded_request(arrival: float) -> None:
+                async with in_flight:
+                    await one_request(arrival)
+
+            next_arrival = time.perf_counter()
+            while next_arrival < stop_at:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                task = asyncio.create_task(bounded_request(next_arrival))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                next_arrival += rng.expovariate(config.rate_qps)
+            await asyncio.gather(*tasks)
+
+        wall_time_s = time.perf_counter() - test_start
+    return summarize(results, wall_time_s, {**asdict(config), "queries": len(config.queries)})
@@ -0,0 +1,419 @@
+"""Offline benchmark of `RagPipeline.aforward` and `RagPipeline.aforward_streaming`.
+
+The pipeline of an agent is built as the server builds it, on top of a pgvector
+fixture corpus, with every LM and the embedder replaced by the deterministic
+stand-ins of `standins`. Each scenario is run for a number of iterations and
+reported as:
+
+- per-stage latency percentiles (p50/p95/p99), from the raw samples of the
+  pipeline stage metrics;
+- CPU time per run (process time, so it includes the embedder and judge threads);
+- allocations per run (peak and retained traced memory), measured in a separate
+  pass since tracemalloc slows everything it traces.
+
+Reports are saved as JSON and compared with a stored baseline to flag regressions.
+Grok augmentation is never exercised: the corpus does not contain the Starknet blog
+source that enables it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import platform
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import dspy
+import numpy as np
+import structlog
+from dspy.adapters import ChatAdapter
+
+from cairo_coder.agents.registry import get_agent_by_string_id
+from cairo_coder.core import metrics
+from cairo_coder.core.rag_pipeline import RagPipeline
+from cairo_coder.core.types import DocumentSource, StreamEventType
+from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
+from cairo_coder_tools.benchmarks.corpus import (
+    BENCHMARK_QUERIES,
+    CORPUS_SOURCES,
+    DEFAULT_TABLE_NAME,
+    build_corpus,
+    load_corpus,
+    vector_store_config_from_dsn,
+)
+from cairo_coder_tools.benchmarks.standins import (
+    LatencyProfile,
+    StandinEmbedder,
+    StandinGrokSearch,
+    StandinLM,
+    register_standin_lm,
+)
+
+logger = structlog.get_logger(__name__)
+
+SCENARIO_AFORWARD = "aforward"
+SCENARIO_STREAMING = "aforward_streaming"
+SCENARIOS = (SCENARIO_AFORWARD, SCENARIO_STREAMING)
+
+# Stand-in model names (`standin/<name>`)
+MAIN_LM = "main"
+JUDGE_LM = "judge"
+SUMMARY_LM = "summary"
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class BenchmarkConfig:
+    """Parameters of a pipeline benchmark run."""
+
+    agent_id: str = "cairo-coder"
+    iterations: int = 20
+    warmup: int = 2
+    allocation_iterations: int = 5
+    queries: tuple[str, ...] = BENCHMARK_QUERIES
+    # Query processing and generation (the default LM)
+    lm_profile: LatencyProfile = field(
+        default_factory=lambda: LatencyProfile(
+            first_token_s=0.3, tokens_per_s=120.0, output_tokens=250
+        )
+    )
+    # One call per judged document
+    judge_profile: LatencyProfile = field(
+        default_factory=lambda: LatencyProfile(
+            first_token_s=0.15, tokens_per_s=300.0, output_tokens=40
+        )
+    )
+    embedding_latency_s: float = 0.05
+    embedding_dimensions: int = 256
+    # Only used when a query selects the Starknet blog (served runs)
+    grok_latency_s: float = 3.0
+    table_name: str = DEFAULT_TABLE_NAME
+
+    def __post_init__(self) -> None:
+        if self.iterations <= 0:
+            raise ValueError("Benchmark iterations must be positive")
+        if self.warmup < 0 or self.allocation_iterations < 0:
+            raise ValueError("Warm-up and allocation iterations cannot be negative")
+        if not self.queries:
+            raise ValueError("Benchmark needs at least one query")
+
+
+@dataclass
+class StageStats:
+    """Latency percentiles of a pipeline stage, in seconds."""
+
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+
+    @classmethod
+    def from_samples(cls, samples: list[float]) -> StageStats:
+        """Summarize raw latency samples."""
+        if not samples:
+            raise ValueError("Cannot summarize an empty sample")
+        p50, p95, p99 = (float(p) for p in np.percentile(samples, PERCENTILES))
+        return cls(count=len(samples), mean=float(np.mean(samples)), p50=p50, p95=p95, p99=p99)
+
+
+@dataclass
+class ScenarioReport:
+    """Measurements of one benchmarked entry point."""
+
+    runs: int
+    stages: dict[str, StageStats]
+    cpu_s_per_run: float
+    # None when allocations were not measured
+    alloc_peak_bytes: int | None = None
+    alloc_retained_bytes: int | None = None
+
+
+@dataclass
+class Regression:
+    """A metric that got worse than the baseline by more than the tolerance."""
+
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        """Current value relative to the baseline."""
+        return self.current / self.baseline if self.baseline else float("inf")
+
+
+@dataclass
+class BenchmarkReport:
+    """Results of a benchmark run, serializable as JSON."""
+
+    created_at: str
+    environment: dict[str, str]
+    config: dict[str, Any]
+    scenarios: dict[str, ScenarioReport]
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable representation."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> BenchmarkReport:
+        """Rebuild a report from `to_dict()` output."""
+        scenarios = {}
+        for name, scenario in data["scenarios"].items():
+            stages = {stage: StageStats(**stats) for stage, stats in scenario["stages"].items()}
+            scenarios[name] = ScenarioReport(**{**scenario, "stages": stages})
+        return cls(
+            created_at=data["created_at"],
+            environment=data.get("environment", {}),
+            config=data.get("config", {}),
+            scenarios=scenarios,
+        )
+
+    def save(self, path: Path) -> None:
+        """Write the report as JSON."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    @classmethod
+    def load(cls, path: Path) -> BenchmarkReport:
+        """Read a report written by `save()`."""
+        return cls.from_dict(json.loads(path.read_text()))
+
+
+def compare_reports(
+    baseline: BenchmarkReport,
+    current: BenchmarkReport,
+    tolerance: float = 0.15,
+    min_delta_s: float = 0.005,
+) -> list[Regression]:
+    """
+    List the metrics of `current` that regressed compared to `baseline`.
+
+    Args:
+        baseline: Reference report
+        current: Report to check
+        tolerance: Allowed relative increase (0.15 = 15%)
+        min_delta_s: Latency and CPU increases below this many seconds are noise
+
+    Returns:
+        Regressions, for the scenarios and stages present in both reports
+    """
+    if tolerance < 0:
+        raise ValueError("Regression tolerance cannot be negative")
+
+    regressions = []
+
+    def check(
+        scenario: str, metric: str, before: float | None, after: float | None, min_delta: float
+    ) -> None:
+        if before is None or after is None:
+            return
+        if after > before * (1 + tolerance) and after - before > min_delta:
+            regressions.append(
+                Regression(scenario=scenario, metric=metric, baseline=before, current=after)
+            )
+
+    for name, scenario in current.scenarios.items():
+        reference = baseline.scenarios.get(name)
+        if reference is None:
+            continue
+        for stage, stats in scenario.stages.items():
+            before = reference.stages.get(stage)
+            if before is None:
+                continue
+            for percentile in PERCENTILES:
+                attribute = f"p{percentile}"
+                check(
+                    name,
+                    f"{stage}.{attribute}",
+                    getattr(before, attribute),
+                    getattr(stats, attribute),
+                    min_delta_s,
+                )
+        check(name, "cpu_s_per_run", reference.cpu_s_per_run, scenario.cpu_s_per_run, min_delta_s)
+        check(name, "alloc_peak_bytes", reference.alloc_peak_bytes, scenario.alloc_peak_bytes, 0)
+    return regressions
+
+
+def format_report(report: BenchmarkReport) -> str:
+    """Human-readable summary of a report."""
+    lines = []
+    for name, scenario in report.scenarios.items():
+        lines.append(
+            f"{name} ({scenario.runs} runs, {scenario.cpu_s_per_run * 1000:.1f} ms CPU/run)"
+        )
+        if scenario.alloc_peak_bytes is not None:
+            lines.append(
+                f"  allocations: peak {scenario.alloc_peak_bytes / 1024:.0f} KiB, "
+                f"retained {(scenario.alloc_retained_bytes or 0) / 1024:.0f} KiB"
+            )
+        lines.append(f"  {'stage':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, stats in sorted(scenario.stages.items()):
+            lines.append(
+                f"  {stage:<18}{stats.count:>7}{stats.p50 * 1000:>10.1f}"
+                f"{stats.p95 * 1000:>10.1f}{stats.p99 * 1000:>10.1f}"
+            )
+    return "\n".join(lines)
+
+
+def configure_standins(config: BenchmarkConfig) -> tuple[StandinLM, StandinEmbedder]:
+    """Serve the default LM, the judge LM and the default embedder with stand-ins."""
+    lm = StandinLM(
+        profiles={MAIN_LM: config.lm_profile, JUDGE_LM: config.judge_profile},
+        default_profile=config.lm_profile,
+    )
+    register_standin_lm(lm)
+    embedder = StandinEmbedder(
+        dimensions=config.embedding_dimensions, latency_s=config.embedding_latency_s
+    )
+    # Cached completions would skip the simulated latency
+    dspy.configure_cache(enable_disk_cache=False, enable_memory_cache=False)
+    dspy.configure(
+        lm=dspy.LM(f"standin/{MAIN_LM}", cache=False),
+        adapter=ChatAdapter(),
+        embedder=embedder,
+        track_usage=True,
+    )
+    return lm, embedder
+
+
+def use_standin_programs(pipeline: RagPipeline, config: BenchmarkConfig) -> None:
+    """Point a pipeline's judge, history summary and Grok search at stand-ins."""
+    pipeline.config.judge_lm = f"standin/{JUDGE_LM}"
+    pipeline.config.history_summary_lm = f"standin/{SUMMARY_LM}"
+    pipeline.grok_search = StandinGrokSearch(latency_s=config.grok_latency_s)
+
+
+def build_benchmark_pipeline(
+    dsn: str, config: BenchmarkConfig, embedder: StandinEmbedder
+) -> RagPipeline:
+    """Build the agent's pipeline on the fixture table, with stand-in LMs."""
+    vector_store_config = vector_store_config_from_dsn(dsn, config.table_name)
+    vector_db = SourceFilteredPgVectorRM(
+        db_url=vector_store_config.dsn,
+        pg_table_name=vector_store_config.table_name,
+        embedding_func=embedder,
+        content_field="content",
+        fields=["id", "content", "metadata"],
+        k=5,
+        include_similarity=True,
+    )
+    # The Grok client is created with the pipeline but never called (see module doc)
+    os.environ.setdefault("XAI_API_KEY", "offline-benchmark")
+    _, spec = get_agent_by_string_id(config.agent_id)
+    pipeline = spec.build(vector_db, vector_store_config)
+    use_standin_programs(pipeline, config)
+    return pipeline
+
+
+async def _run_once(
+    pipeline: RagPipeline, scenario: str, query: str, sources: list[DocumentSource]
+) -> None:
+    if scenario == SCENARIO_AFORWARD:
+        await pipeline.aforward(query=query, sources=sources)
+        return
+    async for event in pipeline.aforward_streaming(query=query, sources=sources):
+        if event.type == StreamEventType.ERROR:
+            raise RuntimeError(f"Streaming pipeline failed: {event.data}")
+
+
+async def _benchmark_scenario(
+    pipeline: RagPipeline, scenario: str, config: BenchmarkConfig
+) -> ScenarioReport:
+    sources = list(CORPUS_SOURCES)
+
+    def query(iteration: int) -> str:
+        return config.queries[iteration % len(config.queries)]
+
+    for iteration in range(config.warmup):
+        await _run_once(pipeline, scenario, query(iteration), sources)
+
+    samples: dict[str, list[float]] = {}
+    cpu_s = 0.0
+    for iteration in range(config.iterations):
+        with metrics.record_stages() as run_samples:
+            cpu_start = time.process_time()
+            await _run_once(pipeline, scenario, query(iteration), sources)
+            cpu_s += time.process_time() - cpu_start
+        for stage, seconds in run_samples:
+            samples.setdefault(stage, []).append(seconds)
+
+    report = ScenarioReport(
+        runs=config.iterations,
+        stages={stage: StageStats.from_samples(values) for stage, values in samples.items()},
+        cpu_s_per_run=cpu_s / config.iterations,
+    )
+
+    if config.allocation_iterations:
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for iteration in range(config.allocation_iterations):
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                await _run_once(pipeline, scenario, query(iteration), sources)
+                after, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(after - before)
+        finally:
+            tracemalloc.stop()
+        report.alloc_peak_bytes = int(max(peaks))
+        report.alloc_retained_bytes = int(np.mean(retained))
+    return report
+
+
+async def run_pipeline_benchmark(
+    dsn: str, config: BenchmarkConfig | None = None
+) -> BenchmarkReport:
+    """
+    Load the fixture corpus and benchmark the pipeline's entry points.
+
+    Must be run from the `python/` directory, where the compiled programs are found.
+
+    Args:
+        dsn: PostgreSQL DSN of a database with the pgvector extension available
+        config: Benchmark parameters
+
+    Returns:
+        BenchmarkReport with one entry per scenario
+    """
+    config = config or BenchmarkConfig()
+    lm, embedder = configure_standins(config)
+
+    await load_corpus(dsn, config.table_name, build_corpus(), embedder)
+    pipeline = build_benchmark_pipeline(dsn, config, embedder)
+    vector_db = pipeline.document_retriever.vector_db
+    try:
+        scenarios = {}
+        for scenario in SCENARIOS:
+            logger.info("Benchmarking pipeline", scenario=scenario, iterations=config.iterations)
+            scenarios[scenario] = await _benchmark_scenario(pipeline, scenario, config)
+    finally:
+        if vector_db.pool is not None:
+            await vector_db.pool.close()
+        vector_db.conn.close()
+
+    return BenchmarkReport(
+        created_at=datetime.now(timezone.utc).isoformat(),
+        environment={
+            "python": platform.python_version(),
+            "dspy": dspy.__version__,
+            "machine": platform.machine(),
+        },
+        config={**asdict(config), "queries": len(config.queries)},
+        scenarios=scenarios,
+    )
+
+
+def run_pipeline_benchmark_sync(dsn: str, config: BenchmarkConfig | None = None) -> BenchmarkReport:
+    """Synchronous wrapper of `run_pipeline_benchmark` for the CLI."""
+    return asyncio.run(run_pipeline_benchmark(dsn, config))
@@ -0,0 +1,249 @@
+"""Replay of production traffic logged in `user_interactions`.
+
+Interactions of a time window are re-sent to a target server with their chat
+history, agent, MCP mode and conversation id, keeping their original spacing
+(optionally sped up). Each replayed request is measured like a load-test request,
+and its answer and sources are compared with the ones that were logged.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any
+
+import httpx
+
+from cairo_coder.db.models import UserInteraction
+from cairo_coder.db.repository import get_interactions_in_window
+from cairo_coder.db.session import close_pool
+from cairo_coder_tools.benchmarks.load import (
+    LoadReport,
+    RequestResult,
+    format_load_report,
+    send_request,
+    summarize,
+)
+from cairo_coder_tools.benchmarks.pipeline import StageStats
+
+# Agent of the /v1/chat/completions endpoint
+DEFAULT_AGENT_ID = "cairo-coder"
+
+
+@dataclass
+class ReplayConfig:
+    """Parameters of a traffic replay."""
+
+    base_url: str
+    # 1.0 replays at the original QPS, 2.0 twice as fast
+    speedup: float = 1.0
+    max_concurrency: int = 64
+    # Streaming responses carry the sources, so they can be compared
+    stream: bool = True
+    timeout_s: float = 180.0
+
+    def __post_init__(self) -> None:
+        if self.speedup <= 0:
+            raise ValueError("Replay speedup must be positive")
+        if self.max_concurrency <= 0:
+            raise ValueError("Replay concurrency must be positive")
+
+
+@dataclass
+class InteractionDiff:
+    """Differences between a logged interaction and its replay."""
+
+    interaction_id: str
+    agent_id: str
+    latency_s: float
+    error: str | None
+    # Similarity ratio of the answers, from 0 (unrelated) to 1 (identical)
+    answer_similarity: float | None
+    # Jaccard index of the source URLs; None when sources were not compared
+    source_overlap: float | None = None
+    sources_added: list[str] = field(default_factory=list)
+    sources_removed: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ReplayReport:
+    """Load measurements and answer/source diffs of a replay."""
+
+    load: LoadReport
+    answer_similarity: StageStats | None
+    source_overlap: StageStats | None
+    changed_sources: int
+    diffs: list[InteractionDiff]
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable representation."""
+        return {**asdict(self), "load": self.load.to_dict()}
+
+
+def interaction_messages(interaction: UserInteraction) -> list[dict[str, str]]:
+    """Request messages of a logged interaction: its history, then its query."""
+    history = [
+        {"role": message.get("role", "user"), "content": message.get("content") or ""}
+        for message in interaction.chat_history or []
+    ]
+    return [*history, {"role": "user", "content": interaction.query}]
+
+
+def interaction_endpoint(base_url: str, interaction: UserInteraction) -> str:
+    """Chat completion URL serving the interaction's agent."""
+    base = base_url.rstrip("/")
+    if interaction.agent_id == DEFAULT_AGENT_ID:
+        return f"{base}/v1/chat/completions"
+    return f"{base}/v1/agents/{interaction.agent_id}/chat/completions"
+
+
+def interaction_headers(interaction: UserInteraction) -> dict[str, str]:
+    """Headers reproducing the interaction's mode and conversation."""
+    headers = {}
+    if interaction.mcp_mode:
+        headers["x-mcp-mode"] = "true"
+    if interaction.conversation_id:
+        headers["x-conversation-id"] = interaction.conversation_id
+    return headers
+
+
+def logged_source_urls(interaction: UserInteraction) -> set[str]:
+    """URLs of the sources retrieved when the interaction was logged."""
+    urls = set()
+    for source in interaction.retrieved_sources or []:
+        metadata = source.get("metadata") or {}
+        url = metadata.get("sourceLink") or metadata.get("url")
+        if url:
+            urls.add(url)
+    return urls
+
+
+def diff_interaction(interaction: UserInteraction, result: RequestResult) -> InteractionDiff:
+    """Compare a replayed request with the logged interaction."""
+    diff = InteractionDiff(
+        interaction_id=str(interaction.id),
+        agent_id=interaction.agent_id,
+        latency_s=result.latency_s,
+        error=result.error,
+        answer_similarity=None,
+    )
+    if not result.ok:
+        return diff
+    if interaction.generated_answer is not None:
+        diff.answer_similarity = SequenceMatcher(
+            None, interaction.generated_answer, result.answer
+        ).ratio()
+    if result.source_urls is not None and interaction.retrieved_sources is not None:
+        before = logged_source_urls(interaction)
+        after = {url for url in result.source_urls if url}
+        union = before | after
+        diff.source_overlap = len(before & after) / len(union) if union else 1.0
+        diff.sources_added = sorted(after - before)
+        diff.sources_removed = sorted(before - after)
+    return diff
+
+
+def format_replay_report(report: ReplayReport) -> str:
+    """Human-readable summary of a replay report."""
+    lines = [format_load_report(report.load)]
+    for name, stats in (
+        ("answer similarity", report.answer_similarity),
+        ("source overlap", report.source_overlap),
+    ):
+        if stats is not None:
+            lines.append(f"  {name:<22}{stats.count:>7}{stats.p50:>10.2f}  mean {stats.mean:.2f}")
+    lines.append(f"  {report.changed_sources} replayed request(s) retrieved different sources")
+    return "\n".join(lines)
+
+
+async def replay_interactions(
+    interactions: list[UserInteraction], config: ReplayConfig
+) -> ReplayReport:
+    """
+    Replay interactions against a running server.
+
+    Requests start at their original offsets from the first interaction, divided
+    by `config.speedup`. Beyond `config.max_concurrency` requests in flight, new
+    ones wait, and the wait counts towards their latency.
+
+    Args:
+        interactions: Logged interactions, oldest first
+        config: Replay parameters
+
+    Returns:
+        ReplayReport
+    """
+    if not interactions:
+        raise ValueError("No interaction to replay")
+
+    origin = interactions[0].created_at
+    results: list[RequestResult | None] = [None] * len(interactions)
+    limits = httpx.Limits(
+        max_connections=config.max_concurrency, max_keepalive_connections=config.max_concurrency
+    )
+    in_flight = asyncio.Semaphore(config.max_concurrency)
+
+    async with httpx.AsyncClient(timeout=config.timeout_s, limits=limits) as client:
+        test_start = time.perf_counter()
+
+        async def replay(index: int, interaction: UserInteraction) -> None:
+            offset = (interaction.created_at - origin).total_seconds() / config.speedup
+            arrival = test_start + offset
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            async with in_flight:
+                results[index] = await send_request(
+                    client,
+                    interaction_endpoint(config.base_url, interaction),
+                    interaction_messages(interaction),
+                    config.stream,
+                    arrival,
+                    test_start,
+                    headers=interaction_headers(interaction),
+                )
+
+        await asyncio.gather(
+            *(replay(index, interaction) for index, interaction in enumerate(interactions))
+        )
+        wall_time_s = time.perf_counter() - test_start
+
+    completed = [result for result in results if result is not None]
+    diffs = [diff_interaction(i, r) for i, r in zip(interactions, completed, strict=True)]
+    similarities = [d.answer_similarity for d in diffs if d.answer_similarity is not None]
+    overlaps = [d.source_overlap for d in diffs if d.source_overlap is not None]
+    return ReplayReport(
+        load=summarize(
+            completed,
+            wall_time_s,
+            {
+                **asdict(config),
+                "interactions": len(interactions),
+                "window_start": origin.isoformat(),
+                "window_end": interactions[-1].created_at.isoformat(),
+            },
+        ),
+        answer_similarity=StageStats.from_samples(similarities) if similarities else None,
+        source_overlap=StageStats.from_samples(overlaps) if overlaps else None,
+        changed_sources=sum(1 for d in diffs if d.sources_added or d.sources_removed),
+        diffs=diffs,
+    )
+
+
+async def replay_window(
+    start_date: datetime,
+    end_date: datetime,
+    config: ReplayConfig,
+    agent_id: str | None = None,
+    limit: int | None = None,
+) -> ReplayReport:
+    """Replay the interactions logged between `start_date` and `end_date`.
+
+    The interactions are read from the database configured for the server.
+    """
+    try:
+        interactions = await get_interactions_in_window(start_date, end_date, agent_id, limit)
+    finally:
+        await close_pool()
+    return await replay_interactions(interactions, config)
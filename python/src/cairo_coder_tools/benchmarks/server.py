@@ -0,0 +1,127 @@
+"""Local Cairo Coder server backed by the benchmark stand-ins.
+
+The real FastAPI application (routes, streaming, coalescing, interaction logging)
+is served on the fixture corpus, with every LM, the embedder and Grok search
+replaced by the stand-ins, so load tests exercise the server without any
+external service.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import socket
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+
+import uvicorn
+from fastapi import FastAPI
+
+from cairo_coder.core.agent_factory import AgentFactory
+from cairo_coder.core.rag_pipeline import RagPipeline
+from cairo_coder.server import app as server_app
+from cairo_coder_tools.benchmarks.corpus import (
+    build_corpus,
+    load_corpus,
+    vector_store_config_from_dsn,
+)
+from cairo_coder_tools.benchmarks.pipeline import (
+    BenchmarkConfig,
+    configure_standins,
+    use_standin_programs,
+)
+
+SERVER_START_TIMEOUT_S = 30.0
+
+
+class StandinAgentFactory(AgentFactory):
+    """Agent factory whose pipelines use the stand-in judge, summary and Grok."""
+
+    def __init__(self, factory: AgentFactory, config: BenchmarkConfig):
+        super().__init__(factory.vector_db, factory.vector_store_config)
+        self.config = config
+
+    def get_or_create_agent(self, agent_id: str, mcp_mode: bool = False) -> RagPipeline:
+        cached = f"{agent_id}_{mcp_mode}" in self._agent_cache
+        agent = super().get_or_create_agent(agent_id, mcp_mode)
+        if not cached:
+            use_standin_programs(agent, self.config)
+        return agent
+
+
+def create_standin_app(dsn: str, config: BenchmarkConfig | None = None) -> FastAPI:
+    """
+    Create the server application on the benchmark database, with stand-ins.
+
+    The fixture corpus is loaded when the application starts. The server reads
+    its database settings from the environment, so they are overridden here.
+
+    Args:
+        dsn: PostgreSQL DSN of a database with the pgvector extension available
+        config: Stand-in latencies and fixture table
+
+    Returns:
+        FastAPI application
+    """
+    config = config or BenchmarkConfig()
+    vector_store_config = vector_store_config_from_dsn(dsn, config.table_name)
+    os.environ.update(
+        {
+            "POSTGRES_HOST": vector_store_config.host,
+            "POSTGRES_PORT": str(vector_store_config.port),
+            "POSTGRES_DB": vector_store_config.database,
+            "POSTGRES_USER": vector_store_config.user,
+            "POSTGRES_PASSWORD": vector_store_config.password,
+            "POSTGRES_TABLE_NAME": vector_store_config.table_name,
+        }
+    )
+    # The Grok client is created with each pipeline, then replaced by the stand-in
+    os.environ.setdefault("XAI_API_KEY", "offline-benchmark")
+
+    app = server_app.create_app(vector_store_config)
+    # The server configures the production LMs; replace them afterwards
+    _, embedder = configure_standins(config)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        await load_corpus(dsn, config.table_name, build_corpus(), embedder)
+        async with server_app.lifespan(app):
+            assert server_app._agent_factory is not None
+            server_app._agent_factory = StandinAgentFactory(server_app._agent_factory, config)
+            yield
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def free_port() -> int:
+    """A TCP port available on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_in_thread(app: FastAPI, port: int | None = None) -> Iterator[str]:
+    """
+    Serve `app` with uvicorn in a background thread.
+
+    Yields:
+        Base URL of the running server
+    """
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="standin-server", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_S
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            server.should_exit = True
+            raise RuntimeError("Stand-in server failed to start")
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
@@ -0,0 +1,356 @@
+"""Deterministic stand-ins for the LMs and the embedder used by the pipeline.
+
+The stand-in LM is registered as the `standin` LiteLLM provider, so any
+`dspy.LM("standin/<name>")` is served locally: it reads the output fields
+announced in the adapter's system prompt (chat `[[ ## field ## ]]` or XML
+`<field>` format) and answers them with pseudo-random but deterministic values
+derived from the prompt. Latency follows a per-model profile (time to first
+token, then a constant token rate), for both plain and streamed completions.
+
+Grok web search is replaced by a module returning a fixed summary document after
+a simulated latency.
+
+The stand-in embedder returns a hashed bag-of-words unit vector, so queries and
+fixture documents sharing words are closer in cosine distance.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import dspy
+import litellm
+import numpy as np
+from litellm import CustomLLM
+from litellm.types.utils import GenericStreamingChunk, ModelResponse
+
+from cairo_coder.core.types import Document, DocumentSource, ProcessedQuery
+
+PROVIDER = "standin"
+
+# Seconds between two streamed chunks; tokens are grouped to respect it, up to
+# the chunk size of the providers' streams
+STREAM_CHUNK_INTERVAL_S = 0.01
+STREAM_MAX_CHUNK_TOKENS = 8
+
+# Chars per token used to estimate prompt tokens
+CHARS_PER_TOKEN = 4
+
+_OUTPUT_FIELDS_HEADER = "Your output fields are:"
+_FIELD_PATTERN = re.compile(r"^\d+\. `(\w+)` \((.+?)\):", re.MULTILINE)
+
+VOCABULARY = (
+    "cairo",
+    "starknet",
+    "contract",
+    "storage",
+    "felt252",
+    "trait",
+    "impl",
+    "struct",
+    "enum",
+    "array",
+    "span",
+    "event",
+    "syscall",
+    "component",
+    "interface",
+    "dispatcher",
+    "library",
+    "test",
+    "assert",
+    "module",
+    "function",
+    "generic",
+    "closure",
+    "ownership",
+    "snapshot",
+    "reference",
+    "option",
+    "result",
+    "panic",
+    "felt",
+    "integer",
+    "u256",
+    "byte",
+    "string",
+    "map",
+    "vec",
+    "deploy",
+    "account",
+    "signature",
+    "class",
+    "hash",
+)
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Simulated latency and size of a stand-in LM's completions."""
+
+    first_token_s: float = 0.2
+    tokens_per_s: float = 150.0
+    output_tokens: int = 120
+
+    def __post_init__(self) -> None:
+        if self.first_token_s < 0:
+            raise ValueError("Time to first token cannot be negative")
+        if self.tokens_per_s <= 0:
+            raise ValueError("Token rate must be positive")
+        if self.output_tokens <= 0:
+            raise ValueError("Output tokens must be positive")
+
+    def duration_s(self, tokens: int) -> float:
+        """Total time taken to produce `tokens` tokens."""
+        return self.first_token_s + tokens / self.tokens_per_s
+
+
+def _rng(*parts: str) -> random.Random:
+    digest = hashlib.sha256("\x00".join(parts).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(count))
+
+
+def parse_output_fields(system_prompt: str) -> list[tuple[str, str]]:
+    """`(name, type)` of the output fields announced in a DSPy adapter system prompt."""
+    _, _, outputs = system_prompt.partition(_OUTPUT_FIELDS_HEADER)
+    # The field list ends with the first blank line
+    outputs = outputs.strip("\n").split("\n\n", 1)[0]
+    return _FIELD_PATTERN.findall(outputs)
+
+
+def _field_value(rng: random.Random, type_name: str, words: int) -> str:
+    if type_name == "float":
+        return f"{rng.uniform(0.2, 1.0):.2f}"
+    if type_name == "int":
+        return str(rng.randint(0, 10))
+    if type_name == "bool":
+        return str(rng.random() < 0.5)
+    if type_name.startswith(("list", "List")):
+        return json.dumps([_words(rng, 4) for _ in range(3)])
+    return _words(rng, words)
+
+
+def render_completion(messages: list[dict[str, Any]], model: str, output_tokens: int) -> str:
+    """
+    Build a well-formed adapter completion answering the prompt's output fields.
+
+    The last text field (the answer) receives most of the `output_tokens` budget.
+
+    Args:
+        messages: Chat messages sent by the DSPy adapter
+        model: Model name, mixed into the seed so stand-ins differ
+        output_tokens: Approximate number of words of the completion
+
+    Returns:
+        Completion text in the adapter's format (chat or XML)
+    """
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    rng = _rng(model, *(str(m.get("content", "")) for m in messages))
+    fields = parse_output_fields(system)
+    text_fields = [name for name, type_name in fields if type_name == "str"]
+    main_field = text_fields[-1] if text_fields else None
+
+    parts = []
+    chat_format = "[[ ## " in system
+    for name, type_name in fields:
+        words = max(1, output_tokens - 12 * (len(text_fields) - 1)) if name == main_field else 12
+        value = _field_value(rng, type_name, words)
+        parts.append(
+            f"[[ ## {name} ## ]]\n{value}" if chat_format else f"<{name}>\n{value}\n</{name}>"
+        )
+    if chat_format:
+        parts.append("[[ ## completed ## ]]")
+    return "\n\n".join(parts)
+
+
+def _usage(messages: list[dict[str, Any]], text: str) -> dict[str, int]:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // CHARS_PER_TOKEN
+    completion_tokens = len(text.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _tokens(text: str) -> list[str]:
+    """Split text in whitespace-preserving word tokens."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class StandinLM(CustomLLM):
+    """LiteLLM provider serving deterministic completions with simulated latency."""
+
+    def __init__(
+        self,
+        profiles: dict[str, LatencyProfile] | None = None,
+        default_profile: LatencyProfile | None = None,
+    ):
+        """
+        Initialize the stand-in LM.
+
+        Args:
+            profiles: Latency profile per model name (the part after `standin/`)
+            default_profile: Profile of the models not listed in `profiles`
+        """
+        super().__init__()
+        self.profiles = dict(profiles or {})
+        self.default_profile = default_profile or LatencyProfile()
+        self.calls: dict[str, int] = {}
+
+    def profile(self, model: str) -> LatencyProfile:
+        """Latency profile of a model."""
+        return self.profiles.get(model.removeprefix(f"{PROVIDER}/"), self.default_profile)
+
+    def _prepare(self, model: str, messages: list[dict[str, Any]]) -> tuple[LatencyProfile, str]:
+        self.calls[model] = self.calls.get(model, 0) + 1
+        profile = self.profile(model)
+        return profile, render_completion(messages, model, profile.output_tokens)
+
+    def _response(self, model: str, messages: list[dict[str, Any]], text: str) -> ModelResponse:
+        return ModelResponse(
+            model=model,
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }
+            ],
+            usage=_usage(messages, text),
+        )
+
+    def completion(self, model: str, messages: list, *args: Any, **kwargs: Any) -> ModelResponse:
+        profile, text = self._prepare(model, messages)
+        time.sleep(profile.duration_s(len(_tokens(text))))
+        return self._response(model, messages, text)
+
+    async def acompletion(
+        self, model: str, messages: list, *args: Any, **kwargs: Any
+    ) -> ModelResponse:
+        profile, text = self._prepare(model, messages)
+        await asyncio.sleep(profile.duration_s(len(_tokens(text))))
+        return self._response(model, messages, text)
+
+    def streaming(
+        self, model: str, messages: list, *args: Any, **kwargs: Any
+    ) -> Iterator[GenericStreamingChunk]:
+        raise NotImplementedError("The stand-in LM only streams asynchronously")
+
+    async def astreaming(
+        self, model: str, messages: list, *args: Any, **kwargs: Any
+    ) -> AsyncIterator[GenericStreamingChunk]:
+        profile, text = self._prepare(model, messages)
+        tokens = _tokens(text)
+        per_chunk = min(
+            STREAM_MAX_CHUNK_TOKENS,
+            max(1, math.ceil(profile.tokens_per_s * STREAM_CHUNK_INTERVAL_S)),
+        )
+        await asyncio.sleep(profile.first_token_s)
+        for start in range(0, len(tokens), per_chunk):
+            chunk = tokens[start : start + per_chunk]
+            yield {
+                "text": "".join(chunk),
+                "is_finished": False,
+                "finish_reason": "",
+                "usage": None,
+                "index": 0,
+                "tool_use": None,
+            }
+            await asyncio.sleep(len(chunk) / profile.tokens_per_s)
+        yield {
+            "text": "",
+            "is_finished": True,
+            "finish_reason": "stop",
+            "usage": _usage(messages, text),  # type: ignore[typeddict-item]
+            "index": 0,
+            "tool_use": None,
+        }
+
+
+def register_standin_lm(lm: StandinLM) -> None:
+    """Serve `standin/*` models with `lm` (replaces a previously registered stand-in)."""
+    providers = [p for p in litellm.custom_provider_map if p.get("provider") != PROVIDER]
+    litellm.custom_provider_map = [*providers, {"provider": PROVIDER, "custom_handler": lm}]
+    # LiteLLM only reads the map when it is (re)initialized
+    litellm.utils.custom_llm_setup()
+
+
+@dataclass
+class StandinEmbedder:
+    """Deterministic hashed bag-of-words embedder with a simulated blocking latency."""
+
+    dimensions: int = 256
+    latency_s: float = 0.0
+    calls: int = field(default=0, init=False)
+
+    def __post_init__(self) -> None:
+        if self.dimensions < 2:
+            raise ValueError("Embeddings need at least 2 dimensions")
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a text without simulated latency (used to load fixtures)."""
+        words = np.zeros(self.dimensions - 1, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            words[int.from_bytes(digest, "big") % (self.dimensions - 1)] += 1.0
+        norm = float(np.linalg.norm(words))
+        if norm > 0:
+            words /= norm
+        # Shared domain component: like real embeddings of in-domain texts, any
+        # two texts are at least 0.5 similar, so the retriever threshold keeps hits
+        vector = np.concatenate([np.ones(1, dtype=np.float32), words])
+        return vector / float(np.linalg.norm(vector))
+
+    def __call__(self, text: str) -> np.ndarray:
+        """Embed a query, blocking like a remote embedding call would."""
+        self.calls += 1
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        return self.embed(text)
+
+
+class StandinGrokSearch(dspy.Module):
+    """Replacement of GrokSearchProgram answering with a fixed summary document."""
+
+    def __init__(self, latency_s: float = 0.0):
+        super().__init__()
+        self.latency_s = latency_s
+
+    async def aforward(self, processed_query: ProcessedQuery, chat_history: str) -> dspy.Prediction:
+        await asyncio.sleep(self.latency_s)
+        content = _words(_rng("grok", processed_query.original), 80)
+        prediction = dspy.Prediction(
+            documents=[
+                Document(
+                    page_content=content,
+                    metadata={
+                        "name": "grok-answer",
+                        "title": "Grok Web/X Summary",
+                        "uniqueId": f"grok-answer-{hashlib.sha1(content.encode()).hexdigest()[:12]}",
+                        "chunkNumber": 0,
+                        "source": DocumentSource.STARKNET_BLOG,
+                        "source_display": "Grok Web/X",
+                        "sourceLink": "",
+                        "url": "",
+                        "is_virtual": True,
+                    },
+                )
+            ],
+            citations=[],
+        )
+        prediction.set_lm_usage({})
+        return prediction
@@ -0,0 +1,230 @@
+"""Microbenchmarks of the streaming path.
+
+- Coalescing: a producer pushes answer chunks through the pipeline's
+  StreamEventQueue at an LM's pace, and the consumer encodes every event it
+  receives into an SSE frame the way the server does. Running the same stream
+  with coalescing disabled and enabled shows the frames per second written and
+  the CPU time saved.
+- Encoding: the cost of encoding one content chunk into an SSE frame, with the
+  pre-serialized ChatChunkEncoder (stdlib or orjson escaping, or the default
+  choice between them) against building the chunk dict and running `json.dumps`
+  on it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from itertools import cycle, islice
+
+from cairo_coder.core.constants import STREAM_COALESCE_MAX_CHARS, STREAM_COALESCE_WINDOW_S
+from cairo_coder.core.stream_queue import StreamEventQueue
+from cairo_coder.core.types import StreamEvent, StreamEventType
+from cairo_coder.server import sse
+
+POLICY_PER_CHUNK = "per-chunk"
+POLICY_COALESCED = "coalesced"
+
+ENCODER_JSON_DUMPS = "json.dumps"
+ENCODER_STDLIB = "prefix+stdlib"
+ENCODER_ORJSON = "prefix+orjson"
+ENCODER_DEFAULT = "prefix+auto"
+
+# Answer text the encoding benchmark is chunked from: prose, code, quotes,
+# newlines and non-ASCII characters, like real answers
+SAMPLE_ANSWER = """To read a storage variable, call `read()` on it:
+
+```cairo
+#[storage]
+struct Storage {
+    balance: felt252,
+}
+
+fn get_balance(self: @ContractState) -> felt252 {
+    self.balance.read() // returns the "balance" value
+}
+```
+
+The value is stored in the contract's storage — see the Cairo Book § 14.
+"""
+
+
+@dataclass
+class StreamBenchmarkResult:
+    """Frames and CPU time for streaming the same chunks under one policy."""
+
+    policy: str
+    chunks: int
+    frames: int
+    bytes: int
+    wall_s: float
+    cpu_s: float
+
+    @property
+    def frames_per_s(self) -> float:
+        """SSE frames written per second."""
+        return self.frames / self.wall_s if self.wall_s > 0 else 0.0
+
+    @property
+    def cpu_us_per_chunk(self) -> float:
+        """Process CPU time per streamed chunk, in microseconds."""
+        return self.cpu_s / self.chunks * 1e6 if self.chunks else 0.0
+
+
+@dataclass
+class EncoderBenchmarkResult:
+    """Cost of encoding content chunks into SSE frames with one encoder."""
+
+    encoder: str
+    chunks: int
+    ns_per_chunk: float
+
+
+def json_dumps_frame(text: str, response_id: str, created: int) -> str:
+    """SSE frame of a content chunk, built as a full dict and run through `json.dumps`."""
+    chunk = {
+        "id": response_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": "cairo-coder",
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def stream_once(
+    queue: StreamEventQueue, chunks: int, chunk_chars: int, rate_cps: float | None
+) -> tuple[int, int]:
+    """
+    Stream `chunks` answer chunks through `queue` and encode the resulting frames.
+
+    Args:
+        queue: Queue under test
+        chunks: Number of chunks produced
+        chunk_chars: Characters per chunk
+        rate_cps: Chunks produced per second; None produces them back to back,
+            yielding to the event loop between chunks like a network read
+
+    Returns:
+        Tuple of (frames, bytes) written
+    """
+    text = "x" * chunk_chars
+
+    async def produce() -> None:
+        start = time.perf_counter()
+        try:
+            for index in range(chunks):
+                if rate_cps is None:
+                    await asyncio.sleep(0)
+                else:
+                    await asyncio.sleep(max(0.0, start + index / rate_cps - time.perf_counter()))
+                await queue.put(StreamEvent(type=StreamEventType.RESPONSE, data=text))
+        finally:
+            queue.close()
+
+    producer = asyncio.create_task(produce())
+    frames = written = 0
+    encoder = sse.ChatChunkEncoder("benchmark", int(time.time()))
+    async for event in queue.events():
+        written += len(encoder.content(event.data))  # type: ignore[arg-type]
+        frames += 1
+    await producer
+    return frames, written
+
+
+async def run_stream_benchmark(
+    chunks: int = 2000,
+    chunk_chars: int = 4,
+    rate_cps: float | None = 1000.0,
+    coalesce_window_s: float = STREAM_COALESCE_WINDOW_S,
+    coalesce_max_chars: int = STREAM_COALESCE_MAX_CHARS,
+) -> list[StreamBenchmarkResult]:
+    """Stream the same chunks with coalescing disabled, then enabled."""
+    if chunks <= 0 or chunk_chars <= 0:
+        raise ValueError("Stream benchmark needs at least one non-empty chunk")
+    policies = [
+        (POLICY_PER_CHUNK, StreamEventQueue(coalesce_window_s=0.0)),
+        (
+            POLICY_COALESCED,
+            StreamEventQueue(
+                coalesce_window_s=coalesce_window_s, coalesce_max_chars=coalesce_max_chars
+            ),
+        ),
+    ]
+    results = []
+    for policy, queue in policies:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        frames, written = await stream_once(queue, chunks, chunk_chars, rate_cps)
+        results.append(
+            StreamBenchmarkResult(
+                policy=policy,
+                chunks=chunks,
+                frames=frames,
+                bytes=written,
+                wall_s=time.perf_counter() - wall_start,
+                cpu_s=time.process_time() - cpu_start,
+            )
+        )
+    return results
+
+
+def format_stream_results(results: list[StreamBenchmarkResult]) -> str:
+    """Human-readable comparison of the streaming policies."""
+    lines = [f"  {'policy':<12}{'frames':>8}{'frames/s':>10}{'KiB':>8}{'CPU us/chunk':>14}"]
+    for result in results:
+        lines.append(
+            f"  {result.policy:<12}{result.frames:>8}{result.frames_per_s:>10.0f}"
+            f"{result.bytes / 1024:>8.0f}{result.cpu_us_per_chunk:>14.1f}"
+        )
+    return "\n".join(lines)
+
+
+def sample_chunks(chunks: int, chunk_chars: int) -> list[str]:
+    """`chunks` consecutive slices of the sample answer."""
+    text = "".join(islice(cycle(SAMPLE_ANSWER), chunks * chunk_chars))
+    return [text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+
+
+def run_encoder_benchmark(
+    chunks: int = 100_000, chunk_chars: int = 8, repeat: int = 3
+) -> list[EncoderBenchmarkResult]:
+    """Time the encoding of the same content chunks with each encoder (best of `repeat`)."""
+    if chunks <= 0 or chunk_chars <= 0 or repeat <= 0:
+        raise ValueError("Encoder benchmark needs positive sizes")
+    texts = sample_chunks(chunks, chunk_chars)
+    created = int(time.time())
+    stdlib_encoder = sse.ChatChunkEncoder("benchmark", created, use_orjson=False)
+    encoders = {
+        ENCODER_JSON_DUMPS: lambda text: json_dumps_frame(text, "benchmark", created),
+        ENCODER_STDLIB: stdlib_encoder.content,
+    }
+    if sse.orjson is not None:
+        encoders[ENCODER_ORJSON] = sse.ChatChunkEncoder(
+            "benchmark", created, use_orjson=True
+        ).content
+    encoders[ENCODER_DEFAULT] = sse.ChatChunkEncoder("benchmark", created).content
+
+    results = []
+    for name, encode in encoders.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for text in texts:
+                encode(text)
+            best = min(best, time.perf_counter_ns() - start)
+        results.append(EncoderBenchmarkResult(name, len(texts), best / len(texts)))
+    return results
+
+
+def format_encoder_results(results: list[EncoderBenchmarkResult]) -> str:
+    """Human-readable comparison of the chunk encoders."""
+    baseline = results[0].ns_per_chunk
+    lines = [f"  {'encoder':<16}{'ns/chunk':>10}{'speedup':>9}"]
+    for result in results:
+        lines.append(
+            f"  {result.encoder:<16}{result.ns_per_chunk:>10.0f}"
+            f"{baseline / result.ns_per_chunk:>8.1f}x"
+        )
+    return "\n".join(lines)
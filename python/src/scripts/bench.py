@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""Benchmark CLI for Cairo Coder.
+
+This module provides commands for benchmarking the RAG pipeline offline, with
+deterministic LM and embedder stand-ins, for the streaming path, for load testing
+the API server, for replaying logged production traffic, and for comparing
+benchmark reports.
+"""
+
+import asyncio
+import json
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+import typer
+import uvicorn
+from typer.core import TyperGroup
+
+from cairo_coder.core.constants import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    STREAM_COALESCE_MAX_CHARS,
+    STREAM_COALESCE_WINDOW_S,
+)
+from cairo_coder_tools.benchmarks.corpus import pgvector_database
+from cairo_coder_tools.benchmarks.imports import (
+    SERVER_IMPORT_BUDGET_MS,
+    SERVER_LAZY_MODULES,
+    SERVER_MODULE,
+    format_import_report,
+    measure_import_time,
+)
+from cairo_coder_tools.benchmarks.load import (
+    ARRIVAL_CLOSED,
+    LoadConfig,
+    LoadReport,
+    format_load_report,
+    run_load_test,
+)
+from cairo_coder_tools.benchmarks.pipeline import (
+    BenchmarkConfig,
+    BenchmarkReport,
+    Regression,
+    compare_reports,
+    format_report,
+    run_pipeline_benchmark_sync,
+)
+from cairo_coder_tools.benchmarks.replay import ReplayConfig, format_replay_report, replay_window
+from cairo_coder_tools.benchmarks.server import create_standin_app, run_in_thread
+from cairo_coder_tools.benchmarks.standins import LatencyProfile
+from cairo_coder_tools.benchmarks.streaming import (
+    format_encoder_results,
+    format_stream_results,
+    run_encoder_benchmark,
+    run_stream_benchmark,
+)
+
+
+class HelpOnInvalidCommand(TyperGroup):
+    """Custom typer group that shows help on invalid commands."""
+
+    def get_command(self, ctx, cmd_name):  # type: ignore[override]
+        cmd = super().get_command(ctx, cmd_name)
+        if cmd is None:
+            # Show a friendly message and the group's help, then exit with code 2
+            typer.secho(f"Error: Unknown command '{cmd_name}'.", fg=typer.colors.RED, err=True)
+            typer.echo()
+            typer.echo(ctx.get_help())
+            # Use Click's normal control flow to avoid rich tracebacks
+            raise click.exceptions.Exit(2)
+        return cmd
+
+
+app = typer.Typer(
+    cls=HelpOnInvalidCommand,
+    help="Cairo Coder Benchmarks CLI",
+    no_args_is_help=True,
+)
+
+
+def _report_regressions(regressions: list[Regression], tolerance: float) -> None:
+    """Print regressions and exit with code 1 if there are any."""
+    if not regressions:
+        typer.secho(
+            f"No regression above {tolerance:.0%} compared to the baseline.", fg=typer.colors.GREEN
+        )
+        return
+    typer.secho(
+        f"{len(regressions)} regression(s) above {tolerance:.0%}:", fg=typer.colors.RED, err=True
+    )
+    for regression in regressions:
+        typer.echo(
+            f"  {regression.scenario} {regression.metric}: "
+            f"{regression.baseline:.4g} -> {regression.current:.4g} (x{regression.ratio:.2f})",
+            err=True,
+        )
+    raise typer.Exit(1)
+
+
+def _write_json(output: Path, data: dict) -> None:
+    """Write a JSON report."""
+    output = Path(output).expanduser()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(data, indent=2) + "\n")
+    typer.echo(f"Report written to {output}")
+
+
+# Stand-in options shared by the commands running the pipeline
+DSN_OPTION = typer.Option(
+    None,
+    "--dsn",
+    help="Postgres DSN with pgvector (default: a throwaway testcontainers database)",
+)
+LM_FIRST_TOKEN_OPTION = typer.Option(
+    0.3, "--lm-first-token-s", help="Stand-in LM time to first token"
+)
+LM_TOKENS_PER_S_OPTION = typer.Option(120.0, "--lm-tokens-per-s", help="Stand-in LM token rate")
+LM_OUTPUT_TOKENS_OPTION = typer.Option(
+    250, "--lm-output-tokens", help="Stand-in LM completion size"
+)
+JUDGE_FIRST_TOKEN_OPTION = typer.Option(
+    0.15, "--judge-first-token-s", help="Stand-in judge LM time to first token"
+)
+JUDGE_TOKENS_PER_S_OPTION = typer.Option(
+    300.0, "--judge-tokens-per-s", help="Stand-in judge LM token rate"
+)
+JUDGE_OUTPUT_TOKENS_OPTION = typer.Option(
+    40, "--judge-output-tokens", help="Stand-in judge LM completion size"
+)
+EMBEDDING_LATENCY_OPTION = typer.Option(
+    0.05, "--embedding-latency-s", help="Stand-in embedder latency"
+)
+
+
+def _standin_config(
+    lm_first_token_s: float,
+    lm_tokens_per_s: float,
+    lm_output_tokens: int,
+    judge_first_token_s: float,
+    judge_tokens_per_s: float,
+    judge_output_tokens: int,
+    embedding_latency_s: float,
+    **kwargs,
+) -> BenchmarkConfig:
+    """Benchmark config with the stand-in latencies given on the command line."""
+    return BenchmarkConfig(
+        lm_profile=LatencyProfile(
+            first_token_s=lm_first_token_s,
+            tokens_per_s=lm_tokens_per_s,
+            output_tokens=lm_output_tokens,
+        ),
+        judge_profile=LatencyProfile(
+            first_token_s=judge_first_token_s,
+            tokens_per_s=judge_tokens_per_s,
+            output_tokens=judge_output_tokens,
+        ),
+        embedding_latency_s=embedding_latency_s,
+        **kwargs,
+    )
+
+
+@app.command("pipeline")
+def bench_pipeline(
+    iterations: int = typer.Option(20, "--iterations", help="Measured runs per scenario"),
+    warmup: int = typer.Option(2, "--warmup", help="Unmeasured runs per scenario"),
+    allocation_iterations: int = typer.Option(
+        5, "--allocation-iterations", help="Runs traced for allocations (0 to skip)"
+    ),
+    agent: str = typer.Option("cairo-coder", "--agent", help="Agent whose pipeline is benchmarked"),
+    dsn: str | None = DSN_OPTION,
+    lm_first_token_s: float = LM_FIRST_TOKEN_OPTION,
+    lm_tokens_per_s: float = LM_TOKENS_PER_S_OPTION,
+    lm_output_tokens: int = LM_OUTPUT_TOKENS_OPTION,
+    judge_first_token_s: float = JUDGE_FIRST_TOKEN_OPTION,
+    judge_tokens_per_s: float = JUDGE_TOKENS_PER_S_OPTION,
+    judge_output_tokens: int = JUDGE_OUTPUT_TOKENS_OPTION,
+    embedding_latency_s: float = EMBEDDING_LATENCY_OPTION,
+    output: Path | None = typer.Option(None, "--output", help="Where to write the JSON report"),
+    baseline: Path | None = typer.Option(None, "--baseline", help="JSON report to compare against"),
+    tolerance: float = typer.Option(
+        0.15, "--tolerance", help="Allowed relative regression (0.15 = 15%)"
+    ),
+) -> None:
+    """Benchmark aforward and aforward_streaming on a fixture corpus.
+
+    Run from the python/ directory, where the compiled DSPy programs are found.
+    Exits with code 1 when a metric regressed compared to --baseline.
+    """
+    config = _standin_config(
+        lm_first_token_s,
+        lm_tokens_per_s,
+        lm_output_tokens,
+        judge_first_token_s,
+        judge_tokens_per_s,
+        judge_output_tokens,
+        embedding_latency_s,
+        agent_id=agent,
+        iterations=iterations,
+        warmup=warmup,
+        allocation_iterations=allocation_iterations,
+    )
+    with pgvector_database(dsn) as database_dsn:
+        report = run_pipeline_benchmark_sync(database_dsn, config)
+
+    typer.echo(format_report(report))
+    if output is not None:
+        report.save(Path(output).expanduser())
+        typer.echo(f"Report written to {output}")
+    if baseline is not None:
+        _report_regressions(
+            compare_reports(BenchmarkReport.load(Path(baseline).expanduser()), report, tolerance),
+            tolerance,
+        )
+
+
+@app.command("stream")
+def bench_stream(
+    chunks: int = typer.Option(2000, "--chunks", help="Answer chunks streamed"),
+    chunk_chars: int = typer.Option(4, "--chunk-chars", help="Characters per chunk"),
+    rate: float = typer.Option(
+        1000.0, "--rate", help="Chunks produced per second (0 = back to back)"
+    ),
+    window_s: float = typer.Option(
+        STREAM_COALESCE_WINDOW_S, "--window-s", help="Coalescing window"
+    ),
+    max_chars: int = typer.Option(
+        STREAM_COALESCE_MAX_CHARS, "--max-chars", help="Coalesced event size limit"
+    ),
+) -> None:
+    """Compare SSE frames and CPU per chunk with and without chunk coalescing."""
+    results = asyncio.run(
+        run_stream_benchmark(chunks, chunk_chars, rate or None, window_s, max_chars)
+    )
+    typer.echo(format_stream_results(results))
+
+
+@app.command("sse")
+def bench_sse(
+    chunks: int = typer.Option(100_000, "--chunks", help="Content chunks encoded"),
+    chunk_chars: int = typer.Option(8, "--chunk-chars", help="Characters per chunk"),
+) -> None:
+    """Compare the per-chunk cost of the SSE encoders."""
+    typer.echo(format_encoder_results(run_encoder_benchmark(chunks, chunk_chars)))
+
+
+@app.command("imports")
+def bench_imports(
+    module: str = typer.Option(SERVER_MODULE, "--module", help="Module whose import is timed"),
+    runs: int = typer.Option(5, "--runs", help="Fresh interpreters started (best run kept)"),
+    budget_ms: float | None = typer.Option(
+        None,
+        "--budget-ms",
+        help=f"Maximum import time (default: {SERVER_IMPORT_BUDGET_MS:.0f} for the server)",
+    ),
+    top: int = typer.Option(15, "--top", help="Slowest imports listed"),
+) -> None:
+    """Time a module's import with `python -X importtime`, against a budget.
+
+    Exits with code 1 when the import exceeds the budget, or when the server
+    imports DSPy or the pipeline modules eagerly.
+    """
+    report = measure_import_time(module, runs)
+    typer.echo(format_import_report(report, top))
+
+    is_server = module == SERVER_MODULE
+    if budget_ms is None and is_server:
+        budget_ms = SERVER_IMPORT_BUDGET_MS
+    failed = False
+    if budget_ms is not None and report.total_ms > budget_ms:
+        typer.secho(
+            f"Import took {report.total_ms:.0f} ms, over the {budget_ms:.0f} ms budget.",
+            fg=typer.colors.RED,
+            err=True,
+        )
+        failed = True
+    eager = report.eager_imports(SERVER_LAZY_MODULES) if is_server else []
+    if eager:
+        typer.secho(
+            f"Modules meant to load lazily were imported: {', '.join(eager)}",
+            fg=typer.colors.RED,
+            err=True,
+        )
+        failed = True
+    if failed:
+        raise typer.Exit(1)
+    if budget_ms is not None:
+        typer.secho(f"Within the {budget_ms:.0f} ms budget.", fg=typer.colors.GREEN)
+
+
+@app.command("serve")
+def bench_serve(
+    port: int = typer.Option(DEFAULT_PORT, "--port", help="Port to listen on"),
+    dsn: str | None = DSN_OPTION,
+    lm_first_token_s: float = LM_FIRST_TOKEN_OPTION,
+    lm_tokens_per_s: float = LM_TOKENS_PER_S_OPTION,
+    lm_output_tokens: int = LM_OUTPUT_TOKENS_OPTION,
+    judge_first_token_s: float = JUDGE_FIRST_TOKEN_OPTION,
+    judge_tokens_per_s: float = JUDGE_TOKENS_PER_S_OPTION,
+    judge_output_tokens: int = JUDGE_OUTPUT_TOKENS_OPTION,
+    embedding_latency_s: float = EMBEDDING_LATENCY_OPTION,
+) -> None:
+    """Serve the API on the fixture corpus with stand-in LMs, until interrupted.
+
+    Run from the python/ directory, where the compiled DSPy programs are found.
+    """
+    config = _standin_config(
+        lm_first_token_s,
+        lm_tokens_per_s,
+        lm_output_tokens,
+        judge_first_token_s,
+        judge_tokens_per_s,
+        judge_output_tokens,
+        embedding_latency_s,
+    )
+    with pgvector_database(dsn) as database_dsn:
+        uvicorn.run(
+            create_standin_app(database_dsn, config), host=DEFAULT_HOST, port=port, log_level="info"
+        )
+
+
+@app.command("load")
+def bench_load(
+    url: str | None = typer.Option(
+        None,
+        "--url",
+        help="Server to load (default: a local stand-in server on the fixture corpus)",
+    ),
+    agent: str | None = typer.Option(
+        None,
+        "--agent",
+        help="Load /v1/agents/{agent}/chat/completions instead of /v1/chat/completions",
+    ),
+    arrival: str = typer.Option(
+        ARRIVAL_CLOSED, "--arrival", help="'closed' (fixed clients) or 'open' (Poisson arrivals)"
+    ),
+    concurrency: int = typer.Option(
+        8, "--concurrency", help="Clients (closed loop) or max requests in flight (open loop)"
+    ),
+    rate: float = typer.Option(2.0, "--rate", help="Arrival rate in requests/s (open loop)"),
+    duration: float = typer.Option(60.0, "--duration", help="Test duration in seconds"),
+    stream_ratio: float = typer.Option(
+        0.5, "--stream-ratio", help="Fraction of streaming requests"
+    ),
+    repeat_queries: bool = typer.Option(
+        False,
+        "--repeat-queries",
+        help="Send identical queries (lets coalescing and caching kick in)",
+    ),
+    dsn: str | None = DSN_OPTION,
+    lm_first_token_s: float = LM_FIRST_TOKEN_OPTION,
+    lm_tokens_per_s: float = LM_TOKENS_PER_S_OPTION,
+    lm_output_tokens: int = LM_OUTPUT_TOKENS_OPTION,
+    judge_first_token_s: float = JUDGE_FIRST_TOKEN_OPTION,
+    judge_tokens_per_s: float = JUDGE_TOKENS_PER_S_OPTION,
+    judge_output_tokens: int = JUDGE_OUTPUT_TOKENS_OPTION,
+    embedding_latency_s: float = EMBEDDING_LATENCY_OPTION,
+    output: Path | None = typer.Option(None, "--output", help="Where to write the JSON report"),
+) -> None:
+    """Load the chat completion endpoint and report TTFT, throughput and latencies.
+
+    Without --url, a stand-in server is started locally (run from the python/
+    directory); the stand-in options only apply to it.
+    """
+
+    def run(base_url: str) -> LoadReport:
+        config = LoadConfig(
+            base_url=base_url,
+            agent_id=agent,
+            arrival=arrival,
+            concurrency=concurrency,
+            rate_qps=rate,
+            duration_s=duration,
+            stream_ratio=stream_ratio,
+            unique_queries=not repeat_queries,
+        )
+        return asyncio.run(run_load_test(config))
+
+    if url is not None:
+        report = run(url)
+    else:
+        config = _standin_config(
+            lm_first_token_s,
+            lm_tokens_per_s,
+            lm_output_tokens,
+            judge_first_token_s,
+            judge_tokens_per_s,
+            judge_output_tokens,
+            embedding_latency_s,
+        )
+        with (
+            pgvector_database(dsn) as database_dsn,
+            run_in_thread(create_standin_app(database_dsn, config)) as base_url,
+        ):
+            report = run(base_url)
+
+    typer.echo(format_load_report(report))
+    if output is not None:
+        _write_json(output, report.to_dict())
+
+
+@app.command("replay")
+def bench_replay(
+    url: str = typer.Option(..., "--url", help="Server receiving the replayed traffic"),
+    start: datetime = typer.Option(..., "--start", help="Start of the window, in UTC"),
+    end: datetime | None = typer.Option(
+        None, "--end", help="End of the window, in UTC (default: now)"
+    ),
+    agent: str | None = typer.Option(
+        None, "--agent", help="Only replay interactions of this agent"
+    ),
+    limit: int | None = typer.Option(None, "--limit", help="Replay at most this many interactions"),
+    speedup: float = typer.Option(
+        1.0, "--speedup", help="Replay rate relative to the original QPS"
+    ),
+    max_concurrency: int = typer.Option(64, "--max-concurrency", help="Maximum requests in flight"),
+    stream: bool = typer.Option(
+        True, "--stream/--no-stream", help="Request streaming responses (needed to compare sources)"
+    ),
+    output: Path | None = typer.Option(
+        None, "--output", help="Where to write the JSON report, with per-request diffs"
+    ),
+) -> None:
+    """Replay interactions logged in user_interactions against a server.
+
+    The interactions are read from the database configured by the POSTGRES_*
+    environment variables.
+    """
+
+    def as_utc(moment: datetime) -> datetime:
+        return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+    config = ReplayConfig(
+        base_url=url, speedup=speedup, max_concurrency=max_concurrency, stream=stream
+    )
+    report = asyncio.run(
+        replay_window(
+            as_utc(start), as_utc(end or datetime.now(timezone.utc)), config, agent, limit
+        )
+    )
+
+    typer.echo(format_replay_report(report))
+    if output is not None:
+        _write_json(output, report.to_dict())
+
+
+@app.command("compare")
+def bench_compare(
+    baseline: Path = typer.Argument(..., help="Reference JSON report"),
+    current: Path = typer.Argument(..., help="JSON report to check"),
+    tolerance: float = typer.Option(
+        0.15, "--tolerance", help="Allowed relative regression (0.15 = 15%)"
+    ),
+    as_json: bool = typer.Option(False, "--json", help="Print the regressions as JSON"),
+) -> None:
+    """Compare two stored benchmark reports; exits with code 1 on regressions."""
+    regressions = compare_reports(
+        BenchmarkReport.load(baseline), BenchmarkReport.load(current), tolerance
+    )
+    if as_json:
+        typer.echo(json.dumps([asdict(regression) for regression in regressions], indent=2))
+        if regressions:
+            raise typer.Exit(1)
+        return
+    _report_regressions(regressions, tolerance)
+
+
+if __name__ == "__main__":
+    app()
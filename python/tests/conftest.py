@@ -5,6 +5,7 @@ This module provides common fixtures and utilities used across multiple test fil
 to reduce code duplication and ensure consistency.
 """
 
+import asyncio
 import os
 from unittest.mock import AsyncMock, Mock, patch
 from urllib.parse import urlparse
@@ -15,6 +16,7 @@ from fastapi.testclient import TestClient
 
 from cairo_coder.agents.registry import AgentId
 from cairo_coder.core.agent_factory import AgentFactory
+from cairo_coder.core.circuit_breaker import configure_circuit_breakers
 from cairo_coder.core.config import VectorStoreConfig
 from cairo_coder.core.rag_pipeline import RagPipeline, RagPipelineConfig
 from cairo_coder.core.types import (
@@ -39,6 +41,39 @@ def enable_dspy_track_usage(monkeypatch):
     yield
 
 
+@pytest.fixture(autouse=True)
+def closed_circuit_breakers():
+    """Start every test with closed circuit breakers (they are per process)."""
+    configure_circuit_breakers()
+    yield
+
+
+@pytest.fixture
+def send_to_gone_client():
+    """
+    Send a streaming response to a client that disconnected before the response started.
+
+    Uses the ASGI 2.3 behaviour of uvicorn: Starlette cancels the stream on disconnect,
+    here before the body generator ever runs.
+    """
+
+    async def send_response(response) -> list[dict]:
+        sent: list[dict] = []
+
+        async def receive() -> dict:
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            await asyncio.sleep(0.05)
+            sent.append(message)
+
+        scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}}
+        await response(scope, receive, send)
+        return sent
+
+    return send_response
+
+
 @pytest.fixture(autouse=True)
 def optimizer_artifacts_optional(monkeypatch):
     """Skip optimizer artifact loading in tests."""
@@ -191,7 +226,11 @@ def mock_agent():
     }
 
     async def mock_aforward_streaming(
-        query: str, chat_history: list[Message] | None = None, mcp_mode: bool = False
+        query: str,
+        chat_history: list[Message] | None = None,
+        mcp_mode: bool = False,
+        deadline=None,
+        conversation_id=None,
     ):
         """Mock agent forward_astreaming method that yields StreamEvent objects."""
         if mcp_mode:
@@ -226,7 +265,13 @@ def mock_agent():
         )
         yield StreamEvent(type=StreamEventType.END, data=pipeline_result)
 
-    async def mock_acall(query: str, chat_history: list[Message] | None = None, mcp_mode: bool = False):
+    async def mock_acall(
+        query: str,
+        chat_history: list[Message] | None = None,
+        mcp_mode: bool = False,
+        deadline=None,
+        conversation_id=None,
+    ):
         """Mock agent acall method that returns a Prediction with usage."""
         if mcp_mode:
             answer = "Cairo is a programming language"
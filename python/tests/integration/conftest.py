@@ -209,6 +209,24 @@ async def test_db_pool(postgres_container):
                 ON user_interactions(user_id);
             """
         )
+        await connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                cache_key CHAR(64) PRIMARY KEY,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                last_hit_at TIMESTAMPTZ,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                agent_id VARCHAR(50) NOT NULL,
+                mcp_mode BOOLEAN NOT NULL DEFAULT FALSE,
+                history_hash CHAR(64) NOT NULL,
+                normalized_query TEXT NOT NULL,
+                query_embedding REAL[],
+                answer TEXT NOT NULL,
+                formatted_sources JSONB,
+                retrieved_sources JSONB
+            );
+            """
+        )
 
     try:
         yield pool
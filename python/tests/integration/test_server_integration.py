@@ -6,18 +6,21 @@ including vector store and config manager integration, API contract
 verification, and OpenAI compatibility checks.
 """
 
+import asyncio
 import concurrent.futures
 import json
 import uuid
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from cairo_coder.agents.registry import AgentId
+from cairo_coder.core.cancellation import RunTokenEstimator
 from cairo_coder.core.config import VectorStoreConfig
 from cairo_coder.server.app import CairoCoderServer, ChatCompletionResponse, create_app
+from cairo_coder.server.rate_limit import RateLimiter, RateLimitPolicy
 
 
 class TestServerIntegration:
@@ -276,6 +279,149 @@ class TestServerIntegration:
         assert data["detail"]["error"]["type"] == "invalid_request_error"
         assert data["detail"]["error"]["code"] == "agent_not_found"
 
+    def test_overloaded_server_rejects_with_retry_after(self, client: TestClient, server):
+        """Requests beyond the admission queue get an OpenAI-style 429."""
+        limiter = server.admission.limiter
+        limiter.in_use, limiter.max_waiting = limiter.limit, 0
+
+        response = client.post(
+            "/v1/chat/completions", json={"messages": [{"role": "user", "content": "Hello"}]}
+        )
+
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        error = response.json()["detail"]["error"]
+        assert (error["type"], error["code"]) == ("rate_limit_error", "server_overloaded")
+
+    def test_stream_slot_is_freed_when_client_leaves_before_first_chunk(
+        self, client: TestClient, server
+    ):
+        """A streaming request abandoned before its first chunk gives its slot back."""
+        body = json.dumps(
+            {"messages": [{"role": "user", "content": "Hello"}], "stream": True}
+        ).encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/v1/chat/completions",
+            "raw_path": b"/v1/chat/completions",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/json")],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+
+        async def abandoned_request() -> None:
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+            async def receive() -> dict:
+                return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+            async def send(message: dict) -> None:
+                await asyncio.sleep(0.05)
+
+            await server.app(scope, receive, send)
+
+        for _ in range(server.admission.limiter.limit + 1):
+            asyncio.run(abandoned_request())
+
+        assert server.admission.limiter.in_use == 0
+        response = client.post(
+            "/v1/chat/completions", json={"messages": [{"role": "user", "content": "Hello"}]}
+        )
+        assert response.status_code == 200
+
+    def test_readiness_flips_once_warm(self, client: TestClient, server):
+        """/ready answers 503 until the lifespan has warmed the worker up."""
+        response = client.get("/ready")
+        assert (response.status_code, response.json()) == (503, {"status": "warming_up"})
+
+        server.app.state.ready = True
+
+        response = client.get("/ready")
+        assert (response.status_code, response.json()) == (200, {"status": "ready"})
+
+    def test_rate_limited_api_key_gets_openai_style_429(self, client: TestClient, server):
+        """Clients over their per-minute request limit are rejected, others are served."""
+        server.rate_limiter = RateLimiter(
+            RateLimitPolicy(requests_per_minute=1), RateLimitPolicy()
+        )
+        body = {"messages": [{"role": "user", "content": "Hello"}]}
+
+        assert client.post("/v1/chat/completions", json=body, headers={"x-api-key": "k1"}).status_code == 200
+        response = client.post("/v1/chat/completions", json=body, headers={"x-api-key": "k1"})
+
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        error = response.json()["detail"]["error"]
+        assert (error["type"], error["code"]) == ("rate_limit_error", "rate_limit_exceeded")
+        assert client.post("/v1/chat/completions", json=body, headers={"x-api-key": "k2"}).status_code == 200
+
+    def test_cancelled_runs_are_charged_to_the_token_limit(
+        self, client: TestClient, server, mock_agent_factory: Mock
+    ):
+        """A client disconnecting before its answer still pays for the tokens already used."""
+        server.rate_limiter = RateLimiter(
+            RateLimitPolicy(tokens_per_minute=1000), RateLimitPolicy()
+        )
+
+        async def hanging_run(**kwargs):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                # As the pipeline does with the usage tracked so far
+                RunTokenEstimator().record_cancellation({"model": {"total_tokens": 5000}}, 1.0)
+                raise
+
+        agent = Mock()
+        agent.acall = hanging_run
+        mock_agent_factory.get_or_create_agent.return_value = agent
+        body = json.dumps({"messages": [{"role": "user", "content": "Hello"}]}).encode()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/v1/chat/completions",
+            "raw_path": b"/v1/chat/completions",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/json"), (b"x-api-key", b"k1")],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+        sent: list[dict] = []
+
+        async def disconnecting_request() -> None:
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+            async def receive() -> dict:
+                if messages:
+                    return messages.pop(0)
+                await asyncio.sleep(0.05)
+                return {"type": "http.disconnect"}
+
+            async def send(message: dict) -> None:
+                sent.append(message)
+                await asyncio.sleep(0.01)
+
+            await server.app(scope, receive, send)
+
+        asyncio.run(disconnecting_request())
+
+        assert sent[0]["status"] == 499
+        agent.acall = AsyncMock(side_effect=RuntimeError("Request was not rate limited"))
+        response = client.post(
+            "/v1/chat/completions", content=body, headers={"x-api-key": "k1"}
+        )
+        assert response.status_code == 429
+        assert "tokens" in response.json()["detail"]["error"]["message"]
+
     def test_error_handling_agent_creation_failure(self, client: TestClient, mock_agent_factory: Mock):
         """Test error handling when agent creation fails."""
         mock_agent_factory.get_or_create_agent.side_effect = Exception("Agent creation failed")
@@ -406,6 +552,7 @@ class TestServerStartup:
             assert "/v1/agents" in routes
             assert "/v1/chat/completions" in routes
             assert "/v1/suggestions" in routes
+            assert "/v1/retrieve" in routes
 
 
 class TestOpenAICompatibility:
@@ -578,6 +725,99 @@ class TestOpenAICompatibility:
         assert error["code"] == "agent_not_found"
 
 
+class TestBatchEndpoint:
+    """Batch chat completions stream one NDJSON line per request."""
+
+    def test_batch_streams_a_result_per_request(self, client: TestClient, real_pipeline):
+        questions = ["How do I write a contract?", "What is a felt?", "How do I write a contract?"]
+        response = client.post(
+            "/v1/batch/chat/completions",
+            json={
+                "requests": [
+                    {"messages": [{"role": "user", "content": question}]} for question in questions
+                ],
+                "max_concurrency": 2,
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert sorted(line["index"] for line in lines) == [0, 1, 2]
+        for line in lines:
+            ChatCompletionResponse.model_validate(line["response"])
+            assert "error" not in line
+        assert real_pipeline.generation_program.acall.await_count <= len(questions)
+
+    def test_agent_batch_invalid_agent(self, client: TestClient, mock_agent_factory: Mock):
+        mock_agent_factory.get_agent_info.side_effect = ValueError("Agent 'unknown-agent' not found")
+
+        response = client.post(
+            "/v1/agents/unknown-agent/batch/chat/completions",
+            json={"requests": [{"messages": [{"role": "user", "content": "Hello"}]}]},
+        )
+
+        assert response.status_code == 404
+        assert response.json()["detail"]["error"]["code"] == "agent_not_found"
+
+    def test_batch_validation(self, client: TestClient):
+        assert client.post("/v1/batch/chat/completions", json={"requests": []}).status_code == 422
+        response = client.post(
+            "/v1/batch/chat/completions",
+            json={
+                "requests": [{"messages": [{"role": "user", "content": "Hello"}]}],
+                "max_concurrency": 0,
+            },
+        )
+        assert response.status_code == 422
+
+
+class TestRetrieveEndpoint:
+    """Retrieval-only endpoints return ranked documents without generating."""
+
+    def test_retrieve_returns_ranked_documents(self, client: TestClient, real_pipeline):
+        response = client.post(
+            "/v1/retrieve",
+            json={"query": "How do I write a Cairo contract?", "limit": 2},
+            headers={"x-latency-budget-ms": "30000"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["search_queries"]
+        assert 0 < len(data["documents"]) <= 2
+        scores = [doc["score"] for doc in data["documents"]]
+        assert scores == sorted(scores, reverse=True)
+        assert all(source["metadata"]["url"] for source in data["sources"])
+        real_pipeline.generation_program.acall.assert_not_called()
+
+    def test_agent_retrieve_fast_path_without_judge(
+        self, client: TestClient, real_pipeline, sample_processed_query
+    ):
+        real_pipeline.query_processor.heuristic_process = Mock(return_value=sample_processed_query)
+
+        response = client.post(
+            "/v1/agents/cairo-coder/retrieve",
+            json={"query": "Storage variables", "fast": True, "judge": False},
+        )
+
+        assert response.status_code == 200
+        real_pipeline.query_processor.acall.assert_not_called()
+        real_pipeline.retrieval_judge.acall.assert_not_called()
+
+    def test_agent_retrieve_invalid_agent(self, client: TestClient, mock_agent_factory: Mock):
+        mock_agent_factory.get_agent_info.side_effect = ValueError("Agent 'unknown-agent' not found")
+
+        response = client.post("/v1/agents/unknown-agent/retrieve", json={"query": "Hello"})
+
+        assert response.status_code == 404
+        assert response.json()["detail"]["error"]["code"] == "agent_not_found"
+
+    def test_retrieve_validation(self, client: TestClient):
+        assert client.post("/v1/retrieve", json={"query": ""}).status_code == 422
+        assert client.post("/v1/retrieve", json={"query": "Hello", "limit": 0}).status_code == 422
+
+
 class TestSuggestionEndpoint:
     @pytest.fixture(autouse=True)
     def setup(self, monkeypatch):
@@ -323,3 +323,103 @@ async def test_migrate_user_interaction_upsert(test_db_pool, db_connection):
     # Verify still only one record
     count = await db_connection.fetchval("SELECT COUNT(*) FROM user_interactions WHERE id = $1", interaction_id)
     assert count == 1
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_round_trip(test_db_pool, db_connection):
+    """Cached answers are upserted, served while fresh and counted on hit."""
+    from cairo_coder.db.models import CachedAnswer
+    from cairo_coder.db.repository import (
+        delete_expired_cached_answers,
+        find_cached_answer_candidates,
+        get_cached_answer,
+        upsert_cached_answer,
+    )
+
+    await db_connection.execute("TRUNCATE TABLE answer_cache;")
+    entry = CachedAnswer(
+        cache_key="a" * 64,
+        agent_id="cairo-coder",
+        history_hash="b" * 64,
+        normalized_query="what is cairo",
+        query_embedding=[0.5, 0.25],
+        answer="Cairo is a language",
+        formatted_sources=[{"metadata": {"title": "Book", "url": "https://book", "source_type": "documentation"}}],
+        retrieved_sources=[{"page_content": "Cairo", "metadata": {"source": DocumentSource.CAIRO_BOOK}}],
+    )
+
+    await upsert_cached_answer(entry)
+    await upsert_cached_answer(entry.model_copy(update={"answer": "Cairo is a provable language"}))
+
+    cached = await get_cached_answer(entry.cache_key, max_age_s=60)
+    assert cached is not None
+    assert cached.answer == "Cairo is a provable language"
+    assert cached.hit_count == 1
+    assert cached.formatted_sources == entry.formatted_sources
+
+    candidates = await find_cached_answer_candidates("cairo-coder", False, "b" * 64, max_age_s=60, limit=10)
+    assert [c.query_embedding for c in candidates] == [[0.5, 0.25]]
+
+    await db_connection.execute("UPDATE answer_cache SET created_at = NOW() - INTERVAL '2 hours'")
+    assert await get_cached_answer(entry.cache_key, max_age_s=60) is None
+    assert await delete_expired_cached_answers(max_age_s=60) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_buckets_round_trip(test_db_pool, db_connection):
+    """Buckets start empty as of the epoch, keep their balance and are pruned when idle."""
+    from cairo_coder.db.repository import (
+        delete_idle_rate_limit_buckets,
+        update_rate_limit_buckets,
+    )
+
+    await db_connection.execute("TRUNCATE TABLE rate_limit_buckets;")
+    seen = []
+
+    def debit(states):
+        seen.append(states)
+        return {key: balance - 1 for key, (balance, _) in states.items()}, len(states)
+
+    assert await update_rate_limit_buckets(["user:a:requests", "user:a:tokens"], debit) == 2
+    assert await update_rate_limit_buckets(["user:a:requests"], debit) == 1
+
+    first, second = seen
+    assert first["user:a:requests"][0] == 0.0
+    assert first["user:a:requests"][1] > 1_000_000_000  # Idle since the epoch
+    assert second["user:a:requests"][0] == -1.0
+    assert second["user:a:requests"][1] < 60
+
+    await db_connection.execute(
+        "UPDATE rate_limit_buckets SET updated_at = NOW() - INTERVAL '2 hours' "
+        "WHERE bucket_key = 'user:a:tokens'"
+    )
+    assert await delete_idle_rate_limit_buckets(max_idle_s=3600) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_interactions_in_window(test_db_pool, db_connection):
+    """Interactions of a window are returned oldest first, as models."""
+    from cairo_coder.db.repository import get_interactions_in_window
+
+    now = datetime.now(timezone.utc)
+    await db_connection.execute(
+        """
+        INSERT INTO user_interactions (id, created_at, agent_id, mcp_mode, chat_history, query)
+        VALUES ($1, $2, 'cairo-coder', FALSE, $3, 'second'),
+               ($4, $5, 'cairo-coder', TRUE, NULL, 'first'),
+               ($6, $7, 'starknet-agent', FALSE, NULL, 'other agent'),
+               ($8, $9, 'cairo-coder', FALSE, NULL, 'too old')
+        """,
+        uuid.uuid4(), now - timedelta(minutes=10), '[{"role": "user", "content": "Hi"}]',
+        uuid.uuid4(), now - timedelta(minutes=20),
+        uuid.uuid4(), now - timedelta(minutes=15),
+        uuid.uuid4(), now - timedelta(days=2),
+    )
+
+    interactions = await get_interactions_in_window(now - timedelta(hours=1), now, "cairo-coder")
+    assert [i.query for i in interactions] == ["first", "second"]
+    assert interactions[0].mcp_mode is True
+    assert interactions[1].chat_history == [{"role": "user", "content": "Hi"}]
+
+    limited = await get_interactions_in_window(now - timedelta(hours=1), now, limit=2)
+    assert [i.query for i in limited] == ["first", "other agent"]
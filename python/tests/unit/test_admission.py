@@ -0,0 +1,129 @@
+"""
+Unit tests for admission control and the priority-ordered concurrency limits.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from cairo_coder.core.concurrency import LimitExceededError, Priority, PriorityLimiter
+from cairo_coder.server.admission import AdmissionController, request_priority
+from cairo_coder.server.disconnect import on_response_end
+
+
+async def hold(limiter: PriorityLimiter, priority: Priority, order: list[str], name: str):
+    async with limiter.slot(priority, bounded=False):
+        order.append(name)
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_released_slots_go_to_the_most_urgent_then_oldest_waiter():
+    limiter = PriorityLimiter("test", limit=1)
+    await limiter.acquire(Priority.STANDARD)
+    order: list[str] = []
+    waiters = [
+        asyncio.create_task(hold(limiter, priority, order, name))
+        for priority, name in [
+            (Priority.BACKGROUND, "batch"),
+            (Priority.STANDARD, "chat-1"),
+            (Priority.INTERACTIVE, "stream"),
+            (Priority.STANDARD, "chat-2"),
+        ]
+    ]
+    await asyncio.sleep(0)
+    assert limiter.waiting == 4
+
+    limiter.release()
+    await asyncio.gather(*waiters)
+
+    assert order == ["stream", "chat-1", "chat-2", "batch"]
+    assert (limiter.in_use, limiter.waiting) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_bounded_waits_are_rejected_when_the_queue_is_full_or_too_slow():
+    limiter = PriorityLimiter("test", limit=1, max_waiting=1, max_wait_s=0.05)
+    await limiter.acquire()
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(LimitExceededError) as full:
+        await limiter.acquire()
+    assert full.value.reason == "queue_full"
+    assert full.value.retry_after_s >= 1
+    # Unbounded callers (stage calls, batch items) still wait
+    unbounded = asyncio.create_task(limiter.acquire(bounded=False))
+
+    with pytest.raises(LimitExceededError) as timeout:
+        await queued
+    assert timeout.value.reason == "queue_timeout"
+
+    limiter.release()
+    await unbounded
+    assert (limiter.in_use, limiter.waiting) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_do_not_leak_slots():
+    limiter = PriorityLimiter("test", limit=1)
+    await limiter.acquire()
+    cancelled = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    # Handed the slot and cancelled before resuming: the slot is given back
+    handed = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    limiter.release()
+    handed.cancel()
+    await asyncio.gather(cancelled, handed, return_exceptions=True)
+
+    assert (limiter.in_use, limiter.waiting) == (0, 0)
+
+
+def test_request_priority_can_only_be_lowered():
+    assert request_priority(stream=True, mcp_mode=False) is Priority.INTERACTIVE
+    assert request_priority(stream=False, mcp_mode=False) is Priority.STANDARD
+    assert request_priority(stream=True, mcp_mode=True) is Priority.BACKGROUND
+    assert request_priority(True, False, "background") is Priority.BACKGROUND
+    assert request_priority(True, True, "interactive") is Priority.BACKGROUND
+    with pytest.raises(ValueError, match="x-request-priority"):
+        request_priority(False, False, "urgent")
+
+
+@pytest.mark.asyncio
+async def test_overloaded_admission_is_rejected_with_retry_after():
+    admission = AdmissionController(max_concurrent=1, max_queued=0, max_wait_s=None)
+    admitted_at = await admission.admit(Priority.INTERACTIVE)
+
+    with pytest.raises(HTTPException) as rejected:
+        await admission.admit(Priority.STANDARD)
+    assert rejected.value.status_code == 429
+    assert rejected.value.detail["error"]["code"] == "server_overloaded"
+    assert int(rejected.value.headers["Retry-After"]) >= 1
+
+    admission.release(admitted_at)
+    admission.release(await admission.admit(Priority.STANDARD))
+
+
+@pytest.mark.asyncio
+async def test_stream_slots_are_freed_when_the_client_leaves_before_the_first_chunk(
+    send_to_gone_client,
+):
+    admission = AdmissionController(max_concurrent=2, max_queued=0, max_wait_s=None)
+
+    async def stream():
+        yield "data: chunk\n\n"
+
+    for _ in range(2):
+        admitted_at = await admission.admit(Priority.INTERACTIVE)
+        response = on_response_end(
+            StreamingResponse(stream()),
+            lambda admitted_at=admitted_at: admission.release(admitted_at),
+        )
+        await send_to_gone_client(response)
+
+    assert admission.limiter.in_use == 0
+    admission.release(await admission.admit(Priority.INTERACTIVE))
@@ -9,7 +9,12 @@ from unittest.mock import Mock, patch
 
 import pytest
 
-from cairo_coder.agents.registry import AgentId, get_agent_by_string_id, registry
+from cairo_coder.agents.registry import (
+    AgentId,
+    clear_shared_programs,
+    get_agent_by_string_id,
+    registry,
+)
 from cairo_coder.core.agent_factory import AgentFactory, create_agent_factory
 from cairo_coder.core.rag_pipeline import RagPipeline
 from cairo_coder.core.types import DocumentSource
@@ -80,6 +85,57 @@ class TestAgentFactory:
         agent_factory.clear_cache()
         assert len(agent_factory._agent_cache) == 0
 
+    def test_preload_agents_builds_every_agent_in_both_modes(self, agent_factory):
+        """Preloading fills the cache so no request builds an agent."""
+        with patch("cairo_coder.agents.registry.AgentSpec.build") as mock_build:
+            mock_build.return_value = Mock(spec=RagPipeline)
+
+            assert agent_factory.preload_agents() == 2 * len(AgentId)
+            assert mock_build.call_count == 2 * len(AgentId)
+
+            agent_factory.get_or_create_agent("starknet-agent", mcp_mode=True)
+            assert mock_build.call_count == 2 * len(AgentId)
+
+    def test_agents_share_programs_across_agents_and_modes(self, agent_factory):
+        """Each compiled program is loaded once and shared by every agent and mode."""
+        clear_shared_programs()
+        with (
+            patch(
+                "cairo_coder.dspy.generation_program.create_generation_program",
+                side_effect=lambda agent_id: Mock(name=f"generation_{agent_id}"),
+            ) as mock_generation,
+            patch(
+                "cairo_coder.dspy.generation_program.create_mcp_generation_program"
+            ) as mock_mcp_generation,
+            patch("cairo_coder.dspy.query_processor.create_query_processor") as mock_query,
+            patch("cairo_coder.dspy.retrieval_judge.RetrievalJudge") as mock_judge,
+            patch("cairo_coder.dspy.grok_search.GrokSearchProgram") as mock_grok,
+        ):
+            try:
+                agent_factory.preload_agents()
+            finally:
+                clear_shared_programs()
+
+        assert mock_generation.call_count == len(AgentId)
+        mock_mcp_generation.assert_called_once()
+        mock_query.assert_called_once()
+        mock_judge.assert_called_once()
+        mock_grok.assert_called_once()
+
+        agents = list(agent_factory._agent_cache.values())
+        for agent in agents:
+            assert agent.query_processor is agents[0].query_processor
+            assert agent.mcp_generation_program is agents[0].mcp_generation_program
+            assert agent.retrieval_judge is agents[0].retrieval_judge
+            assert agent.grok_search is agents[0].grok_search
+        cairo_coder = agent_factory.get_or_create_agent("cairo-coder")
+        starknet = agent_factory.get_or_create_agent("starknet-agent")
+        assert cairo_coder.generation_program is not starknet.generation_program
+        assert (
+            agent_factory.get_or_create_agent("cairo-coder", mcp_mode=True).generation_program
+            is cairo_coder.generation_program
+        )
+
     def test_get_available_agents(self, agent_factory):
         """Test getting available agent IDs."""
         available_agents = agent_factory.get_available_agents()
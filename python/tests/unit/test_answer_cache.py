@@ -0,0 +1,130 @@
+"""
+Unit tests for the answer cache (repository calls are mocked).
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from cairo_coder.core.types import (
+    Document,
+    Message,
+    PipelineResult,
+    ProcessedQuery,
+    Role,
+    StreamEventType,
+)
+from cairo_coder.db.models import CachedAnswer
+from cairo_coder.server.answer_cache import AnswerCache
+
+EMBEDDINGS = {
+    "how do i write a contract": [1.0, 0.0, 0.0],
+    "how to write a contract": [0.99, 0.05, 0.0],
+    "what is a felt": [0.0, 1.0, 0.0],
+}
+
+
+def make_entry(cache: AnswerCache, query: str, answer: str = "Use #[starknet::contract]") -> CachedAnswer:
+    key = cache.build_key("cairo-coder", False, query, [])
+    return CachedAnswer(
+        cache_key=key.digest,
+        agent_id=key.agent_id,
+        history_hash=key.history_hash,
+        normalized_query=key.normalized_query,
+        query_embedding=EMBEDDINGS.get(key.normalized_query),
+        answer=answer,
+        formatted_sources=[{"metadata": {"title": "Contracts", "url": "https://book", "source_type": "documentation"}}],
+        retrieved_sources=[{"page_content": "Contract docs", "metadata": {"title": "Contracts"}}],
+    )
+
+
+def test_key_normalizes_query_and_scopes_by_history():
+    cache = AnswerCache()
+    history = [Message(role=Role.USER, content="Hi"), Message(role=Role.ASSISTANT, content="Hello")]
+
+    key = cache.build_key("cairo-coder", False, "  How do I write a   CONTRACT? ", [])
+
+    assert key.normalized_query == "how do i write a contract"
+    assert key.digest == cache.build_key("cairo-coder", False, "how do i write a contract", []).digest
+    assert key.digest != cache.build_key("cairo-coder", True, "how do i write a contract", []).digest
+    assert key.digest != cache.build_key("cairo-coder", False, "how do i write a contract", history).digest
+
+
+def test_near_duplicates_require_an_embedder():
+    with pytest.raises(ValueError):
+        AnswerCache(similarity_threshold=0.9)
+
+
+@pytest.mark.asyncio
+async def test_lookup_falls_back_to_near_duplicate_match():
+    cache = AnswerCache(similarity_threshold=0.95, embedder=EMBEDDINGS.__getitem__)
+    near_duplicate = make_entry(cache, "How to write a contract?")
+    unrelated = make_entry(cache, "What is a felt?")
+
+    with (
+        patch("cairo_coder.server.answer_cache.get_cached_answer", AsyncMock(side_effect=[None, near_duplicate])) as get_mock,
+        patch(
+            "cairo_coder.server.answer_cache.find_cached_answer_candidates",
+            AsyncMock(return_value=[unrelated, near_duplicate]),
+        ),
+    ):
+        key = cache.build_key("cairo-coder", False, "How do I write a contract?", [])
+        entry = await cache.lookup(key)
+
+    assert entry is near_duplicate
+    assert key.query_embedding == EMBEDDINGS["how do i write a contract"]
+    assert get_mock.await_args_list[-1].args[0] == near_duplicate.cache_key
+
+
+@pytest.mark.asyncio
+async def test_lookup_errors_are_treated_as_misses():
+    cache = AnswerCache()
+    with patch(
+        "cairo_coder.server.answer_cache.get_cached_answer",
+        AsyncMock(side_effect=ConnectionError("db down")),
+    ):
+        assert await cache.lookup(cache.build_key("cairo-coder", False, "q", [])) is None
+
+
+@pytest.mark.asyncio
+async def test_store_skips_degraded_or_empty_answers():
+    cache = AnswerCache()
+    key = cache.build_key("cairo-coder", False, "q", [])
+    result = PipelineResult(
+        processed_query=ProcessedQuery(original="q", search_queries=["q"]),
+        documents=[Document(page_content="doc", metadata={"title": "Doc"})],
+        grok_citations=[],
+        usage={},
+        answer="answer",
+    )
+
+    with patch("cairo_coder.server.answer_cache.upsert_cached_answer", AsyncMock()) as upsert:
+        await cache.store(key, PipelineResult(**{**result.__dict__, "degradations": ["judge_skipped"]}))
+        await cache.store(key, PipelineResult(**{**result.__dict__, "answer": ""}))
+        upsert.assert_not_awaited()
+
+        await cache.store(key, result)
+        stored = upsert.await_args.args[0]
+
+    assert stored.cache_key == key.digest
+    assert stored.retrieved_sources == [{"page_content": "doc", "metadata": {"title": "Doc"}}]
+
+
+@pytest.mark.asyncio
+async def test_replay_emits_sources_answer_and_result():
+    cache = AnswerCache()
+    entry = make_entry(cache, "How do I write a contract?")
+
+    events = [event async for event in AnswerCache.replay(entry, "How do I write a contract?")]
+
+    assert [event.type for event in events] == [
+        StreamEventType.SOURCES,
+        StreamEventType.RESPONSE,
+        StreamEventType.FINAL_RESPONSE,
+        StreamEventType.END,
+    ]
+    assert events[0].data == entry.formatted_sources
+    result = events[-1].data
+    assert result.answer == entry.answer
+    assert result.documents[0].page_content == "Contract docs"
+    assert result.usage == {}
@@ -0,0 +1,321 @@
+"""
+Unit tests for the benchmark, load-testing and replay tooling.
+"""
+
+import json
+
+import dspy
+import httpx
+import numpy as np
+import pytest
+from dspy.adapters import ChatAdapter, XMLAdapter
+
+from cairo_coder.core import metrics
+from cairo_coder.core.types import DocumentSource
+from cairo_coder.db.models import UserInteraction
+from cairo_coder_tools.benchmarks.corpus import CORPUS_SOURCES, build_corpus
+from cairo_coder_tools.benchmarks.imports import (
+    SERVER_LAZY_MODULES,
+    SERVER_MODULE,
+    ImportReport,
+    measure_import_time,
+    parse_importtime,
+)
+from cairo_coder_tools.benchmarks.load import (
+    ARRIVAL_OPEN,
+    LoadConfig,
+    RequestResult,
+    send_request,
+    summarize,
+)
+from cairo_coder_tools.benchmarks.pipeline import (
+    BenchmarkReport,
+    ScenarioReport,
+    StageStats,
+    compare_reports,
+)
+from cairo_coder_tools.benchmarks.replay import (
+    diff_interaction,
+    interaction_endpoint,
+    interaction_headers,
+    interaction_messages,
+)
+from cairo_coder_tools.benchmarks.standins import (
+    LatencyProfile,
+    StandinEmbedder,
+    StandinLM,
+    register_standin_lm,
+)
+from cairo_coder_tools.benchmarks.streaming import run_encoder_benchmark, run_stream_benchmark
+
+FAST = LatencyProfile(first_token_s=0.0, tokens_per_s=100_000.0, output_tokens=30)
+
+
+class RateSignature(dspy.Signature):
+    """Rate a document."""
+
+    query: str = dspy.InputField()
+    answer: str = dspy.OutputField()
+    score: float = dspy.OutputField()
+    queries: list[str] = dspy.OutputField()
+
+
+def make_report(p95: float, cpu_s: float = 0.1) -> BenchmarkReport:
+    return BenchmarkReport(
+        created_at="2026-01-01T00:00:00+00:00",
+        environment={},
+        config={},
+        scenarios={
+            "aforward": ScenarioReport(
+                runs=10,
+                stages={"judge": StageStats(count=10, mean=0.2, p50=0.2, p95=p95, p99=p95)},
+                cpu_s_per_run=cpu_s,
+                alloc_peak_bytes=1000,
+                alloc_retained_bytes=10,
+            )
+        },
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("adapter", [ChatAdapter(), XMLAdapter()])
+async def test_standin_lm_answers_every_output_field(adapter):
+    standin = StandinLM(default_profile=FAST)
+    register_standin_lm(standin)
+    predictor = dspy.Predict(RateSignature)
+
+    with dspy.context(lm=dspy.LM("standin/rater", cache=False), adapter=adapter):
+        first = await predictor.acall(query="storage")
+        second = await predictor.acall(query="storage")
+
+    assert 0.2 <= first.score <= 1.0
+    assert len(first.queries) == 3 and all(isinstance(q, str) for q in first.queries)
+    assert len(first.answer.split()) >= 10
+    # Deterministic for the same prompt
+    assert (first.answer, first.score) == (second.answer, second.score)
+    assert standin.calls == {"rater": 2}
+
+
+@pytest.mark.asyncio
+async def test_standin_lm_streams_the_completion():
+    register_standin_lm(StandinLM(default_profile=FAST))
+    program = dspy.streamify(
+        dspy.Predict(RateSignature),
+        stream_listeners=[dspy.streaming.StreamListener(signature_field_name="answer")],
+        is_async_program=True,
+    )
+
+    chunks, prediction = [], None
+    with dspy.context(lm=dspy.LM("standin/rater", cache=False), adapter=ChatAdapter()):
+        async for item in program(query="events"):
+            if isinstance(item, dspy.streaming.StreamResponse):
+                chunks.append(item.chunk)
+            elif isinstance(item, dspy.Prediction):
+                prediction = item
+
+    assert prediction is not None
+    assert "".join(chunks).strip() == prediction.answer
+
+
+def test_embedder_and_corpus_are_deterministic():
+    embedder = StandinEmbedder(dimensions=64)
+    corpus = build_corpus(pages_per_topic=1, chunks_per_page=2)
+
+    assert [d.metadata for d in corpus] == [d.metadata for d in build_corpus(1, 2)]
+    assert DocumentSource.STARKNET_BLOG not in CORPUS_SOURCES
+    storage = embedder.embed("contract storage variables")
+    assert np.isclose(np.linalg.norm(storage), 1.0)
+    assert np.allclose(storage, embedder("contract storage variables"))
+    # Shared words increase similarity; unrelated texts keep the 0.5 floor
+    unrelated = float(storage @ embedder.embed("u256 math"))
+    assert storage @ embedder.embed("storage of a contract") > unrelated
+    assert unrelated == pytest.approx(0.5)
+
+
+def test_record_stages_collects_raw_samples():
+    with metrics.record_stages() as samples:
+        metrics.observe_stage(metrics.STAGE_JUDGE, 0.25)
+    metrics.observe_stage(metrics.STAGE_JUDGE, 1.0)
+
+    assert samples == [(metrics.STAGE_JUDGE, 0.25)]
+    stats = StageStats.from_samples([float(i) for i in range(1, 101)])
+    assert (stats.p50, stats.p95, stats.p99) == pytest.approx((50.5, 95.05, 99.01))
+
+
+def test_compare_reports_flags_regressions_beyond_tolerance():
+    baseline = BenchmarkReport.from_dict(make_report(p95=0.5).to_dict())
+
+    assert compare_reports(baseline, make_report(p95=0.55), tolerance=0.15) == []
+    regressions = compare_reports(baseline, make_report(p95=0.8, cpu_s=0.102), tolerance=0.15)
+    # The CPU increase is under the noise floor
+    assert [(r.scenario, r.metric) for r in regressions] == [
+        ("aforward", "judge.p95"),
+        ("aforward", "judge.p99"),
+    ]
+    assert regressions[0].ratio == pytest.approx(1.6)
+
+
+def sse_body(*payloads) -> bytes:
+    lines = [f"data: {p if isinstance(p, str) else json.dumps(p)}\n\n" for p in payloads]
+    return "".join(lines).encode()
+
+
+def delta(content: str) -> dict:
+    return {"choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("events", "error"),
+    [
+        (
+            [
+                {"type": "sources", "data": [{"metadata": {"title": "Storage", "url": "https://book/storage"}}]},
+                delta("Use "),
+                delta("storage."),
+                "[DONE]",
+            ],
+            None,
+        ),
+        ([delta("\n\nError: boom"), "[DONE]"], "stream error event"),
+        ([delta("Use ")], "stream ended without [DONE]"),
+    ],
+)
+async def test_send_request_measures_streams(events, error):
+    config = LoadConfig(base_url="http://bench", agent_id="cairo-coder")
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append((request.url.path, json.loads(request.content)["stream"]))
+        return httpx.Response(200, content=sse_body(*events))
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        messages = [{"role": "user", "content": "storage?"}]
+        result = await send_request(client, config.endpoint, messages, True, 0.0, 0.0)
+
+    assert requested == [("/v1/agents/cairo-coder/chat/completions", True)]
+    assert result.error == error
+    if error is None:
+        assert result.status == 200
+        assert result.time_to_sources_s <= result.time_to_first_token_s <= result.latency_s
+        assert result.tokens == 3
+        assert result.source_urls == ["https://book/storage"]
+
+
+def test_load_config_validation_and_summary():
+    with pytest.raises(ValueError):
+        LoadConfig(base_url="http://bench", arrival=ARRIVAL_OPEN, rate_qps=0)
+    config = LoadConfig(base_url="http://bench/")
+    assert config.endpoint == "http://bench/v1/chat/completions"
+
+    results = [
+        RequestResult(
+            stream=True,
+            started_at=0.0,
+            latency_s=2.0,
+            status=200,
+            time_to_sources_s=0.2,
+            time_to_first_token_s=1.0,
+            tokens=11,
+        ),
+        RequestResult(stream=False, started_at=0.5, latency_s=3.0, status=200, tokens=20),
+        RequestResult(stream=True, started_at=1.0, latency_s=0.1, status=503, error="HTTP 503"),
+    ]
+    report = summarize(results, wall_time_s=4.0, config={})
+
+    assert results[0].tokens_per_s == pytest.approx(10.0)
+    assert (report.requests, report.errors_by_kind) == (3, {"HTTP 503": 1})
+    assert report.error_rate == pytest.approx(1 / 3)
+    assert report.throughput_rps == pytest.approx(0.5)
+    assert report.throughput_tokens_per_s == pytest.approx(31 / 4)
+    assert report.latency["time_to_first_token"].p50 == pytest.approx(1.0)
+    assert report.latency["latency"].count == 2
+
+
+def test_replay_reproduces_and_diffs_logged_interactions():
+    interaction = UserInteraction(
+        agent_id="starknet-agent",
+        mcp_mode=True,
+        conversation_id="conv-1",
+        chat_history=[{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}],
+        query="How do I read storage?",
+        generated_answer="Use self.value.read().",
+        retrieved_sources=[
+            {"page_content": "", "metadata": {"sourceLink": "https://book/storage"}},
+            {"page_content": "", "metadata": {"sourceLink": "https://book/events"}},
+        ],
+    )
+
+    assert interaction_endpoint("http://target/", interaction) == (
+        "http://target/v1/agents/starknet-agent/chat/completions"
+    )
+    assert interaction_headers(interaction) == {"x-mcp-mode": "true", "x-conversation-id": "conv-1"}
+    assert [m["content"] for m in interaction_messages(interaction)] == [
+        "Hi",
+        "Hello",
+        "How do I read storage?",
+    ]
+
+    replayed = RequestResult(
+        stream=True,
+        started_at=0.0,
+        latency_s=1.5,
+        status=200,
+        answer="Use self.value.read().",
+        source_urls=["https://book/storage", "https://book/traits"],
+    )
+    diff = diff_interaction(interaction, replayed)
+    assert diff.answer_similarity == 1.0
+    assert diff.source_overlap == pytest.approx(1 / 3)
+    assert (diff.sources_added, diff.sources_removed) == (["https://book/traits"], ["https://book/events"])
+
+    failed = diff_interaction(interaction, RequestResult(True, 0.0, 0.1, 500, error="HTTP 500"))
+    assert (failed.answer_similarity, failed.source_overlap) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_stream_benchmark_counts_frames_per_policy():
+    per_chunk, coalesced = await run_stream_benchmark(chunks=50, chunk_chars=4, rate_cps=None)
+
+    assert (per_chunk.chunks, per_chunk.frames) == (50, 50)
+    assert coalesced.frames < per_chunk.frames
+    assert coalesced.bytes < per_chunk.bytes
+
+
+def test_encoder_benchmark_times_every_encoder():
+    results = run_encoder_benchmark(chunks=200, chunk_chars=8, repeat=1)
+
+    assert results[0].encoder == "json.dumps"
+    assert {r.chunks for r in results} == {200}
+    assert all(r.ns_per_chunk > 0 for r in results)
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       5000 |     pydantic
+import time:       300 |       5300 |   fastapi
+warning: not an importtime line
+import time:       100 |       5520 | cairo_coder.server.app
+"""
+
+
+def test_parse_importtime_reads_nesting_and_timings():
+    imports = parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert [(entry.name, entry.depth) for entry in imports] == [
+        ("_io", 1),
+        ("pydantic", 2),
+        ("fastapi", 1),
+        ("cairo_coder.server.app", 0),
+    ]
+    report = ImportReport(SERVER_MODULE, total_ms=5.52, runs_ms=[5.52], imports=imports)
+    assert [entry.name for entry in report.slowest(1)] == ["fastapi"]
+    assert report.eager_imports(("pydantic", "dspy")) == ["pydantic"]
+
+
+def test_server_import_leaves_the_pipeline_to_the_lifespan():
+    report = measure_import_time(SERVER_MODULE, runs=1)
+
+    assert report.total_ms > 0
+    assert report.eager_imports(SERVER_LAZY_MODULES) == []
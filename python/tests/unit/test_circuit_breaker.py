@@ -0,0 +1,166 @@
+"""
+Unit tests for the per-dependency circuit breakers.
+"""
+
+import asyncio
+import contextlib
+
+import pytest
+from prometheus_client import REGISTRY
+
+from cairo_coder.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(clock: FakeClock, **kwargs) -> CircuitBreaker:
+    options = {"window": 4, "min_calls": 4, "failure_rate": 0.5, "open_s": 30.0}
+    return CircuitBreaker("test-dependency", slow_call_s=1.0, clock=clock, **{**options, **kwargs})
+
+
+def succeed(breaker: CircuitBreaker, clock: FakeClock, duration_s: float = 0.1) -> None:
+    with breaker.guard():
+        clock.now += duration_s
+
+
+def fail(breaker: CircuitBreaker) -> None:
+    with contextlib.suppress(RuntimeError), breaker.guard():
+        raise RuntimeError("dependency failed")
+
+
+def state_gauge() -> float | None:
+    return REGISTRY.get_sample_value(
+        "cairo_coder_circuit_breaker_state", {"dependency": "test-dependency"}
+    )
+
+
+def test_opens_when_failure_rate_reached():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    succeed(breaker, clock)
+    fail(breaker)
+    succeed(breaker, clock)
+    assert breaker.state is CircuitState.CLOSED  # Too few calls yet
+
+    fail(breaker)
+    assert breaker.state is CircuitState.OPEN
+    assert state_gauge() == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError), breaker.guard():
+        pytest.fail("an open breaker must not run the call")
+
+
+def test_slow_calls_count_as_failures():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    for _ in range(2):
+        succeed(breaker, clock)
+    for _ in range(2):
+        succeed(breaker, clock, duration_s=5.0)
+
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_half_open_probes_close_the_breaker():
+    clock = FakeClock()
+    breaker = make_breaker(clock, half_open_probes=2)
+    for _ in range(4):
+        fail(breaker)
+
+    clock.now += 30.0
+    assert breaker.state is CircuitState.HALF_OPEN
+    with breaker.guard(), breaker.guard():
+        # Both probes are in flight: further calls are still rejected
+        assert not breaker.available()
+    assert breaker.state is CircuitState.CLOSED
+    assert state_gauge() == CircuitState.CLOSED
+
+
+def test_failed_probe_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        fail(breaker)
+
+    clock.now += 30.0
+    fail(breaker)
+
+    assert breaker.state is CircuitState.OPEN
+    clock.now += 29.0
+    assert not breaker.available()
+
+
+def test_cancelled_calls_are_not_counted():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    for _ in range(4):
+        with contextlib.suppress(asyncio.CancelledError), breaker.guard():
+            raise asyncio.CancelledError
+
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_timed_out_calls_are_not_counted():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+
+    for _ in range(4):
+        with contextlib.suppress(TimeoutError), breaker.guard():
+            raise TimeoutError
+
+    assert breaker.state is CircuitState.CLOSED
+
+
+async def hang_through(breaker: CircuitBreaker, timeout_s: float) -> None:
+    async def call() -> None:
+        with breaker.guard():
+            await asyncio.sleep(10)
+
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(call(), timeout_s)
+
+
+@pytest.mark.asyncio
+async def test_calls_cut_short_by_a_budget_are_not_counted():
+    breaker = CircuitBreaker("test-dependency", slow_call_s=1.0, window=4, min_calls=4)
+
+    for _ in range(8):
+        await hang_through(breaker, timeout_s=0.01)
+
+    assert breaker.state is CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_calls_still_running_past_the_slow_threshold_are_counted():
+    breaker = CircuitBreaker("test-dependency", slow_call_s=0.01, window=4, min_calls=4)
+
+    for _ in range(4):
+        await hang_through(breaker, timeout_s=0.05)
+
+    assert breaker.state is CircuitState.OPEN
+
+
+def test_disabled_breaker_never_opens():
+    clock = FakeClock()
+    breaker = make_breaker(clock, enabled=False)
+    for _ in range(8):
+        fail(breaker)
+
+    assert breaker.available()
+
+
+def test_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        CircuitBreaker("db", slow_call_s=0)
+    with pytest.raises(ValueError):
+        CircuitBreaker("db", slow_call_s=1.0, failure_rate=1.5)
+    with pytest.raises(ValueError):
+        CircuitBreaker("db", slow_call_s=1.0, window=5, min_calls=10)
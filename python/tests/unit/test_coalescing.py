@@ -0,0 +1,178 @@
+"""
+Unit tests for single-flight request coalescing.
+"""
+
+import asyncio
+
+import pytest
+
+from cairo_coder.core.types import (
+    Message,
+    PipelineResult,
+    ProcessedQuery,
+    Role,
+    StreamEvent,
+    StreamEventType,
+)
+from cairo_coder.server.coalescing import RequestCoalescer, coalescing_key
+
+
+def make_result(answer: str = "answer") -> PipelineResult:
+    return PipelineResult(
+        processed_query=ProcessedQuery(original="q", search_queries=["q"]),
+        documents=[],
+        grok_citations=[],
+        usage={"model": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}},
+        answer=answer,
+        formatted_sources=[{"metadata": {"title": "Doc", "url": "https://doc", "source_type": "documentation"}}],
+    )
+
+
+def test_key_depends_on_scope_and_history():
+    history = [Message(role=Role.USER, content="Hi")]
+    key = coalescing_key("cairo-coder", False, "q", [])
+    assert key == coalescing_key("cairo-coder", False, "q", [])
+    assert key != coalescing_key("cairo-coder", True, "q", [])
+    assert key != coalescing_key("starknet-agent", False, "q", [])
+    assert key != coalescing_key("cairo-coder", False, "q", history)
+    assert key != coalescing_key("cairo-coder", False, "q", [], budget_s=2.0)
+
+
+@pytest.mark.asyncio
+async def test_identical_messages_of_different_conversations_do_not_share_a_run():
+    history = [Message(role=Role.USER, content="Hi")]
+    first = coalescing_key("cairo-coder", False, "q", history, conversation_id="conv-a")
+    second = coalescing_key("cairo-coder", False, "q", history, conversation_id="conv-b")
+    assert first == coalescing_key("cairo-coder", False, "q", history, conversation_id="conv-a")
+    assert first != coalescing_key("cairo-coder", False, "q", history)
+
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+    runs = 0
+
+    async def pipeline() -> PipelineResult:
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return make_result()
+
+    tasks = [asyncio.create_task(coalescer.result(key, pipeline)) for key in (first, second)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    # Each conversation runs (and accounts for) its own pipeline
+    assert runs == 2
+    assert [owns for _, owns in results] == [True, True]
+
+
+@pytest.mark.asyncio
+async def test_streaming_followers_share_one_run():
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+    runs = 0
+
+    async def pipeline():
+        nonlocal runs
+        runs += 1
+        yield StreamEvent(type=StreamEventType.RESPONSE, data="Hello")
+        await release.wait()
+        yield StreamEvent(type=StreamEventType.END, data=make_result("Hello"))
+
+    async def consume():
+        return [event async for event in coalescer.stream("key", pipeline)]
+
+    leader = asyncio.create_task(consume())
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(consume())
+    await asyncio.sleep(0.01)
+    release.set()
+    leader_events, follower_events = await asyncio.gather(leader, follower)
+
+    assert runs == 1
+    assert [e.type for e in follower_events] == [StreamEventType.RESPONSE, StreamEventType.END]
+    assert leader_events[-1].data.usage["model"]["total_tokens"] == 15
+    assert follower_events[-1].data.usage == {}
+    assert coalescer.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_non_streaming_followers_await_result_and_stream_replay():
+    coalescer = RequestCoalescer()
+    release = asyncio.Event()
+    runs = 0
+
+    async def pipeline() -> PipelineResult:
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return make_result()
+
+    leader = asyncio.create_task(coalescer.result("key", pipeline))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(coalescer.result("key", pipeline))
+    streaming = asyncio.create_task(
+        _collect(coalescer.stream("key", lambda: _never_called()))
+    )
+    await asyncio.sleep(0.01)
+    release.set()
+
+    (leader_result, leader_owns), (follower_result, follower_owns), events = await asyncio.gather(
+        leader, follower, streaming
+    )
+
+    assert runs == 1
+    assert leader_owns and not follower_owns
+    assert follower_result.answer == leader_result.answer == "answer"
+    # Followers see the shared run's usage; only the leader accounts for it
+    assert follower_result.usage == leader_result.usage
+    assert [e.type for e in events] == [
+        StreamEventType.SOURCES,
+        StreamEventType.RESPONSE,
+        StreamEventType.FINAL_RESPONSE,
+        StreamEventType.END,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_errors_are_propagated_to_every_waiter():
+    coalescer = RequestCoalescer()
+
+    async def failing() -> PipelineResult:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        coalescer.result("key", failing), coalescer.result("key", failing), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_run_is_cancelled_when_all_subscribers_leave():
+    coalescer = RequestCoalescer()
+    cancelled = asyncio.Event()
+
+    async def pipeline():
+        try:
+            yield StreamEvent(type=StreamEventType.PROCESSING, data="Processing query...")
+            await asyncio.sleep(10)
+        finally:
+            cancelled.set()
+
+    stream = coalescer.stream("key", pipeline)
+    assert (await stream.__anext__()).type == StreamEventType.PROCESSING
+    await stream.aclose()
+
+    assert cancelled.is_set()
+    assert coalescer.in_flight == 0
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+async def _never_called():
+    raise AssertionError("followers must not start a new run")
+    yield  # pragma: no cover
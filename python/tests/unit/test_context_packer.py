@@ -0,0 +1,109 @@
+"""Unit tests for token-budgeted context packing."""
+
+import random
+
+import pytest
+
+from cairo_coder.core.constants import LLM_JUDGE_SCORE_KEY
+from cairo_coder.core.context_packer import (
+    NO_DOCUMENTATION_CONTEXT,
+    TRUNCATION_MARKER,
+    ContextPacker,
+    estimate_tokens,
+)
+from cairo_coder.core.types import Document
+
+
+def make_document(title: str, content: str, score: float | None = None, **metadata) -> Document:
+    """Create a documentation chunk with an optional judge score."""
+    meta = {
+        "title": title,
+        "sourceLink": f"https://docs.example.com/{title.lower().replace(' ', '-')}",
+        "source_display": "Example Docs",
+        **metadata,
+    }
+    if score is not None:
+        meta[LLM_JUDGE_SCORE_KEY] = score
+    return Document(page_content=content, metadata=meta)
+
+
+def test_empty_documents():
+    packed = ContextPacker(token_budget=100).pack([])
+    assert packed.text == NO_DOCUMENTATION_CONTEXT
+    assert packed.included == []
+
+
+def test_unbounded_budget_includes_everything_ranked_by_score():
+    docs = [
+        make_document("Low", "low content", score=0.2),
+        make_document("High", "high content", score=0.9),
+    ]
+
+    packed = ContextPacker(token_budget=None).pack(docs)
+
+    assert [doc.metadata["title"] for doc in packed.included] == ["High", "Low"]
+    assert packed.text.index("## [High]") < packed.text.index("## [Low]")
+    assert "*Source: Example Docs*" in packed.text
+    assert packed.tokens_used >= estimate_tokens(packed.text)
+    assert packed.truncated == packed.dropped == 0
+
+
+def test_virtual_documents_are_pinned_first():
+    docs = [
+        make_document("Docs", "doc content", score=1.0),
+        Document(page_content="Grok summary", metadata={"title": "Grok", "is_virtual": True}),
+    ]
+
+    packed = ContextPacker(token_budget=None).pack(docs)
+
+    assert packed.text.startswith("Relevant Documentation:\n\nGrok summary")
+    assert "## [Grok]" not in packed.text
+
+
+def test_low_value_documents_are_truncated_then_dropped():
+    docs = [
+        make_document("Best", "a" * 400, score=0.9),
+        make_document("Middle", "\n".join(["line of code"] * 200), score=0.7),
+        make_document("Worst", "c" * 4000, score=0.3),
+    ]
+
+    packer = ContextPacker(token_budget=500, min_truncated_tokens=50)
+    packed = packer.pack(docs)
+
+    assert [doc.metadata["title"] for doc in packed.included] == ["Best", "Middle"]
+    assert packed.truncated == 1
+    assert packed.dropped == 1
+    assert TRUNCATION_MARKER in packed.text
+    assert "## [Worst]" not in packed.text
+    assert packed.tokens_used <= 500
+    assert packed.tokens_used >= estimate_tokens(packed.text)
+
+
+@pytest.mark.parametrize("budget", range(250, 330, 7))
+def test_truncated_context_stays_within_budget(budget):
+    docs = [
+        make_document("Best", "x" * 401, score=0.9),
+        make_document("Long", "\n".join(["let a = 1;"] * 300), score=0.5),
+    ]
+
+    packed = ContextPacker(token_budget=budget, min_truncated_tokens=20).pack(docs)
+
+    assert packed.truncated == 1
+    assert packed.tokens_used <= budget
+    assert estimate_tokens(packed.text) <= budget
+
+
+def test_packing_is_deterministic_regardless_of_input_order():
+    docs = [make_document(f"Doc {i}", f"content {i}" * 50, score=0.5) for i in range(8)]
+    packer = ContextPacker(token_budget=400)
+
+    expected = packer.pack(docs).text
+    shuffled = docs[:]
+    random.Random(0).shuffle(shuffled)
+
+    assert packer.pack(shuffled).text == expected
+
+
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        ContextPacker(token_budget=0)
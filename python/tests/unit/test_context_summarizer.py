@@ -0,0 +1,120 @@
+"""Unit tests for incremental chat history summarization."""
+
+from unittest.mock import AsyncMock
+
+import dspy
+import pytest
+
+from cairo_coder.core.types import Message, Role
+from cairo_coder.dspy.context_summarizer import ChatHistoryCompressor
+
+
+def make_history(count: int) -> list[Message]:
+    return [
+        Message(role=Role.USER if i % 2 == 0 else Role.ASSISTANT, content=f"message {i}")
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def compressor():
+    compressor = ChatHistoryCompressor(max_verbatim_messages=2)
+    compressor.summarizer.acall = AsyncMock(
+        side_effect=lambda previous_summary, new_messages: dspy.Prediction(
+            summary=f"{previous_summary}|{new_messages}"
+        )
+    )
+    return compressor
+
+
+def test_verbatim_window_respects_token_budget():
+    compressor = ChatHistoryCompressor(
+        verbatim_token_budget=10, min_verbatim_messages=1, max_verbatim_messages=10
+    )
+    history = [Message(role=Role.USER, content="x" * 200), *make_history(2)]
+
+    assert compressor.verbatim_start(history) == 1
+
+
+@pytest.mark.asyncio
+async def test_without_conversation_id_the_last_messages_are_kept(compressor):
+    formatted = await compressor.aforward(make_history(5))
+
+    assert formatted == "Assistant: message 3\nUser: message 4"
+    compressor.summarizer.acall.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_without_conversation_id_the_token_budget_does_not_shrink_the_window():
+    compressor = ChatHistoryCompressor(
+        verbatim_token_budget=10, min_verbatim_messages=1, max_verbatim_messages=10
+    )
+    history = [Message(role=Role.USER, content="x" * 200), *make_history(2)]
+
+    formatted = await compressor.aforward(history)
+
+    assert formatted == ChatHistoryCompressor.format_messages(history)
+
+
+@pytest.mark.asyncio
+async def test_summary_is_updated_with_new_messages_only(compressor):
+    first = await compressor.aforward(make_history(4), conversation_id="conv")
+    second = await compressor.aforward(make_history(6), conversation_id="conv")
+
+    calls = compressor.summarizer.acall.await_args_list
+    assert calls[0].kwargs["new_messages"] == "User: message 0\nAssistant: message 1"
+    assert calls[1].kwargs["new_messages"] == "User: message 2\nAssistant: message 3"
+    assert first.startswith("Summary of earlier messages: ")
+    assert second.endswith("User: message 4\nAssistant: message 5")
+
+    # Same history again: served from the cache
+    await compressor.aforward(make_history(6), conversation_id="conv")
+    assert compressor.summarizer.acall.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_edited_history_invalidates_the_summary(compressor):
+    await compressor.aforward(make_history(4), conversation_id="conv")
+    edited = make_history(6)
+    edited[0] = Message(role=Role.USER, content="edited")
+
+    await compressor.aforward(edited, conversation_id="conv")
+
+    last_call = compressor.summarizer.acall.await_args_list[-1]
+    assert last_call.kwargs["previous_summary"] == ""
+    assert last_call.kwargs["new_messages"].startswith("User: edited")
+
+
+@pytest.mark.asyncio
+async def test_summarization_failure_falls_back_to_recent_messages(compressor):
+    compressor.summarizer.acall = AsyncMock(side_effect=RuntimeError("LM down"))
+
+    formatted = await compressor.aforward(make_history(4), conversation_id="conv")
+
+    assert formatted == "User: message 2\nAssistant: message 3"
+
+
+@pytest.mark.asyncio
+async def test_skipped_summary_update_keeps_unsummarized_messages(compressor):
+    await compressor.aforward(make_history(4), conversation_id="conv")
+
+    formatted = await compressor.aforward(make_history(6), conversation_id="conv", summarize=False)
+
+    assert formatted.startswith("Summary of earlier messages: |User: message 0")
+    assert formatted.endswith(
+        "User: message 2\nAssistant: message 3\nUser: message 4\nAssistant: message 5"
+    )
+    assert compressor.summarizer.acall.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_summary_update_keeps_unsummarized_messages(compressor):
+    await compressor.aforward(make_history(4), conversation_id="conv")
+    compressor.summarizer.acall.side_effect = RuntimeError("LM down")
+
+    formatted = await compressor.aforward(make_history(6), conversation_id="conv")
+
+    assert formatted.startswith("Summary of earlier messages: |User: message 0")
+    assert formatted.endswith(
+        "User: message 2\nAssistant: message 3\nUser: message 4\nAssistant: message 5"
+    )
@@ -0,0 +1,65 @@
+"""Unit tests for the conversation state store."""
+
+import pytest
+
+from cairo_coder.core.conversation_state import ConversationStateStore, document_key
+from cairo_coder.core.types import Document, ProcessedQuery
+
+QUERY = ProcessedQuery(original="q", search_queries=["q"])
+
+
+def make_document(title: str, score: float | None = None, **metadata) -> Document:
+    meta = {"title": title, "source": "cairo_book", **metadata}
+    if score is not None:
+        meta["llm_judge_score"] = score
+    return Document(page_content=f"{title} content", metadata=meta)
+
+
+def test_scores_accumulate_and_kept_documents_are_carried_over():
+    store = ConversationStateStore()
+    kept = make_document("Kept", 0.9)
+    dropped = make_document("Dropped", 0.1)
+
+    store.update("conv", QUERY, judged=[kept, dropped], kept=[kept])
+    new = make_document("New", 0.7)
+    state = store.update("conv", QUERY, judged=[new], kept=[kept, new])
+
+    assert state.turn == 2
+    assert state.judge_scores == {
+        document_key(kept): 0.9,
+        document_key(dropped): 0.1,
+        document_key(new): 0.7,
+    }
+    assert state.document_ids == [document_key(kept), document_key(new)]
+
+
+def test_virtual_documents_are_not_carried_over_and_documents_are_capped():
+    store = ConversationStateStore(max_documents=2)
+    docs = [make_document(f"Doc {i}", 0.1 * i) for i in range(4)]
+    grok = make_document("Grok", is_virtual=True)
+
+    state = store.update("conv", QUERY, judged=docs, kept=[grok, *docs])
+
+    assert [doc.metadata["title"] for doc in state.documents] == ["Doc 3", "Doc 2"]
+    reused = state.reusable_documents()
+    reused[0].metadata["title"] = "Mutated"
+    assert state.documents[0].metadata["title"] == "Doc 3"
+
+
+def test_expired_and_evicted_states_are_forgotten(monkeypatch):
+    store = ConversationStateStore(ttl_s=60, max_conversations=1)
+    store.update("a", QUERY, judged=[], kept=[])
+    store.update("b", QUERY, judged=[], kept=[])
+
+    assert store.get("a") is None
+    assert store.get(None) is None
+
+    now = store.get("b").updated_at
+    monkeypatch.setattr("cairo_coder.core.conversation_state.time.monotonic", lambda: now + 61)
+    assert store.get("b") is None
+    assert len(store) == 0
+
+
+def test_invalid_ttl():
+    with pytest.raises(ValueError):
+        ConversationStateStore(ttl_s=0)
@@ -0,0 +1,199 @@
+"""
+Unit tests for cancellation on client disconnect.
+"""
+
+import asyncio
+
+import pytest
+from fastapi.responses import StreamingResponse
+
+from cairo_coder.core.cancellation import RunTokenEstimator, on_cancelled_run
+from cairo_coder.server.disconnect import (
+    ClientDisconnectedError,
+    cancel_on_disconnect,
+    on_response_end,
+    stream_until_disconnect,
+)
+
+
+class FakeRequest:
+    """Request whose client disconnects once `disconnect()` is called."""
+
+    def __init__(self):
+        self._disconnected = asyncio.Event()
+
+    def disconnect(self) -> None:
+        self._disconnected.set()
+
+    async def receive(self) -> dict:
+        await self._disconnected.wait()
+        return {"type": "http.disconnect"}
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_returns_result():
+    async def work():
+        return "answer"
+
+    assert await cancel_on_disconnect(FakeRequest(), work()) == "answer"
+
+
+@pytest.mark.asyncio
+async def test_cancel_on_disconnect_propagates_errors():
+    async def work():
+        raise RuntimeError("LM failed")
+
+    with pytest.raises(RuntimeError, match="LM failed"):
+        await cancel_on_disconnect(FakeRequest(), work())
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_work():
+    request = FakeRequest()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def disconnect_when_started():
+        await started.wait()
+        request.disconnect()
+
+    asyncio.create_task(disconnect_when_started())
+    with pytest.raises(ClientDisconnectedError):
+        await cancel_on_disconnect(request, work())
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_all_items():
+    async def items():
+        for item in range(3):
+            yield item
+
+    assert [item async for item in stream_until_disconnect(FakeRequest(), items())] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_stream_propagates_errors():
+    async def items():
+        yield 1
+        raise RuntimeError("pipeline failed")
+
+    received = []
+    with pytest.raises(RuntimeError, match="pipeline failed"):
+        async for item in stream_until_disconnect(FakeRequest(), items()):
+            received.append(item)
+    assert received == [1]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_closes_stream_while_waiting():
+    request = FakeRequest()
+    closed = asyncio.Event()
+
+    async def items():
+        try:
+            yield "first"
+            await asyncio.Event().wait()
+            yield "never"
+        finally:
+            closed.set()
+
+    received = []
+    with pytest.raises(ClientDisconnectedError):
+        async for item in stream_until_disconnect(request, items()):
+            received.append(item)
+            # Disconnect while the next item is being produced
+            request.disconnect()
+
+    assert received == ["first"]
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_consumer_stop_closes_stream():
+    closed = asyncio.Event()
+
+    async def items():
+        try:
+            while True:
+                yield "chunk"
+        finally:
+            closed.set()
+
+    stream = stream_until_disconnect(FakeRequest(), items())
+    assert await anext(stream) == "chunk"
+    await stream.aclose()
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_response_finalizers_run_when_the_body_never_starts(send_to_gone_client):
+    started = False
+    calls: list[str] = []
+
+    async def body():
+        nonlocal started
+        started = True
+        yield "data: chunk\n\n"
+
+    response = StreamingResponse(body(), media_type="text/event-stream")
+    response = on_response_end(response, lambda: calls.append("inner"))
+    response = on_response_end(response, lambda: calls.append("outer"))
+
+    sent = await send_to_gone_client(response)
+
+    assert not started
+    assert not any(message["type"] == "http.response.body" for message in sent)
+    assert calls == ["outer", "inner"]
+    assert response.media_type == "text/event-stream"
+
+
+def test_token_estimator_moving_average():
+    estimator = RunTokenEstimator(weight=0.5)
+    assert estimator.tokens_saved(100) == 0
+
+    estimator.observe({"model": {"total_tokens": 1000}})
+    estimator.observe({"model": {"total_tokens": 2000}})
+    estimator.observe({})
+
+    assert estimator.mean_tokens == 1500
+    assert estimator.tokens_saved(400) == 1100
+    assert estimator.tokens_saved(2000) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_runs_pass_their_usage_to_the_request_callback():
+    charged: list[dict] = []
+    estimator = RunTokenEstimator()
+
+    async def run():
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            estimator.record_cancellation({"model": {"total_tokens": 120}}, 1.0)
+            raise
+
+    async def request():
+        on_cancelled_run(charged.append)
+        # The run inherits the callback from the request's context
+        with pytest.raises(ClientDisconnectedError):
+            await cancel_on_disconnect(disconnected, run())
+
+    disconnected = FakeRequest()
+    disconnected.disconnect()
+    await asyncio.create_task(request())
+
+    assert charged == [{"model": {"total_tokens": 120}}]
+
+
+def test_token_estimator_rejects_bad_weight():
+    with pytest.raises(ValueError):
+        RunTokenEstimator(weight=0)
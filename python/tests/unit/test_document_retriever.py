@@ -9,11 +9,13 @@ from unittest.mock import AsyncMock, Mock, call, patch
 import dspy
 import pytest
 
+from cairo_coder.core.circuit_breaker import BREAKER_DB, CircuitOpenError
 from cairo_coder.core.config import VectorStoreConfig
 from cairo_coder.core.types import Document, DocumentSource, ProcessedQuery
 from cairo_coder.dspy.document_retriever import (
     DocumentRetrieverProgram,
     SourceFilteredPgVectorRM,
+    merge_adjacent_chunks,
 )
 
 
@@ -257,6 +259,51 @@ class TestDocumentRetrieverProgram:
         assert set(expected_templates) == found_templates
 
 
+    @pytest.mark.asyncio
+    async def test_statement_timeout_falls_back_to_cached_results(
+        self, retriever, mock_dspy_examples, sample_processed_query
+    ):
+        """A timed-out search reuses the last results for the same search query."""
+        retriever.vector_db.aforward = AsyncMock(return_value=mock_dspy_examples)
+        first = await retriever.acall(sample_processed_query, statement_timeout=1.0)
+        assert first.degradations == []
+
+        retriever.vector_db.aforward = AsyncMock(side_effect=TimeoutError())
+        second = await retriever.acall(sample_processed_query, statement_timeout=1.0)
+
+        retriever.vector_db.aforward.assert_any_call(
+            query=sample_processed_query.search_queries[0],
+            sources=sample_processed_query.resources,
+            timeout=1.0,
+        )
+        assert second.degradations == ["retrieval_cached_fallback"]
+        assert {d.page_content for d in second.documents} == {
+            d.page_content for d in first.documents
+        }
+
+    @pytest.mark.asyncio
+    async def test_statement_timeout_without_cache_returns_no_documents(
+        self, retriever, sample_processed_query
+    ):
+        """A timed-out search with nothing cached degrades to an empty result."""
+        retriever.vector_db.aforward = AsyncMock(side_effect=TimeoutError())
+
+        prediction = await retriever.acall(sample_processed_query, statement_timeout=1.0)
+
+        assert prediction.documents == []
+        assert prediction.degradations == ["retrieval_timeout"]
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_returns_no_documents(self, retriever, sample_processed_query):
+        """A search rejected by an open breaker degrades without waiting."""
+        retriever.vector_db.aforward = AsyncMock(side_effect=CircuitOpenError(BREAKER_DB))
+
+        prediction = await retriever.acall(sample_processed_query)
+
+        assert prediction.documents == []
+        assert prediction.degradations == ["retrieval_circuit_open"]
+
+
 class TestDocumentRetrieverFactory:
     """Test the document retriever factory function."""
 
@@ -367,3 +414,65 @@ class TestSourceFilteredPgVectorRM:
         retriever._ensure_pool.assert_awaited_once()
         conn.fetch.assert_awaited_once()
         assert result == []
+
+
+class TestMergeAdjacentChunks:
+    """Tests for merging adjacent chunks of the same page."""
+
+    @staticmethod
+    def chunk(name: str, number: int, content: str, **metadata) -> Document:
+        return Document(
+            page_content=content,
+            metadata={
+                "name": name,
+                "title": f"{name} section {number}",
+                "chunkNumber": number,
+                "source": DocumentSource.CAIRO_BOOK,
+                "sourceLink": f"https://book.cairo-lang.org/{name}.html#s{number}",
+                **metadata,
+            },
+        )
+
+    def test_consecutive_chunks_are_merged_and_overlap_removed(self):
+        shared = "fn shared_overlap_between_chunks() -> felt252 { 42 }"
+        docs = [
+            self.chunk("ch01", 1, f"{shared}\nend", similarity=0.8),
+            self.chunk("ch01", 0, f"First part\n{shared}", similarity=0.6),
+            self.chunk("ch02", 0, "Other page"),
+        ]
+
+        merged = merge_adjacent_chunks(docs)
+
+        assert len(merged) == 2
+        assert merged[0].page_content == f"First part\n{shared}\nend"
+        assert merged[0].metadata["chunkNumber"] == 0
+        assert merged[0].metadata["mergedChunkCount"] == 2
+        assert merged[0].metadata["similarity"] == 0.8
+        assert merged[1].page_content == "Other page"
+
+    def test_non_adjacent_chunks_and_skills_are_kept_separate(self):
+        skill_chunk = Document(
+            page_content="Skill chunk",
+            metadata={"name": "skill", "chunkNumber": 0, "source": DocumentSource.CAIRO_SKILLS},
+        )
+        skill_neighbour = Document(
+            page_content="Skill chunk 2",
+            metadata={"name": "skill", "chunkNumber": 1, "source": DocumentSource.CAIRO_SKILLS},
+        )
+        docs = [
+            self.chunk("ch01", 0, "Intro"),
+            self.chunk("ch01", 0, "Intro"),
+            self.chunk("ch01", 3, "Later section"),
+            skill_chunk,
+            skill_neighbour,
+        ]
+
+        merged = merge_adjacent_chunks(docs)
+
+        assert [doc.page_content for doc in merged] == [
+            "Intro",
+            "Later section",
+            "Skill chunk",
+            "Skill chunk 2",
+        ]
+        assert all("mergedChunkCount" not in doc.metadata for doc in merged)
@@ -6,15 +6,24 @@ These tests verify that:
 - The Grok summary is injected as a virtual first document for generation
 - SOURCES events include Grok citation URLs and exclude the Grok summary doc
 - Grok does not run when not requested; failures do not pollute SOURCES
+- Grok answers are cached, and served stale while refreshed in the background
 """
 
-from unittest.mock import AsyncMock
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
 
 import dspy
 import pytest
 
-from cairo_coder.core.types import Document, DocumentSource
-from cairo_coder.dspy.grok_search import GrokSearchProgram
+from cairo_coder.core.circuit_breaker import (
+    BREAKER_GROK,
+    CircuitOpenError,
+    CircuitState,
+    circuit_breaker,
+)
+from cairo_coder.core.types import Document, DocumentSource, ProcessedQuery
+from cairo_coder.dspy import grok_search
+from cairo_coder.dspy.grok_search import GrokAnswerCache, GrokSearchProgram
 
 # A small subset of the real Grok response shared for mocks
 GROK_ANSWER = (
@@ -48,10 +57,9 @@ async def test_grok_citations_emitted_in_sources_and_summary_excluded(
     monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
     # Mock Grok module on the pipeline instance
     grok_doc = _make_grok_summary_doc(GROK_ANSWER)
-    grok_prediction = dspy.Prediction(documents=[grok_doc])
+    grok_prediction = dspy.Prediction(documents=[grok_doc], citations=list(GROK_CITATIONS))
     grok_prediction.set_lm_usage({})
     pipeline.grok_search.acall = AsyncMock(return_value=grok_prediction)
-    pipeline.grok_search.last_citations = list(GROK_CITATIONS)
 
     # Stream to get SOURCES event
     events = []
@@ -83,10 +91,9 @@ async def test_grok_summary_is_first_in_generation_context(
     monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
     # Mock Grok module on the pipeline instance
     grok_doc = _make_grok_summary_doc(GROK_ANSWER)
-    grok_prediction = dspy.Prediction(documents=[grok_doc])
+    grok_prediction = dspy.Prediction(documents=[grok_doc], citations=list(GROK_CITATIONS))
     grok_prediction.set_lm_usage({})
     pipeline.grok_search.acall = AsyncMock(return_value=grok_prediction)
-    pipeline.grok_search.last_citations = list(GROK_CITATIONS)
 
     await pipeline.acall(
         "What's vesu and how can I get yield on it?",
@@ -157,3 +164,145 @@ def test_extract_urls_strips_trailing_punctuations():
     urls = GrokSearchProgram._extract_urls_from_text(text)
     assert "https://example.com/path" in urls
     assert "https://site.org/page" in urls
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _grok_program(monkeypatch, clock: FakeClock) -> GrokSearchProgram:
+    monkeypatch.setenv("XAI_API_KEY", "test-key")
+    program = GrokSearchProgram(cache=GrokAnswerCache(ttl_s=60, stale_s=600, clock=clock))
+    program._search = AsyncMock(return_value=(GROK_ANSWER, list(GROK_CITATIONS)))
+    return program
+
+
+def _vesu_query(original: str = "What's Vesu?") -> ProcessedQuery:
+    return ProcessedQuery(original=original, search_queries=["vesu lending", "vesu yield"])
+
+
+@pytest.mark.asyncio
+async def test_grok_answers_are_cached_with_request_local_citations(monkeypatch):
+    program = _grok_program(monkeypatch, FakeClock())
+
+    first = await program.aforward(_vesu_query(), "")
+    first.citations.append("https://mutated.example")
+    second = await program.aforward(_vesu_query("  what's VESU "), "")
+
+    program._search.assert_awaited_once()
+    assert second.citations == GROK_CITATIONS
+    assert GROK_ANSWER in second.documents[0].page_content
+
+
+@pytest.mark.asyncio
+async def test_grok_answers_to_conversations_are_not_cached(monkeypatch):
+    clock = FakeClock()
+    program = _grok_program(monkeypatch, clock)
+    await program.aforward(_vesu_query(), "")
+
+    await program.aforward(_vesu_query(), "User: I hold a position on Vesu")
+    await program.aforward(_vesu_query(), "User: I hold a position on Vesu")
+    # A stale entry is not refreshed with a user's conversation either
+    clock.now = 120.0
+    await program.aforward(_vesu_query(), "User: I hold a position on Vesu")
+    await asyncio.sleep(0)
+
+    calls = program._search.await_args_list
+    assert [call.args[1] for call in calls] == ["", *["User: I hold a position on Vesu"] * 3]
+    assert program.cache.get(program.cache.key(_vesu_query()))[0].answer == GROK_ANSWER
+
+
+@pytest.mark.asyncio
+async def test_stale_grok_answer_is_served_while_refreshing(monkeypatch):
+    clock = FakeClock()
+    program = _grok_program(monkeypatch, clock)
+    await program.aforward(_vesu_query(), "")
+
+    clock.now = 120.0
+    program._search.return_value = ("Fresh answer", [])
+    stale = await program.aforward(_vesu_query(), "")
+    assert stale.citations == GROK_CITATIONS
+    await asyncio.sleep(0)  # Let the background refresh complete
+
+    fresh = await program.aforward(_vesu_query(), "")
+    assert program._search.await_count == 2
+    assert fresh.documents[0].page_content == "Fresh answer"
+    assert fresh.citations == []
+
+
+@pytest.mark.asyncio
+async def test_expired_grok_answer_is_fetched_again(monkeypatch):
+    clock = FakeClock()
+    program = _grok_program(monkeypatch, clock)
+    await program.aforward(_vesu_query(), "")
+
+    clock.now = 1000.0
+    await program.aforward(_vesu_query(), "")
+
+    assert program._search.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_open_grok_breaker_still_serves_cached_answers(monkeypatch):
+    clock = FakeClock()
+    program = _grok_program(monkeypatch, clock)
+    await program.aforward(_vesu_query(), "")
+    program._search.side_effect = CircuitOpenError(BREAKER_GROK)
+
+    cached = await program.aforward(_vesu_query(), "")
+    with pytest.raises(CircuitOpenError):
+        await program.aforward(_vesu_query("What's Ekubo?"), "")
+
+    assert cached.citations == GROK_CITATIONS
+
+
+@pytest.mark.asyncio
+async def test_hanging_grok_opens_its_breaker_but_cached_answers_are_served(monkeypatch):
+    monkeypatch.setenv("XAI_API_KEY", "test-key")
+    chat = MagicMock()
+    chat.sample = AsyncMock(return_value=MagicMock(content=GROK_ANSWER))
+    client = MagicMock()
+    client.chat.create.return_value = chat
+    monkeypatch.setattr(grok_search, "_clients", {"test-key": client})
+    program = GrokSearchProgram(cache=GrokAnswerCache(ttl_s=60, stale_s=600, clock=FakeClock()))
+    await program.aforward(_vesu_query(), "")
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    chat.sample.side_effect = hang
+    breaker = circuit_breaker(BREAKER_GROK)
+    monkeypatch.setattr(breaker, "slow_call_s", 0.01)
+    for i in range(breaker.min_calls - 1):  # The first search counted as a success
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(program.aforward(_vesu_query(f"Query {i}"), ""), 0.05)
+
+    assert breaker.state is CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        await program.aforward(_vesu_query("What's Ekubo?"), "")
+    cached = await program.aforward(_vesu_query(), "")
+    assert GROK_ANSWER in cached.documents[0].page_content
+
+
+def test_grok_cache_key_depends_on_search_terms():
+    key = GrokAnswerCache.key(_vesu_query())
+    reordered = ProcessedQuery(original="what's vesu", search_queries=["Vesu yield", "vesu lending"])
+
+    assert GrokAnswerCache.key(reordered) == key
+    assert GrokAnswerCache.key(ProcessedQuery(original="What's Vesu?", search_queries=[])) != key
+
+
+def test_programs_open_the_shared_client_on_first_use(monkeypatch):
+    monkeypatch.setenv("XAI_API_KEY", "test-key")
+    monkeypatch.setattr(grok_search, "_clients", {})
+
+    programs = [GrokSearchProgram(), GrokSearchProgram()]
+    # No gRPC channel before the first search, e.g. in a --preload parent
+    assert grok_search.open_client_count() == 0
+
+    assert programs[0].client is programs[1].client
+    assert grok_search.open_client_count() == 1
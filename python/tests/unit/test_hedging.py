@@ -0,0 +1,165 @@
+"""
+Unit tests for hedged LLM requests.
+"""
+
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from cairo_coder.core import metrics
+from cairo_coder.core.hedging import HedgeConfig, Hedger, configure_hedging, hedged, hedger
+
+
+def hedge_count(stage: str, outcome: str) -> float:
+    labels = {"agent": "hedge-agent", "mode": "chat", "stage": stage, "outcome": outcome}
+    return REGISTRY.get_sample_value("cairo_coder_llm_hedges_total", labels) or 0.0
+
+
+def warm_hedger(stage: str, latency_s: float = 0.01, **config) -> Hedger:
+    """Hedger that has already seen enough calls of `latency_s` to hedge."""
+    defaults = {"budget": 1.0, "min_samples": 5, "min_delay_s": 0.0}
+    hedger = Hedger(stage, HedgeConfig(**{**defaults, **config}))
+    hedger.latencies.extend([latency_s] * 5)
+    return hedger
+
+
+class SlowThenFast:
+    """LLM call whose first request hangs and later ones answer at once."""
+
+    def __init__(self, first_error: Exception | None = None):
+        self.calls = 0
+        self.cancelled = 0
+        self.first_error = first_error
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        call = self.calls
+        if call > 1:
+            return f"answer {call}"
+        try:
+            await asyncio.sleep(0.05 if self.first_error else 10)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        raise self.first_error
+
+
+@pytest.fixture(autouse=True)
+def request_labels():
+    metrics.set_request_labels("hedge-agent", mcp_mode=False)
+
+
+@pytest.mark.asyncio
+async def test_disabled_by_default():
+    configure_hedging(HedgeConfig())
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "answer"
+
+    assert await hedged("disabled-stage", call) == "answer"
+    assert calls == [1]
+    assert not hedger("disabled-stage").latencies
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_before_enough_samples():
+    hedger = Hedger("cold", HedgeConfig(budget=1.0, min_samples=5, min_delay_s=0.0))
+    call = SlowThenFast(first_error=RuntimeError("LM failed"))
+
+    with pytest.raises(RuntimeError, match="LM failed"):
+        await hedger.run(call)
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    hedger = warm_hedger("slow")
+    call = SlowThenFast()
+    sent_before = hedge_count("slow", "sent")
+    won_before = hedge_count("slow", "won")
+
+    assert await hedger.run(call) == "answer 2"
+
+    assert call.calls == 2
+    assert call.cancelled == 1
+    assert hedge_count("slow", "sent") == sent_before + 1
+    assert hedge_count("slow", "won") == won_before + 1
+
+
+@pytest.mark.asyncio
+async def test_fast_call_is_not_hedged():
+    hedger = warm_hedger("fast", latency_s=1.0)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return "answer"
+
+    assert await hedger.run(call) == "answer"
+    assert calls == [1]
+    assert len(hedger.latencies) == 6
+
+
+@pytest.mark.asyncio
+async def test_budget_caps_hedges():
+    hedger = warm_hedger("budget", budget=0.5, max_burst=1.0)
+    skipped_before = hedge_count("budget", "skipped")
+
+    # Two calls earn one hedge: the first slow call is not hedged, the second is
+    first = SlowThenFast(first_error=RuntimeError("slow"))
+    with pytest.raises(RuntimeError, match="slow"):
+        await hedger.run(first)
+    second = SlowThenFast()
+    assert await hedger.run(second) == "answer 2"
+
+    assert first.calls == 1
+    assert second.calls == 2
+    assert hedge_count("budget", "skipped") == skipped_before + 1
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_hedge():
+    hedger = warm_hedger("failing")
+    call = SlowThenFast(first_error=RuntimeError("LM failed"))
+
+    assert await hedger.run(call) == "answer 2"
+
+
+@pytest.mark.asyncio
+async def test_all_requests_failing_raises_first_error():
+    hedger = warm_hedger("all-failing")
+    errors = iter([RuntimeError("first"), RuntimeError("second")])
+
+    async def call():
+        error = next(errors)
+        await asyncio.sleep(0.05)
+        raise error
+
+    with pytest.raises(RuntimeError, match="first"):
+        await hedger.run(call)
+
+
+def test_delay_follows_latency_quantile():
+    hedger = Hedger(
+        "quantile",
+        HedgeConfig(budget=1.0, min_samples=10, latency_quantile=0.9, max_delay_s=5.0),
+    )
+    hedger.latencies.extend(i / 10 for i in range(1, 10))
+    assert hedger.delay_s() is None
+
+    hedger.latencies.append(1.0)
+    assert hedger.delay_s() == pytest.approx(1.0)
+    hedger.latencies.extend([100.0] * 10)
+    assert hedger.delay_s() == 5.0
+
+
+def test_config_validation():
+    with pytest.raises(ValueError):
+        HedgeConfig(budget=-0.1)
+    with pytest.raises(ValueError):
+        HedgeConfig(latency_quantile=1.0)
+    with pytest.raises(ValueError):
+        HedgeConfig(min_delay_s=2.0, max_delay_s=1.0)
@@ -0,0 +1,118 @@
+"""Unit tests for the Prometheus metrics helpers."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+
+from cairo_coder.core import metrics
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_timer_uses_request_labels():
+    metrics.set_request_labels("metrics-agent", mcp_mode=True)
+    labels = {"agent": "metrics-agent", "mode": "mcp", "stage": metrics.STAGE_JUDGE}
+    before = sample("cairo_coder_pipeline_stage_seconds_count", **labels)
+
+    with pytest.raises(RuntimeError), metrics.stage_timer(metrics.STAGE_JUDGE):
+        raise RuntimeError("judge failed")
+
+    assert sample("cairo_coder_pipeline_stage_seconds_count", **labels) == before + 1
+
+
+def test_judge_and_usage_counters():
+    metrics.set_request_labels("metrics-agent", mcp_mode=False)
+    labels = {"agent": "metrics-agent", "mode": "chat"}
+    dropped_before = sample("cairo_coder_judge_documents_total", **labels, outcome="dropped")
+    tokens_before = sample("cairo_coder_lm_tokens_total", **labels, model="gemini", kind="prompt")
+
+    metrics.record_judge(judged=5, kept=3)
+    metrics.record_lm_usage({"gemini": {"prompt_tokens": 120, "completion_tokens": 30}})
+
+    assert sample("cairo_coder_judge_documents_total", **labels, outcome="dropped") == dropped_before + 2
+    assert sample("cairo_coder_lm_tokens_total", **labels, model="gemini", kind="prompt") == tokens_before + 120
+
+
+@pytest.mark.asyncio
+async def test_acquire_records_pool_checkouts():
+    metrics.set_request_labels("metrics-agent", mcp_mode=False)
+    labels = {"agent": "metrics-agent", "mode": "chat", "pool": "test"}
+    connection = object()
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__.return_value = connection
+    before = sample("cairo_coder_db_pool_checkouts_total", **labels)
+
+    async with metrics.acquire(pool, "test") as acquired:
+        assert acquired is connection
+
+    assert sample("cairo_coder_db_pool_checkouts_total", **labels) == before + 1
+    assert sample("cairo_coder_db_pool_wait_seconds_count", **labels) == before + 1
+
+
+def test_render_latest_exposes_metric_families():
+    payload, content_type = metrics.render_latest()
+
+    assert content_type.startswith("text/plain")
+    assert b"cairo_coder_pipeline_stage_seconds" in payload
+
+
+def test_worker_samples_are_aggregated(tmp_path):
+    """Samples written by separate worker processes are summed on scrape."""
+    script = (
+        "from cairo_coder.core import metrics\n"
+        "metrics.set_request_labels('cairo-coder', False)\n"
+        "metrics.record_sse_disconnect()\n"
+    )
+    src_dir = str(Path(metrics.__file__).parents[2])
+    env = {
+        **os.environ,
+        metrics.MULTIPROC_DIR_ENV: str(tmp_path),
+        "PYTHONPATH": os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")])),
+    }
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+
+    assert registry.get_sample_value(
+        "cairo_coder_sse_client_disconnects_total", {"agent": "cairo-coder", "mode": "chat"}
+    ) == 2
+
+
+def test_gauges_of_exited_workers_are_dropped(tmp_path):
+    """Live gauges only aggregate the workers that have not shut down."""
+    script = (
+        "import sys\n"
+        "from cairo_coder.core import metrics\n"
+        "state = int(sys.argv[1])\n"
+        "metrics.record_circuit_state('grok', 'open' if state else 'closed', state)\n"
+        "if state:\n"
+        "    metrics.mark_worker_exited()\n"
+    )
+    src_dir = str(Path(metrics.__file__).parents[2])
+    env = {
+        **os.environ,
+        metrics.MULTIPROC_DIR_ENV: str(tmp_path),
+        "PYTHONPATH": os.pathsep.join(filter(None, [src_dir, os.environ.get("PYTHONPATH")])),
+    }
+    # An exited worker whose breaker was open, and a running one whose breaker is closed
+    for state in ("2", "0"):
+        subprocess.run([sys.executable, "-c", script, state], env=env, check=True)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+
+    assert registry.get_sample_value(
+        "cairo_coder_circuit_breaker_state", {"dependency": "grok"}
+    ) == 0
+    assert registry.get_sample_value(
+        "cairo_coder_circuit_breaker_transitions_total", {"dependency": "grok", "state": "open"}
+    ) == 1
@@ -0,0 +1,105 @@
+"""Unit tests for opt-in request profiling."""
+
+import asyncio
+
+import pytest
+from fastapi.responses import StreamingResponse
+
+from cairo_coder.server.disconnect import on_response_end
+from cairo_coder.server.profiling import RequestProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return RequestProfiler(admin_token="secret", directory=tmp_path, max_sessions=2)
+
+
+async def profile_once(profiler: RequestProfiler, label: str) -> str:
+    session = profiler.start(label)
+    await asyncio.sleep(0.005)
+    await profiler.finish(session)
+    return session.profile_id
+
+
+def test_header_requires_admin_token(profiler):
+    assert profiler.should_profile("secret")
+    assert not profiler.should_profile("wrong")
+    assert not profiler.should_profile(None)
+    assert RequestProfiler("secret", profiler.directory, sample_rate=1.0).should_profile(None)
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_stored_in_a_bounded_ring(profiler):
+    ids = [await profile_once(profiler, f"Cairo Coder {i}") for i in range(3)]
+
+    profiles = profiler.list_profiles()
+
+    assert [profile.id for profile in profiles] == [ids[2], ids[1]]
+    assert profiles[0].label == "cairo-coder-2"
+    assert profiler.report_path(ids[0], "html") is None
+    assert profiler.report_path(ids[2], "html").read_text().startswith("<!DOCTYPE html>")
+    assert '"$schema"' in profiler.report_path(ids[2], "speedscope").read_text()
+
+
+async def wait_for_report(profiler: RequestProfiler, profile_id: str) -> None:
+    for _ in range(200):
+        if profiler.report_path(profile_id, "html") is not None:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Profile report was not written")
+
+
+@pytest.mark.asyncio
+async def test_streamed_response_finishes_the_session(profiler):
+    async def body():
+        yield "data: 1\n\n"
+        yield "data: [DONE]\n\n"
+
+    session = profiler.start("stream")
+    response = on_response_end(
+        StreamingResponse(body()), lambda: profiler.finish_in_background(session)
+    )
+    sent: list[dict] = []
+
+    async def receive() -> dict:
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+    assert [m.get("body") for m in sent[1:]] == [b"data: 1\n\n", b"data: [DONE]\n\n", b""]
+    assert not session.profiler.is_running
+    await wait_for_report(profiler, session.profile_id)
+
+
+@pytest.mark.asyncio
+async def test_session_stops_when_the_client_leaves_before_the_first_chunk(
+    profiler, send_to_gone_client
+):
+    async def body():
+        yield "data: 1\n\n"
+
+    session = profiler.start("stream")
+    response = on_response_end(
+        StreamingResponse(body()), lambda: profiler.finish_in_background(session)
+    )
+
+    await send_to_gone_client(response)
+
+    assert not session.profiler.is_running
+    await wait_for_report(profiler, session.profile_id)
+
+
+def test_report_path_rejects_unknown_ids_and_formats(profiler):
+    assert profiler.report_path("../secret", "html") is None
+    assert profiler.report_path("1792381222676-request-7194c411", "pdf") is None
+
+
+def test_invalid_configuration(tmp_path):
+    with pytest.raises(ValueError):
+        RequestProfiler(admin_token="", directory=tmp_path)
+    with pytest.raises(ValueError):
+        RequestProfiler(admin_token="secret", directory=tmp_path, sample_rate=2)
@@ -110,6 +110,19 @@ class TestQueryProcessorProgram:
             assert result.original == ""
             assert result.resources == list(DocumentSource)  # Default fallback
 
+    def test_heuristic_process_skips_lm(self, mock_lm_predict, processor):
+        """The heuristic fallback builds a ProcessedQuery without calling the LM."""
+        query = "How do I test a contract with snforge?"
+
+        result = processor.heuristic_process(query)
+
+        mock_lm_predict.acall.assert_not_called()
+        assert result.original == query
+        assert result.search_queries == [query]
+        assert result.is_contract_related is True
+        assert result.is_test_related is True
+        assert result.resources == list(DocumentSource)
+
 
 class TestCairoQueryAnalysis:
     """Test suite for CairoQueryAnalysis signature."""
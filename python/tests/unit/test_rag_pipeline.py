@@ -5,11 +5,22 @@ Tests the pipeline orchestration functionality including query processing,
 document retrieval, response generation, and retrieval judge feature.
 """
 
+import asyncio
+import contextlib
 from unittest.mock import AsyncMock, Mock, patch
 
 import dspy
 import pytest
 
+from cairo_coder.core.circuit_breaker import (
+    BREAKER_GROK,
+    BREAKER_JUDGE_LM,
+    BREAKER_QUERY_LM,
+    CircuitOpenError,
+    circuit_breaker,
+)
+from cairo_coder.core.constants import MAX_LATENCY_BUDGET_S
+from cairo_coder.core.deadline import Deadline
 from cairo_coder.core.rag_pipeline import (
     RagPipeline,
     RagPipelineFactory,
@@ -19,6 +30,7 @@ from cairo_coder.core.types import (
     DocumentSource,
     Message,
     PipelineResult,
+    ProcessedQuery,
     Role,
     StreamEventType,
 )
@@ -106,6 +118,36 @@ class TestRagPipeline:
         assert StreamEventType.FINAL_RESPONSE in event_types
         assert StreamEventType.END in event_types
 
+    @pytest.mark.asyncio
+    async def test_cancelled_stream_closes_generation(self, pipeline):
+        """Closing the event stream cancels the run and closes the LM stream."""
+        closed = asyncio.Event()
+
+        async def endless_generation(*args, **kwargs):
+            try:
+                yield dspy.streaming.StreamResponse(
+                    predict_name="GenerationProgram",
+                    signature_field_name="answer",
+                    chunk="Cairo",
+                    is_last_chunk=False,
+                )
+                await asyncio.Event().wait()
+            finally:
+                closed.set()
+
+        pipeline.generation_program.aforward_streaming = endless_generation
+        pipeline.run_tokens.observe({"model": {"total_tokens": 1000}})
+
+        events = pipeline.aforward_streaming("How to write Cairo contracts?")
+        async for event in events:
+            if event.type == StreamEventType.RESPONSE:
+                break
+        with patch("cairo_coder.core.cancellation.metrics.record_cancelled_run") as record:
+            await events.aclose()
+
+        assert closed.is_set()
+        record.assert_called_once_with(1000)
+
     @pytest.mark.asyncio
     async def test_mcp_mode_execution(self, pipeline):
         """Test MCP mode pipeline execution."""
@@ -462,6 +504,267 @@ class TestRagPipelineWithJudge:
         assert "Test content" in context
 
 
+class TestLatencyBudget:
+    """Tests for per-request latency budgets and graceful stage degradation."""
+
+    @pytest.mark.asyncio
+    async def test_unbounded_budget_applies_no_degradation(self, pipeline):
+        """Without a budget every stage runs and no degradation is recorded."""
+        result = await pipeline.acall("How to write Cairo contracts?", deadline=Deadline(None))
+
+        pipeline.retrieval_judge.acall.assert_called_once()
+        assert RagPipeline.prediction_to_pipeline_result(result).degradations == []
+
+    @pytest.mark.asyncio
+    async def test_small_budget_skips_optional_stages(
+        self, pipeline, sample_processed_query, monkeypatch
+    ):
+        """A budget smaller than the generation reserve skips every stage before generation."""
+        monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
+        pipeline.grok_search.acall = AsyncMock()
+        pipeline.query_processor.heuristic_process = Mock(return_value=sample_processed_query)
+
+        result = await pipeline.acall(
+            "How to write Cairo contracts?",
+            sources=[DocumentSource.STARKNET_BLOG],
+            deadline=Deadline(1.0),
+        )
+
+        pipeline.query_processor.acall.assert_not_called()
+        pipeline.grok_search.acall.assert_not_called()
+        pipeline.retrieval_judge.acall.assert_not_called()
+        pipeline.generation_program.acall.assert_called_once()
+        assert result.degradations == [
+            "query_processing_skipped",
+            "grok_skipped",
+            "judge_skipped",
+            "skill_expansion_skipped",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_breakers_skip_stages(
+        self, pipeline, sample_processed_query, monkeypatch
+    ):
+        """Stages whose dependency is failing are skipped without being called."""
+        monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
+        # Grok checks its breaker itself, as cached answers are served regardless
+        pipeline.grok_search.acall = AsyncMock(side_effect=CircuitOpenError(BREAKER_GROK))
+        pipeline.query_processor.heuristic_process = Mock(return_value=sample_processed_query)
+        for dependency in (BREAKER_QUERY_LM, BREAKER_JUDGE_LM):
+            breaker = circuit_breaker(dependency)
+            for _ in range(breaker.min_calls):
+                with contextlib.suppress(RuntimeError), breaker.guard():
+                    raise RuntimeError(f"{dependency} is down")
+
+        result = await pipeline.acall(
+            "How to write Cairo contracts?",
+            sources=[DocumentSource.STARKNET_BLOG],
+            deadline=Deadline(None),
+        )
+
+        pipeline.query_processor.acall.assert_not_called()
+        pipeline.retrieval_judge.acall.assert_not_called()
+        pipeline.generation_program.acall.assert_called_once()
+        assert result.degradations == [
+            "query_processing_circuit_open",
+            "grok_circuit_open",
+            "judge_circuit_open",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_slow_judge_is_cut_short(self, pipeline, sample_documents, monkeypatch):
+        """A judge exceeding the remaining budget is cancelled and all documents are kept."""
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.GENERATION_RESERVE_S", 0.0)
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.QUERY_PROCESSING_MIN_BUDGET_S", 0.0)
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.JUDGE_MIN_BUDGET_S", 0.0)
+
+        async def slow_judge(query, documents):
+            await asyncio.sleep(10)
+
+        pipeline.retrieval_judge.acall = AsyncMock(side_effect=slow_judge)
+
+        result = await pipeline.acall("How to write Cairo contracts?", deadline=Deadline(0.2))
+
+        assert "judge_timeout" in result.degradations
+        assert len(result.documents) == len(sample_documents)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(("slow_call_s", "opens"), [(10.0, False), (0.05, True)])
+    async def test_only_judge_calls_past_the_slow_threshold_open_its_breaker(
+        self, pipeline, sample_documents, monkeypatch, slow_call_s, opens
+    ):
+        """Judge calls cut short by a client's budget are only counted once already slow."""
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.GENERATION_RESERVE_S", 0.0)
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.QUERY_PROCESSING_MIN_BUDGET_S", 0.0)
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.JUDGE_MIN_BUDGET_S", 0.0)
+        breaker = circuit_breaker(BREAKER_JUDGE_LM)
+        monkeypatch.setattr(breaker, "slow_call_s", slow_call_s)
+
+        async def hanging_rater(**kwargs):
+            await asyncio.sleep(10)
+
+        pipeline.retrieval_judge = RetrievalJudge()
+        pipeline.retrieval_judge.rater.acall = AsyncMock(side_effect=hanging_rater)
+
+        results = [
+            await pipeline.acall("How to write Cairo contracts?", deadline=Deadline(0.2))
+            for _ in range(breaker.min_calls)
+        ]
+
+        assert "judge_timeout" in results[0].degradations
+        assert ("judge_circuit_open" in results[-1].degradations) is opens
+        assert all(len(result.documents) == len(sample_documents) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_query_processing_timeout_uses_heuristic_query(
+        self, pipeline, sample_processed_query, monkeypatch
+    ):
+        """A query processor exceeding the budget falls back to the raw query."""
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.GENERATION_RESERVE_S", 0.0)
+        monkeypatch.setattr("cairo_coder.core.rag_pipeline.QUERY_PROCESSING_MIN_BUDGET_S", 0.0)
+
+        async def slow_processing(**kwargs):
+            await asyncio.sleep(10)
+
+        pipeline.query_processor.acall = AsyncMock(side_effect=slow_processing)
+        pipeline.query_processor.heuristic_process = Mock(return_value=sample_processed_query)
+
+        result = await pipeline.acall("How to write Cairo contracts?", deadline=Deadline(0.1))
+
+        pipeline.query_processor.heuristic_process.assert_called_once_with(
+            "How to write Cairo contracts?"
+        )
+        assert result.degradations[0] == "query_processing_timeout"
+
+    @pytest.mark.asyncio
+    async def test_streaming_end_event_reports_degradations(
+        self, pipeline, sample_processed_query
+    ):
+        """The END event's PipelineResult carries the applied degradations."""
+        pipeline.query_processor.heuristic_process = Mock(return_value=sample_processed_query)
+        events = [
+            event
+            async for event in pipeline.aforward_streaming(
+                "How to write Cairo contracts?", deadline=Deadline(1.0)
+            )
+        ]
+
+        end_event = next(e for e in events if e.type == StreamEventType.END)
+        assert "judge_skipped" in end_event.data.degradations
+
+    def test_deadline_from_header_validates_and_caps(self):
+        """Header budgets are parsed as milliseconds, validated and capped."""
+        assert Deadline.from_header("1500").budget_s == 1.5
+        assert Deadline.from_header("99999999").budget_s == MAX_LATENCY_BUDGET_S
+        with pytest.raises(ValueError):
+            Deadline.from_header("fast")
+        with pytest.raises(ValueError):
+            Deadline.from_header("0")
+
+
+class TestRetrieveOnly:
+    """Tests for retrieval without generation."""
+
+    @pytest.mark.asyncio
+    async def test_retrieve_runs_no_generation(self, pipeline, sample_documents):
+        """Retrieval returns judged, ranked documents and formatted sources."""
+        result = await pipeline.aretrieve("How to write Cairo contracts?", deadline=Deadline(None))
+
+        pipeline.query_processor.acall.assert_called_once()
+        pipeline.retrieval_judge.acall.assert_called_once()
+        pipeline.generation_program.acall.assert_not_called()
+        pipeline.mcp_generation_program.acall.assert_not_called()
+        assert result.answer is None
+        assert len(result.documents) == len(sample_documents)
+        assert result.formatted_sources == pipeline._format_sources(result.documents)
+
+    @pytest.mark.asyncio
+    async def test_fast_path_without_judge_skips_every_lm_call(
+        self, pipeline, sample_processed_query, monkeypatch
+    ):
+        """The fast path processes the query heuristically and the judge can be turned off."""
+        monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
+        pipeline.grok_search.acall = AsyncMock()
+        pipeline.query_processor.heuristic_process = Mock(return_value=sample_processed_query)
+
+        result = await pipeline.aretrieve(
+            "How to write Cairo contracts?",
+            sources=[DocumentSource.STARKNET_BLOG],
+            deadline=Deadline(None),
+            fast_path=True,
+            judge=False,
+            limit=1,
+        )
+
+        pipeline.query_processor.acall.assert_not_called()
+        pipeline.retrieval_judge.acall.assert_not_called()
+        pipeline.grok_search.acall.assert_not_called()
+        assert len(result.documents) == 1
+        assert result.degradations == []
+
+
+class TestConversationState:
+    """Tests for retrieval reuse across the turns of a conversation."""
+
+    @pytest.mark.asyncio
+    async def test_follow_up_reuses_documents_and_judge_scores(self, pipeline):
+        """Follow-up turns carry documents over and only judge new documents."""
+        turns = [
+            [("Cairo Contracts", "contract content"), ("Cairo Storage", "storage content")],
+            [("Cairo Storage", "storage content"), ("Cairo Testing", "testing content")],
+        ]
+
+        async def retrieve(**kwargs):
+            specs = turns.pop(0)
+            prediction = dspy.Prediction(
+                documents=create_custom_documents(
+                    [(title, content, "cairo_book") for title, content in specs]
+                )
+            )
+            prediction.set_lm_usage({})
+            return prediction
+
+        async def judge(query, documents):
+            for doc in documents:
+                doc.metadata["llm_judge_score"] = 0.8
+            return dspy.Prediction(documents=documents)
+
+        pipeline.document_retriever.acall = AsyncMock(side_effect=retrieve)
+        pipeline.retrieval_judge.acall = AsyncMock(side_effect=judge)
+        pipeline.retrieval_judge.threshold = 0.4
+
+        await pipeline.acall("How do I write a contract?", conversation_id="conv")
+        result = await pipeline.acall("Now add a test for it", conversation_id="conv")
+
+        second_judge_docs = pipeline.retrieval_judge.acall.call_args_list[1].kwargs["documents"]
+        assert [doc.metadata["title"] for doc in second_judge_docs] == ["Cairo Testing"]
+        assert {doc.metadata["title"] for doc in result.documents} == {
+            "Cairo Contracts",
+            "Cairo Storage",
+            "Cairo Testing",
+        }
+        assert pipeline.conversation_states.get("conv").turn == 2
+
+    @pytest.mark.asyncio
+    async def test_heuristic_fallback_keeps_previous_search_queries(
+        self, pipeline, sample_processed_query
+    ):
+        """When query processing is skipped, a follow-up keeps the previous search queries."""
+        await pipeline.acall("How to write Cairo contracts?", conversation_id="conv")
+        pipeline.query_processor.heuristic_process = Mock(
+            return_value=ProcessedQuery(original="Now add a test", search_queries=["Now add a test"])
+        )
+
+        result = await pipeline.acall(
+            "Now add a test", conversation_id="conv", deadline=Deadline(1.0)
+        )
+
+        assert result.processed_query.search_queries == [
+            "Now add a test",
+            *sample_processed_query.search_queries,
+        ]
+
+
 class TestRagPipelineFactory:
     """Tests for RagPipelineFactory."""
 
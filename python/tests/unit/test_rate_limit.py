@@ -0,0 +1,123 @@
+"""
+Unit tests for the per-user and per-API-key rate limits.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from cairo_coder.server import rate_limit
+from cairo_coder.server.rate_limit import (
+    KIND_API_KEY,
+    KIND_USER,
+    RateLimiter,
+    RateLimitKey,
+    RateLimitPolicy,
+    create_rate_limiter_from_env,
+)
+
+API_KEY = RateLimitKey(KIND_API_KEY, "key-hash")
+USER = RateLimitKey(KIND_USER, "user-hash")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def usage(total_tokens: int):
+    return {"gemini/gemini-3-flash-preview": {"total_tokens": total_tokens}}
+
+
+@pytest.mark.asyncio
+async def test_request_limit_rejects_bursts_and_refills(clock):
+    limiter = RateLimiter(RateLimitPolicy(requests_per_minute=2), RateLimitPolicy())
+
+    await limiter.check(API_KEY)
+    await limiter.check(API_KEY)
+    with pytest.raises(HTTPException) as exc:
+        await limiter.check(API_KEY)
+
+    assert exc.value.status_code == 429
+    assert exc.value.detail["error"]["code"] == "rate_limit_exceeded"
+    assert exc.value.headers["Retry-After"] == "30"
+    # Other identities and kinds without limits are not affected
+    await limiter.check(RateLimitKey(KIND_API_KEY, "other-key"))
+    await limiter.check(USER)
+    await limiter.check(None)
+
+    clock[0] += 30
+    await limiter.check(API_KEY)
+
+
+@pytest.mark.asyncio
+async def test_llm_tokens_are_charged_after_the_request_and_block_until_repaid(clock):
+    limiter = RateLimiter(RateLimitPolicy(), RateLimitPolicy(tokens_per_minute=600))
+
+    await limiter.check(USER)
+    # A single request may overdraw the bucket
+    await limiter.charge(usage(900))
+    with pytest.raises(HTTPException) as exc:
+        await limiter.check(USER)
+    assert exc.value.headers["Retry-After"] == "30"
+
+    clock[0] += 31
+    await limiter.check(USER)
+    # Requests of anonymous clients are not charged to the last identity
+    await limiter.check(None)
+    await limiter.charge(usage(10_000))
+    await limiter.check(USER)
+
+
+@pytest.mark.asyncio
+async def test_batches_take_one_request_token_per_item(clock):
+    limiter = RateLimiter(RateLimitPolicy(requests_per_minute=10), RateLimitPolicy())
+
+    await limiter.check(API_KEY, requests=25)
+    with pytest.raises(HTTPException):
+        await limiter.check(API_KEY)
+
+    clock[0] += 60
+    with pytest.raises(HTTPException):
+        await limiter.check(API_KEY)
+    clock[0] += 36
+    await limiter.check(API_KEY)
+
+
+@pytest.mark.asyncio
+async def test_shared_buckets_are_used_and_fall_back_to_the_worker(monkeypatch, clock):
+    stored: dict[str, float] = {}
+
+    async def update_shared(keys, update):
+        # Buckets start empty as of the epoch, like new rows
+        balances, result = update({key: (stored.get(key, 0.0), 1e9) for key in keys})
+        stored.update(balances)
+        return result
+
+    monkeypatch.setattr(rate_limit, "update_rate_limit_buckets", update_shared)
+    limiter = RateLimiter(RateLimitPolicy(requests_per_minute=5), RateLimitPolicy(), shared=True)
+
+    await limiter.check(API_KEY)
+    assert stored == {"api_key:key-hash:requests": 4.0}
+    assert not limiter._local
+
+    async def unavailable(keys, update):
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(rate_limit, "update_rate_limit_buckets", unavailable)
+    await limiter.check(API_KEY)
+    assert limiter._local["api_key:key-hash:requests"] == (4.0, clock[0])
+
+
+def test_rate_limiter_from_env(monkeypatch):
+    for kind in ("API_KEY", "USER"):
+        for unit in ("RPM", "TPM"):
+            monkeypatch.delenv(f"RATE_LIMIT_{kind}_{unit}", raising=False)
+    assert create_rate_limiter_from_env() is None
+
+    monkeypatch.setenv("RATE_LIMIT_USER_RPM", "20")
+    monkeypatch.setenv("RATE_LIMIT_SHARED", "true")
+    limiter = create_rate_limiter_from_env()
+    assert limiter is not None and limiter.shared
+    assert limiter.policies[KIND_USER] == RateLimitPolicy(requests_per_minute=20)
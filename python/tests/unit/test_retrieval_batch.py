@@ -0,0 +1,114 @@
+"""
+Unit tests for the embedding and vector search work shared within a batch.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from cairo_coder.core.retrieval_batch import (
+    RetrievalBatch,
+    current_retrieval_batch,
+    use_retrieval_batch,
+)
+from cairo_coder.core.types import DocumentSource
+from cairo_coder.dspy.document_retriever import SourceFilteredPgVectorRM
+
+
+def fake_embedder(calls: list[list[str]]):
+    def embed(texts: list[str]) -> list[list[float]]:
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    return embed
+
+
+def vector_store(embed, rows) -> tuple[SourceFilteredPgVectorRM, AsyncMock]:
+    retriever = SourceFilteredPgVectorRM.__new__(SourceFilteredPgVectorRM)
+    retriever.embedding_func = embed
+    retriever.pg_table_name = "documents"
+    retriever.fields = ["id", "content", "metadata"]
+    retriever.content_field = "content"
+    retriever.embedding_field = "embedding"
+    retriever.include_similarity = True
+    retriever.k = 5
+    retriever._ensure_pool = AsyncMock()
+
+    conn = AsyncMock()
+    conn.fetch = AsyncMock(return_value=rows)
+    acquire_ctx = AsyncMock()
+    acquire_ctx.__aenter__.return_value = conn
+    acquire_ctx.__aexit__.return_value = False
+    retriever.pool = Mock()
+    retriever.pool.acquire.return_value = acquire_ctx
+    return retriever, conn.fetch
+
+
+@pytest.mark.asyncio
+async def test_concurrent_texts_are_embedded_in_one_call():
+    calls: list[list[str]] = []
+    batch = RetrievalBatch(fake_embedder(calls), window_s=0.01)
+
+    embeddings = await asyncio.gather(
+        batch.embed("storage"), batch.embed("events"), batch.embed("storage")
+    )
+
+    assert calls == [["storage", "events"]]
+    assert embeddings == [[7.0, 1.0], [6.0, 1.0], [7.0, 1.0]]
+    # Texts already embedded in the batch are not embedded again
+    assert await batch.embed("events") == [6.0, 1.0]
+    assert batch.embedding_call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_embedded_without_waiting_and_failures_are_retried():
+    calls: list[list[str]] = []
+    batch = RetrievalBatch(fake_embedder(calls), window_s=60.0, max_texts=2)
+    await asyncio.wait_for(asyncio.gather(batch.embed("a"), batch.embed("b")), timeout=1)
+    assert calls == [["a", "b"]]
+
+    failing = RetrievalBatch(Mock(side_effect=RuntimeError("quota")), window_s=0.0)
+    with pytest.raises(RuntimeError, match="quota"):
+        await failing.embed("a")
+    failing._embed = fake_embedder(calls)
+    assert await failing.embed("a") == [1.0, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_identical_searches_run_once_within_a_batch(monkeypatch):
+    monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
+    calls: list[list[str]] = []
+    rows = [{"id": 1, "content": "Storage", "metadata": {"title": "Storage"}, "similarity": 0.9}]
+    retriever, fetch = vector_store(fake_embedder(calls), rows)
+    sources = [DocumentSource.CAIRO_BOOK]
+
+    batch = RetrievalBatch(retriever.embedding_func, window_s=0.01)
+    with use_retrieval_batch(batch):
+        first, second, other = await asyncio.gather(
+            retriever.aforward("storage", sources=sources),
+            retriever.aforward("storage", sources=sources),
+            retriever.aforward("events", sources=sources),
+        )
+    assert current_retrieval_batch() is None
+
+    assert calls == [["storage", "events"]]
+    assert fetch.await_count == 2
+    assert first[0].metadata == second[0].metadata == other[0].metadata
+    # Every request gets its own copy, so annotating one does not affect the others
+    first[0].metadata["llm_judge_score"] = 1.0
+    assert "llm_judge_score" not in second[0].metadata
+    await batch.aclose()
+
+
+@pytest.mark.asyncio
+async def test_without_a_batch_each_search_embeds_its_query(monkeypatch):
+    monkeypatch.delenv("OPTIMIZER_RUN", raising=False)
+    embed = Mock(return_value=[0.5, 0.5])
+    retriever, fetch = vector_store(embed, [])
+
+    await retriever.aforward("storage")
+    await retriever.aforward("storage")
+
+    assert embed.call_args_list == [(("storage",),), (("storage",),)]
+    assert fetch.await_count == 2
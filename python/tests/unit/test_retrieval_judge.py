@@ -1,10 +1,13 @@
 """Unit tests for RetrievalJudge module."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
 import dspy
 import pytest
 
+from cairo_coder.core.circuit_breaker import BREAKER_JUDGE_LM, CircuitState, circuit_breaker
+from cairo_coder.core.concurrency import configure_stage_limits
 from cairo_coder.core.types import Document
 from cairo_coder.dspy.retrieval_judge import RetrievalJudge
 from cairo_coder.dspy.templates import CONTRACT_TEMPLATE_TITLE, TEST_TEMPLATE_TITLE
@@ -105,6 +108,31 @@ class TestRetrievalJudge:
         assert len(filtered_docs) == len(documents)
         assert filtered_docs == documents
 
+    @pytest.mark.asyncio
+    async def test_time_queued_for_an_llm_slot_is_not_judge_latency(self, monkeypatch):
+        """Calls waiting behind the worker's own LLM calls are not counted as slow."""
+        configure_stage_limits(llm=1)
+        breaker = circuit_breaker(BREAKER_JUDGE_LM)
+        monkeypatch.setattr(breaker, "slow_call_s", 0.05)
+
+        async def rate(**kwargs):
+            await asyncio.sleep(0.02)
+            return MagicMock(resource_note=0.8, reasoning="Relevant")
+
+        judge = RetrievalJudge()
+        judge.rater.acall = AsyncMock(side_effect=rate)
+        documents = [
+            Document(page_content=f"Content {i}", metadata={"title": f"Doc {i}"})
+            for i in range(breaker.min_calls)
+        ]
+        try:
+            prediction = await judge.acall("test query", documents)
+        finally:
+            configure_stage_limits()
+
+        assert len(prediction.documents) == len(documents)
+        assert breaker.state is CircuitState.CLOSED
+
     @pytest.mark.asyncio
     async def test_aforward_with_contract_and_test_templates(self, sample_documents):
         """Test forward with contract template."""
@@ -1,6 +1,10 @@
 """
 Unit tests for server utility functions.
 """
+
+import pytest
+
+
 class TestHashUserId:
     """Tests for the hash_user_id function."""
 
@@ -28,3 +32,29 @@ class TestHashUserId:
 
         result = hash_user_id("")
         assert result == "e3b0c44298fc1c149afbf4c8996fb924"
+
+
+class TestPreloadAgents:
+    """Tests for building the agents before the workers are forked."""
+
+    def test_preload_refuses_grpc_channels_opened_before_fork(self, monkeypatch):
+        """Workers cannot share a gRPC channel, so preloading fails if one was opened."""
+        from unittest.mock import Mock
+
+        from cairo_coder.dspy import grok_search
+        from cairo_coder.server import app
+
+        factory = Mock()
+        factory.preload_agents.return_value = 4
+        monkeypatch.setattr(app, "load_config", Mock())
+        monkeypatch.setattr(app, "create_vector_db", Mock())
+        monkeypatch.setattr(app, "create_agent_factory", Mock(return_value=factory))
+        monkeypatch.setattr(app, "_vector_db", None)
+        monkeypatch.setattr(app, "_agent_factory", None)
+        monkeypatch.setattr(grok_search, "_clients", {})
+
+        assert app.preload_agents() == 4
+
+        monkeypatch.setitem(grok_search._clients, "key", Mock())
+        with pytest.raises(RuntimeError, match="--preload"):
+            app.preload_agents()
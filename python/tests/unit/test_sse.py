@@ -0,0 +1,67 @@
+"""
+Unit tests for the SSE chat chunk encoder.
+"""
+
+import json
+
+import pytest
+
+from cairo_coder.server import sse
+from cairo_coder.server.sse import ChatChunkEncoder
+
+TEXTS = [
+    "",
+    "plain",
+    'quote " and \\ backslash',
+    "line\nbreak\ttab\x01",
+    "café — § 14 🚀",
+    "x" * 500,
+]
+
+
+def payload(frame: str):
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    return json.loads(frame.removeprefix("data: "))
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_content_frames_match_json_dumps(text):
+    stdlib = ChatChunkEncoder("resp-1", 1700000000, use_orjson=False)
+    expected = {
+        "id": "resp-1",
+        "object": "chat.completion.chunk",
+        "created": 1700000000,
+        "model": "cairo-coder",
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+
+    # The stdlib path is byte-for-byte what json.dumps produced before
+    assert stdlib.content(text) == f"data: {json.dumps(expected)}\n\n"
+    # Every escaping choice decodes to the same chunk
+    for use_orjson in (None, True) if sse.orjson is not None else (None,):
+        assert (
+            payload(ChatChunkEncoder("resp-1", 1700000000, use_orjson=use_orjson).content(text))
+            == expected
+        )
+
+
+def test_event_and_envelope_frames():
+    encoder = ChatChunkEncoder("resp-2", 1)
+    sources = [
+        {"metadata": {"title": "Book", "url": "https://book", "source_type": "documentation"}}
+    ]
+
+    assert payload(encoder.event("sources", sources)) == {"type": "sources", "data": sources}
+    assert payload(encoder.event("reasoning", 'a "thought"')) == {
+        "type": "reasoning",
+        "data": 'a "thought"',
+    }
+    assert payload(encoder.event("processing", "Retrieving...")) == {
+        "type": "processing",
+        "data": "Retrieving...",
+    }
+    assert payload(encoder.role())["choices"][0]["delta"] == {"role": "assistant"}
+    error = payload(encoder.finish("\n\nError: boom"))["choices"][0]
+    assert (error["delta"], error["finish_reason"]) == ({"content": "\n\nError: boom"}, "stop")
+    assert payload(encoder.finish())["choices"][0]["delta"] == {}
+    assert sse.DONE_FRAME == "data: [DONE]\n\n"
@@ -0,0 +1,93 @@
+"""
+Unit tests for the bounded, coalescing stream event queue.
+"""
+
+import asyncio
+
+import pytest
+
+from cairo_coder.core.stream_queue import StreamEventQueue
+from cairo_coder.core.types import StreamEvent, StreamEventType
+
+RESPONSE = StreamEventType.RESPONSE
+REASONING = StreamEventType.REASONING
+
+
+async def collect(queue: StreamEventQueue) -> list[tuple[StreamEventType, object]]:
+    return [(event.type, event.data) for event in [e async for e in queue.events()]]
+
+
+@pytest.mark.asyncio
+async def test_adjacent_chunks_of_the_same_type_are_merged():
+    queue = StreamEventQueue(coalesce_window_s=10.0, coalesce_max_chars=1000)
+    for event_type, data in [
+        (StreamEventType.SOURCES, []),
+        (REASONING, "Think"),
+        (REASONING, "ing"),
+        (RESPONSE, "Use "),
+        (RESPONSE, "storage"),
+        (RESPONSE, "."),
+        (StreamEventType.FINAL_RESPONSE, "Use storage."),
+    ]:
+        await queue.put(StreamEvent(type=event_type, data=data))
+    queue.close()
+
+    assert await collect(queue) == [
+        (StreamEventType.SOURCES, []),
+        (REASONING, "Thinking"),
+        (RESPONSE, "Use storage."),
+        (StreamEventType.FINAL_RESPONSE, "Use storage."),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("window_s", "max_chars", "expected"),
+    [
+        (10.0, 4, ["abcd", "efgh", "ij"]),
+        (0.0, 1000, ["ab", "cd", "ef", "gh", "ij"]),
+    ],
+)
+async def test_size_limit_and_disabled_window(window_s, max_chars, expected):
+    queue = StreamEventQueue(coalesce_window_s=window_s, coalesce_max_chars=max_chars)
+    for chunk in ["ab", "cd", "ef", "gh", "ij"]:
+        await queue.put(StreamEvent(type=RESPONSE, data=chunk))
+    queue.close()
+
+    assert [data for _, data in await collect(queue)] == expected
+
+
+@pytest.mark.asyncio
+async def test_buffered_text_is_emitted_when_the_window_elapses():
+    queue = StreamEventQueue(coalesce_window_s=0.02, coalesce_max_chars=1000)
+    received: list[str] = []
+
+    async def consume() -> None:
+        async for event in queue.events():
+            received.append(event.data)
+
+    consumer = asyncio.create_task(consume())
+    await queue.put(StreamEvent(type=RESPONSE, data="first"))
+    await asyncio.sleep(0.1)
+    assert received == ["first"]
+
+    await queue.put(StreamEvent(type=RESPONSE, data="second"))
+    queue.close()
+    await consumer
+    assert received == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_suspends_the_producer_and_close_never_blocks():
+    queue = StreamEventQueue(maxsize=2, coalesce_window_s=0.0)
+    await queue.put(StreamEvent(type=StreamEventType.PROCESSING, data="1"))
+    await queue.put(StreamEvent(type=StreamEventType.PROCESSING, data="2"))
+
+    blocked = asyncio.create_task(queue.put(StreamEvent(type=StreamEventType.PROCESSING, data="3")))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    blocked.cancel()
+
+    # The stream ends after the queued events even though no end marker fits
+    queue.close()
+    assert [data for _, data in await collect(queue)] == ["1", "2"]
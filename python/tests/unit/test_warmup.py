@@ -0,0 +1,50 @@
+"""
+Unit tests for the startup warm-up.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, Mock
+
+import pytest
+
+from cairo_coder.server.warmup import (
+    WARMUP_EAGER,
+    WARMUP_LAZY,
+    warm_connections,
+    warmup_mode_from_env,
+)
+
+
+def pool_with(connection):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=connection)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_warm_connections_runs_every_step_and_reports_failures():
+    connection = Mock(fetchval=AsyncMock(return_value=1))
+    broken = Mock(fetchval=AsyncMock(side_effect=OSError("connection refused")))
+    embed = Mock(return_value=[[0.1, 0.2]])
+    lm = Mock(acall=AsyncMock(return_value=["ok"]))
+
+    durations = await warm_connections(
+        {"app": pool_with(connection), "vector_store": pool_with(broken)}, embed=embed, lm=lm
+    )
+
+    assert set(durations) == {"db_app", "db_vector_store", "embedding", "lm"}
+    assert durations["db_vector_store"] is None
+    assert all(durations[step] is not None for step in ("db_app", "embedding", "lm"))
+    connection.fetchval.assert_awaited_once_with("SELECT 1")
+    embed.assert_called_once()
+    assert lm.acall.await_args.kwargs["max_tokens"] == 1
+
+
+def test_warmup_mode_from_env(monkeypatch):
+    monkeypatch.delenv("WARMUP_MODE", raising=False)
+    assert warmup_mode_from_env() == WARMUP_LAZY
+    monkeypatch.setenv("WARMUP_MODE", " Eager ")
+    assert warmup_mode_from_env() == WARMUP_EAGER
+    monkeypatch.setenv("WARMUP_MODE", "sometimes")
+    with pytest.raises(ValueError, match="WARMUP_MODE"):
+        warmup_mode_from_env()